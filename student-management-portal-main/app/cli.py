@@ -0,0 +1,321 @@
+# app/cli.py
+"""
+Maintenance commands, run from the project root:
+
+    python -m app.cli rebuild-attendance-summary [--student-id ID]
+    python -m app.cli migrate-mcq-options
+    python -m app.cli regrade-exam EXAM_ID [EXAM_ID ...] [--dry-run]
+    python -m app.cli backfill-schedule-times
+    python -m app.cli generate-timetable [--include-unscheduled] [--time-budget S] [--workers N] [--output FILE] [--apply]
+    python -m app.cli set-instructor-availability INSTRUCTOR_ID ["Mon 09:00-13:00" ...]
+    python -m app.cli recount-course-seats
+    python -m app.cli import-students FILE [--dry-run] [--chunk-size N] [--workers N]
+    python -m app.cli export TABLE [--format csv|parquet] [--output FILE]
+    python -m app.cli rebuild-fee-ledger
+    python -m app.cli sweep-overdue-fees [--as-of YYYY-MM-DD] [--batch-size N]
+    python -m app.cli generate-fee-plan PLAN_ID [--preview]
+"""
+
+import argparse
+import json
+import logging
+import sys
+from datetime import date
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.database import SessionLocal, engine
+from app.models import Base
+from app.services import (
+    attendance_service, enrollment_service, exam_service, export_service, fee_ledger_service, fee_overdue_service,
+    fee_plan_service, grading_service, schedule_service, student_import_service,
+    timetable_service,
+)
+
+logger = logging.getLogger("app.cli")
+
+
+def rebuild_attendance_summary(args) -> int:
+    db = SessionLocal()
+    try:
+        written = attendance_service.rebuild_attendance_summary(db, student_id=args.student_id)
+    finally:
+        db.close()
+    print(f"Attendance summary rebuilt: {written} rows.")
+    return 0
+
+
+def migrate_mcq_options(args) -> int:
+    db = SessionLocal()
+    try:
+        converted, linked = exam_service.migrate_legacy_mcq_options(db, batch_size=args.batch_size)
+    finally:
+        db.close()
+    print(f"MCQ options migrated: {converted} questions converted, {linked} answers linked.")
+    return 0
+
+
+def regrade_exam(args) -> int:
+    db = SessionLocal()
+    try:
+        for summary in grading_service.regrade_exams(db, args.exam_ids, dry_run=args.dry_run):
+            verb = "would change" if summary["dry_run"] else "changed"
+            print(
+                f"Exam {summary['exam_id']}: {summary['results']} attempts, {summary['answers']} answers; "
+                f"{verb} {summary['results_changed']} scores and {summary['answers_changed']} answers."
+            )
+    finally:
+        db.close()
+    return 0
+
+
+def backfill_schedule_times(args) -> int:
+    db = SessionLocal()
+    try:
+        updated, unparseable = schedule_service.backfill_schedule_slots(db)
+    finally:
+        db.close()
+    print(f"Schedule times backfilled: {updated} rows updated, {unparseable} could not be parsed.")
+    return 0
+
+
+def generate_timetable(args) -> int:
+    db = SessionLocal()
+    try:
+        report = timetable_service.generate_timetable(
+            db, include_unscheduled=args.include_unscheduled, apply=args.apply,
+            time_budget=args.time_budget, workers=args.workers, seed=args.seed
+        )
+    finally:
+        db.close()
+    if not args.apply:
+        timetable_service.save_preview(report) # Shown by Admin > Schedules > Timetable preview
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    for change in report["changes"][:args.show]:
+        to = change["to"]
+        print(
+            f"  {change['status']:5} #{change['schedule_id'] or '-'} {change['course']} ({change['instructor']}): "
+            f"{to['day_of_week']} {to['start_time']}-{to['end_time']} {to['classroom'] or ''}"
+        )
+    for item in report["unplaced"]:
+        print(f"  unplaced #{item['schedule_id'] or '-'} course {item['course_id']}: {item['reason']}")
+    summary = report["summary"]
+    print(
+        f"Timetable {'applied' if args.apply else 'dry run'}: {report['placed']}/{report['meetings']} meetings placed "
+        f"({summary['unchanged']} unchanged, {summary['moved']} moved, {summary['new']} new), cost {report['cost']}, "
+        f"{len(report['starts'])} starts in {report['seconds']}s."
+    )
+    return 0 if not report["unplaced"] else 2
+
+
+def set_instructor_availability(args) -> int:
+    db = SessionLocal()
+    try:
+        stored = timetable_service.set_instructor_availability(db, args.instructor_id, args.windows)
+    finally:
+        db.close()
+    print(f"Instructor {args.instructor_id}: {stored} availability windows stored" + ("." if stored else " (available any time)."))
+    return 0
+
+
+def recount_course_seats(args) -> int:
+    db = SessionLocal()
+    try:
+        corrected = enrollment_service.recount_course_seats(db)
+    finally:
+        db.close()
+    print(f"Course seat counters recounted: {corrected} courses corrected.")
+    return 0
+
+
+def import_students(args) -> int:
+    db = SessionLocal()
+    try:
+        with open(args.file, "rb") as stream:
+            report = student_import_service.import_students(
+                db, stream, args.file, dry_run=args.dry_run, chunk_size=args.chunk_size, hash_workers=args.workers
+            )
+    finally:
+        db.close()
+        student_import_service.shutdown()
+    for item in report["errors"][:args.show]:
+        print(f"  row {item['row'] or '-'} {item['username'] or ''}: {item['message']}")
+    print(
+        f"Student import {'dry run' if args.dry_run else 'done'}: {report['rows']} rows, "
+        f"{report['imported']} {'valid' if args.dry_run else 'imported'}, {report['failed']} failed in {report['seconds']}s."
+    )
+    return 0 if not report["failed"] else 2
+
+
+def export_table(args) -> int:
+    chunks, _, filename = export_service.open_export(args.table, args.format, batch_rows=args.batch_rows)
+    output = args.output or filename
+    written = 0
+    with (sys.stdout.buffer if output == "-" else open(output, "wb")) as out:
+        for chunk in chunks:
+            out.write(chunk)
+            written += len(chunk)
+    if output != "-":
+        print(f"Exported {args.table} to {output} ({written} bytes).")
+    return 0
+
+
+def rebuild_fee_ledger(args) -> int:
+    db = SessionLocal()
+    try:
+        result = fee_ledger_service.rebuild_fee_ledger(db)
+    finally:
+        db.close()
+    print(
+        f"Fee ledger rebuilt: opening entries posted for {result['fee_records_opened']} fee records, "
+        f"{result['balances']} student balances recomputed."
+    )
+    return 0
+
+
+def sweep_overdue_fees(args) -> int:
+    as_of = date.fromisoformat(args.as_of) if args.as_of else None
+    report = fee_overdue_service.sweep_overdue_fees(as_of=as_of, batch_size=args.batch_size)
+    print(
+        f"Overdue sweep as of {report['as_of']}: {report['rows']} fee records marked OVERDUE in {report['batches']} batches, "
+        f"{report['balances_aged']} balances re-aged in {report['seconds']}s."
+    )
+    return 0
+
+
+def generate_fee_plan(args) -> int:
+    db = SessionLocal()
+    try:
+        if args.preview:
+            preview = fee_plan_service.preview_fee_plan(db, args.plan_id, limit=args.sample)
+            print(json.dumps(preview, indent=2))
+            return 0
+        report = fee_plan_service.generate_fee_plan(db, args.plan_id)
+    finally:
+        db.close()
+    print(
+        f"Fee plan {report['plan_id']} ({report['term']}): {report['generated']} fee records generated "
+        f"({report['total_amount']:.2f} charged), {report['already_charged']} already charged, {report['seconds']}s."
+    )
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Student Management System maintenance commands")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = subcommands.add_parser(
+        "rebuild-attendance-summary",
+        help="Recompute the monthly attendance rollup from the attendance table"
+    )
+    rebuild.add_argument("--student-id", type=int, default=None, help="Only rebuild this student's rows")
+    rebuild.set_defaults(handler=rebuild_attendance_summary)
+
+    migrate_options = subcommands.add_parser(
+        "migrate-mcq-options",
+        help="Convert legacy JSON MCQ options to mcq_options rows and link existing answers"
+    )
+    migrate_options.add_argument("--batch-size", type=int, default=500)
+    migrate_options.set_defaults(handler=migrate_mcq_options)
+
+    regrade = subcommands.add_parser(
+        "regrade-exam",
+        help="Recompute scores of submitted attempts against the exam's current answer key"
+    )
+    regrade.add_argument("exam_ids", type=int, nargs="+", metavar="EXAM_ID")
+    regrade.add_argument("--dry-run", action="store_true", help="Report what would change without writing")
+    regrade.set_defaults(handler=regrade_exam)
+
+    backfill_times = subcommands.add_parser(
+        "backfill-schedule-times",
+        help="Fill the typed weekday/start/end columns of schedules from their day and time strings"
+    )
+    backfill_times.set_defaults(handler=backfill_schedule_times)
+
+    timetable = subcommands.add_parser(
+        "generate-timetable",
+        help="Generate a conflict-free weekly timetable and show its diff against the current schedules (dry runs are stored for the admin preview page)"
+    )
+    timetable.add_argument("--include-unscheduled", action="store_true", help="Also place courses that have no schedule yet")
+    timetable.add_argument("--time-budget", type=float, default=None, help="Seconds per search start (default TIMETABLE_TIME_BUDGET_SECONDS)")
+    timetable.add_argument("--workers", type=int, default=None, help="Parallel search starts (default TIMETABLE_WORKERS)")
+    timetable.add_argument("--seed", type=int, default=None)
+    timetable.add_argument("--output", default=None, help="Write the full diff as JSON to this file")
+    timetable.add_argument("--show", type=int, default=50, help="Changes to print")
+    timetable.add_argument("--apply", action="store_true", help="Write the timetable (only if every meeting was placed)")
+    timetable.set_defaults(handler=generate_timetable)
+
+    availability = subcommands.add_parser(
+        "set-instructor-availability",
+        help="Replace an instructor's teaching windows used by generate-timetable (none = any time)"
+    )
+    availability.add_argument("instructor_id", type=int, metavar="INSTRUCTOR_ID")
+    availability.add_argument("windows", nargs="*", metavar="WINDOW", help='e.g. "Mon 09:00-13:00"')
+    availability.set_defaults(handler=set_instructor_availability)
+
+    recount = subcommands.add_parser(
+        "recount-course-seats",
+        help="Reset each course's taken-seat counter to its enrollment count and fill freed seats from waitlists"
+    )
+    recount.set_defaults(handler=recount_course_seats)
+
+    student_import = subcommands.add_parser(
+        "import-students",
+        help="Create student accounts in bulk from a CSV or XLSX file (rows with errors are skipped and listed)"
+    )
+    student_import.add_argument("file", metavar="FILE", help=".csv or .xlsx with a header row (name, email, username, ...)")
+    student_import.add_argument("--dry-run", action="store_true", help="Validate and check for existing accounts without writing")
+    student_import.add_argument("--chunk-size", type=int, default=student_import_service.STUDENT_IMPORT_CHUNK_SIZE)
+    student_import.add_argument("--workers", type=int, default=student_import_service.STUDENT_IMPORT_HASH_WORKERS, help="Password hashing processes")
+    student_import.add_argument("--show", type=int, default=50, help="Errors to print")
+    student_import.set_defaults(handler=import_students)
+
+    export = subcommands.add_parser(
+        "export",
+        help="Stream a whole table to a CSV or Parquet file (same data as the admin export links)"
+    )
+    export.add_argument("table", choices=list(export_service.EXPORTS))
+    export.add_argument("--format", choices=list(export_service.FORMATS), default="csv")
+    export.add_argument("--output", default=None, help="File to write (default TABLE-DATE.FORMAT; - for stdout)")
+    export.add_argument("--batch-rows", type=int, default=export_service.EXPORT_BATCH_ROWS)
+    export.set_defaults(handler=export_table)
+
+    fee_ledger = subcommands.add_parser(
+        "rebuild-fee-ledger",
+        help="Post opening ledger entries for fee records without any and recompute student balances (run while idle)"
+    )
+    fee_ledger.set_defaults(handler=rebuild_fee_ledger)
+
+    sweep = subcommands.add_parser(
+        "sweep-overdue-fees",
+        help="Mark PENDING fee records past their due date OVERDUE (batched) and re-age fee balances"
+    )
+    sweep.add_argument("--as-of", default=None, help="Treat this date (YYYY-MM-DD) as today")
+    sweep.add_argument("--batch-size", type=int, default=fee_overdue_service.FEE_OVERDUE_SWEEP_BATCH_SIZE)
+    sweep.set_defaults(handler=sweep_overdue_fees)
+
+    fee_plan = subcommands.add_parser(
+        "generate-fee-plan",
+        help="Charge a fee plan's term fee to every cohort student it has not charged yet (safe to rerun)"
+    )
+    fee_plan.add_argument("plan_id", type=int)
+    fee_plan.add_argument("--preview", action="store_true", help="Print totals and sample charges without writing")
+    fee_plan.add_argument("--sample", type=int, default=20, help="Students listed by --preview")
+    fee_plan.set_defaults(handler=generate_fee_plan)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    Base.metadata.create_all(bind=engine) # New tables (e.g. the rollup) exist before the command runs
+    try:
+        return args.handler(args)
+    except ValueError as e:
+        logger.error(str(e))
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
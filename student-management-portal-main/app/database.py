@@ -1,38 +1,279 @@
 import os
-from sqlalchemy import create_engine
+import time
+import threading
+from typing import Any, Callable, Dict, List, Optional
+from sqlalchemy import and_, create_engine, event, exc
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 
 load_dotenv()
 
 # Database credentials
 DATABASE_USER = os.environ.get("DATABASE_USER", 'root')
-DATABASE_PASSWORD = os.environ.get("DATABASE_PASSWORD", 'Password') 
+DATABASE_PASSWORD = os.environ.get("DATABASE_PASSWORD", 'Password')
 DATABASE_HOST = os.environ.get("DATABASE_HOST", 'localhost')
 DATABASE_PORT = os.environ.get("DATABASE_PORT", 3306)
-DATABASE_NAME = os.environ.get("DATABASE_NAME", "smsdatabase")  
+DATABASE_NAME = os.environ.get("DATABASE_NAME", "smsdatabase")
 
-# Construct the MySQL database URL
-DATABASE_URL = f"mysql+mysqlconnector://{DATABASE_USER}:{DATABASE_PASSWORD}@{DATABASE_HOST}:{DATABASE_PORT}/{DATABASE_NAME}"
-
-# Create SQLAlchemy engine
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,
-    pool_recycle=300,
+# Construct the MySQL database URL (DATABASE_URL overrides it, e.g. "sqlite:///./test.sqlite3" for tests)
+DATABASE_URL = os.environ.get(
+    "DATABASE_URL",
+    f"mysql+mysqlconnector://{DATABASE_USER}:{DATABASE_PASSWORD}@{DATABASE_HOST}:{DATABASE_PORT}/{DATABASE_NAME}"
+)
+# Async driver URL, used when DATABASE_ASYNC is enabled (e.g. "sqlite+aiosqlite:///./test.sqlite3" for tests)
+ASYNC_DATABASE_URL = os.environ.get(
+    "ASYNC_DATABASE_URL",
+    f"mysql+aiomysql://{DATABASE_USER}:{DATABASE_PASSWORD}@{DATABASE_HOST}:{DATABASE_PORT}/{DATABASE_NAME}"
 )
+# When true, request handlers get an AsyncSession instead of a threadpool-backed Session
+DATABASE_ASYNC = os.environ.get("DATABASE_ASYNC", "false").lower() in ("1", "true", "yes")
+
+# Connection pool settings (per engine, i.e. per worker process)
+POOL_SIZE = int(os.environ.get("DATABASE_POOL_SIZE", 5))
+POOL_MAX_OVERFLOW = int(os.environ.get("DATABASE_POOL_MAX_OVERFLOW", 10))
+POOL_TIMEOUT = float(os.environ.get("DATABASE_POOL_TIMEOUT", 30))
+POOL_RECYCLE = int(os.environ.get("DATABASE_POOL_RECYCLE", 300))
+# Pre-ping strategy:
+#   "always" - ping on every checkout (one extra round trip per checkout)
+#   "idle"   - ping only connections idle longer than DATABASE_POOL_PRE_PING_IDLE_SECONDS
+#   "never"  - rely on pool_recycle and disconnect handling
+POOL_PRE_PING = os.environ.get("DATABASE_POOL_PRE_PING", "always").lower()
+POOL_PRE_PING_IDLE_SECONDS = float(os.environ.get("DATABASE_POOL_PRE_PING_IDLE_SECONDS", 30))
+if POOL_PRE_PING not in ("always", "idle", "never"):
+    raise ValueError(f"Invalid DATABASE_POOL_PRE_PING '{POOL_PRE_PING}' (expected always, idle or never)")
+
+
+class PoolMetrics:
+    """Thread-safe counters for one engine's connection pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.overflow_checkouts = 0 # Checkouts served while the pool was in overflow
+        self.max_overflow_seen = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, seconds: float, overflow: int, timed_out: bool = False):
+        with self._lock:
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            if overflow > 0:
+                self.overflow_checkouts += 1
+                self.max_overflow_seen = max(self.max_overflow_seen, overflow)
+
+    def increment(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self, pool) -> Dict[str, Any]:
+        with self._lock:
+            data = {
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "overflow_checkouts": self.overflow_checkouts,
+                "max_overflow_seen": self.max_overflow_seen,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+                "wait_seconds_avg": round(self.wait_seconds_total / self.checkouts, 6) if self.checkouts else 0.0,
+            }
+        if isinstance(pool, QueuePool):
+            data.update({
+                "pool_size": pool.size(),
+                "checked_out": pool.checkedout(), # Connections in use right now
+                "checked_in": pool.checkedin(), # Idle connections held by the pool
+                "overflow": max(pool.overflow(), 0),
+                "max_overflow": pool._max_overflow,
+            })
+        return data
+
+
+def _timed_pool_class(base, metrics: PoolMetrics):
+    """Builds a QueuePool subclass that records checkout wait time into `metrics`."""
+    class TimedPool(base):
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                conn = super()._do_get()
+            except exc.TimeoutError:
+                metrics.record_wait(time.perf_counter() - started, self.overflow(), timed_out=True)
+                raise
+            metrics.record_wait(time.perf_counter() - started, self.overflow())
+            return conn
+    TimedPool.__name__ = f"Timed{base.__name__}"
+    return TimedPool
+
+
+def _instrument_pool(sync_engine, metrics: PoolMetrics):
+    """Attaches metric counters and the idle pre-ping strategy to an engine's pool."""
+    @event.listens_for(sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        metrics.increment("connects")
+
+    @event.listens_for(sync_engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        metrics.increment("checkins")
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(sync_engine, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.increment("invalidations")
+
+    if POOL_PRE_PING == "idle":
+        @event.listens_for(sync_engine, "checkout")
+        def _ping_if_idle(dbapi_connection, connection_record, connection_proxy):
+            checked_in_at = connection_record.info.get("checked_in_at")
+            if checked_in_at is None or time.monotonic() - checked_in_at < POOL_PRE_PING_IDLE_SECONDS:
+                return
+            try:
+                cursor = dbapi_connection.cursor()
+                cursor.execute("SELECT 1")
+                cursor.close()
+            except Exception:
+                # The pool discards this connection and retries the checkout with a fresh one
+                raise exc.DisconnectionError("Stale pooled connection")
+
+
+def _pool_kwargs(base_pool_class, metrics: PoolMetrics) -> Dict[str, Any]:
+    return {
+        "poolclass": _timed_pool_class(base_pool_class, metrics),
+        "pool_size": POOL_SIZE,
+        "max_overflow": POOL_MAX_OVERFLOW,
+        "pool_timeout": POOL_TIMEOUT,
+        "pool_recycle": POOL_RECYCLE,
+        "pool_pre_ping": POOL_PRE_PING == "always",
+    }
+
+
+pool_metrics = PoolMetrics()
+async_pool_metrics: Optional[PoolMetrics] = None
+
+# Create SQLAlchemy engine (always available: startup tasks, table creation and scripts use it)
+engine = create_engine(DATABASE_URL, **_pool_kwargs(QueuePool, pool_metrics))
+_instrument_pool(engine, pool_metrics)
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine/session factory, only built when async mode is selected
+async_engine = None
+AsyncSessionLocal = None
+if DATABASE_ASYNC:
+    async_pool_metrics = PoolMetrics()
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL, **_pool_kwargs(AsyncAdaptedQueuePool, async_pool_metrics)
+    )
+    _instrument_pool(async_engine.sync_engine, async_pool_metrics)
+    # expire_on_commit=False: objects returned by services stay readable after commit
+    # without triggering implicit (blocking) refresh IO outside of run_db()
+    AsyncSessionLocal = async_sessionmaker(
+        bind=async_engine, autoflush=False, expire_on_commit=False
+    )
+
 # Create declarative base
 Base = declarative_base()
 
 # Dependency to get db session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+async def get_db():
+    """
+    Yields the request's session. In async mode this is an AsyncSession; otherwise a
+    regular Session whose work is pushed to the threadpool by run_db().
+    Either way the event loop never waits on the database.
+    """
+    if DATABASE_ASYNC:
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            await run_in_threadpool(db.close)
+
+async def run_db(db, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Runs a (synchronous) service function with the request's session. Services keep their
+    plain `fn(db: Session, ...)` signature and stay callable from sync code (scripts,
+    startup tasks); async call sites go through here.
+
+    Sync mode: fn runs in the threadpool. Async mode: fn runs via AsyncSession.run_sync ON
+    THE EVENT LOOP THREAD; only its database IO yields to other requests. This is not a
+    thread offload there, so fn must not hash passwords, wait on pools/futures, parse large
+    files or run long CPU loops (use run_blocking, or do that work in the route first), and
+    results must not lazy load after it returns (eager load what the route/template reads).
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+async def run_blocking(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Runs a service function that does blocking or CPU-heavy work besides database IO in the
+    threadpool with its own (sync) session, in both modes, so the event loop stays free.
+    fn must commit its own work; its results are detached once the session is closed.
+    """
+    def call():
+        db = SessionLocal()
+        try:
+            return fn(db, *args, **kwargs)
+        finally:
+            db.close()
+    return await run_in_threadpool(call)
+
+def bulk_upsert(db, table, rows: List[Dict[str, Any]], key_columns: List[str], update_values) -> None:
+    """
+    Inserts `rows` into `table` in one statement; rows whose unique key (`key_columns`)
+    already exists are updated with update_values(new), where `new` exposes the incoming
+    row's values (MySQL ON DUPLICATE KEY UPDATE / SQLite ON CONFLICT DO UPDATE).
+    Other dialects fall back to per-row UPDATE-then-INSERT. Does not commit.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        stmt = mysql.insert(table).values(rows)
+        db.execute(stmt.on_duplicate_key_update(update_values(stmt.inserted)))
+    elif dialect == "sqlite":
+        stmt = sqlite.insert(table).values(rows)
+        db.execute(stmt.on_conflict_do_update(index_elements=key_columns, set_=update_values(stmt.excluded)))
+    else:
+        for row in rows:
+            key = and_(*[table.c[column] == row[column] for column in key_columns])
+            result = db.execute(table.update().where(key).values(update_values(_IncomingRow(row))))
+            if result.rowcount == 0:
+                db.execute(table.insert().values(row))
+
+class _IncomingRow(dict):
+    """The incoming row for the bulk_upsert fallback, readable as new.column or new[column]."""
+    __getattr__ = dict.__getitem__
+
+def get_pool_metrics() -> Dict[str, Any]:
+    """Returns pool configuration plus live counters for the sync (and async, if enabled) engine."""
+    data = {
+        "config": {
+            "pool_size": POOL_SIZE,
+            "max_overflow": POOL_MAX_OVERFLOW,
+            "pool_timeout": POOL_TIMEOUT,
+            "pool_recycle": POOL_RECYCLE,
+            "pre_ping": POOL_PRE_PING,
+            "pre_ping_idle_seconds": POOL_PRE_PING_IDLE_SECONDS if POOL_PRE_PING == "idle" else None,
+        },
+        "sync": pool_metrics.snapshot(engine.pool),
+    }
+    if async_engine is not None:
+        data["async"] = async_pool_metrics.snapshot(async_engine.sync_engine.pool)
+    return data
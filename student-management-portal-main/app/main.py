@@ -15,7 +15,9 @@ from app.database import get_db, engine
 from app.models import Base
 from app import models
 from app.models import Base, User, UserRole # Import User and UserRole
-from app.services import auth_service
+from app.services import (
+    attempt_service, auth_service, fee_overdue_service, password_service, student_import_service, submission_queue_service,
+)
 # Import all route modules
 from app.routes import (
     auth, admin, showcase,
@@ -35,7 +37,8 @@ from app.routes import (
     department,
      classroom,
      home,
-     showcase
+     showcase,
+     api
 )
 
 # Load environment variables
@@ -57,6 +60,9 @@ app = FastAPI(
 async def startup_event():
     """Checks for and creates the default admin user on startup."""
     logger.info("Running startup event...")
+    submission_queue_service.start() # No-op unless SUBMISSION_QUEUE_ENABLED
+    attempt_service.start() # Periodic flush of autosaved exam answers
+    fee_overdue_service.start() # Periodic PENDING -> OVERDUE sweep of fee records
     db: Session = SessionLocal() # Create a new session explicitly for startup
     try:
         admin_username = os.getenv("DEFAULT_ADMIN_USERNAME", 'admin')
@@ -89,6 +95,10 @@ async def startup_event():
             logger.info(f"Default admin user '{admin_username}' created successfully.")
             logger.warning(f"IMPORTANT: Log in as '{admin_username}' with the default password and change it immediately!")
 
+        # The attendance rollup is created empty on first boot; existing attendance needs a one-off rebuild
+        if db.query(models.Attendance.id).first() and not db.query(models.AttendanceMonthlySummary.id).first():
+            logger.warning("Attendance summary table is empty. Run 'python -m app.cli rebuild-attendance-summary' to populate it.")
+
     except Exception as e:
         logger.error(f"Error during startup event (admin creation): {e}")
         # Depending on the error, you might want to db.rollback() here,
@@ -97,6 +107,16 @@ async def startup_event():
         db.close() # Ensure the session is closed
     logger.info("Startup event finished.")
 
+# --- Shutdown Event ---
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stops the password hashing pools, the submission queue workers, the autosave flusher and the overdue sweeper."""
+    password_service.shutdown()
+    student_import_service.shutdown()
+    submission_queue_service.shutdown()
+    attempt_service.shutdown() # Flushes buffered answers
+    fee_overdue_service.shutdown()
+
 
 
 # Configure templates
@@ -180,6 +200,7 @@ app.include_router(
     prefix="/admin/departments",
     tags=["Admin - Department Management"]
 )
+app.include_router(api.router, prefix="/api", tags=["API"])
 
 if __name__ == "__main__":
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -1,7 +1,7 @@
 import enum
 import datetime
 from datetime import date
-from sqlalchemy import Column, Integer, String, Float, Text, Boolean, Date, DateTime, ForeignKey, Enum, func, UniqueConstraint
+from sqlalchemy import Column, Integer, SmallInteger, String, Float, Text, Boolean, Date, DateTime, ForeignKey, Enum, func, UniqueConstraint, Index
 from sqlalchemy.orm import declarative_base, relationship # Use declarative_base from orm
 from passlib.context import CryptContext # Import CryptContext
 
@@ -46,7 +46,7 @@ class Student(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), unique=True, nullable=False) # Assuming every student MUST be a user
-    name = Column(String(100), nullable=False)
+    name = Column(String(100), nullable=False, index=True) # Indexed for prefix search (typeahead)
     dob = Column(Date, nullable=True)
     phone = Column(String(20), nullable=True)
     address = Column(String(255), nullable=True)
@@ -58,12 +58,16 @@ class Student(Base):
     user = relationship("User", back_populates="student_profile")
     department = relationship("Department", back_populates="students") # Relationship to Department
     enrollments = relationship("Enrollment", back_populates="student", cascade="all, delete-orphan")
+    waitlist_entries = relationship("EnrollmentWaitlist", back_populates="student", cascade="all, delete-orphan")
     scholarship_assignments = relationship("StudentScholarship", back_populates="student", cascade="all, delete-orphan")
     grades = relationship("Grade", back_populates="student", cascade="all, delete-orphan")
     attendance_records = relationship("Attendance", back_populates="student", cascade="all, delete-orphan")
+    attendance_summaries = relationship("AttendanceMonthlySummary", back_populates="student", cascade="all, delete-orphan")
     library_records = relationship("Library", back_populates="student", cascade="all, delete-orphan")
     results = relationship("Result", back_populates="student", cascade="all, delete-orphan")
     fee_payments = relationship("FeePayment", back_populates="student", cascade="all, delete-orphan")
+    fee_ledger_entries = relationship("FeeLedgerEntry", back_populates="student", cascade="all, delete-orphan")
+    fee_balance = relationship("StudentFeeBalance", back_populates="student", uselist=False, cascade="all, delete-orphan")
     hostel_records = relationship("Hostel", back_populates="student", cascade="all, delete-orphan")
     discipline_records = relationship("DisciplineRecord", back_populates="student", cascade="all, delete-orphan")
     guardians = relationship("Guardian", back_populates="student", cascade="all, delete-orphan")
@@ -119,6 +123,7 @@ class Instructor(Base):
         foreign_keys=[department_id] # Specify FK
     )
     schedules = relationship("Schedule", back_populates="instructor", cascade="all, delete-orphan")
+    availability = relationship("InstructorAvailability", back_populates="instructor", cascade="all, delete-orphan")
 
 class Course(Base):
     __tablename__ = "courses"
@@ -128,15 +133,19 @@ class Course(Base):
     credits = Column(Integer, nullable=True)
     description = Column(Text, nullable=True)
     department_id = Column(Integer, ForeignKey("departments.id"), nullable=False) # Link course to a department
+    capacity = Column(Integer, nullable=True) # Seat limit; NULL = unlimited
+    seats_taken = Column(Integer, nullable=False, default=0, server_default="0") # Kept equal to the enrollment count by enrollment_service
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
 
     # Relationships
     department = relationship("Department", back_populates="courses") # Relationship to Department
     enrollments = relationship("Enrollment", back_populates="course", cascade="all, delete-orphan")
+    waitlist_entries = relationship("EnrollmentWaitlist", back_populates="course", cascade="all, delete-orphan")
     schedules = relationship("Schedule", back_populates="course", cascade="all, delete-orphan")
     grades = relationship("Grade", back_populates="course", cascade="all, delete-orphan")
     exams = relationship("Exam", back_populates="course", cascade="all, delete-orphan")
+    attendance_summaries = relationship("AttendanceMonthlySummary", back_populates="course", cascade="all, delete-orphan")
 
 class Enrollment(Base):
     __tablename__ = "enrollments"
@@ -152,6 +161,28 @@ class Enrollment(Base):
     student = relationship("Student", back_populates="enrollments")
     course = relationship("Course", back_populates="enrollments")
 
+    __table_args__ = (
+        UniqueConstraint('student_id', 'course_id', name='_enrollment_student_course_uc'), # A student's courses / one enrollment per course
+        Index('ix_enrollments_course_student', 'course_id', 'student_id'), # Roster of a course
+    )
+
+class EnrollmentWaitlist(Base):
+    """A student waiting for a seat in a full course; promoted first come, first served by enrollment_service."""
+    __tablename__ = "enrollment_waitlist"
+
+    id = Column(Integer, primary_key=True, index=True) # Order of arrival
+    student_id = Column(Integer, ForeignKey("students.id"), nullable=False)
+    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False)
+    created_at = Column(DateTime, default=func.now())
+
+    student = relationship("Student", back_populates="waitlist_entries")
+    course = relationship("Course", back_populates="waitlist_entries")
+
+    __table_args__ = (
+        UniqueConstraint('student_id', 'course_id', name='_waitlist_student_course_uc'),
+        Index('ix_enrollment_waitlist_course', 'course_id', 'id'), # Queue of a course
+    )
+
 class Classroom(Base):
     __tablename__ = "classrooms"
     
@@ -174,6 +205,10 @@ class Schedule(Base):
     day_of_week = Column(String(20), nullable=True)
     start_time = Column(String(20), nullable=True)
     end_time = Column(String(20), nullable=True)
+    # Typed copies of the strings above, kept in sync by schedule_service (conflict checks, solvers)
+    weekday = Column(SmallInteger, nullable=True) # 0 = Monday ... 6 = Sunday
+    start_minute = Column(SmallInteger, nullable=True) # Minutes since midnight
+    end_minute = Column(SmallInteger, nullable=True)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
@@ -183,6 +218,27 @@ class Schedule(Base):
     classroom = relationship("Classroom", back_populates="schedules")
     attendance_records = relationship("Attendance", back_populates="schedule", cascade="all, delete-orphan") # Attendance for this specific schedule
 
+    __table_args__ = (
+        Index('ix_schedules_instructor_course_day', 'instructor_id', 'course_id', 'day_of_week'), # Instructor timetable / conflict checks
+        Index('ix_schedules_course', 'course_id'),
+        Index('ix_schedules_classroom_weekday', 'classroom_id', 'weekday', 'start_minute'), # Room bookings by day
+    )
+
+class InstructorAvailability(Base):
+    """Weekly windows an instructor can teach in (used by the timetable generator). No rows = any time."""
+    __tablename__ = "instructor_availability"
+
+    id = Column(Integer, primary_key=True, index=True)
+    instructor_id = Column(Integer, ForeignKey("instructors.id"), nullable=False)
+    weekday = Column(SmallInteger, nullable=False) # 0 = Monday ... 6 = Sunday
+    start_minute = Column(SmallInteger, nullable=False)
+    end_minute = Column(SmallInteger, nullable=False)
+    created_at = Column(DateTime, default=func.now())
+
+    instructor = relationship("Instructor", back_populates="availability")
+
+    __table_args__ = (Index('ix_instructor_availability_instructor', 'instructor_id', 'weekday'),)
+
 class Grade(Base):
     __tablename__ = "grades"
     
@@ -198,6 +254,8 @@ class Grade(Base):
     student = relationship("Student", back_populates="grades")
     course = relationship("Course", back_populates="grades")
 
+    __table_args__ = (Index('ix_grades_student_course', 'student_id', 'course_id'),) # Transcript / GPA
+
 class AttendanceStatus(enum.Enum):
     PRESENT = "Present"
     ABSENT = "Absent"
@@ -218,6 +276,36 @@ class Attendance(Base):
     student = relationship("Student", back_populates="attendance_records")
     schedule = relationship("Schedule", back_populates="attendance_records") # Link back to Schedule
 
+    # One mark per student per session; attendance_service upserts against this key
+    __table_args__ = (
+        UniqueConstraint('student_id', 'schedule_id', 'date', name='_attendance_student_schedule_date_uc'),
+        Index('ix_attendance_schedule_date', 'schedule_id', 'date'), # Marking sheet for one session
+        Index('ix_attendance_student_date', 'student_id', 'date'), # A student's history, newest first
+    )
+
+class AttendanceMonthlySummary(Base):
+    """Per (student, course, month) attendance status counts, kept in step with `attendance` by attendance_service."""
+    __tablename__ = "attendance_monthly_summary"
+
+    id = Column(Integer, primary_key=True, index=True)
+    student_id = Column(Integer, ForeignKey("students.id"), nullable=False)
+    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False)
+    month = Column(Date, nullable=False) # First day of the month
+    present_count = Column(Integer, nullable=False, default=0)
+    absent_count = Column(Integer, nullable=False, default=0)
+    late_count = Column(Integer, nullable=False, default=0)
+    excused_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    # Relationships
+    student = relationship("Student", back_populates="attendance_summaries")
+    course = relationship("Course", back_populates="attendance_summaries")
+
+    __table_args__ = (UniqueConstraint('student_id', 'course_id', 'month', name='_attendance_summary_student_course_month_uc'),)
+
+    @property
+    def total_count(self) -> int:
+        return self.present_count + self.absent_count + self.late_count + self.excused_count
+
 class Library(Base):
     __tablename__ = "library_records"
     
@@ -249,6 +337,8 @@ class Exam(Base):
     total_marks = Column(Float, nullable=True, default=0.0)
     description = Column(Text, nullable=True)
     is_published = Column(Boolean, default=False)
+    # Bumped whenever questions, options or grading-relevant details change; keys the answer-key cache
+    answer_key_version = Column(Integer, nullable=False, default=1, server_default="1")
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
 
@@ -256,6 +346,8 @@ class Exam(Base):
     results = relationship("Result", back_populates="exam", cascade="all, delete-orphan")
     mcq_questions = relationship("MCQQuestion", back_populates="exam", cascade="all, delete-orphan", lazy="selectin")
 
+    __table_args__ = (Index('ix_exams_course_published_date', 'course_id', 'is_published', 'date'),) # Published/upcoming exams per course
+
 # === MCQ Question Model ===
 class MCQQuestion(Base):
     __tablename__ = "mcq_questions"
@@ -264,15 +356,31 @@ class MCQQuestion(Base):
     question_text = Column(Text, nullable=False)
     marks = Column(Float, nullable=False, default=1.0) # Marks for this specific question
 
-    # Options (Store as JSON or separate table? JSON simpler for now)
-    # Option Format: [{"text": "Option A", "is_correct": false}, {"text": "Option B", "is_correct": true}, ...]
-    options = Column(Text, nullable=False) # Store JSON string of options
+    # Legacy JSON options ([{"text": ..., "is_correct": ...}, ...]); options now live in mcq_options.
+    # Kept only so `python -m app.cli migrate-mcq-options` can convert old exams.
+    options = Column(Text, nullable=True)
 
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
 
     # Relationship back to Exam
     exam = relationship("Exam", back_populates="mcq_questions")
+    mcq_options = relationship("MCQOption", back_populates="question", cascade="all, delete-orphan", order_by="MCQOption.position")
+
+    __table_args__ = (Index('ix_mcq_questions_exam', 'exam_id'),)
+
+class MCQOption(Base):
+    """One answer choice of an MCQ question. Ids stay stable across edits, so answers can reference them."""
+    __tablename__ = "mcq_options"
+    id = Column(Integer, primary_key=True, index=True)
+    question_id = Column(Integer, ForeignKey("mcq_questions.id"), nullable=False)
+    position = Column(Integer, nullable=False, default=0) # Display order within the question
+    text = Column(Text, nullable=False)
+    is_correct = Column(Boolean, nullable=False, default=False)
+
+    question = relationship("MCQQuestion", back_populates="mcq_options")
+
+    __table_args__ = (Index('ix_mcq_options_question_position', 'question_id', 'position'),)
 
 class Result(Base):
     __tablename__ = "results"
@@ -293,20 +401,26 @@ class Result(Base):
     # === NEW RELATIONSHIP ===
     mcq_answers = relationship("MCQAnswer", back_populates="result", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        UniqueConstraint('exam_id', 'student_id', name='_result_exam_student_uc'), # One attempt per student per exam
+        Index('ix_results_student_exam', 'student_id', 'exam_id'), # A student's results across exams
+    )
+
 class MCQAnswer(Base):
    __tablename__ = "mcq_answers"
    id = Column(Integer, primary_key=True, index=True)
    result_id = Column(Integer, ForeignKey("results.id"), nullable=False) # Link to the overall Result/Attempt
    mcq_question_id = Column(Integer, ForeignKey("mcq_questions.id"), nullable=False)
-   # Store the *index* or *text* of the chosen option? Index is less storage, Text is more explicit. Let's use index.
-   # Need to ensure option order is consistent when displaying and grading.
-   # Store the actual option text selected might be safer if option order can change? Let's store text for safety.
-   selected_option_text = Column(Text, nullable=True) # Text of the chosen option
+   selected_option_id = Column(Integer, ForeignKey("mcq_options.id", ondelete="SET NULL"), nullable=True) # Chosen option (graded by id)
+   selected_option_text = Column(Text, nullable=True) # Text of the chosen option at submission time, for display
    is_correct = Column(Boolean, nullable=True) # Was this answer correct when graded?
 
    # Relationship back to the overall result/attempt
    result = relationship("Result", back_populates="mcq_answers")
 
+   # One answer per question per attempt; autosave upserts on this key
+   __table_args__ = (UniqueConstraint('result_id', 'mcq_question_id', name='_mcq_answer_result_question_uc'),)
+
 class PaymentStatus(enum.Enum):
     PENDING = "Pending"
     PAID = "Paid"
@@ -325,11 +439,20 @@ class FeePayment(Base):
     date = Column(Date, nullable=False)
     status = Column(Enum(PaymentStatus), nullable=False, default=PaymentStatus.PENDING)
     payment_method = Column(String(50), nullable=True)
+    fee_plan_id = Column(Integer, ForeignKey("fee_plans.id"), nullable=True) # Set on term charges generated from a fee plan
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
     # Relationships
     student = relationship("Student", back_populates="fee_payments")
+    fee_plan = relationship("FeePlan", back_populates="fee_payments")
+
+    __table_args__ = (
+        UniqueConstraint('fee_plan_id', 'student_id', name='_fee_payment_plan_student_uc'), # One term charge per plan and student
+        Index('ix_fee_payments_student_status', 'student_id', 'status'), # Pending fees per student
+        Index('ix_fee_payments_status_date', 'status', 'date'), # Overdue sweep / fee list by due date
+        Index('ix_fee_payments_date', 'date'), # Fee list default order (keyset pagination)
+    )
     @property
     def balance(self) -> float:
         # Ensure values are treated as floats, default to 0 if None (though nullable=False should prevent None)
@@ -337,6 +460,79 @@ class FeePayment(Base):
         paid = self.amount_paid if self.amount_paid is not None else 0.0
         return round(due - paid, 2) # Round to 2 decimal places
 
+class LedgerEntryType(enum.Enum):
+    CHARGE = "Charge"           # A new fee record
+    ADJUSTMENT = "Adjustment"   # Change of an existing charge (amount edit, cancellation, deletion)
+    PAYMENT = "Payment"
+    REFUND = "Refund"           # Money paid back (a payment reversed)
+
+class FeeLedgerEntry(Base):
+    """Immutable money movement; a student's balance is the sum of their entries (positive = owed)."""
+    __tablename__ = "fee_ledger_entries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    student_id = Column(Integer, ForeignKey("students.id"), nullable=False)
+    fee_payment_id = Column(Integer, nullable=True) # Source fee record (no FK: the ledger outlives deleted records)
+    entry_type = Column(Enum(LedgerEntryType), nullable=False)
+    amount = Column(Float, nullable=False) # Signed: charges/refunds > 0, payments < 0
+    description = Column(String(255), nullable=True)
+    posted_at = Column(DateTime, default=func.now(), nullable=False)
+
+    student = relationship("Student", back_populates="fee_ledger_entries")
+
+    __table_args__ = (
+        Index('ix_fee_ledger_entries_student_id', 'student_id', 'id'), # A student's statement
+        Index('ix_fee_ledger_entries_fee_payment', 'fee_payment_id'),
+    )
+
+class StudentFeeBalance(Base):
+    """Per-student running totals of the fee ledger plus outstanding amounts by age (as of aged_on)."""
+    __tablename__ = "student_fee_balances"
+
+    student_id = Column(Integer, ForeignKey("students.id"), primary_key=True)
+    balance = Column(Float, nullable=False, default=0.0, server_default="0") # Sum of ledger entries
+    charged_total = Column(Float, nullable=False, default=0.0, server_default="0")
+    paid_total = Column(Float, nullable=False, default=0.0, server_default="0") # Payments net of refunds
+    # Outstanding (charged - paid) of open fee records, by days past the due date on aged_on
+    not_due = Column(Float, nullable=False, default=0.0, server_default="0")
+    overdue_1_30 = Column(Float, nullable=False, default=0.0, server_default="0")
+    overdue_31_60 = Column(Float, nullable=False, default=0.0, server_default="0")
+    overdue_61_90 = Column(Float, nullable=False, default=0.0, server_default="0")
+    overdue_over_90 = Column(Float, nullable=False, default=0.0, server_default="0")
+    oldest_due_date = Column(Date, nullable=True) # Earliest due date with money outstanding
+    aged_on = Column(Date, nullable=True)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+    student = relationship("Student", back_populates="fee_balance")
+
+    __table_args__ = (
+        Index('ix_student_fee_balances_balance', 'balance'), # Who owes the most
+        Index('ix_student_fee_balances_aged_on', 'aged_on'), # Rows to re-age after midnight
+    )
+
+class FeePlan(Base):
+    """Term charge for a cohort (a department, or all students): tuition plus hostel fees minus scholarships."""
+    __tablename__ = "fee_plans"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(100), nullable=False) # e.g., "Tuition"
+    term = Column(String(20), nullable=False) # e.g., "2026-Fall"
+    academic_year = Column(String(20), nullable=True) # Scholarships awarded for this year are deducted (all awards when empty)
+    department_id = Column(Integer, ForeignKey("departments.id"), nullable=True) # None = every student
+    tuition_amount = Column(Float, nullable=False)
+    include_hostel = Column(Boolean, nullable=False, default=True) # Add the student's Hostel.fees
+    apply_scholarships = Column(Boolean, nullable=False, default=True)
+    scholarship_share = Column(Float, nullable=False, default=1.0) # Fraction of each award deducted this term
+    due_date = Column(Date, nullable=False)
+    generated_at = Column(DateTime, nullable=True) # Last generation run
+    generated_count = Column(Integer, nullable=False, default=0) # Fee records generated so far
+    created_at = Column(DateTime, default=func.now())
+
+    department = relationship("Department")
+    fee_payments = relationship("FeePayment", back_populates="fee_plan")
+
+    __table_args__ = (UniqueConstraint('term', 'name', name='_fee_plan_term_name_uc'),)
+
 class Scholarship(Base):
     __tablename__ = "scholarships"
     
@@ -376,6 +572,8 @@ class Hostel(Base):
     # Relationships
     student = relationship("Student", back_populates="hostel_records")
 
+    __table_args__ = (Index('ix_hostels_hostel_name', 'hostel_name'),) # Assignments per hostel
+
 class DisciplineRecord(Base):
     __tablename__ = "discipline_records"
 
@@ -459,6 +657,11 @@ class Complaint(Base):
     # Relationships
     student = relationship("Student", back_populates="complaints")
 
+    __table_args__ = (
+        Index('ix_complaints_status_date', 'status', 'date'), # Admin list filtered by status
+        Index('ix_complaints_date', 'date'), # Admin list default order
+    )
+
 class Alumni(Base):
     __tablename__ = "alumni"
     
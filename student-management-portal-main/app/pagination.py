@@ -0,0 +1,174 @@
+# app/pagination.py
+"""
+Keyset (cursor) pagination shared by the admin list services.
+
+Rows are ordered by (sort expression, primary key). A cursor encodes those two values for the
+last (or first) row of a page, so the next page is a range scan from that point instead of an
+OFFSET over everything before it. Sort expressions must be non-NULL (wrap nullable columns in
+coalesce) and compare in SQL the same way they sort.
+"""
+
+import base64
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Query
+
+DEFAULT_PAGE_SIZE = int(os.environ.get("PAGE_SIZE_DEFAULT", 50))
+MAX_PAGE_SIZE = int(os.environ.get("PAGE_SIZE_MAX", 200))
+
+
+@dataclass
+class PageRequest:
+    """What the client asked for: page size, a cursor in either direction, and the sort."""
+    limit: int = DEFAULT_PAGE_SIZE
+    after: Optional[str] = None # Cursor of the last row of the previous page
+    before: Optional[str] = None # Cursor of the first row of the following page (going back)
+    sort: Optional[str] = None
+    order: Optional[str] = None # "asc" / "desc"; None means the list's default order
+
+    @classmethod
+    def from_query(
+        cls, limit: Optional[int] = None, after: Optional[str] = None, before: Optional[str] = None,
+        sort: Optional[str] = None, order: Optional[str] = None
+    ) -> "PageRequest":
+        """Builds a request from raw query parameters, clamping the limit and normalising order."""
+        limit = DEFAULT_PAGE_SIZE if not limit or limit < 1 else min(limit, MAX_PAGE_SIZE)
+        order = order.lower() if order and order.lower() in ("asc", "desc") else None
+        return cls(limit=limit, after=after or None, before=before or None, sort=sort or None, order=order)
+
+
+@dataclass
+class Page:
+    """One slice of results. Iterates like a list so templates can loop over it directly."""
+    items: List[Any]
+    total: int
+    limit: int
+    sort: str
+    order: str
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+    sort_options: List[str] = field(default_factory=list)
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.items)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __bool__(self) -> bool:
+        return bool(self.items)
+
+
+# --- Cursor encoding ---
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    return value
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+    return value
+
+def encode_cursor(sort_value: Any, row_id: int) -> str:
+    raw = json.dumps([_encode_value(sort_value), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    """Returns (sort_value, row_id). Raises ValueError for malformed cursors."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return _decode_value(sort_value), int(row_id)
+    except Exception:
+        raise ValueError("Invalid page cursor.")
+
+
+# --- Pagination ---
+def keyset_paginate(
+    query: Query,
+    page: PageRequest,
+    sort_keys: Dict[str, Any],
+    default_sort: str,
+    id_column: Any,
+    options: Sequence[Any] = (),
+    default_order: str = "asc",
+) -> Page:
+    """
+    Returns one page of `query` ordered by sort_keys[page.sort] then id_column.
+    `query` should carry only joins and filters; eager-load `options` are applied to the
+    page fetch only, so the total is a plain COUNT over the filtered rows.
+    """
+    sort_name = page.sort if page.sort in sort_keys else default_sort
+    sort_expr = sort_keys[sort_name]
+    order = page.order or default_order
+    descending = order == "desc"
+
+    total = query.order_by(None).with_entities(func.count(id_column)).scalar() or 0
+
+    # Walking backwards flips the scan direction; the slice is reversed again afterwards
+    backwards = page.before is not None and page.after is None
+    cursor = page.before if backwards else page.after
+    cursor_value = cursor_id = None
+    if cursor:
+        try:
+            cursor_value, cursor_id = decode_cursor(cursor)
+        except ValueError:
+            cursor = None # Stale or tampered cursor: start from the first page
+            backwards = False
+    scan_desc = descending != backwards
+
+    page_query = query.options(*options).add_columns(sort_expr, id_column)
+    if cursor:
+        if scan_desc:
+            page_query = page_query.filter(or_(
+                sort_expr < cursor_value, and_(sort_expr == cursor_value, id_column < cursor_id)
+            ))
+        else:
+            page_query = page_query.filter(or_(
+                sort_expr > cursor_value, and_(sort_expr == cursor_value, id_column > cursor_id)
+            ))
+    if scan_desc:
+        page_query = page_query.order_by(sort_expr.desc(), id_column.desc())
+    else:
+        page_query = page_query.order_by(sort_expr.asc(), id_column.asc())
+
+    rows = page_query.limit(page.limit + 1).all() # One extra row tells us whether more exist
+    has_more = len(rows) > page.limit
+    rows = rows[:page.limit]
+    if backwards:
+        rows.reverse()
+
+    next_cursor = prev_cursor = None
+    if rows:
+        first, last = rows[0], rows[-1]
+        if backwards:
+            next_cursor = encode_cursor(last[-2], last[-1]) # We came back from that page
+            if has_more:
+                prev_cursor = encode_cursor(first[-2], first[-1])
+        else:
+            if has_more:
+                next_cursor = encode_cursor(last[-2], last[-1])
+            if cursor:
+                prev_cursor = encode_cursor(first[-2], first[-1])
+
+    return Page(
+        items=[row[0] for row in rows],
+        total=total,
+        limit=page.limit,
+        sort=sort_name,
+        order=order,
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor,
+        sort_options=list(sort_keys),
+    )
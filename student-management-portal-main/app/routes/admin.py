@@ -1,11 +1,14 @@
 # Example: app/routes/admin.py
 
-from fastapi import APIRouter, Depends, Request
-from fastapi.responses import HTMLResponse
+from fastapi import APIRouter, Depends, Request, Query, status
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
+from starlette.concurrency import run_in_threadpool
 
-from app import models # Import your models
-from app.services import auth_service
+from app import models, database # Import your models
+from app.services import (
+    attempt_service, auth_service, export_service, fee_overdue_service, password_service, submission_queue_service,
+)
 from app.models import UserRole # Import the enum
 
 router = APIRouter()
@@ -22,7 +25,8 @@ async def get_admin_dashboard(
         "request": request,
         "user": current_user,
         "UserRole": UserRole, # Pass enum for layout
-        "page_title": "Admin Dashboard"
+        "page_title": "Admin Dashboard",
+        "exports": list(export_service.EXPORTS)
     }
 
     # ---
@@ -33,4 +37,58 @@ async def get_admin_dashboard(
     return templates.TemplateResponse("admin/admin_dashboard.html", context)
 
 # Do the same for instructor_dashboard, student_dashboard, change_password_form,
-# and ANY OTHER page that should have the dashboard layout.
\ No newline at end of file
+# and ANY OTHER page that should have the dashboard layout.
+
+
+@router.get("/metrics/db-pool", response_class=JSONResponse, name="admin_db_pool_metrics")
+async def get_db_pool_metrics(
+    current_user: models.User = Depends(auth_service.get_current_active_admin)
+):
+    """Connection pool configuration and counters (checkouts, wait time, overflow, in-use)."""
+    return JSONResponse(content=database.get_pool_metrics())
+
+@router.get("/metrics/password-hashing", response_class=JSONResponse, name="admin_password_hashing_metrics")
+async def get_password_hashing_metrics(
+    current_user: models.User = Depends(auth_service.get_current_active_admin)
+):
+    """Password hashing pool counters (concurrency cap, queue depth, wait/run time)."""
+    return JSONResponse(content=password_service.get_metrics())
+
+@router.get("/metrics/submission-queue", response_class=JSONResponse, name="admin_submission_queue_metrics")
+async def get_submission_queue_metrics(
+    current_user: models.User = Depends(auth_service.get_current_active_admin)
+):
+    """Exam submission queue depth, backlog age and worker counters."""
+    return JSONResponse(content=await run_in_threadpool(submission_queue_service.get_metrics))
+
+@router.get("/metrics/exam-autosave", response_class=JSONResponse, name="admin_exam_autosave_metrics")
+async def get_exam_autosave_metrics(
+    current_user: models.User = Depends(auth_service.get_current_active_admin)
+):
+    """Open exam attempts, buffered answers and flush counters (this worker process)."""
+    return JSONResponse(content=attempt_service.get_metrics())
+
+@router.get("/metrics/fee-overdue-sweep", response_class=JSONResponse, name="admin_fee_overdue_sweep_metrics")
+async def get_fee_overdue_sweep_metrics(
+    current_user: models.User = Depends(auth_service.get_current_active_admin)
+):
+    """Overdue fee sweeps run by this worker process: rows flipped, batches, duration, errors."""
+    return JSONResponse(content=fee_overdue_service.get_metrics())
+
+
+@router.get("/exports/{table}", name="admin_export")
+async def export_table(
+    table: str,
+    format: str = Query("csv"),
+    current_user: models.User = Depends(auth_service.get_current_active_admin)
+):
+    """Streams a whole table (students, fees, attendance, results, enrollments) as CSV or Parquet."""
+    try:
+        chunks, media_type, filename = export_service.open_export(table, format.lower())
+    except ValueError as e:
+        return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"success": False, "message": str(e)})
+    # A sync iterator: Starlette pulls each batch in the threadpool, so the event loop never waits on the cursor
+    return StreamingResponse(
+        chunks, media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "no-store"}
+    )
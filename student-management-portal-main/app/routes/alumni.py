@@ -7,11 +7,10 @@ from sqlalchemy.orm import Session
 from typing import Optional, List, Dict, Any
 import logging
 import urllib.parse
-import json
 
 # Local imports
 from app import database, models
-from app.services import auth_service, alumni_service, student_service # Need student service
+from app.services import auth_service, alumni_service
 from app.models import UserRole # Import models needed
 
 logger = logging.getLogger(__name__)
@@ -35,23 +34,16 @@ async def list_alumni_for_admin(
     """Displays list of all alumni records for admin view."""
     logger.info(f"Admin {current_user.username} accessing alumni list.")
     try:
-        alumni_list = alumni_service.get_all_alumni(db)
-        # Get students *who don't already have an alumni record* for the Add modal dropdown
-        existing_alumni_student_ids = {a.student_id for a in alumni_list}
-        all_students = student_service.get_all_students(db)
-        available_students = [s for s in all_students if s.id not in existing_alumni_student_ids]
-        students_json = json.dumps([{"id": s.id, "name": s.name} for s in available_students])
-
+        alumni_list = await database.run_db(db, alumni_service.get_all_alumni)
     except Exception as e:
         logger.error(f"Failed to fetch alumni/students: {e}", exc_info=True)
-        alumni_list = []; students_json = "[]"
+        alumni_list = []
         toast_error = toast_error or "Failed to load alumni data."
 
     response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"; # etc.
     context = {
         "request": request, "user": current_user, "UserRole": UserRole,
         "alumni_list": alumni_list,
-        "students_json": students_json, # For Add modal
         "page_title": "Manage Alumni Records",
         "toast_error": toast_error, "toast_success": toast_success
     }
@@ -77,8 +69,8 @@ async def add_alumni_by_admin(
         student_id = int(student_id_str)
         grad_year = int(graduation_year_str) if graduation_year_str and graduation_year_str.isdigit() else None
 
-        new_alumni = alumni_service.create_alumni_record(
-            db, student_id=student_id, graduation_year=grad_year,
+        new_alumni = await database.run_db(
+            db, alumni_service.create_alumni_record, student_id=student_id, graduation_year=grad_year,
             current_job=current_job, current_employer=current_employer, contact_info=contact_info
         )
         toast_msg = urllib.parse.quote(f"Alumni record created for student ID {student_id}.")
@@ -112,7 +104,7 @@ async def edit_alumni_by_admin(
         if current_employer is not None: update_data['current_employer'] = current_employer.strip() if current_employer else None
         if contact_info is not None: update_data['contact_info'] = contact_info.strip() if contact_info else None
 
-        updated_alumni = alumni_service.update_alumni_record(db, alumni_id, update_data)
+        updated_alumni = await database.run_db(db, alumni_service.update_alumni_record, alumni_id, update_data)
         if updated_alumni is None: raise ValueError("Alumni record not found.")
 
         toast_msg = urllib.parse.quote(f"Alumni record {alumni_id} updated.")
@@ -135,7 +127,7 @@ async def delete_alumni_by_admin(
     """Handles deletion of an alumni record by an admin via fetch."""
     logger.info(f"Admin {current_user.username} attempting delete alumni record {alumni_id}.")
     try:
-        success = alumni_service.delete_alumni_record(db, alumni_id)
+        success = await database.run_db(db, alumni_service.delete_alumni_record, alumni_id)
         if not success: raise ValueError("Alumni record not found.")
         return JSONResponse(content={"success": True, "message": "Alumni record deleted successfully."})
     except ValueError as e:
@@ -0,0 +1,36 @@
+# app/routes/api.py
+
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session
+from typing import Optional
+import logging
+
+# Local imports
+from app import database, models
+from app.services import auth_service, student_service
+from app.models import UserRole
+
+logger = logging.getLogger(__name__)
+
+# THIS ROUTER IS MOUNTED UNDER /api IN main.py
+router = APIRouter()
+
+async def get_current_staff(current_user: models.User = Depends(auth_service.get_current_user)) -> models.User:
+    """Dependency: admins and instructors (the pages that pick students)."""
+    if current_user.role not in (UserRole.ADMIN, UserRole.INSTRUCTOR):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
+    return current_user
+
+# Typeahead for student pickers: /api/students/search?q=ali
+@router.get("/students/search", response_class=JSONResponse, name="api_search_students")
+async def search_students(
+    q: str = Query("", max_length=100),
+    limit: int = Query(20, ge=1, le=50),
+    exclude: Optional[str] = Query(None, pattern="^(alumni|hostel)$"),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_staff)
+):
+    """Top `limit` students matching `q` (ID, name prefix, then name/username/email substring)."""
+    results = await database.run_db(db, student_service.search_students, q, limit=limit, exclude=exclude)
+    return JSONResponse(content=results)
@@ -11,7 +11,7 @@ from fastapi.security import OAuth2PasswordRequestForm
 
 # Local imports
 from app import database, models
-from app.services import auth_service # Import the auth service module
+from app.services import auth_service, password_service # Import the auth service module
 from app.models import UserRole
 
 router = APIRouter()
@@ -34,7 +34,7 @@ async def login_for_access_token(
     password: str = Form(...)
 ):
     """Handles user login, sets JWT cookie, and redirects."""
-    user = auth_service.authenticate_user(db, username=username, password=password)
+    user = await auth_service.authenticate_user_async(db, username=username, password=password)
     if not user:
         # Re-render login form with an error message
         return templates.TemplateResponse(
@@ -107,7 +107,7 @@ async def change_password(
     context = {"request": request, "user": current_user} # Context for re-rendering form on error
 
     # 1. Verify current password
-    if not auth_service.verify_password(current_password, current_user.hashed_password):
+    if not await password_service.verify_password_async(current_password, current_user.hashed_password):
         context["error"] = "Incorrect current password."
         return templates.TemplateResponse("change_password.html", context, status_code=status.HTTP_400_BAD_REQUEST)
 
@@ -121,10 +121,9 @@ async def change_password(
          context["error"] = "New password must be at least 8 characters long."
          return templates.TemplateResponse("change_password.html", context, status_code=status.HTTP_400_BAD_REQUEST)
 
-    # 4. Hash and update the password
-    current_user.hashed_password = auth_service.get_password_hash(new_password)
-    db.add(current_user)
-    db.commit()
+    # 4. Hash (on the hashing pool, not under run_db) and update the password
+    hashed_password = await password_service.hash_password_async(new_password)
+    await database.run_db(db, auth_service.update_user_password, current_user, hashed_password)
 
     # Determine the appropriate dashboard based on user role
     if current_user.role == "ADMIN":
@@ -148,7 +147,7 @@ async def login_for_token_internal(
     db: Session = Depends(database.get_db)
 ):
     """Provides a token endpoint (primarily for header-based auth flows)."""
-    user = auth_service.authenticate_user(db, username=form_data.username, password=form_data.password)
+    user = await auth_service.authenticate_user_async(db, username=form_data.username, password=form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -33,7 +33,7 @@ async def list_classrooms_for_admin(
     error: Optional[str] = Query(None),
     success: Optional[str] = Query(None)
 ):
-    classrooms = classroom_service.get_all_classrooms(db)
+    classrooms = await database.run_db(db, classroom_service.get_all_classrooms)
 
     # Set cache headers
     response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
@@ -69,8 +69,8 @@ async def add_classroom_by_admin(
         if capacity_str and capacity_str.strip():
             capacity = int(capacity_str)
 
-        new_classroom = classroom_service.create_classroom(
-            db=db, location=location, capacity=capacity
+        new_classroom = await database.run_db(
+            db, classroom_service.create_classroom, location=location, capacity=capacity
         )
         logger.info(f"Admin {current_user.username} created classroom {new_classroom.id} ('{new_classroom.location}')")
         success_msg = urllib.parse.quote(f"Classroom '{new_classroom.location}' created successfully.")
@@ -109,8 +109,8 @@ async def edit_classroom_by_admin(
 
         update_data['location'] = location
 
-        updated_classroom = classroom_service.update_classroom(
-            db=db, classroom_id=classroom_id, update_data=update_data
+        updated_classroom = await database.run_db(
+            db, classroom_service.update_classroom, classroom_id=classroom_id, update_data=update_data
         )
         if updated_classroom is None:
              raise ValueError("Classroom not found.")
@@ -141,10 +141,10 @@ async def delete_classroom_by_admin(
     classroom_loc_temp = f"ID {classroom_id}"
     try:
         # Optional: Get location before deleting
-        classroom = classroom_service.get_classroom_by_id(db, classroom_id)
+        classroom = await database.run_db(db, classroom_service.get_classroom_by_id, classroom_id)
         if classroom: classroom_loc_temp = classroom.location
 
-        success = classroom_service.delete_classroom(db=db, classroom_id=classroom_id)
+        success = await database.run_db(db, classroom_service.delete_classroom, classroom_id=classroom_id)
         if not success:
              raise ValueError("Classroom not found.") # Should be caught by service check or FK
 
@@ -35,7 +35,7 @@ async def list_clubs_for_admin(
     """Displays list of all clubs for admin view."""
     logger.info(f"Admin {current_user.username} accessing clubs list.")
     try:
-        clubs = club_service.get_all_clubs(db)
+        clubs = await database.run_db(db, club_service.get_all_clubs)
     except Exception as e:
         logger.error(f"Failed to fetch clubs: {e}", exc_info=True)
         clubs = []
@@ -65,8 +65,8 @@ async def add_club_by_admin(
     redirect_url = request.url_for('admin_manage_clubs')
     logger.info(f"Admin {current_user.username} attempting to add club.")
     try:
-        new_club = club_service.create_club(
-            db, name=name, club_type=club_type, description=description
+        new_club = await database.run_db(
+            db, club_service.create_club, name=name, club_type=club_type, description=description
         )
         toast_msg = urllib.parse.quote(f"Club '{new_club.name}' created successfully.")
         return RedirectResponse(f"{redirect_url}?toast_success={toast_msg}", status.HTTP_303_SEE_OTHER)
@@ -96,7 +96,7 @@ async def edit_club_by_admin(
         "description": description
     }
     try:
-        updated_club = club_service.update_club(db, club_id, update_data)
+        updated_club = await database.run_db(db, club_service.update_club, club_id, update_data)
         if updated_club is None: raise ValueError("Club not found.")
 
         toast_msg = urllib.parse.quote(f"Club '{updated_club.name}' updated.")
@@ -119,7 +119,7 @@ async def delete_club_by_admin(
     """Handles deletion of a club definition by an admin via fetch."""
     logger.info(f"Admin {current_user.username} attempting delete club {club_id}.")
     try:
-        success = club_service.delete_club(db, club_id)
+        success = await database.run_db(db, club_service.delete_club, club_id)
         if not success: raise ValueError("Club not found.")
         return JSONResponse(content={"success": True, "message": "Club deleted successfully."})
     except ValueError as e: # Catch service errors (not found, dependencies)
@@ -11,6 +11,7 @@ import json
 
 # Local imports
 from app import database, models
+from app.pagination import PageRequest
 from app.services import auth_service, complaint_service, student_service # Need student service for filter
 from app.models import UserRole, ComplaintStatus # Import models/enums needed
 
@@ -31,24 +32,33 @@ async def list_complaints_for_admin(
     current_user: models.User = Depends(auth_service.get_current_active_admin), # Admin Auth
     filter_status = Query(None),
     filter_student_id = Query(None),
+    sort: Optional[str] = Query(None),
+    order: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None),
+    after: Optional[str] = Query(None), # Keyset cursors, see app/pagination.py
+    before: Optional[str] = Query(None),
     toast_error: Optional[str] = Query(None),
     toast_success: Optional[str] = Query(None)
 ):
     """Displays list of all student complaints for admin view."""
     logger.info(f"Admin {current_user.username} accessing complaints list. Filters: status={filter_status}, student={filter_student_id}")
     try:
-        complaints = complaint_service.admin_get_all_complaints(db, status=filter_status, student_id=filter_student_id)
-        all_students = student_service.get_all_students(db) # For filter dropdown
+        page = PageRequest.from_query(limit=limit, after=after, before=before, sort=sort, order=order)
+        complaints = await database.run_db(db, complaint_service.admin_get_complaints_page, page, status=filter_status, student_id=filter_student_id)
+        # Only the filtered student is needed up front; the picker searches /api/students/search
+        filter_student = None
+        if filter_student_id and str(filter_student_id).isdigit():
+            filter_student = await database.run_db(db, student_service.get_student_by_id_with_user, int(filter_student_id))
     except Exception as e:
         logger.error(f"Failed to fetch complaints/students: {e}", exc_info=True)
-        complaints = []; all_students = []
+        complaints = []; filter_student = None
         toast_error = toast_error or "Failed to load complaint data."
 
     response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"; # etc.
     context = {
         "request": request, "user": current_user, "UserRole": UserRole,
         "complaints": complaints,
-        "all_students": all_students, # For student filter dropdown
+        "filter_student": filter_student, # Pre-selected in the student filter picker
         "complaint_statuses": [status.name for status in ComplaintStatus], # Pass status NAMES
         "current_filter_status": filter_status,
         "current_filter_student_id": filter_student_id,
@@ -79,8 +89,8 @@ async def update_complaint_by_admin(
 
     logger.info(f"Admin {current_user.username} attempting update on complaint {complaint_id} to status {new_status}")
     try:
-        updated_complaint = complaint_service.admin_update_complaint(
-            db,
+        updated_complaint = await database.run_db(
+            db, complaint_service.admin_update_complaint,
             complaint_id=complaint_id,
             new_status_str=new_status,
             resolution_note=resolution_note
@@ -108,7 +118,7 @@ async def delete_complaint_by_admin(
     """Handles deletion of any complaint record by an admin via fetch."""
     logger.info(f"Admin {current_user.username} attempting delete complaint {complaint_id}.")
     try:
-        success = complaint_service.admin_delete_complaint(db, complaint_id)
+        success = await database.run_db(db, complaint_service.admin_delete_complaint, complaint_id)
         if not success: raise ValueError("Complaint not found.")
         return JSONResponse(content={"success": True, "message": "Complaint deleted successfully."})
     except ValueError as e:
@@ -34,8 +34,8 @@ async def list_courses_for_admin(
     error: Optional[str] = Query(None),
     success: Optional[str] = Query(None)
 ):
-    courses = course_service.get_all_courses(db)
-    departments = department_service.get_all_departments(db) # Fetch departments
+    courses = await database.run_db(db, course_service.get_all_courses)
+    departments = await database.run_db(db, department_service.get_all_departments) # Fetch departments
 
     # Set cache headers
     response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
@@ -66,17 +66,22 @@ async def add_course_by_admin(
     name: str = Form(...),
     department_id: int = Form(...), # Department is now mandatory
     credits_str: Optional[str] = Form(None), # Credits as string first
-    description: Optional[str] = Form(None)
+    description: Optional[str] = Form(None),
+    capacity_str: Optional[str] = Form(None) # Empty = unlimited seats
 ):
     redirect_url = request.url_for('admin_manage_courses_list')
     credits: Optional[int] = None
+    capacity: Optional[int] = None
     try:
         # Convert credits string to int, allow empty string/None
         if credits_str and credits_str.strip():
             credits = int(credits_str)
+        if capacity_str and capacity_str.strip():
+            capacity = int(capacity_str)
 
-        new_course = course_service.create_course(
-            db=db, name=name, department_id=department_id, credits=credits, description=description
+        new_course = await database.run_db(
+            db, course_service.create_course, name=name, department_id=department_id, credits=credits, description=description,
+            capacity=capacity
         )
         logger.info(f"Admin {current_user.username} created course {new_course.id} ('{new_course.name}' in Dept {department_id})")
         success_msg = urllib.parse.quote(f"Course '{new_course.name}' created successfully.")
@@ -105,7 +110,8 @@ async def edit_course_by_admin(
     name: str = Form(...),
     department_id: int = Form(...), # Department is now mandatory
     credits_str: Optional[str] = Form(None),
-    description: Optional[str] = Form(None)
+    description: Optional[str] = Form(None),
+    capacity_str: Optional[str] = Form(None)
 ):
     redirect_url = request.url_for('admin_manage_courses_list')
     credits: Optional[int] = None
@@ -120,14 +126,17 @@ async def edit_course_by_admin(
         if credits_str is not None:
             update_data['credits'] = credits if credits_str.strip() else None
 
+        if capacity_str is not None:
+            update_data['capacity'] = int(capacity_str) if capacity_str.strip() else None
+
         update_data['name'] = name
         # Include description only if provided
         if description is not None:
             update_data['description'] = description
 
 
-        updated_course = course_service.update_course(
-            db=db, course_id=course_id, update_data=update_data
+        updated_course = await database.run_db(
+            db, course_service.update_course, course_id=course_id, update_data=update_data
         )
         # Service now returns None if not found, raises ValueError for other issues
         if updated_course is None:
@@ -165,10 +174,10 @@ async def delete_course_by_admin(
     course_name_temp = f"ID {course_id}"
     try:
         # Optional: Get name before deleting
-        course = course_service.get_course_by_id(db, course_id)
+        course = await database.run_db(db, course_service.get_course_by_id, course_id)
         if course: course_name_temp = course.name
 
-        success = course_service.delete_course(db=db, course_id=course_id)
+        success = await database.run_db(db, course_service.delete_course, course_id=course_id)
         if not success:
              # This case means the course existed but deletion failed after dependency check (unlikely with current service logic)
              # Or the course was deleted between the check and the delete call (rare)
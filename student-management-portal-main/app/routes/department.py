@@ -30,9 +30,9 @@ async def list_departments_for_admin(
     error: Optional[str] = Query(None),
     success: Optional[str] = Query(None)
 ):
-    departments = department_service.get_all_departments(db)
-    all_instructors = instructor_service.get_all_instructors(db)
-    instructors = instructor_service.get_all_instructors(db) # Fetch instructors
+    departments = await database.run_db(db, department_service.get_all_departments)
+    all_instructors = await database.run_db(db, instructor_service.get_all_instructors)
+    instructors = await database.run_db(db, instructor_service.get_all_instructors) # Fetch instructors
     instructors_data_for_json = [{"id": i.id, "name": i.name} for i in instructors] # Prepare list of dicts
     instructors_json = json.dumps(instructors_data_for_json) # Create JSON string
     # --- Prepare data for Alpine.js ---
@@ -67,7 +67,7 @@ async def add_department_by_admin(
 ):
     redirect_url = request.url_for('admin_manage_departments_list')
     try:
-        new_department = department_service.create_department(db=db, name=name)
+        new_department = await database.run_db(db, department_service.create_department, name=name)
         logger.info(f"Admin {current_user.username} created department {new_department.id} ('{new_department.name}')")
         # Redirect with success message
         success_msg = urllib.parse.quote(f"Department '{new_department.name}' created successfully.")
@@ -106,8 +106,8 @@ async def edit_department_by_admin(
     update_data = { "name": name, "head_of_department_id": hod_id_int }
 
     try:
-        updated_department = department_service.update_department(
-            db=db, department_id=department_id, update_data=update_data
+        updated_department = await database.run_db(
+            db, department_service.update_department, department_id=department_id, update_data=update_data
         )
         if updated_department is None:
              raise ValueError("Department not found.") # Treat not found as ValueError for redirection
@@ -138,10 +138,10 @@ async def delete_department_by_admin(
     dept_name_temp = f"ID {department_id}" # Fallback name
     try:
         # Optional: Get name before deleting for success message
-        dept = department_service.get_department_by_id(db, department_id)
+        dept = await database.run_db(db, department_service.get_department_by_id, department_id)
         if dept: dept_name_temp = dept.name
 
-        success = department_service.delete_department(db=db, department_id=department_id)
+        success = await database.run_db(db, department_service.delete_department, department_id=department_id)
         if not success: # Should ideally not happen if service raises ValueError
              raise ValueError("Department not found.")
 
@@ -7,7 +7,6 @@ from sqlalchemy.orm import Session
 from typing import Optional, List, Dict, Any
 import logging
 import urllib.parse
-import json
 from datetime import date
 
 # Local imports
@@ -40,22 +39,20 @@ async def list_discipline_records(
     """Displays list of discipline records, manageable by authorized staff."""
     logger.info(f"User {current_user.username} accessing discipline records list.")
     try:
-        records = discipline_service.get_all_discipline_records(db, student_id=filter_student_id)
-        # Get all students for filter dropdown AND for Add modal
-        all_students = student_service.get_all_students(db)
-        students_json = json.dumps([{"id": s.id, "name": s.name} for s in all_students])
+        records = await database.run_db(db, discipline_service.get_all_discipline_records, student_id=filter_student_id)
+        # Only the filtered student is needed up front; the pickers search /api/students/search
+        filter_student = await database.run_db(db, student_service.get_student_by_id_with_user, filter_student_id) if filter_student_id else None
 
     except Exception as e:
         logger.error(f"Failed to fetch discipline records/students: {e}", exc_info=True)
-        records = []; students_json = "[]"; all_students = []
+        records = []; filter_student = None
         toast_error = toast_error or "Failed to load discipline data."
 
     response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"; # etc.
     context = {
         "request": request, "user": current_user, "UserRole": UserRole,
         "discipline_records": records,
-        "all_students": all_students, # For filter dropdown
-        "students_json": students_json, # For modal dropdown
+        "filter_student": filter_student, # Pre-selected in the filter picker
         "current_filter_student_id": filter_student_id, # Pass back filter value
         "page_title": "Manage Discipline Records",
         "toast_error": toast_error, "toast_success": toast_success
@@ -83,8 +80,8 @@ async def add_discipline_record(
         if not incident_description or not incident_description.strip():
             raise ValueError("Incident description is required.")
 
-        new_record = discipline_service.create_discipline_record(
-            db, student_id=student_id, incident_date=incident_date,
+        new_record = await database.run_db(
+            db, discipline_service.create_discipline_record, student_id=student_id, incident_date=incident_date,
             incident_description=incident_description, action_taken=action_taken
         )
         toast_msg = urllib.parse.quote(f"Discipline record created for student ID {student_id}.")
@@ -118,7 +115,7 @@ async def edit_discipline_record(
         update_data['incident_description'] = incident_description.strip()
         update_data['action_taken'] = action_taken.strip() if action_taken else None
 
-        updated_record = discipline_service.update_discipline_record(db, record_id, update_data)
+        updated_record = await database.run_db(db, discipline_service.update_discipline_record, record_id, update_data)
         if updated_record is None: raise ValueError("Discipline record not found.")
 
         toast_msg = urllib.parse.quote(f"Discipline record {record_id} updated.")
@@ -141,7 +138,7 @@ async def delete_discipline_record(
     """Handles deletion of a discipline record via fetch."""
     logger.info(f"User {current_user.username} attempting delete discipline record {record_id}.")
     try:
-        success = discipline_service.delete_discipline_record(db, record_id)
+        success = await database.run_db(db, discipline_service.delete_discipline_record, record_id)
         if not success: raise ValueError("Record not found.")
         return JSONResponse(content={"success": True, "message": "Discipline record deleted."})
     except ValueError as e:
@@ -4,15 +4,16 @@ from fastapi import APIRouter, Depends, Request, Form, HTTPException, status, Qu
 from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from typing import Optional, List, Dict, Any # Added Dict, Any
 import logging
 import urllib.parse
-import json
 from datetime import date
 
 # Local imports
 from app import database, models
-from app.services import auth_service, fee_service, student_service # student_service needed for Add modal
+from app.pagination import PageRequest
+from app.services import auth_service, department_service, fee_service, fee_ledger_service, fee_overdue_service, fee_plan_service
 from app.models import UserRole, FeePayment, PaymentStatus # Import specific models/enums
 
 logger = logging.getLogger(__name__)
@@ -31,21 +32,24 @@ async def list_fees_for_admin(
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(auth_service.get_current_active_admin), # Require Admin
     filter_status  = Query(None),
-    search_student = Query(None), # Placeholder for search value
+    search_student = Query(None),
+    sort: Optional[str] = Query(None),
+    order: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None),
+    after: Optional[str] = Query(None), # Keyset cursors, see app/pagination.py
+    before: Optional[str] = Query(None),
     toast_error: Optional[str] = Query(None),
     toast_success: Optional[str] = Query(None)
 ):
     """Displays list of all fee records for admin view, with filters."""
     logger.info(f"Admin {current_user.username} accessing fee list. Filters: status={filter_status}, search={search_student}")
 
-    # Fetch students ONLY for the "Add Fee Record" modal dropdown
-    students = student_service.get_all_students(db)
-    students_json = json.dumps([{"id": s.id, "name": s.name} for s in students])
-
-    # Fetch fee records - Service function should handle filtering/searching
-    # TODO: Implement search_student logic in fee_service.get_all_fee_payments
-    fee_records = fee_service.get_all_fee_payments(db, status=filter_status, search_student=search_student)
-    logger.debug(f"Found {len(fee_records)} fee records matching filters.")
+    # Fetch one page of fee records - the service handles filtering/searching
+    page = PageRequest.from_query(limit=limit, after=after, before=before, sort=sort, order=order)
+    fee_records = await database.run_db(
+        db, fee_service.get_fee_payments_page, page, status=filter_status, search_student=search_student
+    )
+    logger.debug(f"Showing {len(fee_records)} of {fee_records.total} fee records matching filters.")
 
     # Set cache headers
     response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
@@ -54,8 +58,6 @@ async def list_fees_for_admin(
     context = {
         "request": request, "user": current_user, "UserRole": UserRole,
         "fee_records": fee_records,
-        "students_json": students_json, # For Add modal student dropdown
-        "all_students": students,
         "payment_statuses": [status.name for status in PaymentStatus], # Pass NAMES for filter/modal dropdowns
         "current_filter_status": filter_status,
         "current_search_student": search_student,
@@ -66,6 +68,128 @@ async def list_fees_for_admin(
     return templates.TemplateResponse("admin/fees_list.html", context)
 
 
+# REPORT: Who owes what (students by outstanding balance, with aging buckets)
+@router.get("/outstanding", response_class=JSONResponse, name="admin_fee_outstanding_report")
+async def outstanding_fees_report(
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth_service.get_current_active_admin), # Require Admin
+    min_balance: float = Query(0.01, ge=0),
+    limit: int = Query(500, ge=1, le=5000),
+    offset: int = Query(0, ge=0)
+):
+    """Reads the maintained per-student balances (see fee_ledger_service), not the fee payments."""
+    report = await database.run_db(
+        db, fee_ledger_service.get_outstanding_report, min_balance=min_balance, limit=limit, offset=offset
+    )
+    return JSONResponse(content=report)
+
+
+# SWEEP: Mark past-due PENDING records OVERDUE now (also runs on a schedule, see fee_overdue_service)
+@router.post("/sweep-overdue", response_class=JSONResponse, name="admin_fee_sweep_overdue")
+async def sweep_overdue_fees_now(
+    current_user: models.User = Depends(auth_service.get_current_active_admin) # Require Admin
+):
+    try:
+        report = await run_in_threadpool(fee_overdue_service.sweep_overdue_fees) # Uses its own session
+    except Exception as e:
+        logger.error(f"Overdue sweep requested by admin {current_user.username} failed: {e}", exc_info=True)
+        return JSONResponse(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, content={"success": False, "message": "Overdue sweep failed."})
+    logger.info(f"Admin {current_user.username} ran the overdue sweep: {report['rows']} records marked OVERDUE")
+    return JSONResponse(content={"success": True, **report})
+
+
+# === Fee Plans (term charges for a whole cohort, see fee_plan_service) ===
+
+def _fee_plans_context(db: Session, request: Request, current_user: models.User, **extra) -> Dict[str, Any]:
+    return {
+        "request": request, "user": current_user, "UserRole": UserRole,
+        "plans": fee_plan_service.get_fee_plans(db),
+        "departments": department_service.get_all_departments(db),
+        "page_title": "Fee Plans",
+        **extra
+    }
+
+@router.get("/plans", response_class=HTMLResponse, name="admin_fee_plans")
+async def list_fee_plans(
+    request: Request, db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth_service.get_current_active_admin), # Require Admin
+    toast_error: Optional[str] = Query(None),
+    toast_success: Optional[str] = Query(None)
+):
+    context = await database.run_db(
+        db, _fee_plans_context, request, current_user, toast_error=toast_error, toast_success=toast_success
+    )
+    return templates.TemplateResponse("admin/fee_plans.html", context)
+
+@router.post("/plans/add", response_class=RedirectResponse, name="admin_fee_plan_add")
+async def add_fee_plan(
+    request: Request, db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth_service.get_current_active_admin), # Require Admin
+    name: str = Form(...),
+    term: str = Form(...),
+    tuition_amount_str: str = Form(...),
+    due_date_str: str = Form(...),
+    department_id_str: Optional[str] = Form(None),
+    academic_year: Optional[str] = Form(None),
+    include_hostel: bool = Form(False),
+    apply_scholarships: bool = Form(False),
+    scholarship_share_str: Optional[str] = Form("1")
+):
+    redirect_url = request.url_for('admin_fee_plans')
+    try:
+        plan = await database.run_db(
+            db, fee_plan_service.create_fee_plan, name, term, float(tuition_amount_str), date.fromisoformat(due_date_str),
+            department_id=int(department_id_str) if department_id_str else None, academic_year=academic_year,
+            include_hostel=include_hostel, apply_scholarships=apply_scholarships,
+            scholarship_share=float(scholarship_share_str or 1)
+        )
+        logger.info(f"Fee plan {plan.id} created by admin {current_user.username}.")
+        toast_msg = urllib.parse.quote(f"Fee plan '{plan.name}' ({plan.term}) created. Preview it before generating.")
+        return RedirectResponse(f"{redirect_url}?toast_success={toast_msg}", status_code=status.HTTP_303_SEE_OTHER)
+    except ValueError as e:
+        logger.warning(f"Admin add fee plan failed: {e}")
+        toast_msg = urllib.parse.quote(f"Error creating fee plan: {e}")
+        return RedirectResponse(f"{redirect_url}?toast_error={toast_msg}", status_code=status.HTTP_303_SEE_OTHER)
+
+@router.get("/plans/{plan_id}/preview", response_class=HTMLResponse, name="admin_fee_plan_preview")
+async def preview_fee_plan(
+    plan_id: int, request: Request, db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth_service.get_current_active_admin) # Require Admin
+):
+    """Shows what generating the plan would charge, without writing anything."""
+    try:
+        preview = await database.run_db(db, fee_plan_service.preview_fee_plan, plan_id)
+    except ValueError as e:
+        toast_msg = urllib.parse.quote(str(e))
+        return RedirectResponse(f"{request.url_for('admin_fee_plans')}?toast_error={toast_msg}", status_code=status.HTTP_303_SEE_OTHER)
+    context = await database.run_db(db, _fee_plans_context, request, current_user, preview=preview)
+    return templates.TemplateResponse("admin/fee_plans.html", context)
+
+@router.post("/plans/{plan_id}/generate", response_class=RedirectResponse, name="admin_fee_plan_generate")
+async def generate_fee_plan(
+    plan_id: int, request: Request, db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth_service.get_current_active_admin) # Require Admin
+):
+    """Charges every cohort student the plan has not charged yet (safe to repeat)."""
+    redirect_url = request.url_for('admin_fee_plans')
+    try:
+        report = await database.run_db(db, fee_plan_service.generate_fee_plan, plan_id)
+        logger.info(f"Fee plan {plan_id} generated by admin {current_user.username}: {report['generated']} fee records")
+        toast_msg = urllib.parse.quote(
+            f"{report['generated']} fee records generated ({report['total_amount']:.2f} charged); "
+            f"{report['already_charged']} students were already charged by this plan."
+        )
+        return RedirectResponse(f"{redirect_url}?toast_success={toast_msg}", status_code=status.HTTP_303_SEE_OTHER)
+    except ValueError as e:
+        logger.warning(f"Fee plan {plan_id} generation failed: {e}")
+        toast_msg = urllib.parse.quote(f"Error generating fee plan: {e}")
+        return RedirectResponse(f"{redirect_url}?toast_error={toast_msg}", status_code=status.HTTP_303_SEE_OTHER)
+    except Exception as e:
+        logger.error(f"Unexpected error generating fee plan {plan_id}: {e}", exc_info=True)
+        toast_msg = urllib.parse.quote("An unexpected error occurred while generating the fee plan.")
+        return RedirectResponse(f"{redirect_url}?toast_error={toast_msg}", status_code=status.HTTP_303_SEE_OTHER)
+
+
 # CREATE (Admin Adds a New Fee Demand/Record)
 @router.post("/add", response_class=RedirectResponse, name="admin_manage_fee_add")
 async def add_fee_record_by_admin(
@@ -88,7 +212,7 @@ async def add_fee_record_by_admin(
         if amount <= 0: raise ValueError("Amount due must be positive.")
 
         # Call service to create the PENDING record
-        new_fee = fee_service.create_fee_record(db, student_id, amount, due_date, description)
+        new_fee = await database.run_db(db, fee_service.create_fee_record, student_id, amount, due_date, description)
         logger.info(f"Fee record {new_fee.id} created for student {student_id} by admin {current_user.username}.")
         toast_msg = urllib.parse.quote(f"Fee record created for student ID {student_id}.")
         return RedirectResponse(f"{redirect_url}?toast_success={toast_msg}", status_code=status.HTTP_303_SEE_OTHER)
@@ -152,7 +276,7 @@ async def edit_fee_details_by_admin(
         logger.debug(f"Prepared update data for fee {payment_id}: {update_data}")
 
         # --- Call Service ---
-        updated_fee = fee_service.update_fee_record_details(db, payment_id, update_data)
+        updated_fee = await database.run_db(db, fee_service.update_fee_record_details, payment_id, update_data)
         if updated_fee is None: raise ValueError("Fee record not found.") # Service should return object or raise
 
         logger.info(f"Fee record {payment_id} details updated by admin {current_user.username}.")
@@ -178,7 +302,7 @@ async def delete_fee_record_by_admin(
     """Handles deletion of a fee record by an admin."""
     logger.info(f"Admin {current_user.username} attempting to delete fee record {payment_id}.")
     try:
-        success = fee_service.delete_fee_record(db, payment_id)
+        success = await database.run_db(db, fee_service.delete_fee_record, payment_id)
         # Service should raise ValueError if not found or cannot delete
         logger.info(f"Fee record {payment_id} deleted by admin {current_user.username}.")
         return JSONResponse(content={"success": True, "message": "Fee record deleted successfully."})
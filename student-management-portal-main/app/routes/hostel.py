@@ -12,7 +12,8 @@ from datetime import date # Keep date import for date fields if still used elsew
 
 # Local imports
 from app import database, models
-from app.services import auth_service, hostel_service, student_service
+from app.pagination import PageRequest
+from app.services import auth_service, hostel_service
 from app.models import UserRole
 
 logger = logging.getLogger(__name__)
@@ -28,20 +29,27 @@ templates = Jinja2Templates(directory="app/templates")
 async def manage_hostel_assignments_page(
     request: Request, response: Response, db: Session = Depends(database.get_db),
     current_user: models.User = Depends(auth_service.get_current_active_admin),
+    filter_hostel: Optional[str] = Query(None), search: Optional[str] = Query(None),
+    sort: Optional[str] = Query(None),
+    order: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None),
+    after: Optional[str] = Query(None), # Keyset cursors, see app/pagination.py
+    before: Optional[str] = Query(None),
     toast_error: Optional[str] = Query(None), toast_success: Optional[str] = Query(None)
 ):
     """Displays page for admin to manage student hostel assignments."""
     logger.info(f"Admin {current_user.username} accessing hostel assignments list.")
     try:
-        assignments = hostel_service.get_all_hostel_assignments(db)
-        students_json = json.dumps([{"id": s.id, "name": s.name} for s in student_service.get_all_students(db)])
+        page = PageRequest.from_query(limit=limit, after=after, before=before, sort=sort, order=order)
+        assignments = await database.run_db(db, hostel_service.get_hostel_assignments_page, page, hostel_name=filter_hostel, search=search)
         hostel_names_json = json.dumps(hostel_service.HOSTEL_NAMES)
-    except Exception as e: logger.error(f"Error fetching hostel data: {e}", exc_info=True); assignments = []; students_json = "[]"; hostel_names_json = "[]"; toast_error = toast_error or "Failed to load hostel data."
+    except Exception as e: logger.error(f"Error fetching hostel data: {e}", exc_info=True); assignments = []; hostel_names_json = "[]"; toast_error = toast_error or "Failed to load hostel data."
 
     response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate";
     context = {
         "request": request, "user": current_user, "UserRole": UserRole, "hostel_assignments": assignments,
-        "students_json": students_json, "hostel_names_json": hostel_names_json,
+        "hostel_names": hostel_service.HOSTEL_NAMES, "current_filter_hostel": filter_hostel, "current_search": search,
+        "hostel_names_json": hostel_names_json,
         "page_title": "Manage Hostel Assignments", "toast_error": toast_error, "toast_success": toast_success
     }
     return templates.TemplateResponse("admin/manage_hostels.html", context)
@@ -66,8 +74,8 @@ async def assign_hostel_by_admin(
         fees = float(fees_str) if fees_str and fees_str.strip() else None
         # REMOVED: check_in_date = date.fromisoformat(check_in_date_str) if check_in_date_str else None # Removed
 
-        new_assignment = hostel_service.assign_hostel(
-            db, student_id=student_id, hostel_name=hostel_name, room_number=room_number.strip(),
+        new_assignment = await database.run_db(
+            db, hostel_service.assign_hostel, student_id=student_id, hostel_name=hostel_name, room_number=room_number.strip(),
             fees=fees # Removed: , check_in_date=check_in_date # Removed
         )
         toast_msg = urllib.parse.quote(f"Hostel assigned successfully to student ID {student_id}.")
@@ -100,7 +108,7 @@ async def edit_hostel_assignment_by_admin(
         # Removed: update_data['check_in_date'] = date.fromisoformat(check_in_date_str) if check_in_date_str else None # Removed
         # Removed: update_data['check_out_date'] = date.fromisoformat(check_out_date_str) if check_out_date_str else None # Removed
 
-        updated_record = hostel_service.update_hostel_assignment(db, assignment_id, update_data)
+        updated_record = await database.run_db(db, hostel_service.update_hostel_assignment, assignment_id, update_data)
         if updated_record is None: raise ValueError("Assignment record not found.")
 
         toast_msg = urllib.parse.quote(f"Hostel assignment {assignment_id} updated.")
@@ -123,7 +131,7 @@ async def delete_hostel_assignment_by_admin(
     """Handles deletion of a hostel assignment record by an admin via fetch."""
     logger.info(f"Admin {current_user.username} attempting delete hostel assignment {assignment_id}.")
     try:
-        success = hostel_service.delete_hostel_assignment(db, assignment_id)
+        success = await database.run_db(db, hostel_service.delete_hostel_assignment, assignment_id)
         if not success: raise ValueError("Assignment record not found.")
         return JSONResponse(content={"success": True, "message": "Hostel assignment deleted."})
     except ValueError as e:
@@ -1,6 +1,6 @@
 # app/routes/instructor.py
 
-from fastapi import APIRouter, Depends, Request, Form, HTTPException, status
+from fastapi import APIRouter, Depends, Request, Form, HTTPException, status, Query
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
@@ -10,8 +10,9 @@ import os
 
 # Local imports
 from app import database, models
+from app.pagination import PageRequest
 # Import BOTH instructor and auth services
-from app.services import auth_service, instructor_service, department_service # Need department service
+from app.services import auth_service, instructor_service, department_service, password_service # Need department service
 from app.models import UserRole, User, Instructor, Department # Import models
 
 logger = logging.getLogger(__name__)
@@ -28,14 +29,22 @@ templates = Jinja2Templates(directory="app/templates")
 async def list_instructors_for_admin(
     request: Request,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth_service.get_current_active_admin) # Require admin
+    current_user: models.User = Depends(auth_service.get_current_active_admin), # Require admin
+    search: Optional[str] = Query(None),
+    sort: Optional[str] = Query(None),
+    order: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None),
+    after: Optional[str] = Query(None), # Keyset cursors, see app/pagination.py
+    before: Optional[str] = Query(None),
 ):
-    instructors = instructor_service.get_all_instructors(db)
+    page = PageRequest.from_query(limit=limit, after=after, before=before, sort=sort, order=order)
+    instructors = await database.run_db(db, instructor_service.get_instructors_page, page, search=search)
     context = {
         "request": request,
         "user": current_user,
         "UserRole": UserRole,
-        "instructors": instructors,
+        "instructors": instructors, # A Page: iterable, plus total and cursors
+        "current_search": search,
         "page_title": "Manage Instructors"
     }
     return templates.TemplateResponse("admin/instructors_list.html", context)
@@ -49,7 +58,7 @@ async def add_instructor_form_for_admin(
     current_user: models.User = Depends(auth_service.get_current_active_admin) # Require admin
 ):
     default_pwd_display = os.getenv("DEFAULT_NEW_USER_PASSWORD", "12345")
-    departments = department_service.get_all_departments(db) # Fetch departments for dropdown
+    departments = await database.run_db(db, department_service.get_all_departments) # Fetch departments for dropdown
     context = {
         "request": request,
         "user": current_user,
@@ -78,15 +87,16 @@ async def add_instructor_by_admin(
 ):
     default_password = os.getenv("DEFAULT_NEW_USER_PASSWORD", "12345")
     try:
-        new_instructor = instructor_service.create_instructor_with_user(
-            db=db, name=name, email=email, username=username, raw_password=default_password,
+        hashed_password = await password_service.hash_password_async(default_password) # On the hashing pool, not under run_db
+        new_instructor = await database.run_db(
+            db, instructor_service.create_instructor_with_user, name=name, email=email, username=username, hashed_password=hashed_password,
             qualification=qualification, department_id=department_id, phone=phone
         )
-        logger.info(f"Admin {current_user.username} created instructor {new_instructor.id} (User: {new_instructor.user.username})")
+        logger.info(f"Admin {current_user.username} created instructor {new_instructor.id} (User: {username})")
         return RedirectResponse(url=request.url_for('admin_manage_instructors_list'), status_code=status.HTTP_303_SEE_OTHER)
     except ValueError as e: # Catch errors like duplicate user or invalid department
         logger.warning(f"Admin {current_user.username} failed to add instructor: {e}")
-        departments = department_service.get_all_departments(db) # Re-fetch departments for form
+        departments = await database.run_db(db, department_service.get_all_departments) # Re-fetch departments for form
         default_pwd_display = os.getenv("DEFAULT_NEW_USER_PASSWORD", "12345")
         context = {
             "request": request, "user": current_user, "UserRole": UserRole, "instructor": None,
@@ -96,7 +106,7 @@ async def add_instructor_by_admin(
         return templates.TemplateResponse("admin/instructor_form.html", context, status_code=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         logger.error(f"Admin {current_user.username} encountered unexpected error adding instructor: {e}", exc_info=True)
-        departments = department_service.get_all_departments(db) # Re-fetch departments
+        departments = await database.run_db(db, department_service.get_all_departments) # Re-fetch departments
         default_pwd_display = os.getenv("DEFAULT_NEW_USER_PASSWORD", "12345")
         context = {
             "request": request, "user": current_user, "UserRole": UserRole, "instructor": None,
@@ -115,10 +125,10 @@ async def edit_instructor_form_for_admin(
     db: Session = Depends(database.get_db), # Need db for instructor and departments
     current_user: models.User = Depends(auth_service.get_current_active_admin) # Require admin
 ):
-    instructor = instructor_service.get_instructor_by_id_with_user(db, instructor_id=instructor_id)
+    instructor = await database.run_db(db, instructor_service.get_instructor_by_id_with_user, instructor_id=instructor_id)
     if not instructor:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Instructor not found")
-    departments = department_service.get_all_departments(db) # Fetch departments for dropdown
+    departments = await database.run_db(db, department_service.get_all_departments) # Fetch departments for dropdown
     context = {
         "request": request, "user": current_user, "UserRole": UserRole,
         "instructor": instructor, # Pass existing instructor data
@@ -142,7 +152,7 @@ async def edit_instructor_by_admin(
     department_id: Optional[int] = Form(None),
     phone: Optional[str] = Form(None)
 ):
-    instructor_to_update = instructor_service.get_instructor_by_id_with_user(db, instructor_id=instructor_id)
+    instructor_to_update = await database.run_db(db, instructor_service.get_instructor_by_id_with_user, instructor_id=instructor_id)
     if not instructor_to_update:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Instructor not found")
 
@@ -154,14 +164,14 @@ async def edit_instructor_by_admin(
         "user_email": email
     }
     try:
-        updated_instructor = instructor_service.update_instructor_and_user(
-            db=db, instructor_id=instructor_id, update_data=update_data
+        updated_instructor = await database.run_db(
+            db, instructor_service.update_instructor_and_user, instructor_id=instructor_id, update_data=update_data
         )
         logger.info(f"Admin {current_user.username} updated instructor {instructor_id}")
         return RedirectResponse(url=request.url_for('admin_manage_instructors_list'), status_code=status.HTTP_303_SEE_OTHER)
     except ValueError as e: # Catch errors like duplicate email or invalid dept
         logger.warning(f"Admin {current_user.username} failed to update instructor {instructor_id}: {e}")
-        departments = department_service.get_all_departments(db) # Re-fetch departments
+        departments = await database.run_db(db, department_service.get_all_departments) # Re-fetch departments
         context = {
             "request": request, "user": current_user, "UserRole": UserRole,
             "instructor": instructor_to_update, # Pass existing data back
@@ -173,7 +183,7 @@ async def edit_instructor_by_admin(
         return templates.TemplateResponse("admin/instructor_form.html", context, status_code=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         logger.error(f"Admin {current_user.username} encountered unexpected error updating instructor {instructor_id}: {e}", exc_info=True)
-        departments = department_service.get_all_departments(db) # Re-fetch departments
+        departments = await database.run_db(db, department_service.get_all_departments) # Re-fetch departments
         context = {
             "request": request, "user": current_user, "UserRole": UserRole,
             "instructor": instructor_to_update, "departments": departments,
@@ -191,7 +201,7 @@ async def delete_instructor_by_admin(
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(auth_service.get_current_active_admin) # Require admin
 ):
-    success = instructor_service.delete_instructor_and_user(db=db, instructor_id=instructor_id)
+    success = await database.run_db(db, instructor_service.delete_instructor_and_user, instructor_id=instructor_id)
     if not success:
         logger.warning(f"Admin {current_user.username} attempted delete non-existent instructor {instructor_id}")
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Instructor not found or could not be deleted")
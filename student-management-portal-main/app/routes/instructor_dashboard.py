@@ -17,7 +17,7 @@ import json
 from app import database, models
 from app.services import (
     auth_service, schedule_service, attendance_service,
-    exam_service, course_service # Need all relevant services
+    exam_service, course_service, grading_service, exam_analytics_service # Need all relevant services
 )
 from app.models import UserRole, AttendanceStatus, ExamType, Schedule # Import models needed
 
@@ -51,8 +51,9 @@ async def get_instructor_dashboard(
     if instructor_profile:
         try:
             # Count distinct courses taught (based on schedule)
-            dashboard_data["teaching_course_count"] = db.query(func.count(models.Schedule.course_id.distinct()))\
-                .filter(models.Schedule.instructor_id == instructor_profile.id).scalar() or 0
+            dashboard_data["teaching_course_count"] = await database.run_db(
+                db, schedule_service.count_courses_taught_by_instructor, instructor_profile.id
+            )
 
             # Fetch upcoming classes (e.g., today or next few days - requires more logic)
             # ...
@@ -91,9 +92,7 @@ async def show_attendance_form(
     if not instructor_profile: raise HTTPException(404, "Instructor profile not found.")
 
     # Fetch distinct courses taught by this instructor
-    teaching_schedules = db.query(models.Schedule).options(joinedload(models.Schedule.course))\
-        .filter(models.Schedule.instructor_id == instructor_profile.id).distinct(models.Schedule.course_id).all()
-    teaching_courses = sorted([s.course for s in teaching_schedules if s.course], key=lambda c: c.name)
+    teaching_courses = await database.run_db(db, schedule_service.get_courses_taught_by_instructor, instructor_profile.id)
 
     selected_course: Optional[models.Course] = None
     selected_date: Optional[date] = None
@@ -126,11 +125,9 @@ async def show_attendance_form(
         day_name = selected_date.strftime('%A') # e.g., "Monday"
 
         # Find the schedule for this instructor, course, and day
-        schedules_on_day = db.query(models.Schedule).filter(
-            models.Schedule.instructor_id == instructor_profile.id,
-            models.Schedule.course_id == course_id,
-            models.Schedule.day_of_week == day_name
-        ).order_by(models.Schedule.start_time).all() # Order by time just in case
+        schedules_on_day = await database.run_db(
+            db, schedule_service.get_instructor_schedules_on_day, instructor_profile.id, course_id, day_name
+        ) # Ordered by time just in case
 
         if not schedules_on_day:
             toast_error = f"No schedule found for {selected_course.name} on {day_name}s."
@@ -140,8 +137,8 @@ async def show_attendance_form(
             found_schedule_id = schedules_on_day[0].id # Use the first schedule found
 
             # Fetch students and attendance using the found schedule_id
-            students_for_schedule = attendance_service.get_students_for_schedule(db, found_schedule_id)
-            attendance_status_map = attendance_service.get_attendance_records(db, found_schedule_id, selected_date)
+            students_for_schedule = await database.run_db(db, attendance_service.get_students_for_schedule, found_schedule_id)
+            attendance_status_map = await database.run_db(db, attendance_service.get_attendance_records, found_schedule_id, selected_date)
 
     response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"; # etc.
     context = {
@@ -179,11 +176,9 @@ async def save_attendance(
 
         # --- Re-determine schedule_id based on submitted course and date ---
         day_name = attendance_date.strftime('%A')
-        schedules_on_day = db.query(models.Schedule).filter(
-            models.Schedule.instructor_id == instructor_profile.id,
-            models.Schedule.course_id == course_id,
-            models.Schedule.day_of_week == day_name
-        ).all()
+        schedules_on_day = await database.run_db(
+            db, schedule_service.get_instructor_schedules_on_day, instructor_profile.id, course_id, day_name
+        )
 
         if not schedules_on_day:
             raise ValueError(f"No schedule found for this course on {day_name}s to save attendance against.")
@@ -206,7 +201,7 @@ async def save_attendance(
         if not attendance_to_save: raise ValueError("No attendance data submitted.")
 
         # Call service with the *determined* schedule_id
-        created, updated = attendance_service.save_attendance_records(db=db, schedule_id=found_schedule_id, attendance_date=attendance_date, attendance_data=attendance_to_save)
+        created, updated = await database.run_db(db, attendance_service.save_attendance_records, schedule_id=found_schedule_id, attendance_date=attendance_date, attendance_data=attendance_to_save)
         toast_msg = urllib.parse.quote(f"Attendance saved ({created} created, {updated} updated).")
         query_params.append(f"toast_success={toast_msg}")
 
@@ -237,8 +232,7 @@ async def manage_exams_page(
     if not instructor_profile: raise HTTPException(404, "Instructor profile not found.")
 
     # Get courses taught
-    instructor_schedules = db.query(models.Schedule).options(joinedload(models.Schedule.course)).filter(models.Schedule.instructor_id == instructor_profile.id).distinct(models.Schedule.course_id).all()
-    teaching_courses = sorted([s.course for s in instructor_schedules if s.course], key=lambda c: c.name)
+    teaching_courses = await database.run_db(db, schedule_service.get_courses_taught_by_instructor, instructor_profile.id)
 
     # Fetch exams based on selected course
     exams_list = []
@@ -247,7 +241,7 @@ async def manage_exams_page(
         if course_id not in {c.id for c in teaching_courses}:
              toast_error = "Permission denied for selected course."; course_id = None
         else:
-             exams_list = exam_service.get_exams_for_course(db, course_id=course_id)
+             exams_list = await database.run_db(db, exam_service.get_exams_for_course, course_id=course_id)
              selected_course = next((c for c in teaching_courses if c.id == course_id), None)
              if selected_course: selected_course_name = selected_course.name
 
@@ -277,17 +271,14 @@ async def edit_exam_mcqs_page(
     if not instructor_profile: raise HTTPException(404, "Instructor profile not found.")
 
     # Use the service function that fetches questions
-    exam = exam_service.get_exam_by_id_with_questions(db, exam_id)
+    exam = await database.run_db(db, exam_service.get_exam_by_id_with_questions, exam_id)
     if not exam: raise HTTPException(404, "Exam not found.")
-    # Parse options JSON for template rendering
+    # Options as plain dicts for the editor's JS
     questions_with_parsed_options = []
-    for mcq in exam.mcq_questions: # exam.mcq_questions should be loaded now
-        options_list = []; 
-        try: options_list = json.loads(mcq.options or '[]')
-        except json.JSONDecodeError: logger.warning(f"Could not parse options JSON for MCQ {mcq.id}")
+    for mcq in exam.mcq_questions: # questions and options are loaded by the service
         questions_with_parsed_options.append({
-            "id": mcq.id, "question_text": mcq.question_text,
-            "marks": mcq.marks, "options": options_list })
+            "id": mcq.id, "question_text": mcq.question_text, "marks": mcq.marks,
+            "options": [{"text": opt.text, "is_correct": opt.is_correct} for opt in mcq.mcq_options] })
     print(exam)
 
     context = {
@@ -313,7 +304,7 @@ async def save_exam_mcqs(
     if not instructor_profile: raise HTTPException(403, "Profile needed.")
 
     # --- Permission Check ---
-    exam = exam_service.get_exam_by_id_with_questions(db, exam_id)
+    exam = await database.run_db(db, exam_service.get_exam_by_id_with_questions, exam_id)
     if not exam: raise HTTPException(404, "Exam not found.")
 
 
@@ -401,7 +392,7 @@ async def save_exam_mcqs(
     redirect_url = request.url_for('instructor_edit_exam_mcqs', exam_id=exam_id)
     query_params = []
     try:
-        saved_count, total_marks = exam_service.save_mcq_questions_for_exam(db, exam_id, questions_to_save)
+        saved_count, total_marks = await database.run_db(db, exam_service.save_mcq_questions_for_exam, exam_id, questions_to_save)
         toast_msg = urllib.parse.quote(f"Saved {saved_count} questions. Exam total marks: {total_marks:.1f}")
         query_params.append(f"toast_success={toast_msg}")
     except ValueError as e:
@@ -417,6 +408,66 @@ async def save_exam_mcqs(
     return RedirectResponse(final_redirect_url, status_code=status.HTTP_303_SEE_OTHER)
 
 
+# GET: Exam analytics (score distribution, item statistics)
+async def _load_exam_analytics(db: Session, exam_id: int, current_user: models.User) -> Dict:
+    instructor_profile = current_user.instructor_profile
+    if not instructor_profile: raise HTTPException(403, "Profile needed.")
+    try:
+        analytics = await database.run_db(db, exam_analytics_service.get_exam_analytics, exam_id)
+    except ValueError as e:
+        raise HTTPException(404, str(e))
+    teaching_courses = await database.run_db(db, schedule_service.get_courses_taught_by_instructor, instructor_profile.id)
+    if analytics["course_id"] not in {c.id for c in teaching_courses}:
+        raise HTTPException(403, "You do not teach this exam's course.")
+    return analytics
+
+@router.get("/exams/{exam_id}/analytics", response_class=HTMLResponse, name="instructor_exam_analytics")
+async def exam_analytics_page(
+    request: Request, exam_id: int, db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth_service.get_current_active_instructor),
+):
+    analytics = await _load_exam_analytics(db, exam_id, current_user)
+    context = {
+        "request": request, "user": current_user, "UserRole": UserRole, "analytics": analytics,
+        "page_title": f"Analytics: {analytics['exam_name']}",
+    }
+    return templates.TemplateResponse("instructor/exam_analytics.html", context)
+
+@router.get("/exams/{exam_id}/analytics.json", response_class=JSONResponse, name="instructor_exam_analytics_data")
+async def exam_analytics_data(
+    exam_id: int, db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth_service.get_current_active_instructor),
+):
+    return JSONResponse(await _load_exam_analytics(db, exam_id, current_user))
+
+
+# POST: Regrade all submitted attempts against the current answer key
+@router.post("/exams/{exam_id}/regrade", response_class=RedirectResponse, name="instructor_regrade_exam")
+async def regrade_exam(
+    request: Request,
+    exam_id: int,
+    current_user: models.User = Depends(auth_service.get_current_active_instructor),
+):
+    instructor_profile = current_user.instructor_profile
+    if not instructor_profile: raise HTTPException(403, "Profile needed.")
+
+    redirect_url = request.url_for('instructor_edit_exam_mcqs', exam_id=exam_id)
+    try:
+        summary = await database.run_blocking(grading_service.regrade_exam, exam_id) # Whole-exam batch: off the event loop
+        toast_msg = urllib.parse.quote(
+            f"Regraded {summary['results']} attempts: {summary['results_changed']} scores and "
+            f"{summary['answers_changed']} answers changed."
+        )
+        query = f"toast_success={toast_msg}"
+    except ValueError as e:
+        query = f"toast_error={urllib.parse.quote(f'Error regrading exam: {e}')}"
+    except Exception as e:
+        logger.error(f"Unexpected error regrading exam {exam_id}: {e}", exc_info=True)
+        query = f"toast_error={urllib.parse.quote('An unexpected server error occurred.')}"
+
+    return RedirectResponse(f"{redirect_url}?{query}", status_code=status.HTTP_303_SEE_OTHER)
+
+
 @router.post("/exams/define/add", response_class=RedirectResponse, name="instructor_add_exam_definition")
 async def add_exam_definition_by_instructor(
      request: Request, db: Session = Depends(database.get_db),
@@ -440,7 +491,7 @@ async def add_exam_definition_by_instructor(
         try: exam_type_enum = models.ExamType(exam_type_str)
         except ValueError: raise ValueError(f"Invalid exam type: {exam_type_str}")
         exam_date = date.fromisoformat(exam_date_str) if exam_date_str and exam_date_str.strip() else None
-        new_exam = exam_service.create_exam(db, course_id, name, exam_type_enum, exam_date, description)
+        new_exam = await database.run_db(db, exam_service.create_exam, course_id, name, exam_type_enum, exam_date, description)
         toast_msg = urllib.parse.quote(f"Exam '{new_exam.name}' definition created. Edit questions now.")
         query_params.append(f"toast_success={toast_msg}")
 
@@ -473,7 +524,7 @@ async def edit_exam_definition_by_instructor(
 
     try:
         # --- Permission Check FIRST ---
-        exam = exam_service.get_exam_by_id_with_questions(db, exam_id) # Fetch exam to check ownership and get course_id
+        exam = await database.run_db(db, exam_service.get_exam_by_id_with_questions, exam_id) # Fetch exam to check ownership and get course_id
         if not exam: raise ValueError("Exam not found.")
         query_params.append(f"course_id={exam.course_id}") # Add course_id for redirect filter
 
@@ -493,7 +544,7 @@ async def edit_exam_definition_by_instructor(
         logger.debug(f"Updating exam {exam_id} definition with data: {update_data}")
 
         # --- Call Service to Update Details ---
-        updated_exam = exam_service.update_exam_details(db, exam_id, update_data)
+        updated_exam = await database.run_db(db, exam_service.update_exam_details, exam_id, update_data)
         # update_exam_details returns None if not found, but we checked already
         if updated_exam is None: raise ValueError("Exam update failed unexpectedly.")
 
@@ -536,11 +587,11 @@ async def delete_exam_definition_by_instructor(
     if not instructor_profile: return JSONResponse(status_code=403, content={"success": False, "message": "Profile needed."})
     try:
         # Permission check inside try block
-        exam = exam_service.get_exam_by_id_with_questions(db, exam_id)
+        exam = await database.run_db(db, exam_service.get_exam_by_id_with_questions, exam_id)
         if not exam: raise ValueError("Exam not found.")
 
 
-        success = exam_service.delete_exam(db, exam_id) # Service checks results dependency
+        success = await database.run_db(db, exam_service.delete_exam, exam_id) # Service checks results dependency
         # The service raises ValueError if deletion fails due to dependency or other DB error
         return JSONResponse(content={"success": True, "message": "Exam definition deleted."})
 
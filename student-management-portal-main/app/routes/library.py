@@ -7,12 +7,12 @@ from sqlalchemy.orm import Session
 from typing import Optional, List, Dict, Any # Added Dict, Any
 import logging
 import urllib.parse
-import json
 from datetime import date
 
 # Local imports
 from app import database, models
-from app.services import auth_service, library_service, student_service # Need student service
+from app.pagination import PageRequest
+from app.services import auth_service, library_service
 from app.models import UserRole # Import models needed
 
 logger = logging.getLogger(__name__)
@@ -30,27 +30,30 @@ async def list_library_records_for_admin(
     response: Response,
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(auth_service.get_current_active_admin),
+    search_student: Optional[str] = Query(None),
+    sort: Optional[str] = Query(None),
+    order: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None),
+    after: Optional[str] = Query(None), # Keyset cursors, see app/pagination.py
+    before: Optional[str] = Query(None),
     toast_error: Optional[str] = Query(None),
     toast_success: Optional[str] = Query(None)
 ):
     """Displays list of all library borrowing records for admin view."""
     logger.info(f"Admin {current_user.username} accessing library records list.")
     try:
-        records = library_service.get_all_library_records(db)
-        # Fetch students for the 'Add Record' modal dropdown
-        students = student_service.get_all_students(db)
-        students_json = json.dumps([{"id": s.id, "name": s.name} for s in students])
+        page = PageRequest.from_query(limit=limit, after=after, before=before, sort=sort, order=order)
+        records = await database.run_db(db, library_service.get_library_records_page, page, search_student=search_student)
     except Exception as e:
         logger.error(f"Failed to fetch library records or students: {e}", exc_info=True)
         records = []
-        students_json = "[]"
         toast_error = toast_error or "Failed to load library data."
 
     response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"; # etc.
     context = {
         "request": request, "user": current_user, "UserRole": UserRole,
-        "library_records": records, # Pass the borrowing records
-        "students_json": students_json, # Pass students for modal
+        "library_records": records, # One Page of borrowing records
+        "current_search_student": search_student,
         "page_title": "Manage Library Records",
         "toast_error": toast_error, "toast_success": toast_success
     }
@@ -78,8 +81,8 @@ async def add_library_record_by_admin(
         borrowed_date = date.fromisoformat(borrowed_date_str) if borrowed_date_str else None
         return_date = date.fromisoformat(return_date_str) if return_date_str else None
 
-        new_record = library_service.create_library_record(
-            db, student_id=student_id, books_borrowed=books_borrowed,
+        new_record = await database.run_db(
+            db, library_service.create_library_record, student_id=student_id, books_borrowed=books_borrowed,
             borrowed_date=borrowed_date, return_date=return_date
         )
         toast_msg = urllib.parse.quote(f"Library record created for student ID {student_id}.")
@@ -112,7 +115,7 @@ async def edit_library_record_by_admin(
         update_data['return_date'] = date.fromisoformat(return_date_str) if return_date_str else None
         # student_id is generally not editable for an existing record
 
-        updated_record = library_service.update_library_record(db, record_id, update_data)
+        updated_record = await database.run_db(db, library_service.update_library_record, record_id, update_data)
         if updated_record is None: raise ValueError("Library record not found.")
 
         toast_msg = urllib.parse.quote(f"Library record {record_id} updated.")
@@ -135,7 +138,7 @@ async def delete_library_record_by_admin(
     """Handles deletion of a library borrowing record by an admin via fetch."""
     logger.info(f"Admin {current_user.username} attempting delete library record {record_id}.")
     try:
-        success = library_service.delete_library_record(db, record_id)
+        success = await database.run_db(db, library_service.delete_library_record, record_id)
         if not success: raise ValueError("Record not found.")
         return JSONResponse(content={"success": True, "message": "Library record deleted successfully."})
     except ValueError as e:
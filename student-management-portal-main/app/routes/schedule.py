@@ -16,7 +16,7 @@ import json
 from app import database, models
 from app.services import (
     auth_service, schedule_service, course_service,
-    instructor_service, classroom_service
+    instructor_service, classroom_service, timetable_service
 )
 from app.models import UserRole, Schedule
 
@@ -38,10 +38,10 @@ async def list_schedules_for_admin(
     toast_error: Optional[str] = Query(None),
     toast_success: Optional[str] = Query(None)
 ):
-    schedules = schedule_service.get_all_schedules(db)
-    courses = course_service.get_all_courses(db)
-    instructors = instructor_service.get_all_instructors(db)
-    classrooms = classroom_service.get_all_classrooms(db)
+    schedules = await database.run_db(db, schedule_service.get_all_schedules)
+    courses = await database.run_db(db, course_service.get_all_courses)
+    instructors = await database.run_db(db, instructor_service.get_all_instructors)
+    classrooms = await database.run_db(db, classroom_service.get_all_classrooms)
 
     # Prepare data as JSON for JavaScript
     courses_json = json.dumps([{"id": c.id, "name": c.name} for c in courses])
@@ -70,6 +70,32 @@ async def list_schedules_for_admin(
     return templates.TemplateResponse("admin/schedules_list.html", context)
 
 
+# VALIDATE: Every classroom / instructor double booking in the current timetable
+@router.get("/conflicts", response_class=JSONResponse, name="admin_manage_schedule_conflicts")
+async def list_schedule_conflicts(
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth_service.get_current_active_admin)
+):
+    report = await database.run_db(db, schedule_service.find_all_conflicts)
+    return JSONResponse(content=report)
+
+
+# GENERATE: Last dry run of the automatic timetable generator. The search is CPU-bound and runs in worker
+# processes, so it never runs in a request: `python -m app.cli generate-timetable` stores the preview read here
+# (add --apply to write it)
+@router.get("/timetable-preview", response_class=JSONResponse, name="admin_manage_schedule_timetable_preview")
+async def preview_generated_timetable(
+    current_user: models.User = Depends(auth_service.get_current_active_admin)
+):
+    report = await database.run_blocking(timetable_service.load_preview) # Reads a file: off the event loop
+    if report is None:
+        return JSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={
+            "success": False,
+            "message": "No timetable preview yet. Run `python -m app.cli generate-timetable` to generate one."
+        })
+    return JSONResponse(content=report)
+
+
 # CREATE (Process Add Schedule Form) - Still redirects, passes toast message in URL
 @router.post("/add", response_class=RedirectResponse, name="admin_manage_schedule_add")
 async def add_schedule_by_admin(
@@ -88,8 +114,8 @@ async def add_schedule_by_admin(
         course_id = int(course_id_str); instructor_id = int(instructor_id_str)
         classroom_id = int(classroom_id_str) if classroom_id_str and classroom_id_str.strip() else None
 
-        new_schedule = schedule_service.create_schedule(
-            db=db, course_id=course_id, instructor_id=instructor_id, classroom_id=classroom_id,
+        new_schedule = await database.run_db(
+            db, schedule_service.create_schedule, course_id=course_id, instructor_id=instructor_id, classroom_id=classroom_id,
             day_of_week=day_of_week, start_time=start_time, end_time=end_time
         )
         logger.info(f"Admin {current_user.username} created schedule {new_schedule.id}")
@@ -128,8 +154,8 @@ async def edit_schedule_by_admin(
         update_data['start_time'] = start_time
         update_data['end_time'] = end_time
 
-        updated_schedule = schedule_service.update_schedule(
-            db=db, schedule_id=schedule_id, update_data=update_data
+        updated_schedule = await database.run_db(
+            db, schedule_service.update_schedule, schedule_id=schedule_id, update_data=update_data
         )
         if updated_schedule is None: raise ValueError("Schedule not found.")
 
@@ -156,7 +182,7 @@ async def delete_schedule_by_admin(
     current_user: models.User = Depends(auth_service.get_current_active_admin)
 ):
     try:
-        success = schedule_service.delete_schedule(db=db, schedule_id=schedule_id)
+        success = await database.run_db(db, schedule_service.delete_schedule, schedule_id=schedule_id)
         if not success:
              # This case might not be reachable if service raises ValueError for not found
              logger.warning(f"Admin {current_user.username} delete failed: Schedule {schedule_id} not found by service.")
@@ -8,7 +8,7 @@ import logging, urllib.parse, json
 from datetime import date
 
 from app import database, models
-from app.services import auth_service, scholarship_service, student_service # Need student service
+from app.services import auth_service, scholarship_service
 from app.models import UserRole, Scholarship, StudentScholarship
 
 logger = logging.getLogger(__name__)
@@ -24,7 +24,7 @@ async def list_scholarship_defs_for_admin(
     current_user: models.User = Depends(auth_service.get_current_active_admin),
     toast_error: Optional[str] = Query(None), toast_success: Optional[str] = Query(None)
 ):
-    definitions = scholarship_service.get_all_scholarship_definitions(db)
+    definitions = await database.run_db(db, scholarship_service.get_all_scholarship_definitions)
     response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"; # etc.
     context = {
         "request": request, "user": current_user, "UserRole": UserRole,
@@ -44,7 +44,7 @@ async def add_scholarship_def_by_admin(
     try:
         amount = float(amount_str)
         if amount <= 0: raise ValueError("Amount must be positive.")
-        new_def = scholarship_service.create_scholarship_definition(db, name, amount, eligibility)
+        new_def = await database.run_db(db, scholarship_service.create_scholarship_definition, name, amount, eligibility)
         toast_msg = urllib.parse.quote(f"Scholarship '{new_def.name}' created.")
         return RedirectResponse(f"{redirect_url}?toast_success={toast_msg}", status.HTTP_303_SEE_OTHER)
     except ValueError as e:
@@ -64,7 +64,7 @@ async def edit_scholarship_def_by_admin(
         amount = float(amount_str)
         if amount <= 0: raise ValueError("Amount must be positive.")
         update_data = {"name": name, "amount": amount, "eligibility": eligibility}
-        updated_def = scholarship_service.update_scholarship_definition(db, scholarship_id, update_data)
+        updated_def = await database.run_db(db, scholarship_service.update_scholarship_definition, scholarship_id, update_data)
         if updated_def is None: raise ValueError("Scholarship not found.")
         toast_msg = urllib.parse.quote(f"Scholarship '{updated_def.name}' updated.")
         return RedirectResponse(f"{redirect_url}?toast_success={toast_msg}", status.HTTP_303_SEE_OTHER)
@@ -78,7 +78,7 @@ async def delete_scholarship_def_by_admin(
     current_user: models.User = Depends(auth_service.get_current_active_admin)
 ):
     try:
-        success = scholarship_service.delete_scholarship_definition(db, scholarship_id)
+        success = await database.run_db(db, scholarship_service.delete_scholarship_definition, scholarship_id)
         if not success: raise ValueError("Scholarship not found.")
         return JSONResponse(content={"success": True, "message": "Scholarship definition deleted."})
     except ValueError as e: return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"success": False, "message": str(e)})
@@ -94,18 +94,15 @@ async def list_scholarship_assignments_for_admin(
     current_user: models.User = Depends(auth_service.get_current_active_admin),
     toast_error: Optional[str] = Query(None), toast_success: Optional[str] = Query(None)
 ):
-    assignments = scholarship_service.get_all_scholarship_assignments(db)
+    assignments = await database.run_db(db, scholarship_service.get_all_scholarship_assignments)
     # Data for modal
-    students = student_service.get_all_students(db)
-    scholarships = scholarship_service.get_all_scholarship_definitions(db)
-    students_json = json.dumps([{"id": s.id, "name": s.name} for s in students])
+    scholarships = await database.run_db(db, scholarship_service.get_all_scholarship_definitions)
     scholarships_json = json.dumps([{"id": s.id, "name": s.name} for s in scholarships])
 
     response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"; # etc.
     context = {
         "request": request, "user": current_user, "UserRole": UserRole,
         "assignments": assignments,
-        "students_json": students_json,
         "scholarships_json": scholarships_json,
         "page_title": "Manage Scholarship Assignments",
         "toast_error": toast_error, "toast_success": toast_success
@@ -122,7 +119,7 @@ async def assign_scholarship_by_admin(
     redirect_url = request.url_for('admin_manage_scholarship_assignments_list')
     try:
         student_id = int(student_id_str); scholarship_id = int(scholarship_id_str)
-        new_assign = scholarship_service.assign_scholarship_to_student(db, student_id, scholarship_id, academic_year)
+        new_assign = await database.run_db(db, scholarship_service.assign_scholarship_to_student, student_id, scholarship_id, academic_year)
         toast_msg = urllib.parse.quote("Scholarship assigned successfully.")
         return RedirectResponse(f"{redirect_url}?toast_success={toast_msg}", status.HTTP_303_SEE_OTHER)
     except ValueError as e: toast_msg = urllib.parse.quote(f"Error: {e}"); return RedirectResponse(f"{redirect_url}?toast_error={toast_msg}", status.HTTP_303_SEE_OTHER)
@@ -136,7 +133,7 @@ async def revoke_scholarship_by_admin(
     current_user: models.User = Depends(auth_service.get_current_active_admin)
 ):
     try:
-        success = scholarship_service.revoke_scholarship_assignment(db, assignment_id)
+        success = await database.run_db(db, scholarship_service.revoke_scholarship_assignment, assignment_id)
         if not success: raise ValueError("Assignment not found.")
         return JSONResponse(content={"success": True, "message": "Scholarship assignment revoked."})
     except ValueError as e: return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"success": False, "message": str(e)})
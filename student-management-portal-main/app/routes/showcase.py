@@ -35,7 +35,7 @@ async def show_alumni_page(
     alumni_list = []
     try:
         # Fetch all alumni records (service loads student details)
-        alumni_list = alumni_service.get_all_alumni(db)
+        alumni_list = await database.run_db(db, alumni_service.get_all_alumni)
         # Optional: Further filtering? E.g., only show alumni with job info?
         # alumni_list = [a for a in alumni_list if a.current_job or a.current_employer]
     except Exception as e:
@@ -1,6 +1,6 @@
 # app/routes/student.py
 
-from fastapi import APIRouter, Depends, Request, Form, HTTPException, status, Query, Response 
+from fastapi import APIRouter, Depends, Request, Form, HTTPException, status, Query, Response, UploadFile, File
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
@@ -13,7 +13,8 @@ from app.services import auth_service, enrollment_service, department_service #
 
 # Local imports
 from app import database, models
-from app.services import auth_service, student_service # student_service needed here now
+from app.pagination import PageRequest
+from app.services import auth_service, password_service, student_service, student_import_service # student_service needed here now
 from app.models import UserRole, User, Student, Department # Import Department
 
 logger = logging.getLogger(__name__)
@@ -31,14 +32,26 @@ templates = Jinja2Templates(directory="app/templates")
 async def list_students_for_admin(
     request: Request,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth_service.get_current_active_admin) # Require admin
+    current_user: models.User = Depends(auth_service.get_current_active_admin), # Require admin
+    search: Optional[str] = Query(None),
+    department_id: Optional[int] = Query(None),
+    sort: Optional[str] = Query(None),
+    order: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None),
+    after: Optional[str] = Query(None), # Keyset cursors, see app/pagination.py
+    before: Optional[str] = Query(None),
 ):
-    students = student_service.get_all_students(db)
+    page = PageRequest.from_query(limit=limit, after=after, before=before, sort=sort, order=order)
+    students = await database.run_db(db, student_service.get_students_page, page, search=search, department_id=department_id)
+    departments = await database.run_db(db, department_service.get_all_departments) # For the filter dropdown
     context = {
         "request": request,
         "user": current_user,
         "UserRole": UserRole,
-        "students": students,
+        "students": students, # A Page: iterable, plus total and cursors (the pagination links keep the filters)
+        "current_search": search,
+        "departments": departments,
+        "current_department_id": department_id,
         "page_title": "Manage Students"
     }
     # Render the template from the admin section's perspective
@@ -53,7 +66,7 @@ async def add_student_form_for_admin(
     current_user: models.User = Depends(auth_service.get_current_active_admin) # Require admin
 ):
     default_pwd_display = os.getenv("DEFAULT_NEW_USER_PASSWORD", "12345")
-    departments = department_service.get_all_departments(db) # Fetch departments
+    departments = await database.run_db(db, department_service.get_all_departments) # Fetch departments
 
     context = {
         "request": request,
@@ -83,16 +96,17 @@ async def add_student_by_admin(
 ):
     default_password = os.getenv("DEFAULT_NEW_USER_PASSWORD", "12345")
     try:
-        new_student = student_service.create_student_with_user(
-            db=db, name=name, email=email, username=username, raw_password=default_password,
+        hashed_password = await password_service.hash_password_async(default_password) # On the hashing pool, not under run_db
+        new_student = await database.run_db(
+            db, student_service.create_student_with_user, name=name, email=email, username=username, hashed_password=hashed_password,
             dob=dob, phone=phone, address=address, department_id=department_id # Pass department_id
         )
-        logger.info(f"Admin {current_user.username} created student {new_student.id} (User: {new_student.user.username}, Dept: {department_id})")
+        logger.info(f"Admin {current_user.username} created student {new_student.id} (User: {username}, Dept: {department_id})")
         # Redirect to the student list
         return RedirectResponse(url=request.url_for('admin_manage_students_list'), status_code=status.HTTP_303_SEE_OTHER)
     except ValueError as e:
         logger.warning(f"Admin {current_user.username} failed to add student: {e}")
-        departments = department_service.get_all_departments(db) # Fetch departments for error page
+        departments = await database.run_db(db, department_service.get_all_departments) # Fetch departments for error page
         context = {
             "request": request, "user": current_user, "UserRole": UserRole, "student": None,
             "departments": departments, "page_title": "Add New Student", "error": str(e),
@@ -101,7 +115,7 @@ async def add_student_by_admin(
         return templates.TemplateResponse("admin/student_form.html", context, status_code=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         logger.error(f"Admin {current_user.username} encountered unexpected error adding student: {e}", exc_info=True)
-        departments = department_service.get_all_departments(db) # Fetch departments for error page
+        departments = await database.run_db(db, department_service.get_all_departments) # Fetch departments for error page
         context = {
             "request": request, "user": current_user, "UserRole": UserRole, "student": None,
             "departments": departments, "page_title": "Add New Student", "error": "An unexpected error occurred.",
@@ -110,6 +124,54 @@ async def add_student_by_admin(
         return templates.TemplateResponse("admin/student_form.html", context, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+# BULK IMPORT (Show Import Form)
+# Final URL: /admin/students/import
+@router.get("/import", response_class=HTMLResponse, name="admin_manage_students_import_form")
+async def import_students_form_for_admin(
+    request: Request,
+    current_user: models.User = Depends(auth_service.get_current_active_admin) # Require admin
+):
+    context = {
+        "request": request, "user": current_user, "UserRole": UserRole,
+        "page_title": "Import Students", "columns": student_import_service.COLUMNS,
+        "default_password_info": os.getenv("DEFAULT_NEW_USER_PASSWORD", "12345")
+    }
+    return templates.TemplateResponse("admin/student_import.html", context)
+
+# BULK IMPORT (Process CSV/XLSX Upload)
+# Final URL: /admin/students/import
+@router.post("/import", response_class=HTMLResponse, name="admin_manage_students_import")
+async def import_students_by_admin(
+    request: Request,
+    current_user: models.User = Depends(auth_service.get_current_active_admin), # Require admin
+    file: UploadFile = File(...),
+    dry_run: bool = Form(False)
+):
+    context = {
+        "request": request, "user": current_user, "UserRole": UserRole,
+        "page_title": "Import Students", "columns": student_import_service.COLUMNS,
+        "default_password_info": os.getenv("DEFAULT_NEW_USER_PASSWORD", "12345")
+    }
+    try:
+        # The upload is spooled to disk by Starlette; the service streams it chunk by chunk.
+        # Parsing and hashing block, so it runs in the threadpool on its own session (see run_blocking)
+        report = await database.run_blocking(
+            student_import_service.import_students, file.file, file.filename, dry_run=dry_run
+        )
+    except ValueError as e:
+        logger.warning(f"Admin {current_user.username} student import of '{file.filename}' rejected: {e}")
+        context["error"] = str(e)
+        return templates.TemplateResponse("admin/student_import.html", context, status_code=status.HTTP_400_BAD_REQUEST)
+    finally:
+        await file.close()
+    logger.info(
+        f"Admin {current_user.username} {'checked' if dry_run else 'imported'} '{file.filename}': "
+        f"{report['imported']}/{report['rows']} rows ok, {report['failed']} failed in {report['seconds']}s"
+    )
+    context["report"] = report
+    return templates.TemplateResponse("admin/student_import.html", context)
+
+
 # UPDATE (Show Edit Student Form)
 # Final URL: /admin/students/{student_id}/edit
 @router.get("/{student_id}/edit", response_class=HTMLResponse, name="admin_manage_student_edit_form")
@@ -119,10 +181,10 @@ async def edit_student_form_for_admin(
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(auth_service.get_current_active_admin) # Require admin
 ):
-    student = student_service.get_student_by_id_with_user(db, student_id=student_id)
+    student = await database.run_db(db, student_service.get_student_by_id_with_user, student_id=student_id)
     if not student:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Student not found")
-    departments = department_service.get_all_departments(db) # Fetch departments
+    departments = await database.run_db(db, department_service.get_all_departments) # Fetch departments
     context = {
         "request": request, "user": current_user, "UserRole": UserRole,
         "student": student, "departments": departments, # Add departments to context
@@ -145,7 +207,7 @@ async def edit_student_by_admin(
     address: Optional[str] = Form(None),
     department_id: Optional[int] = Form(None) # Add department_id form field
 ):
-    student_to_update = student_service.get_student_by_id_with_user(db, student_id=student_id)
+    student_to_update = await database.run_db(db, student_service.get_student_by_id_with_user, student_id=student_id)
     if not student_to_update:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Student not found")
 
@@ -154,14 +216,14 @@ async def edit_student_by_admin(
         "user_email": email, "department_id": department_id # Add department_id to update data
     }
     try:
-        updated_student = student_service.update_student_and_user(db=db, student_id=student_id, update_data=update_data)
+        updated_student = await database.run_db(db, student_service.update_student_and_user, student_id=student_id, update_data=update_data)
         logger.info(f"Admin {current_user.username} updated student {student_id} (Dept: {department_id})")
         return RedirectResponse(url=request.url_for('admin_manage_students_list'), status_code=status.HTTP_303_SEE_OTHER)
     except ValueError as e:
         logger.warning(f"Admin {current_user.username} failed to update student {student_id}: {e}")
-        departments = department_service.get_all_departments(db) # Fetch departments for error page
+        departments = await database.run_db(db, department_service.get_all_departments) # Fetch departments for error page
         # Re-fetch student in case some data was partially updated before error
-        student_for_form = student_service.get_student_by_id_with_user(db, student_id=student_id) or student_to_update
+        student_for_form = await database.run_db(db, student_service.get_student_by_id_with_user, student_id=student_id) or student_to_update
         context = {
             "request": request, "user": current_user, "UserRole": UserRole,
             "student": student_for_form, "departments": departments,
@@ -171,8 +233,8 @@ async def edit_student_by_admin(
         return templates.TemplateResponse("admin/student_form.html", context, status_code=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         logger.error(f"Admin {current_user.username} encountered unexpected error updating student {student_id}: {e}", exc_info=True)
-        departments = department_service.get_all_departments(db) # Fetch departments for error page
-        student_for_form = student_service.get_student_by_id_with_user(db, student_id=student_id) or student_to_update
+        departments = await database.run_db(db, department_service.get_all_departments) # Fetch departments for error page
+        student_for_form = await database.run_db(db, student_service.get_student_by_id_with_user, student_id=student_id) or student_to_update
         context = {
             "request": request, "user": current_user, "UserRole": UserRole,
             "student": student_for_form, "departments": departments,
@@ -190,7 +252,7 @@ async def delete_student_by_admin(
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(auth_service.get_current_active_admin) # Require admin
 ):
-    success = student_service.delete_student_and_user(db=db, student_id=student_id)
+    success = await database.run_db(db, student_service.delete_student_and_user, student_id=student_id)
     if not success:
         logger.warning(f"Admin {current_user.username} attempted delete non-existent student {student_id}")
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Student not found or could not be deleted")
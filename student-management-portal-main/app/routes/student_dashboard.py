@@ -1,5 +1,6 @@
-from fastapi import APIRouter, Depends, Request, Form, HTTPException, status, Query, Response 
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import APIRouter, Body, Depends, Request, Form, HTTPException, status, Query, Response 
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from starlette.concurrency import run_in_threadpool
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session, joinedload
 from typing import Optional, Dict
@@ -14,7 +15,8 @@ from sqlalchemy import func
 from app import database, models
 from app.services import auth_service, student_service # student_service needed here now
 from app.models import UserRole, User, Student
-from app.services import attendance_service, library_service # Make sure attendance_service is imported
+from app.services import attendance_service, library_service, schedule_service # Make sure attendance_service is imported
+from app.services import dashboard_service
 
 
 logger = logging.getLogger(__name__)
@@ -39,63 +41,14 @@ async def get_student_dashboard(
         "enrolled_courses_count": 0,
         "attendance_percentage": None, # Initialize as None
         "overall_gpa": None, # Initialize as None
-        "upcoming_assignments_count": 0, # Placeholder
-        "pending_fees_count": 0 # Placeholder
+        "upcoming_exams_count": 0,
+        "pending_fees_count": 0
     }
 
     if student_profile:
         try:
-            # 1. Count Enrolled Courses
-            dashboard_data["enrolled_courses_count"] = db.query(func.count(models.Enrollment.id)).filter(
-                models.Enrollment.student_id == student_profile.id
-            ).scalar() or 0
-
-            # 2. Calculate Attendance Percentage (Example: Overall)
-            total_attendance_records = db.query(func.count(models.Attendance.id)).filter(
-                models.Attendance.student_id == student_profile.id
-            ).scalar() or 0
-
-            if total_attendance_records > 0:
-                present_count = db.query(func.count(models.Attendance.id)).filter(
-                    models.Attendance.student_id == student_profile.id,
-                    models.Attendance.status == models.AttendanceStatus.PRESENT # Use Enum value
-                ).scalar() or 0
-                # Calculate percentage, handle division by zero
-                dashboard_data["attendance_percentage"] = round((present_count / total_attendance_records) * 100, 1) if total_attendance_records > 0 else 0.0
-            else:
-                 dashboard_data["attendance_percentage"] = 100.0 # Or None/N/A if no records yet
-
-
-            # 3. Calculate Overall GPA (Simplified Example - NEEDS proper grade point logic)
-            # This is highly dependent on how grades/credits map to points.
-            # Assuming Grade model has 'grade' (A, B, C..) and Course has 'credits'
-            # grades_with_credits = db.query(models.Grade.grade, models.Course.credits)\
-            #     .join(models.Course, models.Grade.course_id == models.Course.id)\
-            #     .filter(models.Grade.student_id == student_profile.id)\
-            #     .filter(models.Grade.grade.isnot(None))\
-            #     .filter(models.Course.credits.isnot(None))\
-            #     .all()
-
-            # if grades_with_credits:
-            #     total_points = 0
-            #     total_credits = 0
-            #     grade_point_map = {'A': 4.0, 'B': 3.0, 'C': 2.0, 'D': 1.0, 'F': 0.0} # Example map
-            #     for grade, credits in grades_with_credits:
-            #         points = grade_point_map.get(grade.upper(), 0.0) # Default to 0 if grade not in map
-            #         if credits > 0: # Only count courses with credits
-            #             total_points += points * credits
-            #             total_credits += credits
-            #     dashboard_data["overall_gpa"] = round(total_points / total_credits, 2) if total_credits > 0 else 0.0
-
-            # 4. Count Pending Fees (Example)
-            dashboard_data["pending_fees_count"] = db.query(func.count(models.FeePayment.id)).filter(
-                models.FeePayment.student_id == student_profile.id,
-                models.FeePayment.status.in_([models.PaymentStatus.PENDING, models.PaymentStatus.OVERDUE, models.PaymentStatus.PENDING]) # Example pending states
-            ).scalar() or 0
-
-            # 5. Upcoming Assignments/Exams (Placeholder - would require Exam/Assignment model with due dates)
-            # dashboard_data["upcoming_assignments_count"] = ... query exams/assignments ...
-
+            # All KPIs in one query (or the cached snapshot), see dashboard_service
+            dashboard_data.update(await database.run_db(db, dashboard_service.get_dashboard_summary, student_profile.id))
         except Exception as e:
             logger.error(f"Error fetching dashboard summary data for student {student_profile.id}: {e}", exc_info=True)
             toast_error = "Could not load all dashboard summary data."
@@ -125,7 +78,8 @@ async def get_student_enrollment_page(
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(auth_service.get_current_active_student),
     toast_error: Optional[str] = Query(None),
-    toast_success: Optional[str] = Query(None)
+    toast_success: Optional[str] = Query(None),
+    hide_clashes: bool = Query(False) # Only list courses that fit the student's timetable
 ):
     """Displays the page for managing course enrollments."""
     logger.info(f"Accessing enrollment page for user: {current_user.username}")
@@ -133,10 +87,19 @@ async def get_student_enrollment_page(
     student_profile = current_user.student_profile
     current_enrollments = []
     available_courses = []
+    clashes = {}
+    waitlist = []
     if student_profile:
         try:
-            current_enrollments = enrollment_service.get_enrollments_for_student(db, student_profile.id)
-            available_courses = enrollment_service.get_available_courses_for_student(db, student_profile.id)
+            current_enrollments = await database.run_db(db, enrollment_service.get_enrollments_for_student, student_profile.id)
+            waitlist = await database.run_db(db, enrollment_service.get_waitlist_for_student, student_profile.id)
+            available_courses = await database.run_db(
+                db, enrollment_service.get_available_courses_for_student, student_profile.id, exclude_clashes=hide_clashes
+            )
+            if not hide_clashes:
+                clashes = await database.run_db(
+                    db, enrollment_service.get_course_clashes_for_student, student_profile.id, [c.id for c in available_courses]
+                )
         except Exception as e:
             logger.error(f"Error fetching enrollment data for student {student_profile.id}: {e}", exc_info=True)
             # Pass error message to be displayed on the page?
@@ -154,6 +117,9 @@ async def get_student_enrollment_page(
         "page_title": "My Enrollments", # Page specific title
         "current_enrollments": current_enrollments,
         "available_courses": available_courses,
+        "clashes": clashes, # course_id -> clash description
+        "waitlist": waitlist, # [{"course", "position"}]
+        "hide_clashes": hide_clashes,
         "toast_error": toast_error, # Pass messages
         "toast_success": toast_success
     }
@@ -174,15 +140,28 @@ async def handle_student_enroll(
     if not current_user.student_profile: # Check profile
          toast_msg = urllib.parse.quote("Cannot enroll: Student profile not found.")
          return RedirectResponse(f"{redirect_url}?toast_error={toast_msg}", status.HTTP_303_SEE_OTHER)
+    student_id = current_user.student_profile.id # Read once: later service calls may expire current_user
     try:
-        enrollment = enrollment_service.create_enrollment(db, student_id=current_user.student_profile.id, course_id=course_id)
+        enrollment = await database.run_db(db, enrollment_service.create_enrollment, student_id=student_id, course_id=course_id)
         toast_msg = urllib.parse.quote(f"Successfully enrolled.")
         return RedirectResponse(f"{redirect_url}?toast_success={toast_msg}", status.HTTP_303_SEE_OTHER)
+    except enrollment_service.CourseFullError as e:
+        # Full: queue the student instead
+        try:
+            position = await database.run_db(db, enrollment_service.join_waitlist, student_id=student_id, course_id=course_id)
+        except ValueError as waitlist_error:
+            toast_msg = urllib.parse.quote(f"Enrollment failed: {waitlist_error}")
+            return RedirectResponse(f"{redirect_url}?toast_error={toast_msg}", status.HTTP_303_SEE_OTHER)
+        if position == 0:
+            toast_msg = urllib.parse.quote("Successfully enrolled.")
+            return RedirectResponse(f"{redirect_url}?toast_success={toast_msg}", status.HTTP_303_SEE_OTHER)
+        toast_msg = urllib.parse.quote(f"{e} You are #{position} on the waitlist and will be enrolled when a seat frees up.")
+        return RedirectResponse(f"{redirect_url}?toast_success={toast_msg}", status.HTTP_303_SEE_OTHER)
     except ValueError as e:
         toast_msg = urllib.parse.quote(f"Enrollment failed: {e}")
         return RedirectResponse(f"{redirect_url}?toast_error={toast_msg}", status.HTTP_303_SEE_OTHER)
     except Exception as e:
-        logger.error(f"Enrollment error: StudID {current_user.student_profile.id}, CourseID {course_id}: {e}", exc_info=True)
+        logger.error(f"Enrollment error: StudID {student_id}, CourseID {course_id}: {e}", exc_info=True)
         toast_msg = urllib.parse.quote("An unexpected error occurred.")
         return RedirectResponse(f"{redirect_url}?toast_error={toast_msg}", status.HTTP_303_SEE_OTHER)
 
@@ -200,7 +179,7 @@ async def handle_student_unenroll(
          toast_msg = urllib.parse.quote("Cannot unenroll: Student profile not found.")
          return RedirectResponse(f"{redirect_url}?toast_error={toast_msg}", status.HTTP_303_SEE_OTHER)
     try:
-        success = enrollment_service.delete_enrollment(db, enrollment_id=enrollment_id, student_id=current_user.student_profile.id)
+        success = await database.run_db(db, enrollment_service.delete_enrollment, enrollment_id=enrollment_id, student_id=current_user.student_profile.id)
         if not success: raise ValueError("Enrollment not found or permission denied.")
         toast_msg = urllib.parse.quote("Successfully unenrolled from course.")
         return RedirectResponse(f"{redirect_url}?toast_success={toast_msg}", status.HTTP_303_SEE_OTHER)
@@ -212,6 +191,25 @@ async def handle_student_unenroll(
         toast_msg = urllib.parse.quote("An unexpected error occurred.")
         return RedirectResponse(f"{redirect_url}?toast_error={toast_msg}", status.HTTP_303_SEE_OTHER)
 
+# === Leave Waitlist Route ===
+@router.post("/waitlist/{course_id}/leave", response_class=RedirectResponse, name="student_leave_waitlist")
+async def handle_student_leave_waitlist(
+    request: Request, course_id: int, db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth_service.get_current_active_student),
+):
+    redirect_url = request.url_for('student_enrollments_page')
+    if not current_user.student_profile:
+         toast_msg = urllib.parse.quote("Student profile not found.")
+         return RedirectResponse(f"{redirect_url}?toast_error={toast_msg}", status.HTTP_303_SEE_OTHER)
+    try:
+        left = await database.run_db(db, enrollment_service.leave_waitlist, student_id=current_user.student_profile.id, course_id=course_id)
+        if not left: raise ValueError("You are not on this course's waitlist.")
+        toast_msg = urllib.parse.quote("Removed from the waitlist.")
+        return RedirectResponse(f"{redirect_url}?toast_success={toast_msg}", status.HTTP_303_SEE_OTHER)
+    except ValueError as e:
+        toast_msg = urllib.parse.quote(f"Could not leave the waitlist: {e}")
+        return RedirectResponse(f"{redirect_url}?toast_error={toast_msg}", status.HTTP_303_SEE_OTHER)
+
 @router.get("/my-schedule", response_class=HTMLResponse, name="student_schedule_page")
 async def get_student_schedule_page(
     request: Request,
@@ -228,18 +226,14 @@ async def get_student_schedule_page(
     if student_profile:
         try:
             # Fetch enrollments first to know which courses the student takes
-            enrollments = enrollment_service.get_enrollments_for_student(db, student_profile.id)
+            enrollments = await database.run_db(db, enrollment_service.get_enrollments_for_student, student_profile.id)
             enrolled_course_ids = [e.course_id for e in enrollments]
 
             if enrolled_course_ids:
                 # Fetch schedule entries ONLY for the courses the student is enrolled in
-                student_schedule_entries = db.query(models.Schedule).options(
-                    joinedload(models.Schedule.course),
-                    joinedload(models.Schedule.instructor), # No need for instructor.user here? Optional.
-                    joinedload(models.Schedule.classroom)
-                ).filter(
-                    models.Schedule.course_id.in_(enrolled_course_ids) # Filter by enrolled courses
-                ).order_by(models.Schedule.day_of_week, models.Schedule.start_time).all()
+                student_schedule_entries = await database.run_db(
+                    db, schedule_service.get_schedules_for_courses, enrolled_course_ids
+                )
 
         except Exception as e:
             logger.error(f"Error fetching schedule data for student {student_profile.id}: {e}", exc_info=True)
@@ -291,22 +285,30 @@ async def get_student_attendance_page(
 
     student_profile = current_user.student_profile
     attendance_records = []
+    attendance_summary = [] # Per-course percentages from the monthly rollup
     courses_enrolled = [] # For filter dropdown
 
     if student_profile:
         try:
             # Fetch enrolled courses for the filter dropdown
-            enrollments = enrollment_service.get_enrollments_for_student(db, student_profile.id)
+            enrollments = await database.run_db(db, enrollment_service.get_enrollments_for_student, student_profile.id)
             courses_enrolled = sorted([e.course for e in enrollments if e.course], key=lambda c: c.name)
 
             # Fetch attendance records using the service function with filters
-            attendance_records = attendance_service.get_attendance_for_student(
-                db,
+            attendance_records = await database.run_db(
+                db, attendance_service.get_attendance_for_student,
                 student_id=student_profile.id,
                 course_id=filter_course_id, # Use filter_course_id
                 start_date=filter_start_date,
                 end_date=filter_end_date
             )
+            attendance_summary = await database.run_db(
+                db, attendance_service.get_attendance_summary_for_student,
+                student_id=student_profile.id,
+                course_id=filter_course_id,
+                start_date=filter_start_date,
+                end_date=filter_end_date
+            )
 
         except Exception as e:
             logger.error(f"Error fetching attendance data for student {student_profile.id}: {e}", exc_info=True)
@@ -323,6 +325,7 @@ async def get_student_attendance_page(
         "UserRole": UserRole, # Needed for layout
         "page_title": "My Attendance Report", # Page specific title
         "attendance_records": attendance_records,
+        "attendance_summary": attendance_summary,
         "courses_enrolled": courses_enrolled, # For filter dropdown
         # Pass current filter values back to template to populate form
         "current_filter_course_id": filter_course_id,
@@ -337,6 +340,8 @@ async def get_student_attendance_page(
 from app.services import exam_service
 
 from app.services import result_service # Import result service
+from app.services import submission_queue_service
+from app.services import attempt_service
 
 
 @router.get("/exams/{exam_id}/attempt", response_class=HTMLResponse, name="student_attempt_exam")
@@ -350,22 +355,35 @@ async def attempt_exam_page(
     if not student_profile: raise HTTPException(403, "Student profile required.")
 
     # 1. Check if exam exists, is published, and student is enrolled
-    exam = exam_service.get_published_exam_details_for_student(db, exam_id, student_profile.id)
+    exam = await database.run_db(db, exam_service.get_published_exam_details_for_student, exam_id, student_profile.id)
     if not exam:
         raise HTTPException(status_code=404, detail="Exam not found, not published, or you are not enrolled in the course.")
 
     # 2. Check if already submitted
     # Note: Allow viewing even if submitted? Or redirect to results? Let's prevent re-attempt for now.
-    if exam_service.check_exam_attempt_exists(db, exam_id, student_profile.id):
+    if await database.run_db(db, exam_service.check_exam_attempt_exists, exam_id, student_profile.id):
         logger.warning(f"Student {student_profile.id} attempted to re-access exam {exam_id} already submitted.")
         # Redirect to results page or dashboard with error?
         redirect_url = request.url_for('student_exams_page')
         toast_msg = urllib.parse.quote("You have already submitted this exam.")
         # Using 303 See Other to indicate the resource state has changed (already submitted)
         return RedirectResponse(f"{redirect_url}?toast_error={toast_msg}", status_code=status.HTTP_303_SEE_OTHER)
+    # Submitted but still waiting in the submission queue
+    if await run_in_threadpool(submission_queue_service.has_pending_submission, exam_id, student_profile.id):
+        redirect_url = request.url_for('student_exams_page')
+        toast_msg = urllib.parse.quote("Your submission for this exam is being processed.")
+        return RedirectResponse(f"{redirect_url}?toast_error={toast_msg}", status_code=status.HTTP_303_SEE_OTHER)
 
     # 3. Fetch questions prepared for student (no correct answers)
-    questions = exam_service.get_exam_questions_for_student(db, exam_id)
+    questions = await database.run_db(db, exam_service.get_exam_questions_for_student, exam_id)
+
+    # 4. Open (or resume) the attempt; answers autosaved so far are pre-selected
+    try:
+        _, saved_answers = await database.run_db(db, attempt_service.start_attempt, exam_id, student_profile.id)
+    except ValueError as e:
+        redirect_url = request.url_for('student_exams_page')
+        toast_msg = urllib.parse.quote(str(e))
+        return RedirectResponse(f"{redirect_url}?toast_error={toast_msg}", status_code=status.HTTP_303_SEE_OTHER)
 
     context = {
         "request": request,
@@ -373,12 +391,38 @@ async def attempt_exam_page(
         "UserRole": UserRole, # For layout
         "exam": exam,
         "questions": questions,
+        "saved_answers": saved_answers, # {question_id: option_id}
         "page_title": f"Attempt: {exam.name}",
     }
     # Create app/templates/student/attempt_exam.html
     return templates.TemplateResponse("student/attempt_exam.html", context)
 
 
+# POST: Autosave answers of the open attempt (JSON {"answers": {question_id: option_id}})
+@router.post("/exams/{exam_id}/autosave", response_class=JSONResponse, name="student_autosave_exam")
+async def autosave_exam_answers(
+    exam_id: int,
+    payload: Dict = Body(...),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth_service.get_current_active_student),
+):
+    student_profile = current_user.student_profile
+    if not student_profile: raise HTTPException(403, "Student profile required.")
+
+    try:
+        answers = {int(question_id): int(option_id) for question_id, option_id in (payload.get("answers") or {}).items()}
+    except (AttributeError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="answers must map question ids to option ids.")
+    if not answers:
+        return JSONResponse({"status": "ok", "pending": 0})
+
+    try:
+        pending = await database.run_db(db, attempt_service.save_answers, exam_id, student_profile.id, answers)
+    except ValueError as e:
+        return JSONResponse({"status": "error", "detail": str(e)}, status_code=status.HTTP_409_CONFLICT)
+    return JSONResponse({"status": "ok", "pending": pending})
+
+
 # POST: Submit Exam Answers
 @router.post("/exams/{exam_id}/submit", response_class=RedirectResponse, name="student_submit_exam")
 async def submit_exam_answers(
@@ -395,34 +439,49 @@ async def submit_exam_answers(
 
     # --- Permission/Pre-check ---
     # Check if exam exists, is published, and student is enrolled (redundant? Service does it too)
-    exam = exam_service.get_published_exam_details_for_student(db, exam_id, student_profile.id)
+    exam = await database.run_db(db, exam_service.get_published_exam_details_for_student, exam_id, student_profile.id)
     if not exam:
          toast_msg = urllib.parse.quote("Exam not found or access denied.")
          return RedirectResponse(f"{redirect_url}?toast_error={toast_msg}", status.HTTP_303_SEE_OTHER)
      # Check if already submitted (Service will raise error too, but good to check early)
-    if exam_service.check_exam_attempt_exists(db, exam_id, student_profile.id):
+    if await database.run_db(db, exam_service.check_exam_attempt_exists, exam_id, student_profile.id):
         toast_msg = urllib.parse.quote("Exam already submitted.")
         return RedirectResponse(f"{redirect_url}?toast_error={toast_msg}", status.HTTP_303_SEE_OTHER)
 
     # --- Process Form Data ---
     form_data = await request.form()
-    submitted_answers: Dict[int, str] = {} # {question_id: selected_option_text}
+    submitted_answers: Dict[int, int] = {} # {question_id: selected option id}
 
     for key, value in form_data.items():
         if key.startswith("q_answer_"): # Name convention for radio groups per question
              try:
                  question_id = int(key.split("_")[-1])
-                 selected_option_text = value # Value of the radio is the option text
-                 submitted_answers[question_id] = selected_option_text
+                 submitted_answers[question_id] = int(value) # Value of the radio is the option id
              except (ValueError, IndexError):
                  logger.warning(f"Could not parse answer form key: {key}")
 
     logger.debug(f"Student {student_profile.id} submitting answers for exam {exam_id}: {submitted_answers}")
 
+    # --- Queued path: acknowledge once the answers are durable, grade in the background ---
+    if submission_queue_service.is_enabled():
+        try:
+            entry, created = await run_in_threadpool(
+                submission_queue_service.enqueue_submission, exam_id, student_profile.id, submitted_answers
+            )
+        except Exception as e:
+            logger.error(f"Could not queue submission of exam {exam_id} for student {student_profile.id}: {e}", exc_info=True)
+            toast_msg = urllib.parse.quote("An unexpected error occurred during submission.")
+            return RedirectResponse(f"{redirect_url}?toast_error={toast_msg}", status.HTTP_303_SEE_OTHER)
+        if created:
+            toast_msg = urllib.parse.quote("Exam submitted successfully! Your score will appear once grading finishes.")
+        else:
+            toast_msg = urllib.parse.quote(f"This exam was already submitted (status: {entry['status']}).")
+        return RedirectResponse(f"{redirect_url}?toast_success={toast_msg}", status.HTTP_303_SEE_OTHER)
+
     # --- Call Result Service ---
     try:
-        result = result_service.record_exam_submission(
-            db=db,
+        result = await database.run_db(
+            db, result_service.record_exam_submission,
             exam_id=exam_id,
             student_id=student_profile.id,
             submitted_answers=submitted_answers
@@ -439,6 +498,28 @@ async def submit_exam_answers(
         toast_msg = urllib.parse.quote("An unexpected error occurred during submission.")
         return RedirectResponse(f"{redirect_url}?toast_error={toast_msg}", status.HTTP_303_SEE_OTHER)
 
+# GET: Status of a (possibly queued) submission, for polling from the exams page
+@router.get("/exams/{exam_id}/submission-status", response_class=JSONResponse, name="student_exam_submission_status")
+async def get_exam_submission_status(
+    exam_id: int,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth_service.get_current_active_student),
+):
+    student_profile = current_user.student_profile
+    if not student_profile: raise HTTPException(403, "Student profile required.")
+
+    entry = None
+    if submission_queue_service.is_enabled():
+        entry = await run_in_threadpool(submission_queue_service.get_submission_status, exam_id, student_profile.id)
+    if entry and entry["status"] != submission_queue_service.DONE:
+        return JSONResponse({"exam_id": exam_id, "status": entry["status"], "error": entry["error"]})
+
+    # Graded (or submitted without the queue): the result row is authoritative
+    result = await database.run_db(db, result_service.get_result_by_exam_and_student, exam_id, student_profile.id)
+    if result and result.submitted_at:
+        return JSONResponse({"exam_id": exam_id, "status": "done", "result_id": result.id, "score": result.score})
+    return JSONResponse({"exam_id": exam_id, "status": "not_submitted"})
+
 from app.models import Result
 from fastapi.responses import JSONResponse
 
@@ -453,22 +534,27 @@ async def get_student_exams_page(
     student_profile = current_user.student_profile
     published_exams = []
     results_map = {} # Map exam_id -> Result object
+    pending_exam_ids = set() # Submitted, still in the submission queue
     error_message = None
     if student_profile:
         try:
             # Fetch published exams for student's courses
-            published_exams = exam_service.get_published_exams_for_student_courses(db, student_profile.id)
+            published_exams = await database.run_db(db, exam_service.get_published_exams_for_student_courses, student_profile.id)
 
             # --- ADDED: Fetch existing results for these exams ---
             if published_exams:
                 exam_ids = [exam.id for exam in published_exams]
-                existing_results = db.query(Result).filter(
-                    Result.student_id == student_profile.id,
-                    Result.exam_id.in_(exam_ids)
-                ).all()
-                # Create map for easy lookup in template: {exam_id: result_object}
-                results_map = {result.exam_id: result for result in existing_results}
+                # Map for easy lookup in template: {exam_id: result_object}
+                results_map = await database.run_db(
+                    db, result_service.get_results_for_student_exams, student_profile.id, exam_ids
+                )
                 logger.debug(f"Found {len(results_map)} existing results for student {student_profile.id}")
+                if submission_queue_service.is_enabled():
+                    pending_exam_ids = {
+                        exam_id for exam_id in exam_ids
+                        if (exam_id not in results_map or not results_map[exam_id].submitted_at) # Not submitted as far as the DB knows
+                        and await run_in_threadpool(submission_queue_service.has_pending_submission, exam_id, student_profile.id)
+                    }
             # --- END ADDED ---
             
 
@@ -488,6 +574,7 @@ async def get_student_exams_page(
         "page_title": "My Exams & Assignments",
         "published_exams": published_exams,
         "results_map": results_map, # <<<< PASS THE RESULTS MAP
+        "pending_exam_ids": pending_exam_ids,
         "error_message": error_message
     }
     return templates.TemplateResponse("student/my_exams.html", context)
@@ -507,7 +594,7 @@ async def view_exam_result_page(
     if not student_profile: raise HTTPException(403, "Student profile required.")
 
     # Fetch result details including answers and related question/exam info
-    result_details = result_service.get_result_details_with_answers(db, result_id, student_profile.id)
+    result_details = await database.run_db(db, result_service.get_result_details_with_answers, result_id, student_profile.id)
 
     if not result_details:
         raise HTTPException(status_code=404, detail="Result not found or you do not have permission to view it.")
@@ -537,7 +624,7 @@ async def get_student_fees_page(
     if student_profile:
         try:
             # Get all fee records for this student
-            fee_records = fee_service.get_all_fee_payments(db, student_id=student_profile.id)
+            fee_records = await database.run_db(db, fee_service.get_all_fee_payments, student_id=student_profile.id)
         except Exception as e:
             logger.error(f"Error fetching fees for student {student_profile.id}: {e}")
             toast_error = "Could not load fee information."
@@ -568,7 +655,7 @@ async def handle_student_fee_payment(
         return RedirectResponse(f"{redirect_url}?toast_error={toast_msg}", status.HTTP_303_SEE_OTHER)
 
     try:
-        paid_fee = fee_service.record_student_payment(db, payment_id, student_profile.id)
+        paid_fee = await database.run_db(db, fee_service.record_student_payment, payment_id, student_profile.id)
         if not paid_fee:
             # This case is handled by ValueError in service usually, but good check
             raise ValueError("Fee record not found or payment failed.")
@@ -600,7 +687,7 @@ async def get_student_library_page(
     if student_profile:
         try:
             # Fetch records only for this student
-            library_records = library_service.get_all_library_records(db, student_id=student_profile.id)
+            library_records = await database.run_db(db, library_service.get_all_library_records, student_id=student_profile.id)
         except Exception as e:
             logger.error(f"Error fetching library records for student {student_profile.id}: {e}", exc_info=True)
             error_message = "Could not load your library records."
@@ -647,7 +734,7 @@ async def get_student_profile_page(
     if student_profile:
         try:
             # Fetch associated guardians using the service
-            guardians = guardian_service.get_guardians_for_student(db, student_id=student_profile.id)
+            guardians = await database.run_db(db, guardian_service.get_guardians_for_student, student_id=student_profile.id)
         except Exception as e:
             logger.error(f"Error fetching guardians for student {student_profile.id}: {e}", exc_info=True)
             error_message = "Could not load guardian information."
@@ -692,7 +779,7 @@ async def handle_student_profile_update(
         # Add phone/address if implemented
         # update_data['phone'] = phone ...
 
-        updated_profile = student_service.update_student_profile(db, student_profile.id, update_data)
+        updated_profile = await database.run_db(db, student_service.update_student_profile, student_profile.id, update_data)
         # No need to check return value if service raises error on failure
 
         toast_msg = urllib.parse.quote("Profile details updated successfully.")
@@ -726,8 +813,8 @@ async def handle_student_add_guardian(
         return RedirectResponse(f"{redirect_url}?toast_error={toast_msg}", status.HTTP_303_SEE_OTHER)
 
     try:
-        new_guardian = guardian_service.add_guardian_for_student(
-            db, student_id=student_profile.id, name=g_name, relationship_type=g_relationship,
+        new_guardian = await database.run_db(
+            db, guardian_service.add_guardian_for_student, student_id=student_profile.id, name=g_name, relationship_type=g_relationship,
             phone=g_phone, email=g_email, address=g_address
         )
         toast_msg = urllib.parse.quote(f"Guardian '{new_guardian.name}' added.")
@@ -767,7 +854,7 @@ async def handle_student_edit_guardian(
     }
     try:
         # Service function includes check that guardian belongs to student
-        updated_guardian = guardian_service.update_guardian(db, guardian_id, student_profile.id, update_data)
+        updated_guardian = await database.run_db(db, guardian_service.update_guardian, guardian_id, student_profile.id, update_data)
         if updated_guardian is None: raise ValueError("Guardian not found or permission denied.")
 
         toast_msg = urllib.parse.quote(f"Guardian '{updated_guardian.name}' updated.")
@@ -794,7 +881,7 @@ async def handle_student_delete_guardian(
 
     try:
         # Service includes check that guardian belongs to student
-        success = guardian_service.delete_guardian(db, guardian_id, student_profile.id)
+        success = await database.run_db(db, guardian_service.delete_guardian, guardian_id, student_profile.id)
         if not success: raise ValueError("Guardian not found or permission denied.")
         return JSONResponse(content={"success": True, "message": "Guardian deleted."})
     except ValueError as e:
@@ -829,9 +916,9 @@ async def get_student_clubs_page(
     if student_profile:
         try:
             # Fetch clubs student has joined (includes Club details via relationship)
-            joined_clubs_data = club_service.get_clubs_joined_by_student(db, student_profile.id)
+            joined_clubs_data = await database.run_db(db, club_service.get_clubs_joined_by_student, student_profile.id)
             # Fetch clubs student has NOT joined
-            available_clubs = club_service.get_clubs_not_joined_by_student(db, student_profile.id)
+            available_clubs = await database.run_db(db, club_service.get_clubs_not_joined_by_student, student_profile.id)
         except Exception as e:
             logger.error(f"Error fetching club data for student {student_profile.id}: {e}", exc_info=True)
             error_message = "Could not load club information."
@@ -866,7 +953,7 @@ async def handle_student_join_club(
         return RedirectResponse(f"{redirect_url}?toast_error={toast_msg}", status.HTTP_303_SEE_OTHER)
 
     try:
-        membership = club_service.student_join_club(db, student_profile.id, club_id)
+        membership = await database.run_db(db, club_service.student_join_club, student_profile.id, club_id)
         toast_msg = urllib.parse.quote(f"Successfully joined club!") # Add club name if needed
         return RedirectResponse(f"{redirect_url}?toast_success={toast_msg}", status.HTTP_303_SEE_OTHER)
     except ValueError as e:
@@ -893,7 +980,7 @@ async def handle_student_leave_club(
         return RedirectResponse(f"{redirect_url}?toast_error={toast_msg}", status.HTTP_303_SEE_OTHER)
 
     try:
-        success = club_service.student_leave_club(db, student_profile.id, club_id)
+        success = await database.run_db(db, club_service.student_leave_club, student_profile.id, club_id)
         if not success:
             # This could mean they weren't a member, which isn't strictly an error here
             toast_msg = urllib.parse.quote("You were not a member of that club.")
@@ -935,7 +1022,7 @@ async def get_student_complaints_page(
 
     if student_profile:
         try:
-            complaints = complaint_service.get_complaints_for_student(db, student_id=student_profile.id)
+            complaints = await database.run_db(db, complaint_service.get_complaints_for_student, student_id=student_profile.id)
         except Exception as e:
             logger.error(f"Error fetching complaints for student {student_profile.id}: {e}", exc_info=True)
             error_message = "Could not load your complaints."
@@ -971,7 +1058,7 @@ async def handle_student_add_complaint(
         return RedirectResponse(f"{redirect_url}?toast_error={toast_msg}", status.HTTP_303_SEE_OTHER)
 
     try:
-        new_complaint = complaint_service.create_complaint(db, student_profile.id, description)
+        new_complaint = await database.run_db(db, complaint_service.create_complaint, student_profile.id, description)
         toast_msg = urllib.parse.quote("Your complaint has been submitted successfully.")
         return RedirectResponse(f"{redirect_url}?toast_success={toast_msg}", status.HTTP_303_SEE_OTHER)
     except ValueError as e:
@@ -1000,7 +1087,7 @@ async def handle_student_edit_complaint(
         return RedirectResponse(f"{redirect_url}?toast_error={toast_msg}", status.HTTP_303_SEE_OTHER)
 
     try:
-        updated_complaint = complaint_service.update_student_complaint(db, complaint_id, student_profile.id, description)
+        updated_complaint = await database.run_db(db, complaint_service.update_student_complaint, complaint_id, student_profile.id, description)
         if updated_complaint is None: raise ValueError("Complaint not found or permission denied.")
 
         toast_msg = urllib.parse.quote("Complaint description updated successfully.")
@@ -1026,7 +1113,7 @@ async def handle_student_delete_complaint(
         return JSONResponse(status_code=403, content={"success": False, "message": "Profile needed."})
 
     try:
-        success = complaint_service.delete_student_complaint(db, complaint_id, student_profile.id)
+        success = await database.run_db(db, complaint_service.delete_student_complaint, complaint_id, student_profile.id)
         if not success: raise ValueError("Complaint not found or permission denied.")
         return JSONResponse(content={"success": True, "message": "Complaint deleted."})
     except ValueError as e:
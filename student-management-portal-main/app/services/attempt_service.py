@@ -0,0 +1,279 @@
+# app/services/attempt_service.py
+"""
+Exam attempt sessions and answer autosave.
+
+Opening an exam creates (or resumes) the student's Result row with submitted_at NULL. Each
+answer change is posted to the autosave endpoint and only recorded in memory; repeated
+changes to the same question overwrite each other. A background thread flushes the buffer
+every EXAM_AUTOSAVE_FLUSH_SECONDS as one upsert of MCQAnswer rows (option chosen, not yet
+graded), so the write load is spread over the exam window. result_service.
+record_exam_submission then grades the saved answers in place instead of rewriting them.
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, lazyload
+
+from app import database, models
+from app.database import SessionLocal
+from app.services import exam_service
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+# 0 disables the background flusher (answers are then only written on submit/shutdown)
+EXAM_AUTOSAVE_FLUSH_SECONDS = float(os.getenv("EXAM_AUTOSAVE_FLUSH_SECONDS", 5))
+EXAM_AUTOSAVE_MAX_SESSIONS = int(os.getenv("EXAM_AUTOSAVE_MAX_SESSIONS", 20000))
+FLUSH_BATCH_SIZE = 1000
+
+
+class AutosaveBuffer:
+    """Thread-safe map of open attempts and their not-yet-written answers."""
+
+    def __init__(self, max_sessions: int):
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[Tuple[int, int], int]" = OrderedDict() # (exam_id, student_id) -> result_id
+        self._pending: Dict[int, Dict[int, int]] = {} # result_id -> {question_id: option_id}
+        self._lock = threading.Lock()
+        # Metrics
+        self.saves = 0
+        self.coalesced = 0 # Answers overwritten before they were written
+        self.flushes = 0
+        self.rows_written = 0
+        self.flush_errors = 0
+
+    def register(self, exam_id: int, student_id: int, result_id: int):
+        with self._lock:
+            self._sessions[(exam_id, student_id)] = result_id
+            self._sessions.move_to_end((exam_id, student_id))
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False) # Looked up from the database again if still open
+
+    def result_id_for(self, exam_id: int, student_id: int) -> Optional[int]:
+        with self._lock:
+            return self._sessions.get((exam_id, student_id))
+
+    def record(self, result_id: int, answers: Dict[int, int]) -> int:
+        """Merges answers into the result's pending set; returns how many are waiting to be written."""
+        with self._lock:
+            pending = self._pending.setdefault(result_id, {})
+            self.saves += 1
+            self.coalesced += sum(1 for question_id in answers if question_id in pending)
+            pending.update(answers)
+            return len(pending)
+
+    def peek(self, result_id: int) -> Dict[int, int]:
+        with self._lock:
+            return dict(self._pending.get(result_id, {}))
+
+    def take(self, result_id: int) -> Dict[int, int]:
+        """Removes and returns the result's pending answers (used by the submission)."""
+        with self._lock:
+            return self._pending.pop(result_id, {})
+
+    def end(self, exam_id: int, student_id: int, result_id: int):
+        with self._lock:
+            self._sessions.pop((exam_id, student_id), None)
+            self._pending.pop(result_id, None)
+
+    def drain(self) -> Dict[int, Dict[int, int]]:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            return pending
+
+    def restore(self, pending: Dict[int, Dict[int, int]]):
+        """Puts back answers whose flush failed, without overwriting newer ones."""
+        with self._lock:
+            for result_id, answers in pending.items():
+                current = self._pending.setdefault(result_id, {})
+                for question_id, option_id in answers.items():
+                    current.setdefault(question_id, option_id)
+
+    def note_flush(self, rows_written: int):
+        with self._lock:
+            self.flushes += 1
+            self.rows_written += rows_written
+
+    def note_flush_error(self):
+        with self._lock:
+            self.flush_errors += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "open_sessions": len(self._sessions),
+                "pending_attempts": len(self._pending),
+                "pending_answers": sum(len(a) for a in self._pending.values()),
+                "saves": self.saves,
+                "coalesced": self.coalesced,
+                "flushes": self.flushes,
+                "rows_written": self.rows_written,
+                "flush_errors": self.flush_errors,
+            }
+
+autosave_buffer = AutosaveBuffer(EXAM_AUTOSAVE_MAX_SESSIONS)
+
+
+# --- Attempt lifecycle ---
+def _find_result(db: Session, exam_id: int, student_id: int) -> Optional[models.Result]:
+    return db.query(models.Result).filter(
+        models.Result.exam_id == exam_id,
+        models.Result.student_id == student_id
+    ).first()
+
+def start_attempt(db: Session, exam_id: int, student_id: int) -> Tuple[models.Result, Dict[int, int]]:
+    """
+    Creates the student's in-progress Result for the exam, or resumes it.
+    Returns (result, {question_id: option_id} saved so far). Caller checks enrollment/publishing.
+    """
+    result = _find_result(db, exam_id, student_id)
+    created = False
+    if not result:
+        result = models.Result(exam_id=exam_id, student_id=student_id)
+        db.add(result)
+        try:
+            db.commit()
+            db.refresh(result)
+            created = True
+            logger.info(f"Student {student_id} started exam {exam_id} (result {result.id}).")
+        except IntegrityError: # A concurrent request (second tab, double click) inserted the attempt first
+            db.rollback()
+            result = _find_result(db, exam_id, student_id)
+            if result is None:
+                raise ValueError("Database error starting the exam attempt.")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error starting attempt of exam {exam_id} for student {student_id}: {e}", exc_info=True)
+            raise ValueError("Database error starting the exam attempt.")
+    if result.submitted_at:
+        raise ValueError("Exam has already been submitted.")
+    if created:
+        saved = {}
+    else:
+        saved = dict(db.query(models.MCQAnswer.mcq_question_id, models.MCQAnswer.selected_option_id).filter(
+            models.MCQAnswer.result_id == result.id,
+            models.MCQAnswer.selected_option_id.isnot(None)
+        ).all())
+    saved.update(autosave_buffer.peek(result.id)) # Not flushed yet
+    autosave_buffer.register(exam_id, student_id, result.id)
+    return result, saved
+
+def save_answers(db: Session, exam_id: int, student_id: int, answers: Dict[int, int]) -> int:
+    """
+    Autosave: buffers answers of the student's open attempt. Touches the database only when
+    the attempt isn't known to this process yet. Returns the number of answers awaiting flush.
+    """
+    result_id = autosave_buffer.result_id_for(exam_id, student_id)
+    if result_id is None:
+        row = db.query(models.Result.id, models.Result.submitted_at).filter(
+            models.Result.exam_id == exam_id,
+            models.Result.student_id == student_id
+        ).first()
+        if not row or row.submitted_at:
+            raise ValueError("No exam attempt in progress.")
+        result_id = row.id
+        autosave_buffer.register(exam_id, student_id, result_id)
+    return autosave_buffer.record(result_id, answers)
+
+def end_attempt(exam_id: int, student_id: int, result_id: int):
+    """Forgets a submitted attempt (called by result_service after the submission commits)."""
+    autosave_buffer.end(exam_id, student_id, result_id)
+
+
+# --- Flushing ---
+def flush_autosaves() -> int:
+    """Writes all buffered answers of still-open attempts. Returns the number of rows upserted."""
+    pending = autosave_buffer.drain()
+    if not pending:
+        return 0
+    db = SessionLocal()
+    try:
+        # Locking the attempts orders this write against a concurrent submission of the same attempt
+        open_attempts = dict(db.query(models.Result.id, models.Result.exam_id).filter(
+            models.Result.id.in_(list(pending)),
+            models.Result.submitted_at.is_(None)
+        ).order_by(models.Result.id).with_for_update().all())
+        exams = {
+            exam.id: exam for exam in db.query(models.Exam).options(lazyload(models.Exam.mcq_questions)).filter(
+                models.Exam.id.in_(set(open_attempts.values()))
+            ).all()
+        } if open_attempts else {}
+
+        rows = []
+        for result_id, answers in pending.items():
+            exam = exams.get(open_attempts.get(result_id))
+            if exam is None:
+                continue # Submitted (or removed) since: the submission carries the final answers
+            answer_key = exam_service.get_answer_key(db, exam)
+            for question_id, option_id in answers.items():
+                owner = answer_key.option_owner.get(option_id)
+                if owner is None or owner[0] != question_id:
+                    logger.warning(f"Autosave: option {option_id} does not belong to question {question_id} (result {result_id}). Dropped.")
+                    continue
+                rows.append({
+                    "result_id": result_id, "mcq_question_id": question_id,
+                    "selected_option_id": option_id, "selected_option_text": owner[1], "is_correct": None,
+                })
+
+        table = models.MCQAnswer.__table__
+        for start in range(0, len(rows), FLUSH_BATCH_SIZE):
+            database.bulk_upsert(db, table, rows[start:start + FLUSH_BATCH_SIZE], ["result_id", "mcq_question_id"], lambda new: {
+                "selected_option_id": new.selected_option_id,
+                "selected_option_text": new.selected_option_text,
+            })
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        autosave_buffer.restore(pending)
+        autosave_buffer.note_flush_error()
+        logger.error(f"Error flushing exam autosaves: {e}", exc_info=True)
+        return 0
+    finally:
+        db.close()
+    autosave_buffer.note_flush(len(rows))
+    logger.debug(f"Flushed {len(rows)} autosaved answers for {len(pending)} attempts.")
+    return len(rows)
+
+
+class _Flusher:
+    """Background thread calling flush_autosaves on an interval."""
+
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            flush_autosaves()
+
+    def start(self):
+        if self.interval_seconds <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="exam-autosave-flusher", daemon=True)
+        self._thread.start()
+        logger.info(f"Exam autosave flusher started (every {self.interval_seconds}s).")
+
+    def shutdown(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.interval_seconds + 5)
+            self._thread = None
+        flush_autosaves() # Don't lose buffered answers on a clean shutdown
+
+_flusher = _Flusher(EXAM_AUTOSAVE_FLUSH_SECONDS)
+
+def get_metrics() -> Dict[str, Any]:
+    return autosave_buffer.metrics()
+
+def start():
+    _flusher.start()
+
+def shutdown():
+    _flusher.shutdown()
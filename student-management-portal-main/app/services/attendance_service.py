@@ -1,14 +1,24 @@
 # app/services/attendance_service.py
 
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_
-from app import models
-from typing import List, Optional, Dict, Tuple
+from sqlalchemy import case, extract, func
+from app import database, models
+from app.services import dashboard_service
+from typing import Any, List, Optional, Dict, Tuple
 from datetime import date
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Rollup column holding the count of each status (models.AttendanceMonthlySummary)
+SUMMARY_COUNT_COLUMNS = {
+    models.AttendanceStatus.PRESENT: "present_count",
+    models.AttendanceStatus.ABSENT: "absent_count",
+    models.AttendanceStatus.LATE: "late_count",
+    models.AttendanceStatus.EXCUSED: "excused_count",
+}
+SUMMARY_REBUILD_BATCH_SIZE = 1000
+
 # Removed get_enrolled_students_for_course, replaced by get_students_for_schedule
 
 def get_students_for_schedule(db: Session, schedule_id: int) -> List[models.Student]:
@@ -44,18 +54,30 @@ def save_attendance_records(
     """
     Saves or updates attendance records for a given schedule and date.
     Input dictionary format: { student_id: status_string (e.g., "PRESENT") }
+    New and changed rows are written with one multi-row upsert (unique on student/schedule/date).
     Returns a tuple: (records_created, records_updated)
     """
     logger.info(f"Saving attendance for schedule {schedule_id} on {attendance_date}")
     created_count = 0
     updated_count = 0
 
-    # Get existing records for efficient update check
-    existing_records = db.query(models.Attendance).filter(
+    # The schedule row is locked until commit, so saves of the same schedule run one at a time and
+    # each reads the statuses the previous one wrote. Locking only the attendance rows would miss
+    # students saved for the first time by two concurrent requests: both would count them as new.
+    course_id = db.query(models.Schedule.course_id).filter(models.Schedule.id == schedule_id).with_for_update().scalar()
+    if course_id is None:
+        db.rollback()
+        raise ValueError(f"Schedule with ID {schedule_id} not found.")
+
+    # Current statuses only (no ORM objects)
+    existing_map = dict(db.query(models.Attendance.student_id, models.Attendance.status).filter(
         models.Attendance.schedule_id == schedule_id, # Changed from course_id
         models.Attendance.date == attendance_date
-    ).all()
-    existing_map = {record.student_id: record for record in existing_records}
+    ).all())
+
+    # Rollup deltas for this save: {student_id: {count column: +/- n}}
+    summary_deltas: Dict[int, Dict[str, int]] = {}
+    upsert_rows: List[Dict[str, Any]] = []
 
     valid_statuses = {status.name for status in models.AttendanceStatus} # Set of valid enum names
 
@@ -66,30 +88,42 @@ def save_attendance_records(
             continue # Skip invalid status entries
 
         status_enum = models.AttendanceStatus[status_str.upper()] # Convert string to enum member
+        previous_status = existing_map.get(student_id)
 
-        existing_record = existing_map.get(student_id)
-
-        if existing_record:
-            # Update existing record if status changed
-            if existing_record.status != status_enum:
-                logger.debug(f"Updating attendance for student {student_id} from {existing_record.status} to {status_enum}")
-                existing_record.status = status_enum
-                db.add(existing_record) # Add to session for update tracking
-                updated_count += 1
+        if previous_status == status_enum:
+            continue # Unchanged, nothing to write
+        deltas = summary_deltas.setdefault(student_id, {})
+        if previous_status is not None:
+            updated_count += 1
+            deltas[SUMMARY_COUNT_COLUMNS[previous_status]] = deltas.get(SUMMARY_COUNT_COLUMNS[previous_status], 0) - 1
         else:
-            # Create new record
-            logger.debug(f"Creating new attendance record for student {student_id} with status {status_enum}")
-            new_record = models.Attendance(
-                student_id=student_id,
-                schedule_id=schedule_id, # Changed from course_id
-                date=attendance_date,
-                status=status_enum
-            )
-            db.add(new_record)
             created_count += 1
+        deltas[SUMMARY_COUNT_COLUMNS[status_enum]] = deltas.get(SUMMARY_COUNT_COLUMNS[status_enum], 0) + 1
+        upsert_rows.append({
+            "student_id": student_id,
+            "schedule_id": schedule_id,
+            "date": attendance_date,
+            "status": status_enum,
+        })
+
+    if not upsert_rows:
+        db.rollback() # Release the schedule lock
+        logger.info("Attendance saved: no changes.")
+        return 0, 0
 
     try:
+        table = models.Attendance.__table__
+        database.bulk_upsert(db, table, upsert_rows, ["student_id", "schedule_id", "date"], lambda new: {
+            "status": new.status,
+            "updated_at": func.now(),
+        })
+        # Same transaction as the attendance rows, so the rollup never drifts on a failed save
+        month = _month_start(attendance_date)
+        _apply_summary_deltas(db, [
+            ((student_id, course_id, month), deltas) for student_id, deltas in summary_deltas.items()
+        ])
         db.commit()
+        dashboard_service.invalidate_student_dashboard(*summary_deltas.keys())
         logger.info(f"Attendance saved: {created_count} created, {updated_count} updated.")
         return created_count, updated_count
     except Exception as e:
@@ -131,3 +165,119 @@ def get_attendance_for_student(
     results = query.all()
     logger.debug(f"Found {len(results)} attendance records for student {student_id}")
     return results
+
+
+# --- Monthly Attendance Rollup ---
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+def _apply_summary_deltas(db: Session, deltas: List[Tuple[Tuple[int, int, date], Dict[str, int]]]) -> None:
+    """
+    Adds status count deltas to the (student, course, month) rollup rows, creating missing
+    rows, in one multi-row upsert. Does not commit.
+    """
+    rows = []
+    for (student_id, course_id, month), counts in deltas:
+        if not any(counts.values()):
+            continue # e.g. a status changed and changed back within one save
+        row = {"student_id": student_id, "course_id": course_id, "month": month}
+        row.update({column: counts.get(column, 0) for column in SUMMARY_COUNT_COLUMNS.values()})
+        rows.append(row)
+    if not rows:
+        return
+
+    table = models.AttendanceMonthlySummary.__table__
+    database.bulk_upsert(db, table, rows, ["student_id", "course_id", "month"], lambda new: {
+        column: case((table.c[column] + new[column] < 0, 0), else_=table.c[column] + new[column])
+        for column in SUMMARY_COUNT_COLUMNS.values()
+    })
+
+def rebuild_attendance_summary(db: Session, student_id: Optional[int] = None) -> int:
+    """
+    Recomputes the monthly rollup from the attendance table (all students, or one).
+    Use after bulk imports, direct SQL edits or deletes that bypass save_attendance_records.
+    Returns the number of rollup rows written.
+    """
+    year_col = extract("year", models.Attendance.date)
+    month_col = extract("month", models.Attendance.date)
+    query = db.query(
+        models.Attendance.student_id,
+        models.Schedule.course_id,
+        year_col,
+        month_col,
+        *[
+            func.sum(case((models.Attendance.status == status, 1), else_=0))
+            for status in SUMMARY_COUNT_COLUMNS
+        ]
+    ).join(models.Schedule, models.Attendance.schedule_id == models.Schedule.id)\
+     .filter(models.Attendance.date.isnot(None))\
+     .group_by(models.Attendance.student_id, models.Schedule.course_id, year_col, month_col)
+
+    clear = db.query(models.AttendanceMonthlySummary)
+    if student_id is not None:
+        query = query.filter(models.Attendance.student_id == student_id)
+        clear = clear.filter(models.AttendanceMonthlySummary.student_id == student_id)
+
+    columns = list(SUMMARY_COUNT_COLUMNS.values())
+    written = 0
+    try:
+        clear.delete(synchronize_session=False)
+        batch: List[Dict[str, Any]] = []
+        for row in query.all(): # Aggregated rows; fetched up front so inserts can reuse the connection
+            row_student_id, row_course_id, year, month = row[:4]
+            summary = {
+                "student_id": row_student_id, "course_id": row_course_id,
+                "month": date(int(year), int(month), 1),
+            }
+            summary.update({column: int(count or 0) for column, count in zip(columns, row[4:])})
+            batch.append(summary)
+            if len(batch) >= SUMMARY_REBUILD_BATCH_SIZE:
+                db.execute(models.AttendanceMonthlySummary.__table__.insert(), batch)
+                written += len(batch); batch = []
+        if batch:
+            db.execute(models.AttendanceMonthlySummary.__table__.insert(), batch)
+            written += len(batch)
+        db.commit()
+        dashboard_service.invalidate_all_dashboards()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error rebuilding attendance summary (student {student_id}): {e}", exc_info=True)
+        raise ValueError("Database error rebuilding attendance summary.")
+    logger.info(f"Rebuilt attendance summary: {written} rows (student {student_id if student_id is not None else 'all'}).")
+    return written
+
+def get_attendance_summary_for_student(
+    db: Session,
+    student_id: int,
+    course_id: Optional[int] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+) -> List[Dict[str, Any]]:
+    """
+    Per-course status counts and attendance percentage for a student, read from the monthly
+    rollup (dates are matched at month granularity).
+    """
+    columns = [getattr(models.AttendanceMonthlySummary, column) for column in SUMMARY_COUNT_COLUMNS.values()]
+    query = db.query(
+        models.Course.id, models.Course.name, *[func.sum(column) for column in columns]
+    ).join(models.Course, models.AttendanceMonthlySummary.course_id == models.Course.id)\
+     .filter(models.AttendanceMonthlySummary.student_id == student_id)
+    if course_id:
+        query = query.filter(models.AttendanceMonthlySummary.course_id == course_id)
+    if start_date:
+        query = query.filter(models.AttendanceMonthlySummary.month >= _month_start(start_date))
+    if end_date:
+        query = query.filter(models.AttendanceMonthlySummary.month <= _month_start(end_date))
+
+    summaries = []
+    for row in query.group_by(models.Course.id, models.Course.name).order_by(models.Course.name):
+        counts = {column: int(count or 0) for column, count in zip(SUMMARY_COUNT_COLUMNS.values(), row[2:])}
+        total = sum(counts.values())
+        summaries.append({
+            "course_id": row[0],
+            "course_name": row[1],
+            **counts,
+            "total_count": total,
+            "attendance_percentage": round(counts["present_count"] / total * 100, 1) if total else None,
+        })
+    return summaries
@@ -1,19 +1,25 @@
 # app/services/auth_service.py
 
 import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone # Use timezone-aware datetime
-from typing import Optional, Union
+from typing import Any, Dict, Optional, Union
 
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, make_transient_to_detached
 from dotenv import load_dotenv
 from app.models import UserRole 
 
 # Local imports
 from app import models, database
+from app.services import password_service
 
 load_dotenv() # Load environment variables from .env
 
@@ -21,13 +27,16 @@ load_dotenv() # Load environment variables from .env
 SECRET_KEY = os.getenv("SECRET_KEY", "dnfifjn4205fjv")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+# Resolved-principal cache (token subject -> user/profile snapshot). TTL 0 disables it.
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", 30))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", 1024))
 
 if not SECRET_KEY:
     raise ValueError("Missing SECRET_KEY environment variable")
 
 # --- Password Hashing Context ---
-# Should match the one in models.py
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashing runs on password_service's bounded pool; the context lives there
+pwd_context = password_service.pwd_context
 
 # --- OAuth2 Scheme ---
 # tokenUrl points to the endpoint that issues the token (in auth.py)
@@ -37,12 +46,12 @@ optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token", auto_error
 
 # --- Helper Functions ---
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verifies a plain password against a hashed password."""
-    return pwd_context.verify(plain_password, hashed_password)
+    """Verifies a plain password against a hashed password (on the hashing pool)."""
+    return password_service.verify_password(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    """Hashes a plain password."""
-    return pwd_context.hash(password)
+    """Hashes a plain password (on the hashing pool)."""
+    return password_service.hash_password(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Creates a JWT access token."""
@@ -57,11 +66,108 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 
 # --- Database Interaction ---
 def get_user(db: Session, username_or_email: str) -> Optional[models.User]:
-    """Retrieves a user by username or email."""
-    return db.query(models.User).filter(
+    """Retrieves a user by username or email, with the student/instructor profile loaded."""
+    # Profiles are eager loaded: routes read current_user.student_profile outside the
+    # session's sync context, where an async session cannot lazy load.
+    return db.query(models.User).options(
+        joinedload(models.User.student_profile),
+        joinedload(models.User.instructor_profile)
+    ).filter(
         (models.User.username == username_or_email) | (models.User.email == username_or_email)
     ).first()
 
+def update_user_password(db: Session, user: models.User, hashed_password: str) -> models.User:
+    """Stores a new password hash for the user (hash it first, e.g. with password_service.hash_password_async)."""
+    user.hashed_password = hashed_password
+    db.add(user)
+    db.commit()
+    invalidate_principal(user.id)
+    return user
+
+# --- Principal Cache ---
+@dataclass(frozen=True)
+class CachedPrincipal:
+    """Snapshot of a resolved user and their profile, enough to rebuild them without a query."""
+    user_id: int
+    role: UserRole
+    is_active: bool
+    student_id: Optional[int]
+    instructor_id: Optional[int]
+    user_row: Dict[str, Any]
+    student_row: Optional[Dict[str, Any]]
+    instructor_row: Optional[Dict[str, Any]]
+    expires_at: float
+
+class PrincipalCache:
+    """Thread-safe, size-bounded LRU of principals keyed by token subject, with a per-entry TTL."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedPrincipal]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, subject: str) -> Optional[CachedPrincipal]:
+        with self._lock:
+            principal = self._entries.get(subject)
+            if principal is None:
+                return None
+            if principal.expires_at <= time.monotonic():
+                del self._entries[subject]
+                return None
+            self._entries.move_to_end(subject)
+            return principal
+
+    def put(self, subject: str, user: models.User):
+        if self.ttl_seconds <= 0 or self.max_entries <= 0:
+            return
+        student, instructor = user.student_profile, user.instructor_profile
+        principal = CachedPrincipal(
+            user_id=user.id,
+            role=user.role,
+            is_active=user.is_active,
+            student_id=student.id if student else None,
+            instructor_id=instructor.id if instructor else None,
+            user_row=_column_snapshot(user),
+            student_row=_column_snapshot(student) if student else None,
+            instructor_row=_column_snapshot(instructor) if instructor else None,
+            expires_at=time.monotonic() + self.ttl_seconds,
+        )
+        with self._lock:
+            self._entries[subject] = principal
+            self._entries.move_to_end(subject)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False) # Evict least recently used
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            for subject in [k for k, p in self._entries.items() if p.user_id == user_id]:
+                del self._entries[subject]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_TTL_SECONDS, PRINCIPAL_CACHE_MAX_ENTRIES)
+
+def invalidate_principal(user_id: int):
+    """Drops cached principals for a user. Call after password, activation or profile changes."""
+    principal_cache.invalidate_user(user_id)
+
+def _column_snapshot(obj) -> Dict[str, Any]:
+    return {attr.key: getattr(obj, attr.key) for attr in sa_inspect(type(obj)).column_attrs}
+
+def _attach_principal(db: Session, principal: CachedPrincipal) -> models.User:
+    """Rebuilds the User (and profile) from a cached snapshot and attaches it to the session, without IO."""
+    user = models.User(**principal.user_row)
+    # Profiles are always set (possibly to None) so neither is lazy loaded later
+    user.student_profile = models.Student(**principal.student_row) if principal.student_row else None
+    user.instructor_profile = models.Instructor(**principal.instructor_row) if principal.instructor_row else None
+    for obj in (user, user.student_profile, user.instructor_profile):
+        if obj is not None:
+            make_transient_to_detached(obj) # Persistent identity, no pending changes
+    return db.merge(user, load=False)
+
 # --- Authentication Logic ---
 def authenticate_user(db: Session, username: str, password: str) -> Optional[models.User]:
     """Authenticates a user by username/email and password."""
@@ -74,6 +180,20 @@ def authenticate_user(db: Session, username: str, password: str) -> Optional[mod
         return None # Incorrect password
     return user
 
+async def authenticate_user_async(db: Session, username: str, password: str) -> Optional[models.User]:
+    """
+    Same checks as authenticate_user, for route handlers: the lookup runs via run_db and
+    bcrypt on the hashing pool, so neither the event loop nor a DB worker waits on the hash.
+    """
+    user = await database.run_db(db, get_user, username)
+    if not user:
+        return None # User not found
+    if not user.is_active:
+        return None # User is inactive
+    if not await password_service.verify_password_async(password, user.hashed_password):
+        return None # Incorrect password
+    return user
+
 # --- Dependencies ---
 async def get_current_user_from_token(
     token: Optional[str], db: Session
@@ -95,10 +215,17 @@ async def get_current_user_from_token(
     except JWTError:
         return None # Invalid token (decode failed)
 
-    user = get_user(db, username_or_email=username)
+    principal = principal_cache.get(username)
+    if principal is not None:
+        # merge(load=False) does no IO, so the session can be used directly here
+        session = db.sync_session if isinstance(db, AsyncSession) else db
+        return _attach_principal(session, principal)
+
+    user = await database.run_db(db, get_user, username_or_email=username)
     if user is None or not user.is_active:
         return None # User not found in DB or inactive
 
+    principal_cache.put(username, user)
     return user
 
 async def get_optional_current_user(
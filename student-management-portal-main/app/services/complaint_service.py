@@ -1,8 +1,9 @@
 # app/services/complaint_service.py
 
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import desc
+from sqlalchemy.orm import Session, joinedload, contains_eager
+from sqlalchemy import desc, func
 from app import models
+from app.pagination import Page, PageRequest, keyset_paginate
 from typing import List, Optional, Dict, Any
 from datetime import date
 import logging
@@ -148,6 +149,32 @@ def admin_get_all_complaints(
     )
     return query.all()
 
+# Sortable columns for the admin complaint list (must be non-NULL, see app/pagination.py).
+# Status is a filter rather than a sort key: MySQL orders ENUMs by index but compares them as strings.
+COMPLAINT_SORT_KEYS = {
+    "date": func.coalesce(models.Complaint.date, date(1900, 1, 1)),
+    "student": models.Student.name,
+    "id": models.Complaint.id,
+}
+
+def admin_get_complaints_page(
+    db: Session,
+    page: PageRequest,
+    status: Optional[str] = None,
+    student_id: Optional[int] = None
+) -> Page:
+    """One keyset page of complaints for Admin, with the same filters as admin_get_all_complaints."""
+    query = db.query(models.Complaint).join(models.Complaint.student)
+    if student_id:
+        query = query.filter(models.Complaint.student_id == student_id)
+    if status and status in models.ComplaintStatus.__members__:
+        query = query.filter(models.Complaint.status == models.ComplaintStatus[status])
+    return keyset_paginate(
+        query, page, COMPLAINT_SORT_KEYS, default_sort="date", default_order="desc",
+        id_column=models.Complaint.id,
+        options=[contains_eager(models.Complaint.student).joinedload(models.Student.user)]
+    )
+
 def admin_get_complaint_by_id(db: Session, complaint_id: int) -> Optional[models.Complaint]:
     """Retrieves a single complaint by ID for Admin view."""
     # Loads student details for context
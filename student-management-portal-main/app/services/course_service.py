@@ -4,6 +4,7 @@ from sqlalchemy.orm import Session, joinedload # Import joinedload
 from sqlalchemy import func, or_ # Import or_ for dependency checks
 from sqlalchemy.exc import IntegrityError
 from app import models
+from app.services import dashboard_service, enrollment_service
 from typing import List, Optional, Dict, Any
 import logging
 
@@ -29,8 +30,12 @@ def get_course_by_name(db: Session, name: str, department_id: int) -> Optional[m
         models.Course.department_id == department_id
     ).first()
 
-def create_course(db: Session, name: str, department_id: int, credits: Optional[int], description: Optional[str]) -> models.Course:
-    """Creates a new course, assigning it to a department."""
+def create_course(
+    db: Session, name: str, department_id: int, credits: Optional[int], description: Optional[str], capacity: Optional[int] = None
+) -> models.Course:
+    """Creates a new course, assigning it to a department. capacity None = unlimited seats."""
+    if capacity is not None and capacity < 0:
+        raise ValueError("Capacity cannot be negative.")
     # Check if department exists
     department = db.query(models.Department).filter(models.Department.id == department_id).first()
     if not department:
@@ -45,7 +50,8 @@ def create_course(db: Session, name: str, department_id: int, credits: Optional[
         name=name,
         credits=credits,
         description=description,
-        department_id=department_id # Assign mandatory department
+        department_id=department_id, # Assign mandatory department
+        capacity=capacity
     )
     db.add(db_course)
     try:
@@ -105,10 +111,24 @@ def update_course(db: Session, course_id: int, update_data: Dict[str, Any]) -> O
     if 'description' in update_data:
         db_course.description = update_data['description']
 
+    # --- Capacity Update (lowering it below the enrolled count only stops new enrollments) ---
+    capacity_raised = False
+    if 'capacity' in update_data:
+        new_capacity = update_data['capacity']
+        if new_capacity is not None and new_capacity < 0:
+            raise ValueError("Capacity cannot be negative.")
+        capacity_raised = new_capacity is None or (db_course.capacity is not None and new_capacity > db_course.capacity)
+        db_course.capacity = new_capacity
+
     try:
         db.add(db_course)
         db.commit()
         db.refresh(db_course)
+        if 'credits' in update_data:
+            dashboard_service.invalidate_all_dashboards() # Credits weight every enrolled student's GPA
+        if capacity_raised:
+            enrollment_service.promote_waitlist(db, course_id) # New seats go to the waitlist first
+            db.refresh(db_course)
         return db_course
     except IntegrityError as e:
         db.rollback()
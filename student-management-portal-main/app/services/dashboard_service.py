@@ -0,0 +1,200 @@
+# app/services/dashboard_service.py
+"""
+Student dashboard KPIs.
+
+Every figure on the student dashboard is a scalar subquery of one SELECT, so loading the
+page costs a single round trip. The result can be cached per student for a short TTL; the
+services that write enrollments, attendance, fees, exams or course credits drop the
+affected snapshots after they commit.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import and_, case, func, select
+from sqlalchemy.orm import Session
+import logging
+
+from app import models
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+# TTL 0 disables the snapshot cache (every dashboard load queries the database)
+DASHBOARD_CACHE_TTL_SECONDS = float(os.getenv("DASHBOARD_CACHE_TTL_SECONDS", 60))
+DASHBOARD_CACHE_MAX_ENTRIES = int(os.getenv("DASHBOARD_CACHE_MAX_ENTRIES", 4096))
+
+# Letter grade -> grade points. Grades outside the map are left out of the GPA.
+GRADE_POINTS = {"A": 4.0, "B": 3.0, "C": 2.0, "D": 1.0, "F": 0.0}
+
+PENDING_FEE_STATUSES = (models.PaymentStatus.PENDING, models.PaymentStatus.OVERDUE)
+
+
+# --- Snapshot Cache ---
+class DashboardCache:
+    """Thread-safe, size-bounded LRU of dashboard summaries keyed by student id."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict() # student_id -> (expires_at, summary)
+        self._lock = threading.Lock()
+        # A summary computed before a write must not be cached after it. Invalidating one student
+        # bumps only their generation; clear() bumps the epoch, which every student's token includes.
+        self._generations: Dict[int, int] = {}
+        self._epoch = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    def generation(self, student_id: int) -> Tuple[int, int]:
+        """Token to take before computing a student's summary and hand back to put()."""
+        with self._lock:
+            return self._epoch, self._generations.get(student_id, 0)
+
+    def get(self, student_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(student_id)
+            if entry is None:
+                return None
+            expires_at, summary = entry
+            if expires_at <= time.monotonic():
+                del self._entries[student_id]
+                return None
+            self._entries.move_to_end(student_id)
+            return dict(summary) # Callers may mutate their copy
+
+    def put(self, student_id: int, summary: Dict[str, Any], generation: Tuple[int, int]):
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation != (self._epoch, self._generations.get(student_id, 0)):
+                return # This student (or everyone) was invalidated while the summary was being computed
+            self._entries[student_id] = (time.monotonic() + self.ttl_seconds, dict(summary))
+            self._entries.move_to_end(student_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False) # Evict least recently used
+
+    def invalidate(self, student_id: int):
+        with self._lock:
+            self._generations[student_id] = self._generations.get(student_id, 0) + 1
+            self._entries.pop(student_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._generations.clear() # The new epoch already rejects every older token
+            self._entries.clear()
+
+dashboard_cache = DashboardCache(DASHBOARD_CACHE_TTL_SECONDS, DASHBOARD_CACHE_MAX_ENTRIES)
+
+def invalidate_student_dashboard(*student_ids: int):
+    """Drops the cached summary of the given students. Call after committing their enrollments, attendance or fees."""
+    for student_id in student_ids:
+        if student_id is not None:
+            dashboard_cache.invalidate(student_id)
+
+def invalidate_all_dashboards():
+    """Drops every cached summary. For writes that touch many students (exams, course credits)."""
+    dashboard_cache.clear()
+
+
+# --- Aggregation ---
+def _summary_statement(student_id: int, today: date):
+    """One SELECT whose columns are the per-student KPI subqueries."""
+    enrolled = select(func.count(models.Enrollment.id)).where(
+        models.Enrollment.student_id == student_id
+    ).scalar_subquery()
+
+    # Attendance comes from the monthly rollup: a handful of rows per course instead of every session
+    summary = models.AttendanceMonthlySummary
+    attendance_total = select(func.sum(
+        summary.present_count + summary.absent_count + summary.late_count + summary.excused_count
+    )).where(summary.student_id == student_id).scalar_subquery()
+
+    attendance_present = select(func.sum(summary.present_count)).where(
+        summary.student_id == student_id
+    ).scalar_subquery()
+
+    # Credit-weighted GPA: sum(points * credits) / sum(credits) over graded, credit-bearing courses
+    grade_points = case(
+        *[(func.upper(models.Grade.grade) == letter, points) for letter, points in GRADE_POINTS.items()],
+        else_=None
+    )
+    graded = and_(
+        models.Grade.student_id == student_id,
+        func.upper(models.Grade.grade).in_(list(GRADE_POINTS)),
+        models.Course.credits > 0
+    )
+    weighted_points = select(func.sum(grade_points * models.Course.credits)).select_from(models.Grade).join(
+        models.Course, models.Grade.course_id == models.Course.id
+    ).where(graded).scalar_subquery()
+    graded_credits = select(func.sum(models.Course.credits)).select_from(models.Grade).join(
+        models.Course, models.Grade.course_id == models.Course.id
+    ).where(graded).scalar_subquery()
+
+    pending_fees = select(func.count(models.FeePayment.id)).where(
+        models.FeePayment.student_id == student_id,
+        models.FeePayment.status.in_(PENDING_FEE_STATUSES)
+    ).scalar_subquery()
+
+    overdue_fees = select(func.count(models.FeePayment.id)).where(
+        models.FeePayment.student_id == student_id,
+        models.FeePayment.status == models.PaymentStatus.OVERDUE # Kept current by fee_overdue_service
+    ).scalar_subquery()
+
+    upcoming_exams = select(func.count(models.Exam.id)).select_from(models.Exam).join(
+        models.Enrollment, models.Enrollment.course_id == models.Exam.course_id
+    ).where(
+        models.Enrollment.student_id == student_id,
+        models.Exam.is_published == True,
+        models.Exam.date >= today
+    ).scalar_subquery()
+
+    return select(
+        enrolled.label("enrolled"),
+        attendance_total.label("attendance_total"),
+        attendance_present.label("attendance_present"),
+        weighted_points.label("weighted_points"),
+        graded_credits.label("graded_credits"),
+        pending_fees.label("pending_fees"),
+        overdue_fees.label("overdue_fees"),
+        upcoming_exams.label("upcoming_exams"),
+    )
+
+def compute_dashboard_summary(db: Session, student_id: int) -> Dict[str, Any]:
+    """Queries the student's dashboard KPIs in a single round trip."""
+    row = db.execute(_summary_statement(student_id, date.today())).one()
+
+    attendance_total = int(row.attendance_total or 0) # SUM() comes back as Decimal on MySQL
+    if attendance_total > 0:
+        attendance_percentage = round((int(row.attendance_present or 0) / attendance_total) * 100, 1)
+    else:
+        attendance_percentage = 100.0 # No records yet
+
+    graded_credits = float(row.graded_credits or 0)
+    overall_gpa = round(float(row.weighted_points or 0) / graded_credits, 2) if graded_credits > 0 else None
+
+    return {
+        "enrolled_courses_count": row.enrolled or 0,
+        "attendance_percentage": attendance_percentage,
+        "overall_gpa": overall_gpa,
+        "upcoming_exams_count": row.upcoming_exams or 0,
+        "pending_fees_count": row.pending_fees or 0,
+        "overdue_fees_count": row.overdue_fees or 0,
+    }
+
+def get_dashboard_summary(db: Session, student_id: int) -> Dict[str, Any]:
+    """The student's dashboard KPIs, from the snapshot cache when fresh."""
+    summary = dashboard_cache.get(student_id)
+    if summary is not None:
+        return summary
+    generation = dashboard_cache.generation(student_id)
+    summary = compute_dashboard_summary(db, student_id)
+    dashboard_cache.put(student_id, summary, generation)
+    return summary
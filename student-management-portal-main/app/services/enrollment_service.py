@@ -1,62 +1,219 @@
 # app/services/enrollment_service.py
 from sqlalchemy.orm import Session, joinedload, selectinload
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy import func, or_, select, update
 from app import models
-from typing import List, Optional
+from app.services import dashboard_service, schedule_service
+from typing import Dict, List, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+class CourseFullError(ValueError):
+    """No free seat in the course (the caller can offer the waitlist). Nothing was written; the session is left as is."""
+
 def get_enrollments_for_student(db: Session, student_id: int) -> List[models.Enrollment]:
     """Fetches all enrollments for a given student, loading the course."""
     return db.query(models.Enrollment).options(
         joinedload(models.Enrollment.course) # Eager load course details
     ).filter(models.Enrollment.student_id == student_id).order_by(models.Enrollment.enrollment_date.desc()).all()
 
-def get_available_courses_for_student(db: Session, student_id: int) -> List[models.Course]:
-    """Fetches courses the student is NOT currently enrolled in."""
+def _enrolled_course_ids(db: Session, student_id: int) -> Tuple[int, ...]:
+    return tuple(sorted({row[0] for row in db.query(models.Enrollment.course_id).filter(
+        models.Enrollment.student_id == student_id
+    ).all()}))
+
+def get_course_clashes_for_student(db: Session, student_id: int, course_ids: List[int]) -> Dict[int, str]:
+    """
+    For each of the given courses whose meetings overlap the student's current timetable:
+    a description of the clash, e.g. "'Physics' on Monday 09:00".
+    """
+    enrolled = _enrolled_course_ids(db, student_id)
+    bitmaps = schedule_service.course_bitmaps.course_bitmaps(db)
+    timetable = schedule_service.course_bitmaps.student_bitmap(db, student_id, enrolled)
+    clashing = {course_id: bitmaps.get(course_id, 0) & timetable for course_id in course_ids}
+    clashing = {course_id: overlap for course_id, overlap in clashing.items() if overlap and course_id not in enrolled}
+    if not clashing:
+        return {}
+    names = dict(db.query(models.Course.id, models.Course.name).filter(models.Course.id.in_(enrolled)).all())
+    clashes = {}
+    for course_id, overlap in clashing.items():
+        # Name the enrolled course that owns the first overlapping slot
+        other = next((c for c in enrolled if bitmaps.get(c, 0) & overlap & -overlap), None)
+        clashes[course_id] = f"'{names.get(other, 'another course')}' on {schedule_service.describe_bitmap(overlap)}"
+    return clashes
+
+def get_available_courses_for_student(db: Session, student_id: int, exclude_clashes: bool = False) -> List[models.Course]:
+    """Fetches courses the student is NOT currently enrolled in (optionally only those fitting their timetable)."""
     # Get IDs of courses the student IS enrolled in
     enrolled_course_ids = db.query(models.Enrollment.course_id).filter(
         models.Enrollment.student_id == student_id
     ).subquery()
 
-    # Query courses whose IDs are NOT in the subquery
+    waitlisted_course_ids = db.query(models.EnrollmentWaitlist.course_id).filter(
+        models.EnrollmentWaitlist.student_id == student_id
+    ).subquery()
+
+    # Query courses whose IDs are NOT in the subqueries (waitlisted ones are listed with the waitlist)
     available_courses = db.query(models.Course).filter(
-        models.Course.id.notin_(enrolled_course_ids)
+        models.Course.id.notin_(select(enrolled_course_ids)),
+        models.Course.id.notin_(select(waitlisted_course_ids))
     ).order_by(models.Course.name).all()
+    if exclude_clashes:
+        # One AND per course against the student's weekly bitmap
+        bitmaps = schedule_service.course_bitmaps.course_bitmaps(db)
+        timetable = schedule_service.course_bitmaps.student_bitmap(db, student_id, _enrolled_course_ids(db, student_id))
+        available_courses = [course for course in available_courses if not bitmaps.get(course.id, 0) & timetable]
     # TODO: Add more filtering later (prerequisites, program requirements, capacity?)
     return available_courses
 
+def _reserve_seat(db: Session, course_id: int) -> bool:
+    """
+    Takes a seat with one conditional UPDATE of the seat counter. The row lock it holds until
+    commit serialises concurrent enrollments in the course, so seats are never oversold.
+    """
+    result = db.execute(
+        update(models.Course).where(
+            models.Course.id == course_id,
+            or_(models.Course.capacity.is_(None), models.Course.seats_taken < models.Course.capacity)
+        ).values(seats_taken=models.Course.seats_taken + 1).execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
 def create_enrollment(db: Session, student_id: int, course_id: int) -> models.Enrollment:
-    """Enrolls a student in a course."""
+    """Enrolls a student in a course. Raises CourseFullError when no seat is left."""
     # Check if student/course exist
     student = db.query(models.Student).filter(models.Student.id == student_id).first()
     if not student: raise ValueError("Student not found.")
     course = db.query(models.Course).filter(models.Course.id == course_id).first()
     if not course: raise ValueError("Course not found.")
 
-    # Check if already enrolled
-    existing_enrollment = db.query(models.Enrollment).filter_by(student_id=student_id, course_id=course_id).first()
+    # Check if already enrolled (the unique constraint catches concurrent double submits)
+    existing_enrollment = db.query(models.Enrollment.id).filter_by(student_id=student_id, course_id=course_id).first()
     if existing_enrollment:
         raise ValueError(f"Already enrolled in course '{course.name}'.")
 
-    # TODO: Add checks for enrollment capacity, prerequisites, time conflicts, etc.
+    clash = get_course_clashes_for_student(db, student_id, [course_id]).get(course_id)
+    if clash:
+        raise ValueError(f"'{course.name}' clashes with {clash}.")
 
+    # TODO: Add checks for prerequisites, etc.
+
+    if not _reserve_seat(db, course_id):
+        # The conditional UPDATE matched no row: nothing to undo, and the session (and the
+        # objects the caller holds) stays usable, e.g. to join the waitlist next
+        raise CourseFullError(f"'{course.name}' is full ({course.capacity} seats).")
     db_enrollment = models.Enrollment(student_id=student_id, course_id=course_id)
     db.add(db_enrollment)
+    db.query(models.EnrollmentWaitlist).filter_by(student_id=student_id, course_id=course_id).delete(synchronize_session=False)
     try:
         db.commit()
         db.refresh(db_enrollment)
+        dashboard_service.invalidate_student_dashboard(student_id)
         logger.info(f"Student {student_id} enrolled in course {course_id}")
         return db_enrollment
+    except IntegrityError:
+        db.rollback() # Also gives back the seat taken above
+        raise ValueError(f"Already enrolled in course '{course.name}'.")
     except Exception as e:
         db.rollback()
         logger.error(f"Error creating enrollment for student {student_id}, course {course_id}: {e}", exc_info=True)
         raise ValueError("Database error during enrollment.")
 
 
+# --- Waitlist ---
+def _promote(db: Session, course: models.Course) -> List[int]:
+    """
+    Fills free seats of the (locked) course from its waitlist in arrival order, without
+    committing. Students whose timetable now clashes with the course keep waiting.
+    Returns the promoted student ids.
+    """
+    promoted = []
+    if course.capacity is not None and course.seats_taken >= course.capacity:
+        return promoted
+    entries = db.query(models.EnrollmentWaitlist).filter(
+        models.EnrollmentWaitlist.course_id == course.id
+    ).order_by(models.EnrollmentWaitlist.id).with_for_update().all()
+    for entry in entries:
+        if course.capacity is not None and course.seats_taken >= course.capacity:
+            break
+        if get_course_clashes_for_student(db, entry.student_id, [course.id]):
+            continue
+        db.delete(entry)
+        if db.query(models.Enrollment.id).filter_by(student_id=entry.student_id, course_id=course.id).first():
+            continue # Enrolled meanwhile; just drop the entry
+        db.add(models.Enrollment(student_id=entry.student_id, course_id=course.id))
+        course.seats_taken += 1
+        promoted.append(entry.student_id)
+    return promoted
+
+def _notify_promoted(course_id: int, promoted: List[int]):
+    for student_id in promoted:
+        dashboard_service.invalidate_student_dashboard(student_id)
+    if promoted:
+        logger.info(f"Promoted {len(promoted)} waitlisted students into course {course_id}: {promoted}")
+
+def promote_waitlist(db: Session, course_id: int) -> List[int]:
+    """Moves waitlisted students into free seats of the course (e.g. after its capacity was raised)."""
+    try:
+        course = db.query(models.Course).filter(models.Course.id == course_id).with_for_update().first()
+        promoted = _promote(db, course) if course else []
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error promoting the waitlist of course {course_id}: {e}", exc_info=True)
+        raise ValueError("Database error promoting the course waitlist.")
+    _notify_promoted(course_id, promoted)
+    return promoted
+
+def _waitlist_position(db: Session, entry: models.EnrollmentWaitlist) -> int:
+    return db.query(func.count(models.EnrollmentWaitlist.id)).filter(
+        models.EnrollmentWaitlist.course_id == entry.course_id,
+        models.EnrollmentWaitlist.id <= entry.id
+    ).scalar()
+
+def join_waitlist(db: Session, student_id: int, course_id: int) -> int:
+    """Queues the student for a seat in the course. Returns their position (0 = a seat was free and they got it)."""
+    course = db.query(models.Course).filter(models.Course.id == course_id).first()
+    if not course: raise ValueError("Course not found.")
+    if db.query(models.Enrollment.id).filter_by(student_id=student_id, course_id=course_id).first():
+        raise ValueError(f"Already enrolled in course '{course.name}'.")
+    db.add(models.EnrollmentWaitlist(student_id=student_id, course_id=course_id))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback() # Already waiting
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error adding student {student_id} to the waitlist of course {course_id}: {e}", exc_info=True)
+        raise ValueError("Database error joining the waitlist.")
+    # A seat may have been released between the full check and joining
+    if student_id in promote_waitlist(db, course_id):
+        return 0
+    entry = db.query(models.EnrollmentWaitlist).filter_by(student_id=student_id, course_id=course_id).first()
+    return _waitlist_position(db, entry) if entry else 0
+
+def leave_waitlist(db: Session, student_id: int, course_id: int) -> bool:
+    deleted = db.query(models.EnrollmentWaitlist).filter_by(student_id=student_id, course_id=course_id).delete(synchronize_session=False)
+    try:
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error removing student {student_id} from the waitlist of course {course_id}: {e}", exc_info=True)
+        raise ValueError("Database error leaving the waitlist.")
+    return bool(deleted)
+
+def get_waitlist_for_student(db: Session, student_id: int) -> List[Dict]:
+    """The student's waitlist entries with their course and current position."""
+    entries = db.query(models.EnrollmentWaitlist).options(joinedload(models.EnrollmentWaitlist.course)).filter(
+        models.EnrollmentWaitlist.student_id == student_id
+    ).order_by(models.EnrollmentWaitlist.id).all()
+    return [{"course": entry.course, "position": _waitlist_position(db, entry)} for entry in entries]
+
+
 def delete_enrollment(db: Session, enrollment_id: int, student_id: int) -> bool:
-    """Unenrolls a student by enrollment ID, ensuring ownership."""
+    """Unenrolls a student by enrollment ID, ensuring ownership. The seat goes to the waitlist first."""
     db_enrollment = db.query(models.Enrollment).filter(
         models.Enrollment.id == enrollment_id,
         models.Enrollment.student_id == student_id # IMPORTANT: Ensure student owns this enrollment
@@ -67,12 +224,54 @@ def delete_enrollment(db: Session, enrollment_id: int, student_id: int) -> bool:
 
     # TODO: Add checks if unenrollment is allowed (e.g., before a certain date?)
 
+    course_id = db_enrollment.course_id
     try:
+        # Same lock order as _reserve_seat (course row first)
+        course = db.query(models.Course).filter(models.Course.id == course_id).with_for_update().first()
         db.delete(db_enrollment)
+        promoted = []
+        if course:
+            course.seats_taken = max((course.seats_taken or 0) - 1, 0)
+            db.flush()
+            promoted = _promote(db, course)
         db.commit()
+        dashboard_service.invalidate_student_dashboard(student_id)
         logger.info(f"Student {student_id} unenrolled from enrollment {enrollment_id}")
-        return True
     except Exception as e:
         db.rollback()
         logger.error(f"Error deleting enrollment {enrollment_id} for student {student_id}: {e}", exc_info=True)
-        raise ValueError("Database error during unenrollment.")
\ No newline at end of file
+        raise ValueError("Database error during unenrollment.")
+    _notify_promoted(course_id, promoted)
+    return True
+
+def release_student_seats(db: Session, student_id: int) -> List[int]:
+    """
+    Gives back the seats of a student about to be deleted (enrollments go by cascade), without
+    committing. Returns the course ids whose waitlists should be promoted after the commit.
+    """
+    course_ids = [row[0] for row in db.query(models.Enrollment.course_id).filter(models.Enrollment.student_id == student_id).all()]
+    if course_ids:
+        db.execute(
+            update(models.Course).where(models.Course.id.in_(course_ids), models.Course.seats_taken > 0)
+            .values(seats_taken=models.Course.seats_taken - 1).execution_options(synchronize_session=False)
+        )
+    return course_ids
+
+def recount_course_seats(db: Session) -> int:
+    """Resets every course's seats_taken to its enrollment count. Returns the number of courses corrected."""
+    enrolled = select(func.count(models.Enrollment.id)).where(
+        models.Enrollment.course_id == models.Course.id
+    ).correlate(models.Course).scalar_subquery()
+    try:
+        corrected = db.execute(
+            update(models.Course).where(models.Course.seats_taken != enrolled).values(seats_taken=enrolled)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error recounting course seats: {e}", exc_info=True)
+        raise ValueError("Database error recounting course seats.")
+    for course_id in [row[0] for row in db.query(models.EnrollmentWaitlist.course_id).distinct().all()]:
+        promote_waitlist(db, course_id)
+    return corrected
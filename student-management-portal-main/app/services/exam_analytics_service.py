@@ -0,0 +1,207 @@
+# app/services/exam_analytics_service.py
+"""
+Exam-level statistics for instructors.
+
+Submitted results and answers are read as flat id columns and aggregated with NumPy: score
+distribution and percentiles, per-question difficulty (share of attempts answering
+correctly) and discrimination index (difficulty in the top 27% of scorers minus the bottom
+27%), and how often each option was chosen. Results are cached per exam and reused until
+the exam's submissions or answer key change.
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app import models
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+EXAM_ANALYTICS_CACHE_MAX_ENTRIES = int(os.getenv("EXAM_ANALYTICS_CACHE_MAX_ENTRIES", 128))
+
+PERCENTILES = (10, 25, 50, 75, 90)
+HISTOGRAM_BINS = 10 # Over 0-100% of total marks
+DISCRIMINATION_GROUP_SHARE = 0.27 # Kelley's upper/lower groups
+
+
+class AnalyticsCache:
+    """Per-process LRU of computed analytics, valid while the exam's fingerprint is unchanged."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict() # exam_id -> (fingerprint, analytics)
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, exam_id: int, fingerprint: tuple) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(exam_id)
+            if entry is None or entry[0] != fingerprint:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(exam_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, exam_id: int, fingerprint: tuple, analytics: Dict[str, Any]):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[exam_id] = (fingerprint, analytics)
+            self._entries.move_to_end(exam_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+analytics_cache = AnalyticsCache(EXAM_ANALYTICS_CACHE_MAX_ENTRIES)
+
+
+def _submitted(exam_id: int):
+    return (models.Result.exam_id == exam_id, models.Result.submitted_at.isnot(None))
+
+def _fingerprint(db: Session, exam: models.Exam) -> tuple:
+    """Changes whenever a submission arrives, a result is regraded or the answer key is edited."""
+    count, last_update = db.query(func.count(models.Result.id), func.max(models.Result.updated_at)).filter(
+        *_submitted(exam.id)
+    ).one()
+    return (exam.answer_key_version or 0, count, last_update)
+
+def _round(value, digits: int = 2) -> Optional[float]:
+    return None if value is None or np.isnan(value) else round(float(value), digits)
+
+
+def compute_exam_analytics(db: Session, exam: models.Exam) -> Dict[str, Any]:
+    """Aggregates all submitted attempts of the exam (uncached)."""
+    questions = db.query(models.MCQQuestion.id, models.MCQQuestion.question_text, models.MCQQuestion.marks).filter(
+        models.MCQQuestion.exam_id == exam.id
+    ).order_by(models.MCQQuestion.id).all()
+    options = db.query(
+        models.MCQOption.id, models.MCQOption.question_id, models.MCQOption.text, models.MCQOption.is_correct
+    ).join(models.MCQQuestion, models.MCQOption.question_id == models.MCQQuestion.id).filter(
+        models.MCQQuestion.exam_id == exam.id
+    ).order_by(models.MCQOption.question_id, models.MCQOption.position).all()
+    results = db.query(models.Result.id, models.Result.score).filter(*_submitted(exam.id)).order_by(models.Result.id).all()
+    answers = db.query(
+        models.MCQAnswer.result_id, models.MCQAnswer.mcq_question_id, models.MCQAnswer.selected_option_id, models.MCQAnswer.is_correct
+    ).join(models.Result, models.MCQAnswer.result_id == models.Result.id).filter(*_submitted(exam.id)).all()
+
+    total_marks = float(sum(q.marks or 0.0 for q in questions)) or float(exam.total_marks or 0.0)
+    result_ids = np.array([r.id for r in results], dtype=np.int64)
+    scores = np.array([r.score or 0.0 for r in results], dtype=np.float64)
+    question_ids = np.array([q.id for q in questions], dtype=np.int64)
+    n_results, n_questions = result_ids.size, question_ids.size
+
+    # attempt x question matrices of correct / answered flags
+    correct = np.zeros((n_results, n_questions), dtype=np.float64)
+    answered = np.zeros((n_results, n_questions), dtype=bool)
+    option_ids = np.array(sorted(o.id for o in options), dtype=np.int64)
+    option_counts = np.zeros(option_ids.size, dtype=np.int64)
+    if answers and n_questions:
+        columns = list(zip(*answers))
+        answer_results = np.array(columns[0], dtype=np.int64)
+        answer_questions = np.array(columns[1], dtype=np.int64)
+        answer_options = np.array([o if o is not None else -1 for o in columns[2]], dtype=np.int64)
+        answer_correct = np.array([bool(c) for c in columns[3]], dtype=bool)
+
+        q_pos = np.clip(np.searchsorted(question_ids, answer_questions), 0, n_questions - 1)
+        known = question_ids[q_pos] == answer_questions # Drop answers to questions since removed
+        r_pos = np.searchsorted(result_ids, answer_results)
+        correct[r_pos[known], q_pos[known]] = answer_correct[known]
+        answered[r_pos[known], q_pos[known]] = answer_options[known] >= 0
+
+        if option_ids.size:
+            o_pos = np.clip(np.searchsorted(option_ids, answer_options), 0, option_ids.size - 1)
+            chosen = option_ids[o_pos] == answer_options
+            option_counts = np.bincount(o_pos[chosen], minlength=option_ids.size)
+
+    # --- Score distribution ---
+    summary: Dict[str, Any] = {
+        "exam_id": exam.id,
+        "exam_name": exam.name,
+        "course_id": exam.course_id,
+        "attempts": int(n_results),
+        "total_marks": round(total_marks, 2),
+        "computed_at": datetime.utcnow().isoformat(timespec="seconds"),
+    }
+    if n_results:
+        percentages = scores / total_marks * 100 if total_marks > 0 else np.zeros(n_results)
+        counts, edges = np.histogram(np.clip(percentages, 0, 100), bins=HISTOGRAM_BINS, range=(0, 100))
+        summary.update({
+            "mean": _round(scores.mean()),
+            "median": _round(np.median(scores)),
+            "std": _round(scores.std()),
+            "min": _round(scores.min()),
+            "max": _round(scores.max()),
+            "mean_percentage": _round(percentages.mean(), 1),
+            "percentiles": {str(p): _round(v) for p, v in zip(PERCENTILES, np.percentile(scores, PERCENTILES))},
+            "histogram": [
+                {"range": f"{int(lo)}-{int(hi)}%", "count": int(c)} for lo, hi, c in zip(edges[:-1], edges[1:], counts)
+            ],
+        })
+    else:
+        summary.update({
+            "mean": None, "median": None, "std": None, "min": None, "max": None, "mean_percentage": None,
+            "percentiles": {str(p): None for p in PERCENTILES}, "histogram": [],
+        })
+
+    # --- Item statistics ---
+    difficulty = correct.mean(axis=0) if n_results else np.full(n_questions, np.nan)
+    discrimination = np.full(n_questions, np.nan)
+    if n_results >= 2:
+        group = max(1, int(round(n_results * DISCRIMINATION_GROUP_SHARE)))
+        order = np.argsort(scores, kind="stable")
+        discrimination = correct[order[-group:]].mean(axis=0) - correct[order[:group]].mean(axis=0)
+    answered_counts = answered.sum(axis=0)
+
+    count_by_option = dict(zip(option_ids.tolist(), option_counts.tolist()))
+    options_by_question: Dict[int, list] = {}
+    for option in options:
+        options_by_question.setdefault(option.question_id, []).append(option)
+
+    summary["questions"] = []
+    for index, question in enumerate(questions):
+        chosen_total = int(answered_counts[index])
+        summary["questions"].append({
+            "id": question.id,
+            "number": index + 1,
+            "text": question.question_text,
+            "marks": question.marks,
+            "difficulty": _round(difficulty[index], 3),
+            "discrimination": _round(discrimination[index], 3),
+            "answered": chosen_total,
+            "unanswered": int(n_results - chosen_total),
+            "options": [
+                {
+                    "id": option.id,
+                    "text": option.text,
+                    "is_correct": bool(option.is_correct),
+                    "count": int(count_by_option.get(option.id, 0)),
+                    "share": round(count_by_option.get(option.id, 0) / n_results, 3) if n_results else None,
+                }
+                for option in options_by_question.get(question.id, [])
+            ],
+        })
+    return summary
+
+def get_exam_analytics(db: Session, exam_id: int) -> Dict[str, Any]:
+    """The exam's analytics, from the cache unless submissions or the answer key changed."""
+    exam = db.query(models.Exam).filter(models.Exam.id == exam_id).first()
+    if not exam:
+        raise ValueError(f"Exam with ID {exam_id} not found.")
+    fingerprint = _fingerprint(db, exam)
+    analytics = analytics_cache.get(exam_id, fingerprint)
+    if analytics is None:
+        analytics = compute_exam_analytics(db, exam)
+        analytics_cache.put(exam_id, fingerprint, analytics)
+    return analytics
@@ -1,14 +1,22 @@
 from sqlalchemy.orm import Session, joinedload, selectinload
 from sqlalchemy.exc import IntegrityError
 from app import models
+from app.services import dashboard_service
 from typing import List, Optional, Dict, Any, Tuple
+from dataclasses import dataclass
 from datetime import date
+from collections import OrderedDict
 import logging
+import os
+import threading
 
 logger = logging.getLogger(__name__)
 
 import json # Ensure json is imported
 
+# Compiled answer keys kept in memory (one per exam version)
+ANSWER_KEY_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_KEY_CACHE_MAX_ENTRIES", 256))
+
 # --- Existing Exam Functions (Modify if needed) ---
 def get_exams_for_course(db: Session, course_id: int) -> List[models.Exam]:
     # Eager load questions if always needed on list view
@@ -17,10 +25,11 @@ def get_exams_for_course(db: Session, course_id: int) -> List[models.Exam]:
         .order_by(models.Exam.date.desc(), models.Exam.name).all()
 
 def get_exam_by_id_with_questions(db: Session, exam_id: int) -> Optional[models.Exam]:
-    """Retrieves exam and eagerly loads its MCQ questions."""
+    """Retrieves exam and eagerly loads its course and MCQ questions."""
     logger.debug(f"Fetching exam ID {exam_id} with MCQ questions.")
     exam = db.query(models.Exam).options(
-        selectinload(models.Exam.mcq_questions) # Eagerly load questions
+        joinedload(models.Exam.course), # Shown by the MCQ editor
+        selectinload(models.Exam.mcq_questions).selectinload(models.MCQQuestion.mcq_options) # Eagerly load questions + options
     ).filter(models.Exam.id == exam_id).first()
     if exam:
         logger.debug(f"Found exam '{exam.name}' with {len(exam.mcq_questions)} questions.")
@@ -42,6 +51,7 @@ def create_exam(db: Session, course_id: int, name: str, exam_type: models.ExamTy
     db.add(db_exam); #...commit/refresh/error handling
     db.commit()
     db.refresh(db_exam)
+    dashboard_service.invalidate_all_dashboards() # Upcoming exam counts of everyone in the course
     return db_exam
 
 # update_exam: Might recalculate total_marks based on MCQs
@@ -58,7 +68,12 @@ def update_exam_details(db: Session, exam_id: int, update_data: Dict[str, Any])
     if 'is_published' in update_data and update_data['is_published'] != db_exam.is_published: db_exam.is_published = update_data['is_published']; updated = True
 
     if not updated: return db_exam
-    try: db.add(db_exam); db.commit(); db.refresh(db_exam); return db_exam
+    db_exam.answer_key_version = models.Exam.answer_key_version + 1 # Submissions must see the new state
+    try:
+        db.add(db_exam); db.commit(); db.refresh(db_exam)
+        answer_key_cache.invalidate(exam_id)
+        dashboard_service.invalidate_all_dashboards() # Publishing or moving an exam changes upcoming counts
+        return db_exam
     except Exception as e: db.rollback(); logger.error(...); raise ValueError("DB error updating exam details.")
 
 
@@ -71,7 +86,11 @@ def delete_exam(db: Session, exam_id: int) -> bool:
      # Check results...
      if db.query(models.Result.id).filter(models.Result.exam_id == exam_id).first():
           raise ValueError(f"Cannot delete exam '{db_exam.name}' with existing results.")
-     try: db.delete(db_exam); db.commit(); return True
+     try:
+         db.delete(db_exam); db.commit()
+         answer_key_cache.invalidate(exam_id)
+         dashboard_service.invalidate_all_dashboards()
+         return True
      except Exception as e: db.rollback(); logger.error(...); raise ValueError("DB error deleting exam.")
 
 
@@ -137,8 +156,9 @@ def save_mcq_questions_for_exam(db: Session, exam_id: int, questions_data: List[
              has_correct_option = any(opt.get('is_correct') for opt in options_list if isinstance(opt, dict))
              if not has_correct_option:
                  logger.warning(f"Skipping Q '{question_text[:30]}...' (ID/Str: {mcq_id_str}): No correct option."); continue
-        try: options_json = json.dumps(options_list)
-        except TypeError: logger.warning(f"Skipping Q '{question_text[:30]}...' (ID/Str: {mcq_id_str}): Invalid options format."); continue
+        options_clean = _clean_options(options_list)
+        if not delete_flag and len(options_clean) < 2:
+            logger.warning(f"Skipping Q '{question_text[:30]}...' (ID/Str: {mcq_id_str}): Invalid options format."); continue
 
 
         # --- DB Operation ---
@@ -158,7 +178,7 @@ def save_mcq_questions_for_exam(db: Session, exam_id: int, questions_data: List[
                 logger.debug(f"Service: Updating existing MCQ {mcq_id_db} for exam {exam_id}")
                 mcq_to_process.question_text = question_text
                 mcq_to_process.marks = marks
-                mcq_to_process.options = options_json
+                _sync_mcq_options(mcq_to_process, options_clean)
                 db.add(mcq_to_process) # Add to session for update
                 total_marks += marks
                 saved_count += 1
@@ -167,9 +187,9 @@ def save_mcq_questions_for_exam(db: Session, exam_id: int, questions_data: List[
             # Add NEW question
             logger.debug(f"Service: Adding new MCQ '{question_text[:30]}...' for exam {exam_id}")
             new_mcq = models.MCQQuestion(
-                exam_id=exam_id, question_text=question_text,
-                marks=marks, options=options_json
+                exam_id=exam_id, question_text=question_text, marks=marks
             )
+            _sync_mcq_options(new_mcq, options_clean)
             db.add(new_mcq)
             total_marks += marks
             saved_count += 1
@@ -180,6 +200,9 @@ def save_mcq_questions_for_exam(db: Session, exam_id: int, questions_data: List[
     ids_to_delete = ids_in_db - processed_mcq_ids
     if ids_to_delete:
         logger.info(f"Service: Deleting {len(ids_to_delete)} MCQs ({ids_to_delete}) not in submission for exam {exam_id}")
+        db.query(models.MCQOption).filter(
+            models.MCQOption.question_id.in_(ids_to_delete)
+        ).delete(synchronize_session=False)
         db.query(models.MCQQuestion).filter(
             models.MCQQuestion.exam_id == exam_id,
             models.MCQQuestion.id.in_(ids_to_delete)
@@ -191,10 +214,12 @@ def save_mcq_questions_for_exam(db: Session, exam_id: int, questions_data: List[
         logger.info(f"Service: Updating total marks for exam {exam_id} from {exam.total_marks or 0.0} to {rounded_total_marks}")
         exam.total_marks = rounded_total_marks
         db.add(exam)
+    exam.answer_key_version = models.Exam.answer_key_version + 1 # Atomic in SQL; other workers' cached keys go stale
 
     # --- Commit ---
     try:
         db.commit()
+        answer_key_cache.invalidate(exam_id)
         logger.info(f"Service: Successfully saved MCQs for exam {exam_id}. Saved/Updated: {saved_count}. Final Total Marks: {rounded_total_marks}")
         return saved_count, rounded_total_marks
     except Exception as e:
@@ -203,6 +228,29 @@ def save_mcq_questions_for_exam(db: Session, exam_id: int, questions_data: List[
         raise ValueError("Database error saving MCQ questions.")
 
 
+def _clean_options(options_list: List[Any]) -> List[Dict[str, Any]]:
+    """Form options -> [{'text': str, 'is_correct': bool}], dropping blank or malformed entries."""
+    cleaned = []
+    for opt in options_list if isinstance(options_list, list) else []:
+        if isinstance(opt, dict) and str(opt.get('text') or '').strip():
+            cleaned.append({"text": str(opt['text']).strip(), "is_correct": bool(opt.get('is_correct'))})
+    return cleaned
+
+def _sync_mcq_options(mcq: models.MCQQuestion, options: List[Dict[str, Any]]) -> None:
+    """
+    Makes the question's option rows match `options`, updating rows in place by position so
+    option ids (which answers reference) survive text and answer-key edits.
+    """
+    existing = sorted(mcq.mcq_options, key=lambda o: o.position) if mcq.id else []
+    for position, opt in enumerate(options):
+        if position < len(existing):
+            row = existing[position]
+            row.text, row.is_correct, row.position = opt["text"], opt["is_correct"], position
+        else:
+            mcq.mcq_options.append(models.MCQOption(position=position, text=opt["text"], is_correct=opt["is_correct"]))
+    for row in existing[len(options):]:
+        mcq.mcq_options.remove(row) # delete-orphan; answers pointing at it keep their text snapshot
+
 # app/services/exam_service.py
 def get_published_exams_for_student_courses(db: Session, student_id: int) -> List[models.Exam]:
     """
@@ -277,40 +325,206 @@ def get_published_exam_details_for_student(db: Session, exam_id: int, student_id
 def get_exam_questions_for_student(db: Session, exam_id: int) -> List[Dict]:
     """
     Retrieves MCQ questions for an exam, preparing them for student attempt.
-    Crucially, it parses options but does NOT include the 'is_correct' flag.
-    Option order should be preserved if possible or randomized consistently.
+    Options carry their id and text only, never the 'is_correct' flag.
     """
     logger.debug(f"SERVICE: Fetching questions for student attempt, exam ID {exam_id}")
-    questions = db.query(models.MCQQuestion).filter(
+    questions = db.query(models.MCQQuestion).options(
+        selectinload(models.MCQQuestion.mcq_options)
+    ).filter(
         models.MCQQuestion.exam_id == exam_id
     ).order_by(models.MCQQuestion.id).all() # Consistent order is important
 
-    output = []
-    for mcq in questions:
-        options_for_student = []
-        try:
-            options_list = json.loads(mcq.options or '[]')
-            # Only include the text, shuffle order maybe? For now, keep order.
-            options_for_student = [{"text": opt.get("text")} for opt in options_list if isinstance(opt, dict) and opt.get("text")]
-        except json.JSONDecodeError:
-            logger.warning(f"Could not parse options for MCQ {mcq.id} during student fetch.")
-
-        output.append({
-            "id": mcq.id,
-            "question_text": mcq.question_text,
-            "marks": mcq.marks,
-            "options": options_for_student # List of dicts containing only 'text'
-        })
+    output = [{
+        "id": mcq.id,
+        "question_text": mcq.question_text,
+        "marks": mcq.marks,
+        "options": [{"id": opt.id, "text": opt.text} for opt in mcq.mcq_options] # Position order
+    } for mcq in questions]
     logger.debug(f"SERVICE: Prepared {len(output)} questions for student attempt.")
     return output
 
 def check_exam_attempt_exists(db: Session, exam_id: int, student_id: int) -> bool:
-    """Checks if a result record (attempt) exists for the student and exam."""
-    # Check if a Result record exists and potentially if it's submitted
+    """Checks if the student has submitted the exam (an open, autosaved attempt doesn't count)."""
     existing_result = db.query(models.Result.id).filter(
         models.Result.exam_id == exam_id,
-        models.Result.student_id == student_id
-        # Optionally add filter(models.Result.submitted_at.isnot(None)) to only count submitted attempts
+        models.Result.student_id == student_id,
+        models.Result.submitted_at.isnot(None)
     ).first()
     logger.debug(f"SERVICE: Attempt check for Student {student_id}, Exam {exam_id}. Found: {existing_result is not None}")
     return existing_result is not None
+
+# --- Compiled Answer Keys ---
+@dataclass(frozen=True)
+class AnswerKey:
+    """Everything needed to grade a submission for one exam version, with no further queries."""
+    exam_id: int
+    version: int
+    total_marks: float
+    question_marks: Dict[int, float] # question id -> marks
+    option_owner: Dict[int, Tuple[int, str]] # option id -> (question id, option text)
+    correct_option_ids: frozenset
+
+    def grade(self, submitted_answers: Dict[Any, Any]) -> Tuple[float, List[Tuple[int, Optional[int], Optional[str], bool]]]:
+        """
+        Grades {question id: option id}. Returns (score, [(question id, option id, option text, is_correct)]).
+        Unknown questions are dropped; options that don't belong to their question count as unanswered.
+        """
+        score = 0.0
+        graded = []
+        for question_key, option_key in submitted_answers.items():
+            try: question_id, option_id = int(question_key), int(option_key)
+            except (ValueError, TypeError):
+                logger.warning(f"Invalid answer '{question_key}': '{option_key}' for exam {self.exam_id}."); continue
+            marks = self.question_marks.get(question_id)
+            if marks is None:
+                logger.warning(f"Question {question_id} is not part of exam {self.exam_id}. Skipping."); continue
+            owner = self.option_owner.get(option_id)
+            if owner is None or owner[0] != question_id:
+                logger.warning(f"Option {option_id} does not belong to question {question_id}. Recorded as unanswered.")
+                graded.append((question_id, None, None, False)); continue
+            is_correct = option_id in self.correct_option_ids
+            if is_correct:
+                score += marks
+            graded.append((question_id, option_id, owner[1], is_correct))
+        return score, graded
+
+def compile_answer_key(db: Session, exam_id: int, version: int) -> AnswerKey:
+    """Builds an exam's answer key from one question/option query."""
+    rows = db.query(
+        models.MCQQuestion.id, models.MCQQuestion.marks, models.MCQOption.id, models.MCQOption.text, models.MCQOption.is_correct
+    ).outerjoin(
+        models.MCQOption, models.MCQOption.question_id == models.MCQQuestion.id
+    ).filter(models.MCQQuestion.exam_id == exam_id).all()
+
+    question_marks: Dict[int, float] = {}
+    option_owner: Dict[int, Tuple[int, str]] = {}
+    correct = set()
+    for question_id, marks, option_id, option_text, option_is_correct in rows:
+        question_marks[question_id] = marks or 0.0
+        if option_id is not None:
+            option_owner[option_id] = (question_id, option_text)
+            if option_is_correct:
+                correct.add(option_id)
+    return AnswerKey(
+        exam_id=exam_id, version=version, total_marks=round(sum(question_marks.values()), 2),
+        question_marks=question_marks, option_owner=option_owner, correct_option_ids=frozenset(correct),
+    )
+
+class AnswerKeyCache:
+    """
+    Per-process LRU of compiled answer keys. An entry is only used while its version matches
+    the exam row's answer_key_version, so edits made through any worker take effect on the
+    next submission; local invalidation just frees the memory early.
+
+    Compiling reads the database, so it happens outside the lock: in async mode run_db runs
+    this on the event loop thread, where waiting on a lock held across IO deadlocks. A cohort
+    submitting into a cold cache may compile the same key more than once; the lock only
+    guards the LRU itself.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, AnswerKey]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, db: Session, exam_id: int, version: int) -> AnswerKey:
+        key = self._lookup(exam_id, version)
+        if key is not None:
+            return key
+        key = compile_answer_key(db, exam_id, version)
+        with self._lock:
+            self.misses += 1
+            cached = self._entries.get(exam_id)
+            if self.max_entries > 0 and (cached is None or cached.version <= version): # Never replace a newer key
+                self._entries[exam_id] = key
+                self._entries.move_to_end(exam_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return key
+
+    def _lookup(self, exam_id: int, version: int) -> Optional[AnswerKey]:
+        with self._lock:
+            key = self._entries.get(exam_id)
+            if key is None or key.version != version:
+                return None
+            self._entries.move_to_end(exam_id)
+            self.hits += 1
+            return key
+
+    def invalidate(self, exam_id: int):
+        with self._lock:
+            self._entries.pop(exam_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+answer_key_cache = AnswerKeyCache(ANSWER_KEY_CACHE_MAX_ENTRIES)
+
+def get_answer_key(db: Session, exam: models.Exam) -> AnswerKey:
+    """The compiled answer key for the exam's current version (cached)."""
+    return answer_key_cache.get(db, exam.id, exam.answer_key_version or 0)
+
+# --- Legacy JSON Options Migration ---
+def migrate_legacy_mcq_options(db: Session, batch_size: int = 500) -> Tuple[int, int]:
+    """
+    Converts MCQQuestion.options JSON blobs into mcq_options rows, then points existing
+    MCQAnswers at the option whose text they recorded. Idempotent: questions that already
+    have option rows and answers that already have an option id are skipped.
+    Returns (questions converted, answers linked).
+    """
+    converted = linked = 0
+    converted_exam_ids = set()
+    last_id = 0
+    while True:
+        questions = db.query(models.MCQQuestion).options(
+            selectinload(models.MCQQuestion.mcq_options)
+        ).filter(
+            models.MCQQuestion.id > last_id,
+            models.MCQQuestion.options.isnot(None)
+        ).order_by(models.MCQQuestion.id).limit(batch_size).all()
+        if not questions:
+            break
+        last_id = questions[-1].id
+        for mcq in questions:
+            if mcq.mcq_options:
+                continue
+            try:
+                options = _clean_options(json.loads(mcq.options or '[]'))
+            except json.JSONDecodeError:
+                logger.warning(f"Could not parse legacy options for MCQ {mcq.id}; left unconverted.")
+                continue
+            _sync_mcq_options(mcq, options)
+            converted_exam_ids.add(mcq.exam_id)
+            converted += 1
+        db.flush()
+
+        # Link answers of this batch by (question, option text)
+        option_ids = {
+            (opt.question_id, opt.text): opt.id
+            for mcq in questions for opt in mcq.mcq_options
+        }
+        answers = db.query(models.MCQAnswer).filter(
+            models.MCQAnswer.mcq_question_id.in_([mcq.id for mcq in questions]),
+            models.MCQAnswer.selected_option_id.is_(None),
+            models.MCQAnswer.selected_option_text.isnot(None)
+        ).all()
+        for answer in answers:
+            option_id = option_ids.get((answer.mcq_question_id, (answer.selected_option_text or '').strip()))
+            if option_id:
+                answer.selected_option_id = option_id
+                linked += 1
+        try:
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error migrating MCQ options after question {last_id}: {e}", exc_info=True)
+            raise ValueError("Database error migrating MCQ options.")
+    if converted_exam_ids:
+        db.query(models.Exam).filter(models.Exam.id.in_(converted_exam_ids)).update(
+            {models.Exam.answer_key_version: models.Exam.answer_key_version + 1}, synchronize_session=False
+        )
+        db.commit()
+    logger.info(f"Migrated legacy MCQ options: {converted} questions converted, {linked} answers linked.")
+    return converted, linked
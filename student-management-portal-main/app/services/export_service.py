@@ -0,0 +1,241 @@
+# app/services/export_service.py
+"""
+Streaming table exports (CSV or Parquet) for admins and nightly pulls.
+
+Each export is a Core SELECT (plain row tuples, no ORM objects) read in keyset batches of
+EXPORT_BATCH_ROWS: WHERE key > last key ORDER BY key LIMIT n, one statement per batch. That
+bounds memory on every driver; mysql-connector has no server-side cursors, so a single
+streamed SELECT would be buffered whole by the client. Every batch is encoded and handed to
+the HTTP response (or file) before the next one is fetched: memory stays at one batch
+whatever the table size. The whole export runs in one transaction, so on MySQL/InnoDB all
+batches read the same consistent snapshot.
+"""
+
+import csv
+import enum
+import io
+import logging
+import os
+from datetime import date
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from sqlalchemy import Boolean, Date, DateTime, Enum, Float, Integer, Numeric, select
+from sqlalchemy.sql import Select
+
+from app import models
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", 10000)) # Rows per fetch; one Parquet row group each
+
+FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+# --- Export queries (ordered by primary key so the scan follows the clustered index; the
+#     key is the first selected column, batches page on it) ---
+def _students() -> Select:
+    return select(
+        models.Student.id.label("student_id"), models.Student.name, models.User.username, models.User.email,
+        models.Student.dob, models.Student.phone, models.Student.address,
+        models.Department.name.label("department"), models.Student.created_at,
+    ).select_from(models.Student) \
+        .outerjoin(models.User, models.User.id == models.Student.user_id) \
+        .outerjoin(models.Department, models.Department.id == models.Student.department_id) \
+        .order_by(models.Student.id)
+
+def _fees() -> Select:
+    return select(
+        models.FeePayment.id.label("fee_payment_id"), models.FeePayment.student_id,
+        models.Student.name.label("student_name"), models.FeePayment.description, models.FeePayment.amount,
+        models.FeePayment.amount_paid, models.FeePayment.date, models.FeePayment.status,
+        models.FeePayment.payment_method, models.FeePayment.created_at, models.FeePayment.updated_at,
+    ).select_from(models.FeePayment) \
+        .outerjoin(models.Student, models.Student.id == models.FeePayment.student_id) \
+        .order_by(models.FeePayment.id)
+
+def _attendance() -> Select:
+    return select(
+        models.Attendance.id.label("attendance_id"), models.Attendance.student_id,
+        models.Student.name.label("student_name"), models.Attendance.schedule_id,
+        models.Course.name.label("course"), models.Attendance.date, models.Attendance.status,
+    ).select_from(models.Attendance) \
+        .outerjoin(models.Student, models.Student.id == models.Attendance.student_id) \
+        .outerjoin(models.Schedule, models.Schedule.id == models.Attendance.schedule_id) \
+        .outerjoin(models.Course, models.Course.id == models.Schedule.course_id) \
+        .order_by(models.Attendance.id)
+
+def _results() -> Select:
+    return select(
+        models.Result.id.label("result_id"), models.Result.student_id, models.Student.name.label("student_name"),
+        models.Result.exam_id, models.Exam.name.label("exam"), models.Course.name.label("course"),
+        models.Result.score, models.Result.grade, models.Result.is_graded, models.Result.submitted_at,
+    ).select_from(models.Result) \
+        .outerjoin(models.Student, models.Student.id == models.Result.student_id) \
+        .outerjoin(models.Exam, models.Exam.id == models.Result.exam_id) \
+        .outerjoin(models.Course, models.Course.id == models.Exam.course_id) \
+        .order_by(models.Result.id)
+
+def _enrollments() -> Select:
+    return select(
+        models.Enrollment.id.label("enrollment_id"), models.Enrollment.student_id,
+        models.Student.name.label("student_name"), models.Enrollment.course_id,
+        models.Course.name.label("course"), models.Enrollment.enrollment_date,
+    ).select_from(models.Enrollment) \
+        .outerjoin(models.Student, models.Student.id == models.Enrollment.student_id) \
+        .outerjoin(models.Course, models.Course.id == models.Enrollment.course_id) \
+        .order_by(models.Enrollment.id)
+
+def _fee_balances() -> Select:
+    return select(
+        models.StudentFeeBalance.student_id, models.Student.name.label("student_name"),
+        models.StudentFeeBalance.balance, models.StudentFeeBalance.charged_total, models.StudentFeeBalance.paid_total,
+        models.StudentFeeBalance.not_due, models.StudentFeeBalance.overdue_1_30, models.StudentFeeBalance.overdue_31_60,
+        models.StudentFeeBalance.overdue_61_90, models.StudentFeeBalance.overdue_over_90,
+        models.StudentFeeBalance.oldest_due_date, models.StudentFeeBalance.aged_on,
+    ).select_from(models.StudentFeeBalance) \
+        .outerjoin(models.Student, models.Student.id == models.StudentFeeBalance.student_id) \
+        .order_by(models.StudentFeeBalance.student_id)
+
+EXPORTS: Dict[str, Tuple[Callable[[], Select], Any]] = { # table -> (query, key column)
+    "students": (_students, models.Student.id),
+    "fees": (_fees, models.FeePayment.id),
+    "fee_balances": (_fee_balances, models.StudentFeeBalance.student_id),
+    "attendance": (_attendance, models.Attendance.id),
+    "results": (_results, models.Result.id),
+    "enrollments": (_enrollments, models.Enrollment.id),
+}
+
+
+# --- Streaming ---
+def _batches(query: Select, key, batch_rows: int) -> Iterator[List[Tuple]]:
+    """Row tuples of the query, batch by batch: one keyset SELECT (key > last key, LIMIT n) each."""
+    db = SessionLocal()
+    try:
+        last_key = None
+        while True:
+            page = query if last_key is None else query.where(key > last_key)
+            batch = [tuple(row) for row in db.execute(page.limit(batch_rows))]
+            if not batch:
+                break
+            yield batch
+            if len(batch) < batch_rows:
+                break
+            last_key = batch[-1][0]
+    finally:
+        db.close() # Also runs when the client disconnects and the generator is closed
+
+def _enum_columns(query: Select) -> List[int]:
+    return [i for i, column in enumerate(query.selected_columns) if isinstance(column.type, Enum)]
+
+def _plain(batch: List[Tuple], enum_columns: List[int]) -> List[Tuple]:
+    """Enum members -> their values."""
+    if not enum_columns:
+        return batch
+    plain = []
+    for row in batch:
+        row = list(row)
+        for i in enum_columns:
+            if isinstance(row[i], enum.Enum):
+                row[i] = row[i].value
+        plain.append(tuple(row))
+    return plain
+
+def _csv_stream(query: Select, key, batch_rows: int) -> Iterator[bytes]:
+    enum_columns = _enum_columns(query)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.name for column in query.selected_columns])
+    for batch in _batches(query, key, batch_rows):
+        writer.writerows(_plain(batch, enum_columns))
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell(): # Header only (empty table)
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ByteSink(io.RawIOBase):
+    """Write-only file for the Parquet writer that hands out the bytes written since the last drain."""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._position = 0 # Absolute, the writer records column chunk offsets with it
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+def _arrow_schema(pa, query: Select):
+    def arrow_type(sql_type):
+        if isinstance(sql_type, Enum):
+            return pa.string()
+        if isinstance(sql_type, Integer):
+            return pa.int64()
+        if isinstance(sql_type, (Float, Numeric)):
+            return pa.float64()
+        if isinstance(sql_type, Boolean):
+            return pa.bool_()
+        if isinstance(sql_type, DateTime):
+            return pa.timestamp("us")
+        if isinstance(sql_type, Date):
+            return pa.date32()
+        return pa.string()
+    return pa.schema([(column.name, arrow_type(column.type)) for column in query.selected_columns])
+
+def _parquet_stream(pa, pq, query: Select, key, batch_rows: int) -> Iterator[bytes]:
+    schema = _arrow_schema(pa, query)
+    enum_columns = _enum_columns(query)
+    sink = _ByteSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    try:
+        for batch in _batches(query, key, batch_rows):
+            columns = list(zip(*_plain(batch, enum_columns)))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+            )) # One row group per batch
+            yield sink.drain()
+    finally:
+        writer.close() # Writes the footer
+    yield sink.drain()
+
+def open_export(table: str, fmt: str = "csv", batch_rows: int = EXPORT_BATCH_ROWS) -> Tuple[Iterator[bytes], str, str]:
+    """
+    Returns (byte chunk iterator, media type, download filename) for an export.
+    Raises ValueError for an unknown table/format before anything is queried.
+    """
+    if table not in EXPORTS:
+        raise ValueError(f"Unknown export '{table}' (expected one of: {', '.join(EXPORTS)}).")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}' (expected csv or parquet).")
+    build_query, key = EXPORTS[table]
+    query = build_query()
+    batch_rows = max(1, batch_rows)
+    if fmt == "parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Parquet export needs the pyarrow package; use format=csv instead.")
+        chunks = _parquet_stream(pa, pq, query, key, batch_rows)
+    else:
+        chunks = _csv_stream(query, key, batch_rows)
+    media_type, extension = FORMATS[fmt]
+    logger.info(f"Export of {table} as {fmt} started (batches of {batch_rows} rows)")
+    return chunks, media_type, f"{table}-{date.today().isoformat()}.{extension}"
@@ -0,0 +1,266 @@
+# app/services/fee_ledger_service.py
+"""
+Fee ledger and per-student balance summary.
+
+Every change to a fee record's money is recorded as an immutable FeeLedgerEntry: the
+record's charged amount (its amount, or 0 once cancelled/deleted) and paid amount are
+compared before and after the change and the differences are posted as CHARGE/ADJUSTMENT
+and PAYMENT/REFUND entries. fee_service posts them in the same transaction as the fee
+change, and the student's StudentFeeBalance row (running totals plus outstanding money by
+age) is updated under a row lock before the commit. "Who owes what" is then an index range
+scan of student_fee_balances instead of a pass over every fee payment.
+
+Aging buckets move with the calendar: rows aged on an earlier day are re-aged by
+refresh_fee_aging (the outstanding report does it for stale rows before reading).
+"""
+
+import logging
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, case, event, func, insert, or_, select
+from sqlalchemy.orm import Session
+
+from app import database, models
+
+logger = logging.getLogger(__name__)
+
+# Aging buckets: (column, lowest days past due, highest days past due)
+AGING_BUCKETS = (
+    ("overdue_1_30", 1, 30),
+    ("overdue_31_60", 31, 60),
+    ("overdue_61_90", 61, 90),
+    ("overdue_over_90", 91, None),
+)
+BUCKET_COLUMNS = ("not_due",) + tuple(column for column, _, _ in AGING_BUCKETS)
+
+def _open_fee_filter():
+    """Fee records with money outstanding (cancelled ones owe nothing)."""
+    return and_(
+        models.FeePayment.status != models.PaymentStatus.CANCELLED,
+        models.FeePayment.amount_paid < models.FeePayment.amount
+    )
+
+def _stale_filter(as_of: date):
+    """Balance rows whose aging is out of date: never aged, or aged earlier with money outstanding."""
+    balances = models.StudentFeeBalance
+    return or_(balances.aged_on.is_(None), and_(balances.aged_on < as_of, balances.oldest_due_date.isnot(None)))
+
+
+@event.listens_for(models.FeeLedgerEntry, "before_update")
+def _ledger_entries_are_immutable(mapper, connection, target):
+    raise ValueError("Fee ledger entries are immutable; post an adjustment instead.")
+
+
+# --- Posting ---
+def fee_position(fee: Optional[models.FeePayment]) -> Tuple[float, float]:
+    """(charged, paid) of a fee record as the ledger sees it; (0, 0) for none/deleted."""
+    if fee is None:
+        return 0.0, 0.0
+    charged = 0.0 if fee.status == models.PaymentStatus.CANCELLED else float(fee.amount or 0.0)
+    return round(charged, 2), round(float(fee.amount_paid or 0.0), 2)
+
+def post_fee_change(
+    db: Session, student_id: int, fee_payment_id: int, before: Tuple[float, float], after: Tuple[float, float],
+    description: Optional[str] = None, is_new: bool = False
+) -> List[models.FeeLedgerEntry]:
+    """
+    Posts the ledger entries that take a fee record from `before` to `after` (charged, paid)
+    and updates the student's balance row. Does not commit: call inside the fee change's
+    transaction, after locking the fee record.
+    """
+    charge_delta = round(after[0] - before[0], 2)
+    paid_delta = round(after[1] - before[1], 2)
+    entries = []
+    if charge_delta:
+        entry_type = models.LedgerEntryType.CHARGE if is_new else models.LedgerEntryType.ADJUSTMENT
+        entries.append(models.FeeLedgerEntry(
+            student_id=student_id, fee_payment_id=fee_payment_id, entry_type=entry_type,
+            amount=charge_delta, description=description
+        ))
+    if paid_delta:
+        entry_type = models.LedgerEntryType.PAYMENT if paid_delta > 0 else models.LedgerEntryType.REFUND
+        entries.append(models.FeeLedgerEntry(
+            student_id=student_id, fee_payment_id=fee_payment_id, entry_type=entry_type,
+            amount=-paid_delta, description=description
+        ))
+    db.add_all(entries)
+    # Aging depends on due dates and statuses too, so the row is refreshed even without entries
+    _update_balance(db, student_id, charge_delta, paid_delta)
+    return entries
+
+def lock_balance_row(db: Session, student_id: int) -> models.StudentFeeBalance:
+    """
+    The student's balance row, created if missing and locked until commit. Fee changes take
+    it before locking the fee record itself, so changes of one student queue up here.
+    """
+    table = models.StudentFeeBalance.__table__
+    database.bulk_upsert(db, table, [{"student_id": student_id}], ["student_id"], lambda new: {"student_id": new.student_id})
+    return db.query(models.StudentFeeBalance).filter(
+        models.StudentFeeBalance.student_id == student_id
+    ).populate_existing().with_for_update().one()
+
+def _aging(rows, as_of: date) -> Dict[str, Any]:
+    """Bucket totals and oldest due date of (due_date, outstanding) pairs."""
+    buckets = {column: 0.0 for column in BUCKET_COLUMNS}
+    oldest = None
+    for due_date, outstanding in rows:
+        if outstanding <= 0:
+            continue
+        days = (as_of - due_date).days if due_date else 0
+        column = "not_due"
+        for bucket, low, high in AGING_BUCKETS:
+            if days >= low and (high is None or days <= high):
+                column = bucket
+                break
+        buckets[column] += outstanding
+        if due_date and (oldest is None or due_date < oldest):
+            oldest = due_date
+    buckets = {column: round(value, 2) for column, value in buckets.items()}
+    buckets["oldest_due_date"] = oldest
+    return buckets
+
+def _open_fees(db: Session, student_id: int):
+    # Locking read: sees fee changes committed after this transaction's snapshot
+    return db.query(
+        models.FeePayment.date, models.FeePayment.amount - models.FeePayment.amount_paid
+    ).filter(
+        models.FeePayment.student_id == student_id, _open_fee_filter()
+    ).with_for_update().all()
+
+def _update_balance(db: Session, student_id: int, charge_delta: float, paid_delta: float):
+    db.flush() # The fee change itself, so the aging read below sees it
+    row = lock_balance_row(db, student_id)
+    row.charged_total = round(row.charged_total + charge_delta, 2)
+    row.paid_total = round(row.paid_total + paid_delta, 2)
+    row.balance = round(row.charged_total - row.paid_total, 2)
+    today = date.today()
+    for column, value in _aging(_open_fees(db, student_id), today).items():
+        setattr(row, column, value)
+    row.aged_on = today
+
+
+# --- Aging refresh ---
+def refresh_fee_aging(db: Session, as_of: Optional[date] = None) -> int:
+    """
+    Re-buckets the outstanding money of balance rows aged before `as_of` (default today)
+    from their open fee records, in batched passes. Commits; returns rows updated.
+    """
+    as_of = as_of or date.today()
+    stale = [student_id for (student_id,) in db.query(models.StudentFeeBalance.student_id).filter(_stale_filter(as_of)).all()]
+    if not stale:
+        return 0
+    open_fees: Dict[int, list] = {student_id: [] for student_id in stale}
+    for start in range(0, len(stale), 1000):
+        batch = stale[start:start + 1000]
+        for student_id, due_date, outstanding in db.query(
+            models.FeePayment.student_id, models.FeePayment.date, models.FeePayment.amount - models.FeePayment.amount_paid
+        ).filter(
+            models.FeePayment.student_id.in_(batch), _open_fee_filter()
+        ).all():
+            open_fees[student_id].append((due_date, outstanding))
+    table = models.StudentFeeBalance.__table__
+    rows = [{"student_id": student_id, "aged_on": as_of, **_aging(fees, as_of)} for student_id, fees in open_fees.items()]
+    for start in range(0, len(rows), 1000):
+        database.bulk_upsert(
+            db, table, rows[start:start + 1000], ["student_id"],
+            lambda new: {column: getattr(new, column) for column in BUCKET_COLUMNS + ("oldest_due_date", "aged_on")}
+        )
+    db.commit()
+    logger.info(f"Fee aging refreshed for {len(rows)} students as of {as_of}")
+    return len(rows)
+
+
+# --- Reports ---
+def get_student_balance(db: Session, student_id: int) -> Optional[models.StudentFeeBalance]:
+    return db.query(models.StudentFeeBalance).filter(models.StudentFeeBalance.student_id == student_id).first()
+
+def get_student_statement(db: Session, student_id: int, limit: int = 200) -> List[models.FeeLedgerEntry]:
+    """The student's latest ledger entries, newest first."""
+    return db.query(models.FeeLedgerEntry).filter(
+        models.FeeLedgerEntry.student_id == student_id
+    ).order_by(models.FeeLedgerEntry.id.desc()).limit(limit).all()
+
+def get_outstanding_report(db: Session, min_balance: float = 0.01, limit: int = 500, offset: int = 0) -> Dict[str, Any]:
+    """
+    Students owing at least `min_balance`, largest balance first, with aging buckets and
+    totals. Reads student_fee_balances only (range scan of the balance index).
+    """
+    if db.query(models.StudentFeeBalance.student_id).filter(_stale_filter(date.today())).first():
+        refresh_fee_aging(db)
+    balances = models.StudentFeeBalance
+    owing = balances.balance >= min_balance
+    totals = db.query(
+        func.count(balances.student_id), func.coalesce(func.sum(balances.balance), 0.0),
+        *[func.coalesce(func.sum(getattr(balances, column)), 0.0) for column in BUCKET_COLUMNS]
+    ).filter(owing).one()
+    rows = db.query(balances, models.Student.name).join(
+        models.Student, models.Student.id == balances.student_id
+    ).filter(owing).order_by(balances.balance.desc(), balances.student_id).offset(offset).limit(limit).all()
+    return {
+        "as_of": date.today().isoformat(),
+        "students_owing": totals[0],
+        "total_outstanding": round(totals[1], 2),
+        "aging_totals": {column: round(value, 2) for column, value in zip(BUCKET_COLUMNS, totals[2:])},
+        "students": [
+            {
+                "student_id": row.student_id, "name": name, "balance": row.balance,
+                "oldest_due_date": row.oldest_due_date.isoformat() if row.oldest_due_date else None,
+                **{column: getattr(row, column) for column in BUCKET_COLUMNS},
+            }
+            for row, name in rows
+        ],
+    }
+
+
+# --- Rebuild (upgrade / repair) ---
+def rebuild_fee_ledger(db: Session) -> Dict[str, int]:
+    """
+    Posts opening CHARGE/PAYMENT entries for fee records that have no ledger entries yet
+    (records from before the ledger existed), then recomputes every balance row from the
+    ledger with one grouped INSERT...SELECT and re-ages it. Commits.
+    """
+    has_entries = select(models.FeeLedgerEntry.id).where(
+        models.FeeLedgerEntry.fee_payment_id == models.FeePayment.id
+    ).exists()
+    opened = 0
+    last_id = 0
+    while True:
+        fees = db.query(models.FeePayment).filter(
+            models.FeePayment.id > last_id, models.FeePayment.student_id.isnot(None), ~has_entries
+        ).order_by(models.FeePayment.id).limit(1000).all()
+        if not fees:
+            break
+        entries = []
+        for fee in fees:
+            charged, paid = fee_position(fee)
+            if charged:
+                entries.append({"student_id": fee.student_id, "fee_payment_id": fee.id, "amount": charged,
+                                "entry_type": models.LedgerEntryType.CHARGE, "description": "Opening balance"})
+            if paid:
+                entries.append({"student_id": fee.student_id, "fee_payment_id": fee.id, "amount": -paid,
+                                "entry_type": models.LedgerEntryType.PAYMENT, "description": "Opening balance"})
+        if entries:
+            db.execute(insert(models.FeeLedgerEntry), entries)
+        opened += len(fees)
+        last_id = fees[-1].id
+        db.commit()
+
+    entries = models.FeeLedgerEntry
+    db.query(models.StudentFeeBalance).delete(synchronize_session=False)
+    charge_kinds = (models.LedgerEntryType.CHARGE, models.LedgerEntryType.ADJUSTMENT)
+    charged = func.coalesce(func.sum(case((entries.entry_type.in_(charge_kinds), entries.amount), else_=0.0)), 0.0)
+    summary = select(
+        entries.student_id,
+        func.round(charged, 2),
+        func.round(charged - func.sum(entries.amount), 2),
+        func.round(func.sum(entries.amount), 2),
+    ).group_by(entries.student_id)
+    db.execute(insert(models.StudentFeeBalance.__table__).from_select(
+        ["student_id", "charged_total", "paid_total", "balance"], summary
+    ))
+    db.commit()
+    students = db.query(func.count(models.StudentFeeBalance.student_id)).scalar()
+    refresh_fee_aging(db)
+    logger.info(f"Fee ledger rebuilt: {opened} fee records opened, {students} balances recomputed")
+    return {"fee_records_opened": opened, "balances": students}
@@ -0,0 +1,191 @@
+# app/services/fee_overdue_service.py
+"""
+Overdue sweep for fee payments.
+
+PENDING fee records whose due date has passed are flipped to OVERDUE in bounded batches:
+each batch picks up to FEE_OVERDUE_SWEEP_BATCH_SIZE ids from the (status, date) index and
+flips them with one set-based UPDATE (re-checking the status, so a payment committed in
+between is left alone), then commits, so locks are held for one batch at a time. The same
+pass re-ages the per-student fee balances (fee_ledger_service), which also move with the
+calendar.
+
+A background thread runs the sweep every FEE_OVERDUE_SWEEP_INTERVAL_SECONDS (0 disables it;
+use `python -m app.cli sweep-overdue-fees` from cron instead). The sweep is idempotent, so
+several app workers running it is harmless.
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import update
+from sqlalchemy.exc import OperationalError
+
+from app import models
+from app.database import SessionLocal
+from app.services import dashboard_service, fee_ledger_service
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+FEE_OVERDUE_SWEEP_INTERVAL_SECONDS = float(os.getenv("FEE_OVERDUE_SWEEP_INTERVAL_SECONDS", 3600))
+FEE_OVERDUE_SWEEP_BATCH_SIZE = int(os.getenv("FEE_OVERDUE_SWEEP_BATCH_SIZE", 500))
+MAX_BATCH_RETRIES = 3 # Deadlock victims (a fee change locking rows of the same batch) are retried
+
+
+class SweepMetrics:
+    """Counters of the sweeps run by this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.errors = 0
+        self.rows_total = 0
+        self.last_run_at: Optional[str] = None
+        self.last_as_of: Optional[str] = None
+        self.last_rows = 0
+        self.last_batches = 0
+        self.last_balances_aged = 0
+        self.last_seconds = 0.0
+        self.max_seconds = 0.0
+        self.last_error: Optional[str] = None
+
+    def record(self, report: Dict[str, Any]):
+        with self._lock:
+            self.runs += 1
+            self.rows_total += report["rows"]
+            self.last_run_at = datetime.now().isoformat(timespec="seconds")
+            self.last_as_of = report["as_of"]
+            self.last_rows = report["rows"]
+            self.last_batches = report["batches"]
+            self.last_balances_aged = report["balances_aged"]
+            self.last_seconds = report["seconds"]
+            self.max_seconds = max(self.max_seconds, report["seconds"])
+
+    def record_error(self, error: Exception):
+        with self._lock:
+            self.errors += 1
+            self.last_error = f"{type(error).__name__}: {error}"
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "interval_seconds": FEE_OVERDUE_SWEEP_INTERVAL_SECONDS,
+                "batch_size": FEE_OVERDUE_SWEEP_BATCH_SIZE,
+                "runs": self.runs,
+                "errors": self.errors,
+                "rows_total": self.rows_total,
+                "last_run_at": self.last_run_at,
+                "last_as_of": self.last_as_of,
+                "last_rows": self.last_rows,
+                "last_batches": self.last_batches,
+                "last_balances_aged": self.last_balances_aged,
+                "last_seconds": self.last_seconds,
+                "max_seconds": self.max_seconds,
+                "last_error": self.last_error,
+            }
+
+sweep_metrics = SweepMetrics()
+
+
+def _overdue_batch(db, as_of: date, batch_size: int):
+    """(id, student_id) of up to batch_size PENDING records due before as_of."""
+    return db.query(models.FeePayment.id, models.FeePayment.student_id).filter(
+        models.FeePayment.status == models.PaymentStatus.PENDING,
+        models.FeePayment.date < as_of,
+        models.FeePayment.amount_paid < models.FeePayment.amount
+    ).order_by(models.FeePayment.date, models.FeePayment.id).limit(batch_size).all()
+
+def sweep_overdue_fees(as_of: Optional[date] = None, batch_size: int = FEE_OVERDUE_SWEEP_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    Flips every PENDING fee record due before `as_of` (default today) to OVERDUE, one
+    committed batch at a time, then re-ages the fee balances. Returns
+    {as_of, rows, batches, balances_aged, seconds}.
+    """
+    as_of = as_of or date.today()
+    batch_size = max(1, batch_size)
+    started = time.perf_counter()
+    rows = batches = retries = 0
+    db = SessionLocal()
+    try:
+        while True:
+            try:
+                batch = _overdue_batch(db, as_of, batch_size)
+                if not batch:
+                    break
+                result = db.execute(
+                    update(models.FeePayment).where(
+                        models.FeePayment.id.in_([fee_id for fee_id, _ in batch]),
+                        models.FeePayment.status == models.PaymentStatus.PENDING # Paid since the select: leave it
+                    ).values(status=models.PaymentStatus.OVERDUE, updated_at=datetime.now())
+                    .execution_options(synchronize_session=False)
+                )
+                db.commit()
+            except OperationalError as e:
+                db.rollback()
+                retries += 1
+                if retries > MAX_BATCH_RETRIES:
+                    raise
+                logger.warning(f"Overdue sweep batch failed ({e.orig}); retrying")
+                continue
+            rows += result.rowcount
+            batches += 1
+            dashboard_service.invalidate_student_dashboard(*{student_id for _, student_id in batch if student_id})
+            if len(batch) < batch_size:
+                break
+        balances_aged = fee_ledger_service.refresh_fee_aging(db, as_of)
+    finally:
+        db.close()
+    report = {
+        "as_of": as_of.isoformat(), "rows": rows, "batches": batches,
+        "balances_aged": balances_aged, "seconds": round(time.perf_counter() - started, 3),
+    }
+    sweep_metrics.record(report)
+    logger.info(f"Overdue sweep as of {as_of}: {rows} fee records marked OVERDUE in {batches} batches, {balances_aged} balances re-aged ({report['seconds']}s)")
+    return report
+
+
+class _Sweeper:
+    """Background thread running sweep_overdue_fees on an interval (first run right after start)."""
+
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                sweep_overdue_fees()
+            except Exception as e:
+                sweep_metrics.record_error(e)
+                logger.error(f"Overdue fee sweep failed: {e}", exc_info=True)
+            self._stop.wait(self.interval_seconds)
+
+    def start(self):
+        if self.interval_seconds <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="fee-overdue-sweeper", daemon=True)
+        self._thread.start()
+        logger.info(f"Overdue fee sweeper started (every {self.interval_seconds}s).")
+
+    def shutdown(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(5) # A sweep in progress finishes its batch; the daemon thread does not block exit
+            self._thread = None
+
+_sweeper = _Sweeper(FEE_OVERDUE_SWEEP_INTERVAL_SECONDS)
+
+def get_metrics() -> Dict[str, Any]:
+    return sweep_metrics.snapshot()
+
+def start():
+    _sweeper.start()
+
+def shutdown():
+    _sweeper.shutdown()
@@ -0,0 +1,246 @@
+# app/services/fee_plan_service.py
+"""
+Fee plans: term charges for a whole cohort (a department, or every student).
+
+A student's charge is the plan's tuition, plus their Hostel.fees when the plan includes
+hostel, minus scholarship_share of the scholarships awarded to them (for the plan's
+academic year), floored at 0. Generation is set-based: one INSERT ... SELECT creates the
+PENDING fee records, one posts their CHARGE ledger entries and one UPDATE moves the
+students' fee balances, all in one transaction. A student gets at most one plan charge per
+term: the cohort skips students any plan of the term has charged, so a rerun (e.g. after
+new students joined) only charges newcomers, and a second plan for the same term (or an
+all-students plan over a department plan) never charges anyone twice. Generation runs of
+a term's plans are serialised; the (fee_plan_id, student_id) unique key backs this up
+per plan. Preview runs the same SELECT without writing.
+"""
+
+import logging
+import time
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Date, Float, String, case, func, insert, literal, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload
+
+from app import models
+from app.services import dashboard_service, fee_ledger_service
+
+logger = logging.getLogger(__name__)
+
+
+# --- Plans ---
+def get_fee_plans(db: Session) -> List[models.FeePlan]:
+    return db.query(models.FeePlan).options(
+        joinedload(models.FeePlan.department)
+    ).order_by(models.FeePlan.id.desc()).all()
+
+def get_fee_plan(db: Session, plan_id: int) -> Optional[models.FeePlan]:
+    return db.query(models.FeePlan).filter(models.FeePlan.id == plan_id).first()
+
+def create_fee_plan(
+    db: Session, name: str, term: str, tuition_amount: float, due_date: date,
+    department_id: Optional[int] = None, academic_year: Optional[str] = None,
+    include_hostel: bool = True, apply_scholarships: bool = True, scholarship_share: float = 1.0
+) -> models.FeePlan:
+    name, term = (name or "").strip(), (term or "").strip()
+    if not name or not term:
+        raise ValueError("Plan name and term are required.")
+    if tuition_amount < 0:
+        raise ValueError("Tuition amount cannot be negative.")
+    if not 0 <= scholarship_share <= 1:
+        raise ValueError("Scholarship share must be between 0 and 1.")
+    if department_id is not None and not db.query(models.Department.id).filter(models.Department.id == department_id).first():
+        raise ValueError(f"Department with ID {department_id} not found.")
+    plan = models.FeePlan(
+        name=name, term=term, academic_year=(academic_year or "").strip() or None, department_id=department_id,
+        tuition_amount=round(tuition_amount, 2), include_hostel=include_hostel,
+        apply_scholarships=apply_scholarships, scholarship_share=scholarship_share, due_date=due_date
+    )
+    db.add(plan)
+    try:
+        db.commit(); db.refresh(plan)
+    except IntegrityError:
+        db.rollback()
+        raise ValueError(f"A fee plan named '{name}' already exists for term {term}.")
+    logger.info(f"Fee plan {plan.id} ({name}, {term}) created")
+    return plan
+
+
+# --- Charge computation ---
+def _plan_description(plan: models.FeePlan) -> str:
+    return f"{plan.name} ({plan.term})"
+
+def _term_plan_ids(plan: models.FeePlan):
+    return select(models.FeePlan.id).where(models.FeePlan.term == plan.term)
+
+def _already_charged(plan: models.FeePlan):
+    """The student has a charge from this plan or another plan of the same term."""
+    return select(models.FeePayment.id).where(
+        models.FeePayment.fee_plan_id.in_(_term_plan_ids(plan)), models.FeePayment.student_id == models.Student.id
+    ).exists()
+
+def _charges(plan: models.FeePlan):
+    """Subquery of (student_id, tuition, hostel, scholarship, amount) for cohort students no plan of the term has charged."""
+    tuition = literal(float(plan.tuition_amount), Float)
+    hostel = literal(0.0, Float)
+    if plan.include_hostel:
+        hostel = select(func.coalesce(func.sum(models.Hostel.fees), 0.0)).where(
+            models.Hostel.student_id == models.Student.id
+        ).scalar_subquery()
+    scholarship = literal(0.0, Float)
+    if plan.apply_scholarships and plan.scholarship_share:
+        awards = select(func.coalesce(func.sum(models.Scholarship.amount), 0.0)).select_from(models.StudentScholarship).join(
+            models.Scholarship, models.Scholarship.id == models.StudentScholarship.scholarship_id
+        ).where(models.StudentScholarship.student_id == models.Student.id)
+        if plan.academic_year:
+            awards = awards.where(models.StudentScholarship.academic_year == plan.academic_year)
+        scholarship = awards.scalar_subquery() * float(plan.scholarship_share)
+    cohort = select(
+        models.Student.id.label("student_id"), tuition.label("tuition"),
+        hostel.label("hostel"), scholarship.label("scholarship")
+    ).where(~_already_charged(plan))
+    if plan.department_id is not None:
+        cohort = cohort.where(models.Student.department_id == plan.department_id)
+    cohort = cohort.subquery()
+    gross = cohort.c.tuition + cohort.c.hostel
+    amount = func.round(case((gross > cohort.c.scholarship, gross - cohort.c.scholarship), else_=0.0), 2)
+    return select(
+        cohort.c.student_id, cohort.c.tuition, cohort.c.hostel, cohort.c.scholarship, amount.label("amount")
+    ).subquery()
+
+def _require_plan(db: Session, plan_id: int, lock: bool = False) -> models.FeePlan:
+    if lock:
+        # Serialises generation runs of every plan of the term (they skip each other's students);
+        # all of them are locked in id order, so two runs cannot deadlock
+        term = db.query(models.FeePlan.term).filter(models.FeePlan.id == plan_id).scalar()
+        db.query(models.FeePlan.id).filter(models.FeePlan.term == term).order_by(models.FeePlan.id).with_for_update().all()
+    plan = db.query(models.FeePlan).filter(models.FeePlan.id == plan_id).first()
+    if not plan:
+        raise ValueError(f"Fee plan with ID {plan_id} not found.")
+    return plan
+
+
+# --- Preview ---
+def preview_fee_plan(db: Session, plan_id: int, limit: int = 100) -> Dict[str, Any]:
+    """What generating the plan now would charge: totals plus the first `limit` students. Writes nothing."""
+    plan = _require_plan(db, plan_id)
+    charges = _charges(plan)
+    totals = db.execute(select(
+        func.count(),
+        func.coalesce(func.sum(case((charges.c.amount > 0, 1), else_=0)), 0),
+        func.coalesce(func.sum(charges.c.amount), 0.0),
+        func.coalesce(func.sum(charges.c.hostel), 0.0),
+        func.coalesce(func.sum(charges.c.scholarship), 0.0),
+    ).select_from(charges)).one()
+    rows = db.execute(
+        select(charges, models.Student.name).join(models.Student, models.Student.id == charges.c.student_id)
+        .order_by(charges.c.student_id).limit(limit)
+    ).all()
+    already = db.query(func.count(models.FeePayment.id)).filter(models.FeePayment.fee_plan_id == plan.id).scalar()
+    other_plans = db.query(func.count(models.FeePayment.id)).join(
+        models.Student, models.Student.id == models.FeePayment.student_id
+    ).filter(
+        models.FeePayment.fee_plan_id.in_(_term_plan_ids(plan)), models.FeePayment.fee_plan_id != plan.id,
+        *([models.Student.department_id == plan.department_id] if plan.department_id is not None else [])
+    ).scalar()
+    return {
+        "plan_id": plan.id, "term": plan.term, "description": _plan_description(plan),
+        "due_date": plan.due_date.isoformat(),
+        "students": totals[0], "to_charge": int(totals[1]), "fully_covered": totals[0] - int(totals[1]),
+        "already_charged": already, "charged_by_other_plans": other_plans,
+        "total_amount": round(totals[2], 2), "total_hostel": round(totals[3], 2), "total_scholarship": round(totals[4], 2),
+        "sample": [
+            {"student_id": row.student_id, "name": row.name, "tuition": round(row.tuition, 2), "hostel": round(row.hostel, 2),
+             "scholarship": round(row.scholarship, 2), "amount": row.amount}
+            for row in rows
+        ],
+    }
+
+
+# --- Generation ---
+def generate_fee_plan(db: Session, plan_id: int) -> Dict[str, Any]:
+    """
+    Charges every cohort student no plan of the term has charged yet (amount > 0): fee records,
+    CHARGE ledger entries and balances in one transaction, then re-ages those balances.
+    Returns {plan_id, term, generated, total_amount, already_charged, seconds}.
+    """
+    started = time.perf_counter()
+    plan = _require_plan(db, plan_id, lock=True)
+    description = _plan_description(plan)
+    charges = _charges(plan)
+    to_charge = select(charges.c.student_id, charges.c.amount).where(charges.c.amount > 0)
+    balances = models.StudentFeeBalance
+    try:
+        # Balance rows first, created if missing and locked: the same order as single fee changes
+        db.execute(insert(balances.__table__).from_select(
+            ["student_id"],
+            select(charges.c.student_id).where(
+                charges.c.amount > 0,
+                ~select(balances.student_id).where(balances.student_id == charges.c.student_id).exists()
+            )
+        ))
+        student_ids = db.execute(
+            select(balances.student_id).where(balances.student_id.in_(select(to_charge.subquery().c.student_id)))
+            .with_for_update()
+        ).scalars().all()
+        if not student_ids:
+            db.rollback()
+            return {"plan_id": plan.id, "term": plan.term, "generated": 0, "total_amount": 0.0,
+                    "already_charged": plan.generated_count, "seconds": round(time.perf_counter() - started, 3)}
+
+        # The term charges themselves
+        new_fees = to_charge.subquery()
+        generated = db.execute(insert(models.FeePayment).from_select(
+            ["student_id", "amount", "amount_paid", "date", "status", "description", "fee_plan_id"],
+            select(
+                new_fees.c.student_id, new_fees.c.amount, literal(0.0, Float), literal(plan.due_date, Date),
+                literal(models.PaymentStatus.PENDING, models.FeePayment.status.type),
+                literal(description, String), literal(plan.id)
+            )
+        )).rowcount
+
+        # Fee records of the plan without ledger entries are the ones just inserted
+        unposted = [
+            models.FeePayment.fee_plan_id == plan.id,
+            ~select(models.FeeLedgerEntry.id).where(models.FeeLedgerEntry.fee_payment_id == models.FeePayment.id).exists(),
+        ]
+        total_amount = db.query(func.coalesce(func.sum(models.FeePayment.amount), 0.0)).filter(*unposted).scalar()
+        charged = select(func.coalesce(func.sum(models.FeePayment.amount), 0.0)).where(
+            models.FeePayment.student_id == balances.student_id, *unposted
+        ).scalar_subquery()
+        db.execute(
+            update(balances).where(
+                balances.student_id.in_(select(models.FeePayment.student_id).where(*unposted))
+            ).values(
+                charged_total=func.round(balances.charged_total + charged, 2),
+                balance=func.round(balances.balance + charged, 2),
+                aged_on=None # Re-aged below
+            ).execution_options(synchronize_session=False)
+        )
+        db.execute(insert(models.FeeLedgerEntry).from_select(
+            ["student_id", "fee_payment_id", "entry_type", "amount", "description"],
+            select(
+                models.FeePayment.student_id, models.FeePayment.id,
+                literal(models.LedgerEntryType.CHARGE, models.FeeLedgerEntry.entry_type.type),
+                models.FeePayment.amount, models.FeePayment.description
+            ).where(*unposted)
+        ))
+        plan.generated_at = datetime.now()
+        plan.generated_count = db.query(func.count(models.FeePayment.id)).filter(models.FeePayment.fee_plan_id == plan.id).scalar()
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        logger.warning(f"Fee plan {plan_id} generation conflicted with a concurrent change: {e.orig}")
+        raise ValueError("Another change touched the same students; generate the plan again.")
+    except Exception:
+        db.rollback()
+        raise
+    dashboard_service.invalidate_student_dashboard(*student_ids)
+    fee_ledger_service.refresh_fee_aging(db)
+    report = {
+        "plan_id": plan.id, "term": plan.term, "generated": generated, "total_amount": round(total_amount, 2),
+        "already_charged": plan.generated_count - generated, "seconds": round(time.perf_counter() - started, 3),
+    }
+    logger.info(f"Fee plan {plan.id} ({description}): {generated} fee records generated in {report['seconds']}s")
+    return report
@@ -1,16 +1,18 @@
 # app/services/fee_service.py
 from sqlalchemy.orm import Session, joinedload, selectinload
 from app import models
+from app.services import dashboard_service, fee_ledger_service
 from typing import List, Optional, Dict, Any
 from datetime import date
 import logging
 
 logger = logging.getLogger(__name__)
 
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, joinedload, contains_eager
 from sqlalchemy import func # Import func for ilike
 from typing import Optional, List
 from app import models
+from app.pagination import Page, PageRequest, keyset_paginate
 
 # ... other imports and functions ...
 
@@ -43,11 +45,53 @@ def get_all_fee_payments(
 
     return query.all()
 
+# Sortable columns for the admin fee list (must be non-NULL, see app/pagination.py)
+FEE_SORT_KEYS = {
+    "due_date": models.FeePayment.date,
+    "amount": models.FeePayment.amount,
+    "student": models.Student.name,
+    "id": models.FeePayment.id,
+}
+
+def get_fee_payments_page(
+    db: Session,
+    page: PageRequest,
+    student_id: Optional[int] = None,
+    status: Optional[str] = None,
+    search_student: Optional[str] = None
+) -> Page:
+    """One keyset page of fee payments, with the same filters as get_all_fee_payments."""
+    query = db.query(models.FeePayment).join(models.FeePayment.student)
+    if student_id:
+        query = query.filter(models.FeePayment.student_id == student_id)
+    if status and status in models.PaymentStatus.__members__:
+        query = query.filter(models.FeePayment.status == models.PaymentStatus[status])
+    if search_student and search_student.strip():
+        query = query.filter(models.Student.name.ilike(f"%{search_student.strip()}%"))
+    return keyset_paginate(
+        query, page, FEE_SORT_KEYS, default_sort="due_date", default_order="desc",
+        id_column=models.FeePayment.id,
+        options=[contains_eager(models.FeePayment.student).joinedload(models.Student.user)]
+    )
+
 def get_fee_payment_by_id(db: Session, payment_id: int) -> Optional[models.FeePayment]:
      return db.query(models.FeePayment).options(
          joinedload(models.FeePayment.student).joinedload(models.Student.user)
      ).filter(models.FeePayment.id == payment_id).first()
 
+def _lock_fee(db: Session, payment_id: int, student_id: Optional[int] = None) -> Optional[models.FeePayment]:
+    """
+    The fee record, locked until commit so concurrent changes post their ledger entries one
+    after another. The student's balance row is locked first (same order as every fee change).
+    """
+    owner = db.query(models.FeePayment.student_id).filter(models.FeePayment.id == payment_id).scalar()
+    if owner is not None:
+        fee_ledger_service.lock_balance_row(db, owner)
+    query = db.query(models.FeePayment).filter(models.FeePayment.id == payment_id)
+    if student_id is not None:
+        query = query.filter(models.FeePayment.student_id == student_id) # Ensure student owns the record
+    return query.populate_existing().with_for_update().first()
+
 def create_fee_record(db: Session, student_id: int, amount: float, due_date: date, description: Optional[str] = "Fee Due") -> models.FeePayment:
     # Check if student exists
     student = db.query(models.Student).filter(models.Student.id == student_id).first()
@@ -64,9 +108,16 @@ def create_fee_record(db: Session, student_id: int, amount: float, due_date: dat
         status=models.PaymentStatus.PENDING # Default status
         # payment_method=None, # Null initially
     )
-    db.add(db_fee)
     try:
+        fee_ledger_service.lock_balance_row(db, student_id)
+        db.add(db_fee)
+        db.flush() # Fee id for the ledger
+        fee_ledger_service.post_fee_change(
+            db, student_id, db_fee.id, (0.0, 0.0), fee_ledger_service.fee_position(db_fee),
+            description=description, is_new=True
+        )
         db.commit(); db.refresh(db_fee)
+        dashboard_service.invalidate_student_dashboard(student_id)
         return db_fee
     except Exception as e:
         db.rollback(); logger.error(f"Error creating fee record: {e}");
@@ -74,8 +125,9 @@ def create_fee_record(db: Session, student_id: int, amount: float, due_date: dat
 def update_fee_record_details(db: Session, payment_id: int, update_data: Dict[str, Any]) -> Optional[models.FeePayment]:
     """Updates details of a fee record (description, due date, amount due) - Admin action."""
     # Does NOT update payment status/details directly
-    db_fee = get_fee_payment_by_id(db, payment_id)
+    db_fee = _lock_fee(db, payment_id)
     if not db_fee: return None
+    before = fee_ledger_service.fee_position(db_fee)
 
     updated = False
     # Only allow edits if not already fully PAID? Or allow correcting details? Let's allow for now.
@@ -115,10 +167,18 @@ def update_fee_record_details(db: Session, payment_id: int, update_data: Dict[st
                  db_fee.status = new_pending_status
                  updated = True
 
-    if not updated: return db_fee # No changes made
+    if not updated:
+        db.rollback() # Release the row lock
+        return db_fee # No changes made
 
     try:
-        db.add(db_fee); db.commit(); db.refresh(db_fee)
+        db.add(db_fee)
+        fee_ledger_service.post_fee_change(
+            db, db_fee.student_id, db_fee.id, before, fee_ledger_service.fee_position(db_fee),
+            description="Cancelled" if db_fee.status == models.PaymentStatus.CANCELLED else "Fee details changed"
+        )
+        db.commit(); db.refresh(db_fee)
+        dashboard_service.invalidate_student_dashboard(db_fee.student_id)
         logger.info(f"Admin updated fee record {payment_id} details.")
         return db_fee
     except Exception as e:
@@ -128,10 +188,7 @@ def update_fee_record_details(db: Session, payment_id: int, update_data: Dict[st
 # --- NEW: Service for Student Payment Action ---
 def record_student_payment(db: Session, payment_id: int, student_id: int) -> Optional[models.FeePayment]:
     """Marks a fee record as PAID by the student."""
-    db_fee = db.query(models.FeePayment).filter(
-        models.FeePayment.id == payment_id,
-        models.FeePayment.student_id == student_id # Ensure student owns the record
-    ).first()
+    db_fee = _lock_fee(db, payment_id, student_id=student_id) # Locked: a double submit cannot pay twice
 
     if not db_fee:
         logger.warning(f"Student {student_id} tried to pay non-existent/unauthorized fee record {payment_id}")
@@ -139,8 +196,10 @@ def record_student_payment(db: Session, payment_id: int, student_id: int) -> Opt
 
     # Check if already paid or cancelled
     if db_fee.status in [models.PaymentStatus.PAID]:
+        db.rollback()
         raise ValueError(f"Fee record is already {db_fee.status.value.lower()} and cannot be paid again.")
 
+    before = fee_ledger_service.fee_position(db_fee)
     # Mark as fully paid (simple model)
     db_fee.amount_paid = db_fee.amount # Set paid amount to full amount due
     db_fee.payment_date = date.today() # Set payment date to today
@@ -149,8 +208,12 @@ def record_student_payment(db: Session, payment_id: int, student_id: int) -> Opt
 
     try:
         db.add(db_fee)
+        fee_ledger_service.post_fee_change(
+            db, student_id, payment_id, before, fee_ledger_service.fee_position(db_fee), description="Student Portal"
+        )
         db.commit()
         db.refresh(db_fee)
+        dashboard_service.invalidate_student_dashboard(student_id)
         logger.info(f"Student {student_id} marked fee record {payment_id} as PAID.")
         return db_fee
     except Exception as e:
@@ -161,9 +224,10 @@ def record_student_payment(db: Session, payment_id: int, student_id: int) -> Opt
 def update_fee_payment(db: Session, payment_id: int, update_data: Dict[str, Any]) -> Optional[models.FeePayment]:
     """Updates an existing fee payment record, recalculating status."""
     print(f"Updating fee payment {payment_id} with data: {update_data}")
-    db_fee = get_fee_payment_by_id(db, payment_id)
+    db_fee = _lock_fee(db, payment_id)
     if not db_fee:
         return None # Not found
+    before = fee_ledger_service.fee_position(db_fee)
 
     updated = False # Track if any actual change occurred
 
@@ -248,14 +312,20 @@ def update_fee_payment(db: Session, payment_id: int, update_data: Dict[str, Any]
     # If no fields actually changed, don't hit the DB
     if not updated:
         logger.debug(f"No actual changes detected for fee payment {payment_id}. Skipping update.")
+        db.rollback() # Release the row lock
         return db_fee
 
     # --- Commit Changes ---
     try:
         print(f"Updating fee payment {payment_id} with data: {update_data}")
         db.add(db_fee)
+        fee_ledger_service.post_fee_change(
+            db, db_fee.student_id, db_fee.id, before, fee_ledger_service.fee_position(db_fee),
+            description=db_fee.payment_method
+        )
         db.commit()
         db.refresh(db_fee)
+        dashboard_service.invalidate_student_dashboard(db_fee.student_id)
         logger.info(f"Successfully updated fee payment {payment_id}. New status: {db_fee.status.value}")
         return db_fee
     except Exception as e:
@@ -264,11 +334,17 @@ def update_fee_payment(db: Session, payment_id: int, update_data: Dict[str, Any]
         raise ValueError("Database error during fee payment update.")
 
 def delete_fee_record(db: Session, payment_id: int) -> bool:
-     db_fee = get_fee_payment_by_id(db, payment_id)
+     db_fee = _lock_fee(db, payment_id)
      if not db_fee: return False
      # Add checks if needed (e.g., cannot delete if partially/fully paid?)
      try:
-         db.delete(db_fee); db.commit()
+         student_id = db_fee.student_id
+         before = fee_ledger_service.fee_position(db_fee)
+         db.delete(db_fee)
+         if student_id is not None: # The ledger reverses whatever the record still charged/held
+             fee_ledger_service.post_fee_change(db, student_id, payment_id, before, (0.0, 0.0), description="Fee record deleted")
+         db.commit()
+         dashboard_service.invalidate_student_dashboard(student_id)
          return True
      except Exception as e:
          db.rollback(); logger.error(f"Error deleting fee record {payment_id}: {e}");
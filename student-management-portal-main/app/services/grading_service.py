@@ -0,0 +1,137 @@
+# app/services/grading_service.py
+"""
+Batch (re)grading of MCQ exams.
+
+Every submitted answer of an exam is loaded as flat id columns, graded against the exam's
+answer key with NumPy array operations, and only the rows whose outcome changed are
+written back with bulk UPDATEs. Used after an answer key correction, from the instructor
+exam editor or `python -m app.cli regrade-exam`.
+"""
+
+from typing import Any, Dict, List
+import logging
+
+import numpy as np
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app import models
+from app.services import exam_service
+
+logger = logging.getLogger(__name__)
+
+UPDATE_BATCH_SIZE = 1000
+SCORE_TOLERANCE = 1e-6
+
+
+def _lookup(keys: np.ndarray, values: np.ndarray, queries: np.ndarray, missing) -> np.ndarray:
+    """values[i] where keys[i] == query, else `missing`. `keys` must be sorted."""
+    if keys.size == 0:
+        return np.full(queries.shape, missing, dtype=values.dtype)
+    positions = np.clip(np.searchsorted(keys, queries), 0, keys.size - 1)
+    found = keys[positions] == queries
+    return np.where(found, values[positions], missing)
+
+
+def grade_answers(answer_key: exam_service.AnswerKey, question_ids: np.ndarray, option_ids: np.ndarray):
+    """
+    Vectorised AnswerKey.grade: returns (is_correct bool array, awarded marks float array)
+    for parallel arrays of question ids and chosen option ids (-1 = no option).
+    """
+    option_keys = np.array(sorted(answer_key.option_owner), dtype=np.int64)
+    option_questions = np.array([answer_key.option_owner[o][0] for o in option_keys], dtype=np.int64)
+    question_keys = np.array(sorted(answer_key.question_marks), dtype=np.int64)
+    question_marks = np.array([answer_key.question_marks[q] for q in question_keys], dtype=np.float64)
+    correct_ids = np.array(sorted(answer_key.correct_option_ids), dtype=np.int64)
+
+    # An option only counts for the question it belongs to
+    owner = _lookup(option_keys, option_questions, option_ids, -1)
+    is_correct = (owner == question_ids) & np.isin(option_ids, correct_ids)
+    marks = _lookup(question_keys, question_marks, question_ids, 0.0)
+    return is_correct, np.where(is_correct, marks, 0.0)
+
+
+def regrade_exam(db: Session, exam_id: int, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Recomputes MCQAnswer.is_correct and Result.score for every submitted attempt of an exam
+    against its current answer key. Returns counts of what changed (written unless dry_run).
+    """
+    exam = db.query(models.Exam).filter(models.Exam.id == exam_id).first()
+    if not exam:
+        raise ValueError(f"Exam with ID {exam_id} not found.")
+    answer_key = exam_service.get_answer_key(db, exam)
+
+    result_rows = db.query(models.Result.id, models.Result.score).filter(
+        models.Result.exam_id == exam_id,
+        models.Result.submitted_at.isnot(None)
+    ).order_by(models.Result.id).all()
+    answer_rows = db.query(
+        models.MCQAnswer.id, models.MCQAnswer.result_id, models.MCQAnswer.mcq_question_id,
+        models.MCQAnswer.selected_option_id, models.MCQAnswer.is_correct
+    ).join(models.Result, models.MCQAnswer.result_id == models.Result.id).filter(
+        models.Result.exam_id == exam_id,
+        models.Result.submitted_at.isnot(None)
+    ).all()
+
+    result_ids = np.array([r[0] for r in result_rows], dtype=np.int64)
+    old_scores = np.array([r[1] if r[1] is not None else np.nan for r in result_rows], dtype=np.float64)
+    if answer_rows:
+        columns = list(zip(*answer_rows))
+        answer_ids = np.array(columns[0], dtype=np.int64)
+        answer_result_ids = np.array(columns[1], dtype=np.int64)
+        question_ids = np.array(columns[2], dtype=np.int64)
+        option_ids = np.array([o if o is not None else -1 for o in columns[3]], dtype=np.int64)
+        old_correct = np.array([-1 if c is None else int(bool(c)) for c in columns[4]], dtype=np.int8) # -1 = never graded
+    else:
+        answer_ids = answer_result_ids = question_ids = option_ids = np.empty(0, dtype=np.int64)
+        old_correct = np.empty(0, dtype=np.int8)
+
+    new_correct, awarded = grade_answers(answer_key, question_ids, option_ids)
+
+    # Per-result totals: result_ids is sorted, so searchsorted gives each answer's result slot
+    slots = np.searchsorted(result_ids, answer_result_ids)
+    new_scores = np.round(np.bincount(slots, weights=awarded, minlength=result_ids.size), 2) if result_ids.size else np.empty(0)
+
+    answers_to_correct = answer_ids[new_correct & (old_correct != 1)]
+    answers_to_incorrect = answer_ids[~new_correct & (old_correct != 0)]
+    score_changed = np.isnan(old_scores) | (np.abs(new_scores - np.nan_to_num(old_scores)) > SCORE_TOLERANCE)
+    changed_results = [
+        {"id": int(result_id), "score": float(score)}
+        for result_id, score in zip(result_ids[score_changed], new_scores[score_changed])
+    ]
+
+    summary = {
+        "exam_id": exam_id,
+        "results": int(result_ids.size),
+        "answers": int(answer_ids.size),
+        "results_changed": len(changed_results),
+        "answers_changed": int(answers_to_correct.size + answers_to_incorrect.size),
+        "total_marks": answer_key.total_marks,
+        "dry_run": dry_run,
+    }
+    if dry_run:
+        db.rollback()
+        return summary
+
+    try:
+        for ids, value in ((answers_to_correct, True), (answers_to_incorrect, False)):
+            for start in range(0, ids.size, UPDATE_BATCH_SIZE):
+                chunk = [int(i) for i in ids[start:start + UPDATE_BATCH_SIZE]]
+                db.execute(update(models.MCQAnswer).where(models.MCQAnswer.id.in_(chunk)).values(is_correct=value))
+        for start in range(0, len(changed_results), UPDATE_BATCH_SIZE):
+            # Bulk UPDATE by primary key (executemany)
+            db.execute(update(models.Result), changed_results[start:start + UPDATE_BATCH_SIZE])
+        if exam.total_marks != answer_key.total_marks:
+            exam.total_marks = answer_key.total_marks
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error writing regrade of exam {exam_id}: {e}", exc_info=True)
+        raise ValueError("Database error saving regraded results.")
+    logger.info(f"Regraded exam {exam_id}: {summary}")
+    return summary
+
+
+def regrade_exams(db: Session, exam_ids: List[int], dry_run: bool = False) -> List[Dict[str, Any]]:
+    """Regrades several exams one after another (each in its own transaction)."""
+    return [regrade_exam(db, exam_id, dry_run=dry_run) for exam_id in exam_ids]
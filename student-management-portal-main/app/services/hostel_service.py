@@ -1,9 +1,10 @@
 # app/services/hostel_service.py
 
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
+from sqlalchemy.orm import Session, joinedload, contains_eager
+from sqlalchemy import func, or_
 from sqlalchemy.exc import IntegrityError
 from app import models
+from app.pagination import Page, PageRequest, keyset_paginate
 from typing import List, Optional, Dict, Any
 # Removed 'date' import as check-in/out are gone
 import logging
@@ -21,6 +22,29 @@ def get_all_hostel_assignments(db: Session) -> List[models.Hostel]:
         joinedload(models.Hostel.student).joinedload(models.Student.user) # Load student -> user
     ).order_by(models.Hostel.hostel_name, models.Hostel.room_number).all() # Example order
 
+# Sortable columns for the admin hostel list (must be non-NULL, see app/pagination.py)
+HOSTEL_SORT_KEYS = {
+    "hostel": models.Hostel.hostel_name,
+    "room": func.coalesce(models.Hostel.room_number, ""),
+    "student": models.Student.name,
+    "id": models.Hostel.id,
+}
+
+def get_hostel_assignments_page(
+    db: Session, page: PageRequest, hostel_name: Optional[str] = None, search: Optional[str] = None
+) -> Page:
+    """One keyset page of hostel assignments, filterable by hostel and student name / room search."""
+    query = db.query(models.Hostel).join(models.Hostel.student)
+    if hostel_name:
+        query = query.filter(models.Hostel.hostel_name == hostel_name)
+    if search and search.strip():
+        term = f"%{search.strip()}%"
+        query = query.filter(or_(models.Student.name.ilike(term), models.Hostel.room_number.ilike(term)))
+    return keyset_paginate(
+        query, page, HOSTEL_SORT_KEYS, default_sort="hostel", id_column=models.Hostel.id,
+        options=[contains_eager(models.Hostel.student).joinedload(models.Student.user)]
+    )
+
 def get_hostel_assignment_by_id(db: Session, assignment_id: int) -> Optional[models.Hostel]:
     """Retrieves a single hostel assignment record by its ID."""
     return db.query(models.Hostel).options(
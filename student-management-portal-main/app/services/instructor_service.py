@@ -1,10 +1,11 @@
 # app/services/instructor_service.py
 
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, joinedload, contains_eager
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import func # Import func for lower case comparison
+from sqlalchemy import func, or_ # Import func for lower case comparison
 from app import models
-from app.services import auth_service # For password hashing
+from app.pagination import Page, PageRequest, keyset_paginate
+from app.services import auth_service # For principal invalidation
 from datetime import date
 from typing import List, Optional, Dict, Any
 import logging
@@ -18,6 +19,31 @@ def get_all_instructors(db: Session) -> List[models.Instructor]:
         joinedload(models.Instructor.department)  # Eager load department
     ).order_by(models.Instructor.name).all()
 
+# Sortable columns for the admin instructor list (must be non-NULL, see app/pagination.py)
+INSTRUCTOR_SORT_KEYS = {
+    "name": models.Instructor.name,
+    "id": models.Instructor.id,
+    "username": models.User.username,
+    "email": models.User.email,
+}
+
+def get_instructors_page(
+    db: Session, page: PageRequest, search: Optional[str] = None, department_id: Optional[int] = None
+) -> Page:
+    """One keyset page of instructors, searchable by name/username/email and filterable by department."""
+    query = db.query(models.Instructor).join(models.Instructor.user)
+    if search and search.strip():
+        term = f"%{search.strip()}%"
+        query = query.filter(or_(
+            models.Instructor.name.ilike(term), models.User.username.ilike(term), models.User.email.ilike(term)
+        ))
+    if department_id:
+        query = query.filter(models.Instructor.department_id == department_id)
+    return keyset_paginate(
+        query, page, INSTRUCTOR_SORT_KEYS, default_sort="name", id_column=models.Instructor.id,
+        options=[contains_eager(models.Instructor.user), joinedload(models.Instructor.department)]
+    )
+
 def get_instructor_by_id_with_user(db: Session, instructor_id: int) -> Optional[models.Instructor]:
     """Retrieves a single instructor by ID, ensuring user and department info is loaded."""
     return db.query(models.Instructor).options(
@@ -26,10 +52,10 @@ def get_instructor_by_id_with_user(db: Session, instructor_id: int) -> Optional[
     ).filter(models.Instructor.id == instructor_id).first()
 
 def create_instructor_with_user(
-    db: Session, name: str, email: str, username: str, raw_password: str,
+    db: Session, name: str, email: str, username: str, hashed_password: str,
     qualification: Optional[str], department_id: Optional[int], phone: Optional[str]
 ) -> models.Instructor:
-    """Creates a User and a linked Instructor record."""
+    """Creates a User (with an already hashed password) and a linked Instructor record."""
     # Ensure case-insensitive checks for username and email
     existing_user = db.query(models.User).filter(
         (func.lower(models.User.username) == func.lower(username)) |
@@ -45,9 +71,6 @@ def create_instructor_with_user(
     if department_id and not db.query(models.Department).filter(models.Department.id == department_id).first():
          raise ValueError(f"Department with ID {department_id} not found.")
 
-
-    hashed_password = auth_service.get_password_hash(raw_password)
-
     db_user = models.User(
         username=username,
         email=email,
@@ -124,6 +147,7 @@ def update_instructor_and_user(db: Session, instructor_id: int, update_data: Dic
         db.commit()
         db.refresh(db_instructor)
         db.refresh(db_user)
+        auth_service.invalidate_principal(db_user.id)
         # Ensure relationships are refreshed if needed
         db.refresh(db_instructor.department) if db_instructor.department_id else None
         return db_instructor
@@ -175,6 +199,8 @@ def delete_instructor_and_user(db: Session, instructor_id: int) -> bool:
              logger.warning(f"Instructor {instructor_id} did not have an associated user to delete.")
 
         db.commit()
+        if db_user_to_delete:
+            auth_service.invalidate_principal(db_user_to_delete.id)
         return True
     except Exception as e:
         db.rollback()
@@ -1,9 +1,10 @@
 # app/services/library_service.py
 
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, joinedload, contains_eager
 from sqlalchemy import func
 from sqlalchemy.exc import IntegrityError
 from app import models
+from app.pagination import Page, PageRequest, keyset_paginate
 from typing import List, Optional, Dict, Any
 from datetime import date
 import logging
@@ -27,6 +28,28 @@ def get_all_library_records(db: Session, student_id: Optional[int] = None) -> Li
     )
     return query.all()
 
+# Sortable columns for the admin library list (must be non-NULL, see app/pagination.py)
+LIBRARY_SORT_KEYS = {
+    "student": models.Student.name,
+    "borrowed_date": func.coalesce(models.Library.borrowed_date, date(1900, 1, 1)), # Never-borrowed rows sort first
+    "books": func.coalesce(models.Library.books_borrowed, 0),
+    "id": models.Library.id,
+}
+
+def get_library_records_page(
+    db: Session, page: PageRequest, student_id: Optional[int] = None, search_student: Optional[str] = None
+) -> Page:
+    """One keyset page of library borrowing records, filterable by student id or name."""
+    query = db.query(models.Library).join(models.Library.student)
+    if student_id:
+        query = query.filter(models.Library.student_id == student_id)
+    if search_student and search_student.strip():
+        query = query.filter(models.Student.name.ilike(f"%{search_student.strip()}%"))
+    return keyset_paginate(
+        query, page, LIBRARY_SORT_KEYS, default_sort="student", id_column=models.Library.id,
+        options=[contains_eager(models.Library.student).joinedload(models.Student.user)]
+    )
+
 def get_library_record_by_id(db: Session, record_id: int) -> Optional[models.Library]:
     """Retrieves a single library borrowing record by its ID."""
     return db.query(models.Library).options(
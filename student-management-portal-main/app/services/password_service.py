@@ -0,0 +1,171 @@
+# app/services/password_service.py
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from passlib.context import CryptContext
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+# "thread": bcrypt releases the GIL while hashing, so threads already use every core.
+# "process": for hash backends that hold the GIL.
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread").lower()
+# Concurrency cap: at most this many hashes/verifications run at once; the rest queue.
+PASSWORD_HASH_MAX_WORKERS = int(os.getenv("PASSWORD_HASH_MAX_WORKERS", os.cpu_count() or 2))
+
+if PASSWORD_HASH_EXECUTOR not in ("thread", "process"):
+    raise ValueError(f"Invalid PASSWORD_HASH_EXECUTOR '{PASSWORD_HASH_EXECUTOR}' (expected thread or process)")
+
+# Should match the one in models.py
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+# --- Worker functions (module level so the process pool can pickle them) ---
+def _timed_call(fn: Callable[..., Any], *args) -> Tuple[Any, float, float]:
+    """Runs fn in the worker and reports when it started and how long it ran (wall clock)."""
+    started = time.time()
+    result = fn(*args)
+    return result, started, time.time() - started
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+class PasswordHasher:
+    """Runs bcrypt work on a bounded pool and keeps queue-depth / latency counters."""
+
+    def __init__(self, max_workers: int = PASSWORD_HASH_MAX_WORKERS, executor: str = PASSWORD_HASH_EXECUTOR):
+        self.max_workers = max(1, max_workers)
+        self.executor_kind = executor
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        # Metrics
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.pending = 0 # Submitted and not finished (running + queued)
+        self.max_queue_depth = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.run_seconds_total = 0.0
+
+    def _get_executor(self) -> Executor:
+        # Created lazily: importing this module (e.g. inside a pool child) must not spawn workers
+        with self._lock:
+            if self._executor is None:
+                if self.executor_kind == "process":
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="pwhash")
+                logger.info(f"Password hashing pool started ({self.executor_kind}, {self.max_workers} workers).")
+            return self._executor
+
+    def _submit(self, fn: Callable[..., Any], *args) -> Future:
+        submitted_at = time.time()
+        with self._lock:
+            self.submitted += 1
+            self.pending += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.pending - self.max_workers)
+        inner = self._get_executor().submit(_timed_call, fn, *args)
+        outer: Future = Future()
+
+        def _done(f: Future):
+            try:
+                result, started, run_seconds = f.result()
+            except BaseException as e:
+                with self._lock:
+                    self.pending -= 1
+                    self.failed += 1
+                outer.set_exception(e)
+                return
+            wait_seconds = max(started - submitted_at, 0.0)
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+                self.wait_seconds_total += wait_seconds
+                self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+                self.run_seconds_total += run_seconds
+            outer.set_result(result)
+
+        inner.add_done_callback(_done)
+        return outer
+
+    # Blocking API (for sync service code already running off the event loop)
+    def hash(self, password: str) -> str:
+        return self._submit(_hash, password).result()
+
+    def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return self._submit(_verify, plain_password, hashed_password).result()
+
+    # Async API (for route handlers)
+    async def hash_async(self, password: str) -> str:
+        return await asyncio.wrap_future(self._submit(_hash, password))
+
+    async def verify_async(self, plain_password: str, hashed_password: str) -> bool:
+        return await asyncio.wrap_future(self._submit(_verify, plain_password, hashed_password))
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            done = self.completed or 1
+            return {
+                "executor": self.executor_kind,
+                "max_workers": self.max_workers,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "in_flight": min(self.pending, self.max_workers),
+                "queue_depth": max(self.pending - self.max_workers, 0),
+                "max_queue_depth": self.max_queue_depth,
+                "wait_seconds_avg": round(self.wait_seconds_total / done, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+                "run_seconds_avg": round(self.run_seconds_total / done, 6),
+            }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+# Shared instance used by auth/student/instructor services
+hasher = PasswordHasher()
+
+def hash_password(password: str) -> str:
+    """Hashes a password on the bounded pool (blocks the calling thread, not the event loop)."""
+    return hasher.hash(password)
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verifies a password on the bounded pool (blocks the calling thread, not the event loop)."""
+    return hasher.verify(plain_password, hashed_password)
+
+def hash_passwords_on(pool: Executor, passwords: List[str], chunksize: int = 4) -> List[str]:
+    """
+    Hashes a batch on a caller-owned pool (e.g. a process pool for a bulk import), so a
+    large batch does not queue ahead of interactive logins on the shared pool.
+    """
+    return list(pool.map(_hash, passwords, chunksize=chunksize))
+
+async def hash_password_async(password: str) -> str:
+    return await hasher.hash_async(password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await hasher.verify_async(plain_password, hashed_password)
+
+def get_metrics() -> Dict[str, Any]:
+    return hasher.metrics()
+
+def shutdown():
+    hasher.shutdown()
@@ -1,13 +1,20 @@
 # app/services/result_service.py (New File)
-from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload, lazyload, selectinload
 from app import models
+from app.services import attempt_service, exam_service
 from typing import List, Optional, Dict, Any
 from datetime import datetime, date # Need datetime now
 import logging
-import json
 
 logger = logging.getLogger(__name__)
 
+class ExamAlreadySubmittedError(ValueError):
+    """The student's attempt for this exam already has a submission."""
+
+class SubmissionStorageError(ValueError):
+    """The submission was valid but could not be written (transient database failure)."""
+
 def get_result_by_exam_and_student(db: Session, exam_id: int, student_id: int) -> Optional[models.Result]:
     """Gets the result record for a specific student and exam."""
     return db.query(models.Result).filter(
@@ -15,11 +22,17 @@ def get_result_by_exam_and_student(db: Session, exam_id: int, student_id: int) -
         models.Result.student_id == student_id
     ).first()
 
+def _locked_result(db: Session, exam_id: int, student_id: int) -> Optional[models.Result]:
+    return db.query(models.Result).filter(
+        models.Result.exam_id == exam_id,
+        models.Result.student_id == student_id
+    ).with_for_update().first()
+
 def record_exam_submission(
     db: Session,
     exam_id: int,
     student_id: int,
-    submitted_answers: Dict[int, str] # {mcq_question_id: selected_option_text}
+    submitted_answers: Dict[int, int] # {mcq_question_id: selected mcq_options.id}
 ) -> models.Result:
     """
     Records student's answers, calculates score, and saves the result.
@@ -27,67 +40,72 @@ def record_exam_submission(
     """
     logger.info(f"Recording submission for Student {student_id}, Exam {exam_id}")
 
-    # 1. Find or Create Result Record
-    result = get_result_by_exam_and_student(db, exam_id, student_id)
-    if result and result.submitted_at:
-        raise ValueError("Exam has already been submitted.") # Prevent re-submission
-    elif not result:
+    # 1. Find or Create Result Record (locked, so an autosave flush can't interleave)
+    result = _locked_result(db, exam_id, student_id)
+    created = False
+    if not result:
         logger.debug("Creating new Result record.")
         result = models.Result(exam_id=exam_id, student_id=student_id)
         db.add(result)
-        db.flush() # Get result.id if needed for answers immediately
-    else:
-         logger.debug(f"Found existing Result record ID: {result.id}. Updating answers.")
-         # Clear previous answers if re-submitting an incomplete attempt? Assume we overwrite.
-         db.query(models.MCQAnswer).filter(models.MCQAnswer.result_id == result.id).delete()
-         db.flush() # Apply deletion before adding new
+        try:
+            db.flush() # Get result.id if needed for answers immediately
+            created = True
+        except IntegrityError: # A concurrent start or submit inserted the attempt first: use that row
+            db.rollback()
+            result = _locked_result(db, exam_id, student_id)
+            if result is None:
+                raise SubmissionStorageError("Database error saving exam submission.")
+    saved_answers: Dict[int, models.MCQAnswer] = {} # Autosaved rows of the open attempt, by question
+    if result.submitted_at:
+        raise ExamAlreadySubmittedError("Exam has already been submitted.") # Prevent re-submission
+    elif not created:
+        logger.debug(f"Found in-progress Result record ID: {result.id}. Finalizing saved answers.")
+        saved_answers = {
+            answer.mcq_question_id: answer
+            for answer in db.query(models.MCQAnswer).filter(models.MCQAnswer.result_id == result.id).all()
+        }
 
 
-    # 2. Fetch Exam Questions with Correct Answers (for grading)
+    # 2. Fetch Exam and its answer key (for grading)
     exam = db.query(models.Exam).options(
-        selectinload(models.Exam.mcq_questions) # Need questions + options
+        lazyload(models.Exam.mcq_questions) # The key below reads questions as plain rows
     ).filter(models.Exam.id == exam_id).first()
     if not exam: raise ValueError("Exam not found during submission.")
     if not exam.is_published: raise ValueError("Cannot submit to an unpublished exam.")
 
-    # Create a map of question ID to its data (including parsed correct option text)
-    correct_answers_map = {}
-    total_possible_marks = 0.0
-    for mcq in exam.mcq_questions:
-        total_possible_marks += mcq.marks
-        correct_text = None
-        try:
-            options_list = json.loads(mcq.options or '[]')
-            correct_opt = next((opt for opt in options_list if isinstance(opt, dict) and opt.get('is_correct') == True), None)
-            if correct_opt: correct_text = correct_opt.get('text')
-        except json.JSONDecodeError: pass # Ignore parsing errors here, focus on grading
-        correct_answers_map[mcq.id] = {"correct_text": correct_text, "marks": mcq.marks}
-
-
-    # 3. Process Submitted Answers and Calculate Score
-    student_score = 0.0
+    # Compiled answer key for this exam version (cached per process); grading is a dict pass
+    answer_key = exam_service.get_answer_key(db, exam)
+    total_possible_marks = answer_key.total_marks
+
+    # 3. Final answers: saved rows, then answers still in the autosave buffer, then the submitted form
+    final_answers = {
+        question_id: answer.selected_option_id
+        for question_id, answer in saved_answers.items() if answer.selected_option_id is not None
+    }
+    result_id = result.id
+    buffered_answers = attempt_service.autosave_buffer.take(result_id)
+    final_answers.update(buffered_answers)
+    final_answers.update(submitted_answers)
+
+    # Grade, reusing the saved rows: unchanged answers only get is_correct set
+    student_score, graded_answers = answer_key.grade(final_answers)
     mcq_answers_to_save = []
-
-    for question_id_str, selected_option_text in submitted_answers.items():
-        try: question_id = int(question_id_str)
-        except ValueError: logger.warning(f"Invalid question ID format '{question_id_str}' in submission."); continue
-
-        question_info = correct_answers_map.get(question_id)
-        is_correct = False
-        if question_info:
-            # Compare submitted text with the stored correct option text
-            if question_info["correct_text"] is not None and selected_option_text == question_info["correct_text"]:
-                is_correct = True
-                student_score += question_info["marks"]
-
-        # Create MCQAnswer object
-        answer = models.MCQAnswer(
-            result_id=result.id,
-            mcq_question_id=question_id,
-            selected_option_text=selected_option_text,
-            is_correct=is_correct
-        )
-        mcq_answers_to_save.append(answer)
+    for question_id, option_id, option_text, is_correct in graded_answers:
+        answer = saved_answers.pop(question_id, None)
+        if answer is None:
+            mcq_answers_to_save.append(models.MCQAnswer(
+                result_id=result.id,
+                mcq_question_id=question_id,
+                selected_option_id=option_id,
+                selected_option_text=option_text,
+                is_correct=is_correct
+            ))
+        else:
+            answer.selected_option_id = option_id
+            answer.selected_option_text = option_text
+            answer.is_correct = is_correct
+    for stale_answer in saved_answers.values(): # Questions no longer part of the exam
+        db.delete(stale_answer)
 
     # Add all answers to session
     db.add_all(mcq_answers_to_save)
@@ -110,24 +128,27 @@ def record_exam_submission(
     try:
         db.commit()
         db.refresh(result) # Refresh to get final state
+        attempt_service.end_attempt(exam_id, student_id, result.id)
         logger.info(f"Submission recorded for Student {student_id}, Exam {exam_id}. Score: {result.score}/{total_possible_marks}")
         return result
     except Exception as e:
         db.rollback()
+        attempt_service.autosave_buffer.restore({result_id: buffered_answers}) # Still flushed if the student retries later
         logger.error(f"Error committing exam submission for Student {student_id}, Exam {exam_id}: {e}", exc_info=True)
-        raise ValueError("Database error saving exam submission.")
+        raise SubmissionStorageError("Database error saving exam submission.")
 
 def get_result_details_with_answers(db: Session, result_id: int, student_id: int) -> Optional[models.Result]:
     """
     Retrieves a specific result, ensuring it belongs to the student,
-    and loads related exam, questions, and student answers.
-    Parses correct answers for comparison.
+    and loads related exam, questions, options, and student answers.
+    Marks each option as correct / selected for the template.
     """
     logger.debug(f"Fetching result details for Result ID: {result_id}, Student ID: {student_id}")
     result = db.query(models.Result).options(
         joinedload(models.Result.student), # Load student info (optional)
         joinedload(models.Result.exam).options( # Load exam...
-            selectinload(models.Exam.mcq_questions) # ...and its questions
+            joinedload(models.Exam.course), # ...its course (page header)
+            selectinload(models.Exam.mcq_questions).selectinload(models.MCQQuestion.mcq_options) # ...its questions and options
         ),
         selectinload(models.Result.mcq_answers) # Load student's answers for this result
     ).filter(
@@ -143,48 +164,39 @@ def get_result_details_with_answers(db: Session, result_id: int, student_id: int
         return None # Or raise an error
 
     # --- Process questions and answers for easy template use ---
-    # Create maps for quick lookups
-    student_answers_map = {ans.mcq_question_id: ans.selected_option_text for ans in result.mcq_answers}
+    answers_map = {ans.mcq_question_id: ans for ans in result.mcq_answers}
     questions_details = []
 
     for mcq in result.exam.mcq_questions:
-        question_data = {
+        answer = answers_map.get(mcq.id)
+        selected_option_id = answer.selected_option_id if answer else None
+        questions_details.append({
             "id": mcq.id,
             "question_text": mcq.question_text,
             "marks": mcq.marks,
-            "options": [], # Will contain {'text': str, 'is_correct': bool, 'was_selected': bool}
-            "student_answer_text": student_answers_map.get(mcq.id),
-            "is_student_correct": None # Will be True/False
-        }
-        correct_option_text = None
-        try:
-            options_list = json.loads(mcq.options or '[]')
-            student_selected_text = question_data["student_answer_text"]
-
-            for option in options_list:
-                if isinstance(option, dict) and 'text' in option:
-                    text = option.get('text')
-                    is_correct = option.get('is_correct', False)
-                    was_selected = (text == student_selected_text)
-
-                    question_data["options"].append({
-                        "text": text,
-                        "is_correct": is_correct,
-                        "was_selected": was_selected
-                    })
-                    if is_correct:
-                        correct_option_text = text # Store the text of the correct option
-
-        except json.JSONDecodeError:
-             logger.warning(f"Could not parse options for MCQ {mcq.id} during result view.")
-
-        # Determine if the student's answer was correct
-        question_data["is_student_correct"] = (correct_option_text is not None and student_selected_text == correct_option_text)
-        questions_details.append(question_data)
+            # {'text': str, 'is_correct': bool, 'was_selected': bool}
+            "options": [{
+                "text": opt.text,
+                "is_correct": opt.is_correct,
+                "was_selected": selected_option_id is not None and opt.id == selected_option_id
+            } for opt in mcq.mcq_options],
+            "student_answer_text": answer.selected_option_text if answer else None,
+            "is_student_correct": bool(answer and answer.is_correct)
+        })
 
     # Attach the processed questions list to the result object (not saved to DB)
     result.processed_questions = questions_details
     # --- End Processing ---
 
     logger.debug(f"Successfully prepared result details for Result ID: {result_id}")
-    return result
\ No newline at end of file
+    return result
+
+def get_results_for_student_exams(db: Session, student_id: int, exam_ids: List[int]) -> Dict[int, models.Result]:
+    """Returns the student's results for the given exams as {exam_id: Result}."""
+    if not exam_ids:
+        return {}
+    results = db.query(models.Result).filter(
+        models.Result.student_id == student_id,
+        models.Result.exam_id.in_(exam_ids)
+    ).all()
+    return {result.exam_id: result for result in results}
@@ -2,19 +2,333 @@
 
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy import func
 from app import models
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import datetime
+import threading
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+_WEEKDAY_LOOKUP = {name.lower(): i for i, name in enumerate(WEEKDAYS)}
+_WEEKDAY_LOOKUP.update({name[:3].lower(): i for i, name in enumerate(WEEKDAYS)})
+_TIME_FORMATS = ("%H:%M", "%H:%M:%S", "%I:%M %p", "%I:%M%p", "%I %p")
+
+# Weekly bitmaps: one bit per BITMAP_SLOT_MINUTES of the week. Fine enough that back-to-back
+# classes on a 5-minute grid (09:00-09:50, 09:50-10:40) don't share a bit.
+BITMAP_SLOT_MINUTES = 5
+_BITMAP_SLOTS_PER_DAY = 24 * 60 // BITMAP_SLOT_MINUTES
+STUDENT_BITMAP_CACHE_MAX_ENTRIES = int(os.getenv("STUDENT_BITMAP_CACHE_MAX_ENTRIES", 4096))
+
+
+# --- Typed weekday / time ---
+def parse_weekday(value: Any) -> int:
+    """'Monday' / 'mon' / 0 -> 0 (Monday) ... 6 (Sunday)."""
+    if isinstance(value, int) and 0 <= value <= 6:
+        return value
+    weekday = _WEEKDAY_LOOKUP.get(str(value or "").strip().lower())
+    if weekday is None:
+        raise ValueError(f"Invalid day of week '{value}'.")
+    return weekday
+
+def parse_time_minutes(value: Any) -> int:
+    """'09:30' / '9:30 AM' / '09:30:00' -> minutes since midnight."""
+    text = str(value or "").strip().upper()
+    for fmt in _TIME_FORMATS:
+        try:
+            parsed = datetime.strptime(text, fmt)
+            return parsed.hour * 60 + parsed.minute
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid time '{value}' (expected HH:MM).")
+
+def format_minutes(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def parse_slot(day_of_week: Any, start_time: Any, end_time: Any) -> Tuple[int, int, int]:
+    """Validates a weekly slot. Returns (weekday, start_minute, end_minute)."""
+    weekday, start, end = parse_weekday(day_of_week), parse_time_minutes(start_time), parse_time_minutes(end_time)
+    if end <= start:
+        raise ValueError("End time must be after start time.")
+    return weekday, start, end
+
+def schedule_slot(schedule) -> Optional[Tuple[int, int, int]]:
+    """The typed slot of a schedule row, parsing the strings of rows not backfilled yet. None if unparseable."""
+    if schedule.weekday is not None and schedule.start_minute is not None and schedule.end_minute is not None:
+        return schedule.weekday, schedule.start_minute, schedule.end_minute
+    try:
+        return parse_slot(schedule.day_of_week, schedule.start_time, schedule.end_time)
+    except ValueError:
+        return None
+
+def apply_slot(db_schedule: models.Schedule, slot: Tuple[int, int, int]):
+    """Stores the typed columns and their canonical string forms."""
+    weekday, start, end = slot
+    db_schedule.weekday, db_schedule.start_minute, db_schedule.end_minute = weekday, start, end
+    db_schedule.day_of_week = WEEKDAYS[weekday]
+    db_schedule.start_time, db_schedule.end_time = format_minutes(start), format_minutes(end)
+
+
+# --- Interval index (conflict detection) ---
+class _DayIntervals:
+    """One resource's bookings on one weekday: sorted by start, with a running max of end times."""
+
+    def __init__(self, entries: List[Tuple[int, int, int]]):
+        self.entries = sorted(entries) # (start, end, schedule_id)
+        self.starts = [entry[0] for entry in self.entries]
+        self.max_end: List[int] = [] # max_end[i] = max(end of entries[0..i])
+        running = -1
+        for _, end, _ in self.entries:
+            running = max(running, end)
+            self.max_end.append(running)
+
+    def overlapping(self, start: int, end: int, exclude_id: Optional[int] = None) -> Optional[Tuple[int, int, int]]:
+        """A booking overlapping [start, end), found by one bisect plus the prefix max (O(log n))."""
+        position = bisect_left(self.starts, end) # Entries before this start before `end`
+        if position == 0 or self.max_end[position - 1] <= start:
+            return None
+        for entry in reversed(self.entries[:position]): # Walk back to name the clash; stops at the first hit
+            if entry[1] > start and entry[2] != exclude_id:
+                return entry
+        return None
+
+class ScheduleIndex:
+    """
+    Per-classroom and per-instructor weekly interval index over all schedules. Rebuilt when the
+    schedules table changes (row count / last update), so writes from any worker are seen.
+
+    The fingerprint (count, max id, max updated_at) has one blind spot: a second update of an
+    existing row by another worker within the same updated_at second (DATETIME has whole
+    seconds on MySQL) leaves it unchanged, so this worker checks against the first update
+    until the next write. Writes in this process always invalidate the index.
+
+    Database reads happen outside the lock, which only guards the swap: in async mode run_db
+    runs this on the event loop thread, where waiting on a lock held across IO deadlocks.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._fingerprint = None
+        self._days: Dict[Tuple[str, int, int], _DayIntervals] = {} # (resource, resource_id, weekday) -> intervals
+        self._labels: Dict[int, str] = {} # schedule_id -> course name for messages
+
+    @staticmethod
+    def fingerprint(db: Session) -> tuple:
+        return tuple(db.query(func.count(models.Schedule.id), func.max(models.Schedule.id), func.max(models.Schedule.updated_at)).one())
+
+    @staticmethod
+    def _build(db: Session) -> Tuple[Dict[Tuple[str, int, int], _DayIntervals], Dict[int, str]]:
+        rows = db.query(
+            models.Schedule.id, models.Schedule.instructor_id, models.Schedule.classroom_id,
+            models.Schedule.weekday, models.Schedule.start_minute, models.Schedule.end_minute,
+            models.Schedule.day_of_week, models.Schedule.start_time, models.Schedule.end_time, models.Course.name
+        ).outerjoin(models.Course, models.Schedule.course_id == models.Course.id).all()
+        bookings: Dict[Tuple[str, int, int], List[Tuple[int, int, int]]] = {}
+        for row in rows:
+            slot = schedule_slot(row)
+            if slot is None:
+                continue
+            weekday, start, end = slot
+            for resource, resource_id in (("classroom", row.classroom_id), ("instructor", row.instructor_id)):
+                if resource_id is not None:
+                    bookings.setdefault((resource, resource_id, weekday), []).append((start, end, row.id))
+        return {key: _DayIntervals(entries) for key, entries in bookings.items()}, {row.id: row.name for row in rows}
+
+    def _current(self, db: Session) -> Tuple[Dict[Tuple[str, int, int], _DayIntervals], Dict[int, str]]:
+        """The index for the current schedules; built (without the lock) when they changed."""
+        fingerprint = self.fingerprint(db)
+        with self._lock:
+            if fingerprint == self._fingerprint:
+                return self._days, self._labels
+        days, labels = self._build(db) # Read after the fingerprint, so never older than it
+        with self._lock:
+            self._days, self._labels, self._fingerprint = days, labels, fingerprint
+        return days, labels
+
+    def find_conflict(
+        self, db: Session, slot: Tuple[int, int, int], instructor_id: Optional[int], classroom_id: Optional[int],
+        exclude_id: Optional[int] = None
+    ) -> Optional[Tuple[str, int, Tuple[int, int, int], str]]:
+        """(resource, resource_id, (start, end, schedule_id), course name) of the first clash, or None."""
+        days, labels = self._current(db) # Built once and never mutated: read without the lock
+        weekday, start, end = slot
+        for resource, resource_id in (("classroom", classroom_id), ("instructor", instructor_id)):
+            intervals = days.get((resource, resource_id, weekday)) if resource_id is not None else None
+            clash = intervals.overlapping(start, end, exclude_id) if intervals else None
+            if clash:
+                return resource, resource_id, clash, labels.get(clash[2], "")
+        return None
+
+    def invalidate(self):
+        with self._lock:
+            self._fingerprint = None
+
+schedule_index = ScheduleIndex()
+
+# --- Weekly bitmaps (student timetable clashes) ---
+def slot_bitmap(slot: Tuple[int, int, int]) -> int:
+    """Bits of the week covered by (weekday, start_minute, end_minute)."""
+    weekday, start, end = slot
+    first = weekday * _BITMAP_SLOTS_PER_DAY + start // BITMAP_SLOT_MINUTES
+    last = weekday * _BITMAP_SLOTS_PER_DAY + -(-end // BITMAP_SLOT_MINUTES)
+    return ((1 << (last - first)) - 1) << first
+
+def describe_bitmap(bitmap: int) -> str:
+    """'Monday 09:00' for the first slot set in the bitmap."""
+    first = (bitmap & -bitmap).bit_length() - 1
+    weekday, slot = divmod(first, _BITMAP_SLOTS_PER_DAY)
+    return f"{WEEKDAYS[weekday]} {format_minutes(slot * BITMAP_SLOT_MINUTES)}"
+
+class CourseBitmaps:
+    """
+    Weekly bitmap of every course's meetings, and per student the OR of their courses'
+    bitmaps, so a clash check is a single AND. Rebuilt when the schedules table changes;
+    a cached student bitmap is reused while the student's course list is unchanged.
+    Like ScheduleIndex, queries run outside the lock and only the swap is guarded.
+    """
+
+    def __init__(self, max_students: int):
+        self.max_students = max_students
+        self._lock = threading.Lock()
+        self._fingerprint = None
+        self._courses: Dict[int, int] = {} # course_id -> bitmap
+        self._students: "OrderedDict[int, Tuple[Tuple[int, ...], int]]" = OrderedDict() # student_id -> (course ids, bitmap)
+
+    def _current(self, db: Session) -> Dict[int, int]:
+        """Course bitmaps for the current schedules; rebuilt (without the lock) when they changed."""
+        fingerprint = ScheduleIndex.fingerprint(db)
+        with self._lock:
+            if fingerprint == self._fingerprint:
+                return self._courses
+        courses: Dict[int, int] = {}
+        for row in db.query(
+            models.Schedule.course_id, models.Schedule.weekday, models.Schedule.start_minute, models.Schedule.end_minute,
+            models.Schedule.day_of_week, models.Schedule.start_time, models.Schedule.end_time
+        ).all():
+            slot = schedule_slot(row)
+            if slot is not None:
+                courses[row.course_id] = courses.get(row.course_id, 0) | slot_bitmap(slot)
+        with self._lock:
+            self._courses, self._fingerprint = courses, fingerprint
+            self._students.clear() # Built from the previous course bitmaps
+        return courses
+
+    def course_bitmaps(self, db: Session) -> Dict[int, int]:
+        return self._current(db)
+
+    def student_bitmap(self, db: Session, student_id: int, course_ids: Tuple[int, ...]) -> int:
+        """OR of the bitmaps of `course_ids` (the student's current courses, sorted)."""
+        courses = self._current(db)
+        with self._lock:
+            cached = self._students.get(student_id) if courses is self._courses else None
+            if cached is not None and cached[0] == course_ids:
+                self._students.move_to_end(student_id)
+                return cached[1]
+        bitmap = 0
+        for course_id in course_ids:
+            bitmap |= courses.get(course_id, 0)
+        with self._lock:
+            if self.max_students > 0 and courses is self._courses: # Not if a rebuild swapped them meanwhile
+                self._students[student_id] = (course_ids, bitmap)
+                while len(self._students) > self.max_students:
+                    self._students.popitem(last=False)
+        return bitmap
+
+    def invalidate(self):
+        with self._lock:
+            self._fingerprint = None
+
+course_bitmaps = CourseBitmaps(STUDENT_BITMAP_CACHE_MAX_ENTRIES)
+
+def invalidate_schedule_caches():
+    """Drops the conflict index and course bitmaps of this process after a schedule write."""
+    schedule_index.invalidate()
+    course_bitmaps.invalidate()
+
+def check_schedule_conflicts(
+    db: Session, slot: Tuple[int, int, int], instructor_id: Optional[int], classroom_id: Optional[int],
+    exclude_schedule_id: Optional[int] = None
+):
+    """Raises ValueError if the classroom or instructor is already booked during the slot."""
+    conflict = schedule_index.find_conflict(db, slot, instructor_id, classroom_id, exclude_schedule_id)
+    if conflict:
+        resource, resource_id, (start, end, schedule_id), course_name = conflict
+        raise ValueError(
+            f"{resource.capitalize()} {resource_id} is already booked on {WEEKDAYS[slot[0]]} "
+            f"{format_minutes(start)}-{format_minutes(end)} (schedule #{schedule_id}{', ' + course_name if course_name else ''})."
+        )
+
+def find_all_conflicts(db: Session) -> Dict[str, Any]:
+    """
+    Sweeps the whole timetable: every overlapping pair of bookings of the same classroom or
+    instructor, plus schedules whose day/time cannot be parsed.
+    """
+    schedules = get_all_schedules(db)
+    bookings: Dict[Tuple[str, int, int], List[Tuple[int, int, models.Schedule]]] = {}
+    invalid = []
+    for schedule in schedules:
+        slot = schedule_slot(schedule)
+        if slot is None:
+            invalid.append({"schedule_id": schedule.id, "day_of_week": schedule.day_of_week,
+                            "start_time": schedule.start_time, "end_time": schedule.end_time})
+            continue
+        weekday, start, end = slot
+        for resource, resource_id in (("classroom", schedule.classroom_id), ("instructor", schedule.instructor_id)):
+            if resource_id is not None:
+                bookings.setdefault((resource, resource_id, weekday), []).append((start, end, schedule))
+
+    conflicts = []
+    for (resource, resource_id, weekday), day in sorted(bookings.items(), key=lambda item: item[0]):
+        day.sort(key=lambda booking: (booking[0], booking[1]))
+        active: List[Tuple[int, int, models.Schedule]] = [] # Bookings still running at the current start
+        for start, end, schedule in day:
+            active = [booking for booking in active if booking[1] > start]
+            for other_start, other_end, other in active:
+                conflicts.append({
+                    "resource": resource, "resource_id": resource_id, "day_of_week": WEEKDAYS[weekday],
+                    "overlap": f"{format_minutes(start)}-{format_minutes(min(end, other_end))}",
+                    "schedules": [
+                        {"id": s.id, "course": s.course.name if s.course else None,
+                         "time": f"{format_minutes(b_start)}-{format_minutes(b_end)}"}
+                        for s, b_start, b_end in ((other, other_start, other_end), (schedule, start, end))
+                    ],
+                })
+            active.append((start, end, schedule))
+    return {"schedules": len(schedules), "conflicts": conflicts, "invalid": invalid}
+
+def backfill_schedule_slots(db: Session) -> Tuple[int, int]:
+    """Fills weekday/start_minute/end_minute from the string columns. Returns (updated, unparseable)."""
+    updated = unparseable = 0
+    for schedule in db.query(models.Schedule).filter(
+        (models.Schedule.weekday.is_(None)) | (models.Schedule.start_minute.is_(None)) | (models.Schedule.end_minute.is_(None))
+    ).all():
+        try:
+            apply_slot(schedule, parse_slot(schedule.day_of_week, schedule.start_time, schedule.end_time))
+            updated += 1
+        except ValueError as e:
+            logger.warning(f"Schedule {schedule.id}: {e}")
+            unparseable += 1
+    try:
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error backfilling schedule slots: {e}", exc_info=True)
+        raise ValueError("Database error backfilling schedule times.")
+    invalidate_schedule_caches()
+    return updated, unparseable
+
 def get_all_schedules(db: Session) -> List[models.Schedule]:
     """Retrieves all schedule records, loading related entities."""
     return db.query(models.Schedule).options(
         joinedload(models.Schedule.course),
         joinedload(models.Schedule.instructor).joinedload(models.Instructor.user), # Instructor -> User
         joinedload(models.Schedule.classroom)
-    ).order_by(models.Schedule.day_of_week, models.Schedule.start_time).all() # Example ordering
+    ).order_by(models.Schedule.weekday, models.Schedule.start_minute).all()
 
 def get_schedule_by_id(db: Session, schedule_id: int) -> Optional[models.Schedule]:
     """Retrieves a single schedule by ID, loading related entities."""
@@ -32,7 +346,7 @@ def validate_foreign_keys(db: Session, course_id: int, instructor_id: int, class
         raise ValueError(f"Instructor with ID {instructor_id} not found.")
     if classroom_id and not db.query(models.Classroom).filter(models.Classroom.id == classroom_id).first():
         raise ValueError(f"Classroom with ID {classroom_id} not found.")
-    # Add potential conflict checks here later (e.g., instructor/classroom availability)
+    # Time conflicts are checked separately by check_schedule_conflicts
 
 def create_schedule(
     db: Session,
@@ -47,20 +361,20 @@ def create_schedule(
     # Validate FKs first
     validate_foreign_keys(db, course_id, instructor_id, classroom_id)
 
-    # Basic validation for day/time format could be added here if needed
+    slot = parse_slot(day_of_week, start_time, end_time)
+    check_schedule_conflicts(db, slot, instructor_id, classroom_id)
 
     db_schedule = models.Schedule(
         course_id=course_id,
         instructor_id=instructor_id,
         classroom_id=classroom_id, # Can be None
-        day_of_week=day_of_week,
-        start_time=start_time,
-        end_time=end_time
     )
+    apply_slot(db_schedule, slot)
     db.add(db_schedule)
     try:
         db.commit()
         db.refresh(db_schedule)
+        invalidate_schedule_caches()
         return db_schedule
     except IntegrityError as e: # Catch potential DB constraint issues
         db.rollback()
@@ -88,18 +402,24 @@ def update_schedule(db: Session, schedule_id: int, update_data: Dict[str, Any])
         classroom_id != db_schedule.classroom_id):
          validate_foreign_keys(db, course_id, instructor_id, classroom_id)
 
+    slot = parse_slot(
+        update_data.get('day_of_week', db_schedule.day_of_week),
+        update_data.get('start_time', db_schedule.start_time),
+        update_data.get('end_time', db_schedule.end_time)
+    )
+    check_schedule_conflicts(db, slot, instructor_id, classroom_id, exclude_schedule_id=schedule_id)
+
     # Update fields
     db_schedule.course_id = course_id
     db_schedule.instructor_id = instructor_id
     db_schedule.classroom_id = classroom_id
-    db_schedule.day_of_week = update_data.get('day_of_week', db_schedule.day_of_week)
-    db_schedule.start_time = update_data.get('start_time', db_schedule.start_time)
-    db_schedule.end_time = update_data.get('end_time', db_schedule.end_time)
+    apply_slot(db_schedule, slot)
 
     try:
         db.add(db_schedule)
         db.commit()
         db.refresh(db_schedule)
+        invalidate_schedule_caches()
         # Refresh relationships after commit
         db.refresh(db_schedule.course)
         db.refresh(db_schedule.instructor)
@@ -130,8 +450,40 @@ def delete_schedule(db: Session, schedule_id: int) -> bool:
     try:
         db.delete(db_schedule)
         db.commit()
+        invalidate_schedule_caches()
         return True
     except Exception as e:
         db.rollback()
         logger.error(f"Error deleting schedule {schedule_id}: {e}", exc_info=True)
         raise ValueError("Failed to delete schedule due to a database error.")
+
+def get_courses_taught_by_instructor(db: Session, instructor_id: int) -> List[models.Course]:
+    """Retrieves the distinct courses an instructor has schedules for, ordered by name."""
+    return db.query(models.Course).join(
+        models.Schedule, models.Schedule.course_id == models.Course.id
+    ).filter(models.Schedule.instructor_id == instructor_id).distinct().order_by(models.Course.name).all()
+
+def count_courses_taught_by_instructor(db: Session, instructor_id: int) -> int:
+    """Counts the distinct courses an instructor has schedules for."""
+    return db.query(func.count(models.Schedule.course_id.distinct()))\
+        .filter(models.Schedule.instructor_id == instructor_id).scalar() or 0
+
+def get_instructor_schedules_on_day(db: Session, instructor_id: int, course_id: int, day_name: str) -> List[models.Schedule]:
+    """Retrieves an instructor's schedules for a course on a given weekday name (e.g. 'Monday')."""
+    return db.query(models.Schedule).filter(
+        models.Schedule.instructor_id == instructor_id,
+        models.Schedule.course_id == course_id,
+        models.Schedule.day_of_week == day_name
+    ).order_by(models.Schedule.start_time).all()
+
+def get_schedules_for_courses(db: Session, course_ids: List[int]) -> List[models.Schedule]:
+    """Retrieves schedules for the given courses, loading course, instructor and classroom for display."""
+    if not course_ids:
+        return []
+    return db.query(models.Schedule).options(
+        joinedload(models.Schedule.course),
+        joinedload(models.Schedule.instructor),
+        joinedload(models.Schedule.classroom)
+    ).filter(
+        models.Schedule.course_id.in_(course_ids)
+    ).order_by(models.Schedule.weekday, models.Schedule.start_minute).all()
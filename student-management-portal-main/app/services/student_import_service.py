@@ -0,0 +1,320 @@
+# app/services/student_import_service.py
+"""
+Bulk student onboarding from a CSV or XLSX file.
+
+Rows are streamed from the file and handled in chunks of STUDENT_IMPORT_CHUNK_SIZE: each
+chunk is validated in Python, its usernames and emails are checked against the users table
+with one query, the passwords are hashed on the import's process pool and the users and students are
+written with two bulk INSERTs and one commit. Rows that fail are reported with their line
+number and do not stop the rest of the file.
+
+Columns (header row, any order, case-insensitive): name, email, username are required;
+password (default DEFAULT_NEW_USER_PASSWORD), dob (YYYY-MM-DD), phone, address and
+department (id or name) are optional.
+"""
+
+import csv
+import io
+import logging
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from itertools import islice
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import insert, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app import models
+from app.services import password_service
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+STUDENT_IMPORT_CHUNK_SIZE = int(os.getenv("STUDENT_IMPORT_CHUNK_SIZE", 500))
+STUDENT_IMPORT_HASH_WORKERS = int(os.getenv("STUDENT_IMPORT_HASH_WORKERS", os.cpu_count() or 2))
+STUDENT_IMPORT_MAX_ERRORS = int(os.getenv("STUDENT_IMPORT_MAX_ERRORS", 1000)) # Errors listed in the report (all are counted)
+
+COLUMNS = ("name", "email", "username", "password", "dob", "phone", "address", "department")
+REQUIRED_COLUMNS = ("name", "email", "username")
+# Column lengths of users / students
+MAX_LENGTHS = {"name": 100, "email": 100, "username": 50, "phone": 20, "address": 255}
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+
+# --- Readers: yield (line number, {column: value}) without loading the whole file ---
+def _header(cells) -> List[str]:
+    return [str(cell or "").strip().lower().replace(" ", "_") for cell in cells]
+
+def _check_header(header: List[str]):
+    missing = [column for column in REQUIRED_COLUMNS if column not in header]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}. Expected a header row with {', '.join(COLUMNS)}.")
+
+def _csv_rows(stream: BinaryIO) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.reader(text)
+        header = _header(next(reader, []))
+        _check_header(header)
+        for cells in reader:
+            if any(cell.strip() for cell in cells):
+                yield reader.line_num, dict(zip(header, cells))
+    except UnicodeDecodeError:
+        raise ValueError("The CSV file is not UTF-8 encoded.")
+    except csv.Error as e:
+        raise ValueError(f"Malformed CSV near line {reader.line_num}: {e}")
+    finally:
+        text.detach() # The caller owns (and closes) the upload
+
+def _xlsx_rows(stream: BinaryIO) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("XLSX import needs the openpyxl package; upload a CSV instead.")
+    try:
+        workbook = load_workbook(stream, read_only=True, data_only=True) # Streams rows from the zip
+    except Exception as e:
+        raise ValueError(f"Could not read the XLSX file: {e}")
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = _header(next(rows, ()))
+        _check_header(header)
+        for line, cells in enumerate(rows, start=2):
+            if any(cell not in (None, "") for cell in cells):
+                yield line, dict(zip(header, cells))
+    finally:
+        workbook.close()
+
+def iter_rows(stream: BinaryIO, filename: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Rows of an uploaded file, by extension (.csv or .xlsx)."""
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension == ".csv":
+        return _csv_rows(stream)
+    if extension == ".xlsx":
+        return _xlsx_rows(stream)
+    raise ValueError("Unsupported file type; upload a .csv or .xlsx file.")
+
+
+# --- Validation ---
+def _text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value) # Spreadsheets store phone numbers and ids as floats
+    return str(value).strip()
+
+def _department_lookup(db: Session) -> Dict[str, int]:
+    """Department id or lower-cased name -> id."""
+    lookup: Dict[str, int] = {}
+    for department_id, name in db.query(models.Department.id, models.Department.name).all():
+        lookup[str(department_id)] = department_id
+        lookup.setdefault(name.strip().lower(), department_id)
+    return lookup
+
+def _clean_row(raw: Dict[str, Any], departments: Dict[str, int], default_password: str) -> Dict[str, Any]:
+    """The row's user/student values; raises ValueError naming the first problem."""
+    row = {column: _text(raw.get(column)) for column in COLUMNS if column != "dob"}
+    for column in REQUIRED_COLUMNS:
+        if not row[column]:
+            raise ValueError(f"{column} is required.")
+    for column, limit in MAX_LENGTHS.items():
+        if len(row[column]) > limit:
+            raise ValueError(f"{column} is longer than {limit} characters.")
+    if not EMAIL_PATTERN.match(row["email"]):
+        raise ValueError(f"'{row['email']}' is not a valid email address.")
+
+    dob = raw.get("dob")
+    if isinstance(dob, datetime):
+        dob = dob.date()
+    elif not isinstance(dob, date):
+        dob = _text(dob)
+        try:
+            dob = date.fromisoformat(dob) if dob else None
+        except ValueError:
+            raise ValueError(f"dob '{dob}' is not a YYYY-MM-DD date.")
+
+    department_id = None
+    if row["department"]:
+        department_id = departments.get(row["department"].lower())
+        if department_id is None:
+            raise ValueError(f"Unknown department '{row['department']}'.")
+
+    return {
+        "name": row["name"], "email": row["email"], "username": row["username"],
+        "password": row["password"] or default_password, "dob": dob,
+        "phone": row["phone"] or None, "address": row["address"] or None, "department_id": department_id,
+    }
+
+
+class _Report:
+    def __init__(self, filename: str, dry_run: bool):
+        self.filename = filename
+        self.dry_run = dry_run
+        self.rows = 0
+        self.imported = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.started = time.perf_counter()
+
+    def error(self, line: Optional[int], username: str, message: str):
+        self.failed += 1
+        if len(self.errors) < STUDENT_IMPORT_MAX_ERRORS:
+            self.errors.append({"row": line, "username": username, "message": message})
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "filename": self.filename, "dry_run": self.dry_run, "rows": self.rows,
+            "imported": self.imported, "failed": self.failed, "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+            "seconds": round(time.perf_counter() - self.started, 2),
+        }
+
+
+# --- Hashing pool ---
+_hash_pool: Optional[ProcessPoolExecutor] = None
+_hash_pool_lock = threading.Lock()
+
+def _get_hash_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    The import's password hashing processes, started by the first import and reused by later
+    ones (the first import sets the size). Separate from password_service.hasher so a bulk
+    upload does not queue ahead of logins. Spawned, not forked: forking the threaded app
+    process can copy a lock some other thread holds into the child.
+    """
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is None:
+            _hash_pool = ProcessPoolExecutor(max_workers=max(1, workers), mp_context=multiprocessing.get_context("spawn"))
+            logger.info(f"Student import hashing pool started ({max(1, workers)} processes).")
+        return _hash_pool
+
+def shutdown():
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is not None:
+            _hash_pool.shutdown(wait=True)
+            _hash_pool = None
+
+
+# --- Import ---
+def _taken(db: Session, rows: List[Tuple[int, Dict[str, Any]]]) -> Tuple[Set[str], Set[str]]:
+    """Usernames and emails of the chunk that already exist (one query, lower-cased)."""
+    usernames = [row["username"] for _, row in rows]
+    emails = [row["email"] for _, row in rows]
+    existing = db.query(models.User.username, models.User.email).filter(
+        or_(models.User.username.in_(usernames), models.User.email.in_(emails))
+    ).all()
+    return {username.lower() for username, _ in existing}, {email.lower() for _, email in existing}
+
+def _drop_taken(db: Session, rows: List[Tuple[int, Dict[str, Any]]], report: _Report) -> List[Tuple[int, Dict[str, Any]]]:
+    taken_usernames, taken_emails = _taken(db, rows)
+    free = []
+    for line, row in rows:
+        if row["username"].lower() in taken_usernames:
+            report.error(line, row["username"], f"Username '{row['username']}' already exists.")
+        elif row["email"].lower() in taken_emails:
+            report.error(line, row["username"], f"Email '{row['email']}' already exists.")
+        else:
+            free.append((line, row))
+    return free
+
+def _insert_chunk(db: Session, rows: List[Tuple[int, Dict[str, Any]]], hashes: List[str]):
+    """Two bulk INSERTs (users, then their students) and one commit."""
+    db.execute(insert(models.User), [
+        {"username": row["username"], "email": row["email"], "hashed_password": hashed,
+         "role": models.UserRole.STUDENT, "is_active": True}
+        for (_, row), hashed in zip(rows, hashes)
+    ])
+    user_ids = dict(db.query(models.User.username, models.User.id).filter(
+        models.User.username.in_([row["username"] for _, row in rows])
+    ).all())
+    db.execute(insert(models.Student), [
+        {"user_id": user_ids[row["username"]], "name": row["name"], "dob": row["dob"], "phone": row["phone"],
+         "address": row["address"], "department_id": row["department_id"]}
+        for _, row in rows
+    ])
+    db.commit()
+
+def _import_chunk(db: Session, rows: List[Tuple[int, Dict[str, Any]]], pool: ProcessPoolExecutor, report: _Report):
+    rows = _drop_taken(db, rows, report)
+    if not rows:
+        return
+    hashes = password_service.hash_passwords_on(pool, [row["password"] for _, row in rows])
+    try:
+        _insert_chunk(db, rows, hashes)
+    except IntegrityError:
+        # Someone created one of these accounts since the check: drop it and retry once
+        db.rollback()
+        hash_by_line = {line: hashed for (line, _), hashed in zip(rows, hashes)}
+        rows = _drop_taken(db, rows, report)
+        if not rows:
+            return
+        hashes = [hash_by_line[line] for line, _ in rows]
+        try:
+            _insert_chunk(db, rows, hashes)
+        except IntegrityError as e:
+            db.rollback()
+            logger.error(f"Student import chunk failed twice: {e}")
+            for line, row in rows:
+                report.error(line, row["username"], "Database error (duplicate account created concurrently?).")
+            return
+    report.imported += len(rows)
+
+def import_students(
+    db: Session, stream: BinaryIO, filename: str, dry_run: bool = False,
+    default_password: Optional[str] = None, chunk_size: int = STUDENT_IMPORT_CHUNK_SIZE,
+    hash_workers: int = STUDENT_IMPORT_HASH_WORKERS
+) -> Dict[str, Any]:
+    """
+    Imports the students of a CSV/XLSX file chunk by chunk (dry_run only validates and checks
+    for existing accounts). Returns {rows, imported, failed, errors: [{row, username, message}], ...}.
+    Raises ValueError only for an unreadable file; row problems are reported.
+    """
+    default_password = default_password or os.getenv("DEFAULT_NEW_USER_PASSWORD", "12345")
+    report = _Report(filename, dry_run)
+    departments = _department_lookup(db)
+    seen_usernames: Set[str] = set()
+    seen_emails: Set[str] = set()
+    rows = iter_rows(stream, filename)
+    pool = None if dry_run else _get_hash_pool(hash_workers)
+    while True:
+        try:
+            chunk = list(islice(rows, max(1, chunk_size)))
+        except ValueError as e:
+            if not report.rows:
+                raise # Nothing read yet: the file itself is unusable
+            # Earlier chunks are already committed; report where reading stopped
+            report.error(None, "", f"Import stopped after {report.rows} rows: {e}")
+            break
+        if not chunk:
+            break
+        report.rows += len(chunk)
+        valid = []
+        for line, raw in chunk:
+            try:
+                row = _clean_row(raw, departments, default_password)
+            except ValueError as e:
+                report.error(line, _text(raw.get("username")), str(e))
+                continue
+            # Duplicates within the file: the first row wins
+            if row["username"].lower() in seen_usernames:
+                report.error(line, row["username"], f"Username '{row['username']}' appears earlier in the file.")
+                continue
+            if row["email"].lower() in seen_emails:
+                report.error(line, row["username"], f"Email '{row['email']}' appears earlier in the file.")
+                continue
+            seen_usernames.add(row["username"].lower())
+            seen_emails.add(row["email"].lower())
+            valid.append((line, row))
+        if dry_run and valid:
+            report.imported += len(_drop_taken(db, valid, report))
+        elif valid:
+            _import_chunk(db, valid, pool, report)
+        logger.info(f"Student import '{filename}': {report.rows} rows read, {report.imported} {'valid' if dry_run else 'imported'}, {report.failed} failed")
+    return report.as_dict()
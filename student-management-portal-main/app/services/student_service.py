@@ -1,10 +1,12 @@
 # app/services/student_service.py
 # (Create this file if it doesn't exist)
 
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, joinedload, contains_eager
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy import or_
 from app import models
-from app.services import auth_service # For password hashing
+from app.pagination import Page, PageRequest, keyset_paginate
+from app.services import auth_service, enrollment_service # For principal invalidation / seat release
 from datetime import date
 from typing import List, Optional, Dict, Any
 import logging
@@ -19,6 +21,73 @@ def get_all_students(db: Session) -> List[models.Student]:
         joinedload(models.Student.department) # Eager load department
     ).order_by(models.Student.name).all()
 
+# Sortable columns for the admin student list (must be non-NULL, see app/pagination.py)
+STUDENT_SORT_KEYS = {
+    "name": models.Student.name,
+    "id": models.Student.id,
+    "username": models.User.username,
+    "email": models.User.email,
+}
+
+def get_students_page(
+    db: Session, page: PageRequest, search: Optional[str] = None, department_id: Optional[int] = None
+) -> Page:
+    """One keyset page of students, searchable by name/username/email and filterable by department."""
+    query = db.query(models.Student).join(models.Student.user)
+    if search and search.strip():
+        term = f"%{search.strip()}%"
+        query = query.filter(or_(
+            models.Student.name.ilike(term), models.User.username.ilike(term), models.User.email.ilike(term)
+        ))
+    if department_id:
+        query = query.filter(models.Student.department_id == department_id)
+    return keyset_paginate(
+        query, page, STUDENT_SORT_KEYS, default_sort="name", id_column=models.Student.id,
+        options=[contains_eager(models.Student.user), joinedload(models.Student.department)]
+    )
+
+def _like_escape(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def search_students(
+    db: Session, q: str, limit: int = 20, exclude: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Typeahead lookup returning up to `limit` students as {id, name, username}.
+    A numeric query matches the ID exactly. Otherwise name prefix matches come first (a range
+    scan on the name index), then - only if the page isn't full - substring matches on name,
+    username or email, which stop scanning as soon as LIMIT rows are found.
+    `exclude` drops students that already have an "alumni" record or a "hostel" assignment.
+    """
+    q = (q or "").strip()
+    if not q:
+        return []
+    query = db.query(models.Student.id, models.Student.name, models.User.username).join(models.Student.user)
+    if exclude == "alumni":
+        query = query.filter(~models.Student.alumni_record.has())
+    elif exclude == "hostel":
+        query = query.filter(~models.Student.hostel_records.any())
+
+    if q.isdigit():
+        rows = query.filter(models.Student.id == int(q)).all()
+    else:
+        term = _like_escape(q)
+        rows = query.filter(models.Student.name.like(f"{term}%", escape="\\")) \
+            .order_by(models.Student.name, models.Student.id).limit(limit).all()
+        if len(rows) < limit:
+            contains = f"%{term}%"
+            fallback = query.filter(or_(
+                models.Student.name.like(contains, escape="\\"),
+                models.User.username.like(contains, escape="\\"),
+                models.User.email.like(contains, escape="\\"),
+            ))
+            if rows:
+                fallback = fallback.filter(~models.Student.id.in_([r.id for r in rows]))
+            # No ORDER BY here, so the scan can stop at LIMIT; sort the few extra rows in Python
+            more = sorted(fallback.limit(limit - len(rows)).all(), key=lambda r: (r.name, r.id))
+            rows = list(rows) + more
+    return [{"id": r.id, "name": r.name, "username": r.username} for r in rows]
+
 def get_student_by_id_with_user(db: Session, student_id: int) -> Optional[models.Student]:
     """Retrieves a single student by ID, ensuring user and department info is loaded."""
     return db.query(models.Student).options(
@@ -27,11 +96,11 @@ def get_student_by_id_with_user(db: Session, student_id: int) -> Optional[models
     ).filter(models.Student.id == student_id).first()
 
 def create_student_with_user(
-    db: Session, name: str, email: str, username: str, raw_password: str,
+    db: Session, name: str, email: str, username: str, hashed_password: str,
     dob: Optional[date], phone: Optional[str], address: Optional[str],
     department_id: Optional[int] = None # Add department_id parameter
 ) -> models.Student:
-    """Creates a User and a linked Student record, optionally assigning a department."""
+    """Creates a User (with an already hashed password) and a linked Student record, optionally assigning a department."""
     # Check for existing user first
     existing_user = db.query(models.User).filter(
         (models.User.username == username) | (models.User.email == email)
@@ -42,8 +111,6 @@ def create_student_with_user(
         else:
             raise ValueError(f"Email '{email}' already exists.")
 
-    hashed_password = auth_service.get_password_hash(raw_password)
-
     # Create User first
     db_user = models.User(
         username=username,
@@ -125,6 +192,7 @@ def update_student_and_user(db: Session, student_id: int, update_data: Dict[str,
         db.commit()
         db.refresh(db_student)
         db.refresh(db_user)
+        auth_service.invalidate_principal(db_user.id)
         return db_student
     except IntegrityError as e:
         db.rollback()
@@ -161,6 +229,7 @@ def delete_student_and_user(db: Session, student_id: int) -> bool:
 
         # Option 2: Explicitly delete both (Student first if User has FK)
         # This is generally safer if unsure about cascades or if FK constraints prevent user delete first
+        released_course_ids = enrollment_service.release_student_seats(db, student_id) # Enrollments go by cascade
         db.delete(db_student)
         if db_user_to_delete:
              db.delete(db_user_to_delete) # Delete associated user
@@ -169,11 +238,18 @@ def delete_student_and_user(db: Session, student_id: int) -> bool:
 
 
         db.commit()
-        return True
+        if db_user_to_delete:
+            auth_service.invalidate_principal(db_user_to_delete.id)
     except Exception as e:
         db.rollback()
         logger.error(f"Error deleting student {student_id} or associated user: {e}", exc_info=True)
         return False
+    for course_id in released_course_ids:
+        try:
+            enrollment_service.promote_waitlist(db, course_id)
+        except ValueError as e:
+            logger.warning(f"Waitlist of course {course_id} not promoted after deleting student {student_id}: {e}")
+    return True
 
 def update_student_profile(db: Session, student_id: int, update_data: Dict[str, Any]) -> Optional[models.Student]:
     """Updates basic profile details for a student."""
@@ -195,6 +271,7 @@ def update_student_profile(db: Session, student_id: int, update_data: Dict[str,
         db.add(db_student)
         db.commit()
         db.refresh(db_student)
+        auth_service.invalidate_principal(db_student.user_id)
         logger.info(f"Student profile {student_id} updated.")
         return db_student
     except Exception as e:
@@ -0,0 +1,345 @@
+# app/services/submission_queue_service.py
+"""
+Write-behind queue for exam submissions.
+
+When SUBMISSION_QUEUE_ENABLED is on, the submit route only appends the answers to a local
+SQLite file (synchronous=FULL, so an acknowledged submission survives a crash) and returns.
+A pool of worker threads drains the file in batches through
+result_service.record_exam_submission. Entries are unique per (exam, student): a repeated
+submit returns the existing entry, and an attempt that is already in the database counts
+as done. Transient database failures are retried with backoff; entries claimed by a
+worker that died are picked up again after SUBMISSION_QUEUE_LEASE_SECONDS.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from app.database import SessionLocal
+from app.services import result_service
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+SUBMISSION_QUEUE_ENABLED = os.getenv("SUBMISSION_QUEUE_ENABLED", "false").lower() in ("1", "true", "yes")
+SUBMISSION_QUEUE_PATH = os.getenv("SUBMISSION_QUEUE_PATH", "submission_queue.sqlite3")
+SUBMISSION_QUEUE_WORKERS = int(os.getenv("SUBMISSION_QUEUE_WORKERS", 2))
+SUBMISSION_QUEUE_BATCH_SIZE = int(os.getenv("SUBMISSION_QUEUE_BATCH_SIZE", 20))
+SUBMISSION_QUEUE_POLL_SECONDS = float(os.getenv("SUBMISSION_QUEUE_POLL_SECONDS", 0.5))
+SUBMISSION_QUEUE_MAX_ATTEMPTS = int(os.getenv("SUBMISSION_QUEUE_MAX_ATTEMPTS", 20))
+SUBMISSION_QUEUE_LEASE_SECONDS = float(os.getenv("SUBMISSION_QUEUE_LEASE_SECONDS", 300))
+RETRY_BACKOFF_MAX_SECONDS = 60.0
+
+# Entry states
+QUEUED = "queued"
+PROCESSING = "processing"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    exam_id INTEGER NOT NULL,
+    student_id INTEGER NOT NULL,
+    answers TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    enqueued_at REAL NOT NULL,
+    available_at REAL NOT NULL,
+    claimed_at REAL,
+    finished_at REAL,
+    result_id INTEGER,
+    score REAL,
+    error TEXT,
+    UNIQUE (exam_id, student_id)
+);
+CREATE INDEX IF NOT EXISTS ix_submissions_status_available ON submissions (status, available_at);
+"""
+
+_COLUMNS = (
+    "id", "exam_id", "student_id", "status", "attempts", "enqueued_at",
+    "finished_at", "result_id", "score", "error"
+)
+
+
+def _row_to_entry(row) -> Dict[str, Any]:
+    return dict(zip(_COLUMNS, row))
+
+
+def record_submission(exam_id: int, student_id: int, answers: Dict[int, int]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Default processor: writes one submission through result_service.
+    Returns (status, details); raises for failures worth retrying.
+    """
+    db = SessionLocal()
+    try:
+        result = result_service.record_exam_submission(db, exam_id=exam_id, student_id=student_id, submitted_answers=answers)
+        return DONE, {"result_id": result.id, "score": result.score}
+    except result_service.SubmissionStorageError:
+        raise # Transient: retried
+    except result_service.ExamAlreadySubmittedError:
+        # Written by an earlier run whose acknowledgement was lost: idempotent success
+        db.rollback()
+        result = result_service.get_result_by_exam_and_student(db, exam_id, student_id)
+        return DONE, {"result_id": result.id if result else None, "score": result.score if result else None}
+    except ValueError as e:
+        db.rollback()
+        return FAILED, {"error": str(e)} # Rejected submission (e.g. exam unpublished): not retried
+    finally:
+        db.close()
+
+
+class SubmissionQueue:
+    """Durable SQLite-backed submission queue plus the worker threads that drain it."""
+
+    def __init__(
+        self,
+        path: str = SUBMISSION_QUEUE_PATH,
+        workers: int = SUBMISSION_QUEUE_WORKERS,
+        batch_size: int = SUBMISSION_QUEUE_BATCH_SIZE,
+        poll_seconds: float = SUBMISSION_QUEUE_POLL_SECONDS,
+        max_attempts: int = SUBMISSION_QUEUE_MAX_ATTEMPTS,
+        lease_seconds: float = SUBMISSION_QUEUE_LEASE_SECONDS,
+        processor: Callable[[int, int, Dict[int, int]], Tuple[str, Dict[str, Any]]] = record_submission,
+    ):
+        self.path = path
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max(1, max_attempts)
+        self.lease_seconds = lease_seconds
+        self.processor = processor
+        self._local = threading.local() # One sqlite3 connection per thread
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._schema_ready = False
+        # Metrics (this process only)
+        self.enqueued = 0
+        self.duplicates = 0
+        self.processed = 0
+        self.retried = 0
+        self.failed = 0
+        self.batches = 0
+
+    # --- Storage ---
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None) # Explicit BEGIN/COMMIT below
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL") # fsync on commit: acknowledged means durable
+            with self._lock:
+                if not self._schema_ready:
+                    conn.executescript(_SCHEMA)
+                    self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, exam_id: int, student_id: int, answers: Dict[int, int]) -> Tuple[Dict[str, Any], bool]:
+        """Stores a submission. Returns (entry, created); created is False if the student already has one for this exam."""
+        conn = self._connect()
+        now = time.time()
+        payload = json.dumps({str(q): o for q, o in answers.items()})
+        cursor = conn.execute(
+            "INSERT INTO submissions (exam_id, student_id, answers, status, enqueued_at, available_at) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            # A rejected (failed) submission may be sent again; anything else is a duplicate
+            "ON CONFLICT (exam_id, student_id) DO UPDATE SET answers = excluded.answers, status = excluded.status, "
+            "attempts = 0, enqueued_at = excluded.enqueued_at, available_at = excluded.available_at, "
+            "claimed_at = NULL, finished_at = NULL, error = NULL WHERE submissions.status = ?",
+            (exam_id, student_id, payload, QUEUED, now, now, FAILED)
+        )
+        created = cursor.rowcount == 1
+        with self._lock:
+            if created:
+                self.enqueued += 1
+            else:
+                self.duplicates += 1
+        if created:
+            self._wakeup.set()
+        return self.get_status(exam_id, student_id), created
+
+    def get_status(self, exam_id: int, student_id: int) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM submissions WHERE exam_id = ? AND student_id = ?",
+            (exam_id, student_id)
+        ).fetchone()
+        return _row_to_entry(row) if row else None
+
+    def has_pending(self, exam_id: int, student_id: int) -> bool:
+        entry = self.get_status(exam_id, student_id)
+        return entry is not None and entry["status"] in (QUEUED, PROCESSING)
+
+    def claim_batch(self) -> List[Tuple[int, int, int, Dict[int, int], int]]:
+        """Marks up to batch_size due entries as processing (plus expired leases) and returns them."""
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE") # Serialises claims across threads and processes
+        try:
+            rows = conn.execute(
+                "SELECT id, exam_id, student_id, answers, attempts FROM submissions "
+                "WHERE (status = ? AND available_at <= ?) OR (status = ? AND claimed_at < ?) "
+                "ORDER BY id LIMIT ?",
+                (QUEUED, now, PROCESSING, now - self.lease_seconds, self.batch_size)
+            ).fetchall()
+            if rows:
+                conn.executemany(
+                    "UPDATE submissions SET status = ?, claimed_at = ?, attempts = attempts + 1 WHERE id = ?",
+                    [(PROCESSING, now, row[0]) for row in rows]
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return [
+            (entry_id, exam_id, student_id, {int(q): int(o) for q, o in json.loads(answers).items()}, attempts + 1)
+            for entry_id, exam_id, student_id, answers, attempts in rows
+        ]
+
+    def _finish(self, outcomes: List[Tuple[int, str, Dict[str, Any], int]]):
+        """Writes the outcome of a processed batch in one transaction."""
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for entry_id, status, details, attempts in outcomes:
+                if status == QUEUED: # Retry later with exponential backoff
+                    delay = min(RETRY_BACKOFF_MAX_SECONDS, self.poll_seconds * (2 ** attempts))
+                    conn.execute(
+                        "UPDATE submissions SET status = ?, available_at = ?, claimed_at = NULL, error = ? WHERE id = ?",
+                        (QUEUED, now + delay, details.get("error"), entry_id)
+                    )
+                else:
+                    conn.execute(
+                        "UPDATE submissions SET status = ?, finished_at = ?, result_id = ?, score = ?, error = ? WHERE id = ?",
+                        (status, now, details.get("result_id"), details.get("score"), details.get("error"), entry_id)
+                    )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def process_batch(self) -> int:
+        """Claims and processes one batch. Returns the number of entries handled."""
+        batch = self.claim_batch()
+        if not batch:
+            return 0
+        outcomes = []
+        for entry_id, exam_id, student_id, answers, attempts in batch:
+            try:
+                status, details = self.processor(exam_id, student_id, answers)
+            except Exception as e:
+                if attempts >= self.max_attempts:
+                    logger.error(f"Submission {entry_id} (exam {exam_id}, student {student_id}) failed after {attempts} attempts: {e}")
+                    status, details = FAILED, {"error": str(e)}
+                else:
+                    logger.warning(f"Submission {entry_id} (exam {exam_id}, student {student_id}) attempt {attempts} failed, will retry: {e}")
+                    status, details = QUEUED, {"error": str(e)}
+            outcomes.append((entry_id, status, details, attempts))
+        self._finish(outcomes)
+        with self._lock:
+            self.batches += 1
+            for _, status, _, _ in outcomes:
+                if status == DONE:
+                    self.processed += 1
+                elif status == FAILED:
+                    self.failed += 1
+                else:
+                    self.retried += 1
+        return len(batch)
+
+    # --- Workers ---
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                handled = self.process_batch()
+            except Exception as e:
+                logger.error(f"Submission queue worker error: {e}", exc_info=True)
+                handled = 0
+            if not handled:
+                self._wakeup.wait(self.poll_seconds)
+                self._wakeup.clear()
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._stop.clear()
+            self._threads = [
+                threading.Thread(target=self._run, name=f"submission-queue-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Submission queue started ({self.path}, {self.workers} workers).")
+
+    def shutdown(self, timeout: float = 10.0):
+        """Stops the workers after their current batch; unfinished entries stay queued on disk."""
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def metrics(self) -> Dict[str, Any]:
+        counts = dict(self._connect().execute("SELECT status, COUNT(*) FROM submissions GROUP BY status").fetchall())
+        oldest = self._connect().execute(
+            "SELECT MIN(enqueued_at) FROM submissions WHERE status IN (?, ?)", (QUEUED, PROCESSING)
+        ).fetchone()[0]
+        with self._lock:
+            return {
+                "enabled": SUBMISSION_QUEUE_ENABLED,
+                "path": self.path,
+                "workers": self.workers,
+                "running": bool(self._threads),
+                "batch_size": self.batch_size,
+                "queued": counts.get(QUEUED, 0),
+                "processing": counts.get(PROCESSING, 0),
+                "done": counts.get(DONE, 0),
+                "failed": counts.get(FAILED, 0),
+                "oldest_pending_seconds": round(time.time() - oldest, 3) if oldest else 0.0,
+                "enqueued": self.enqueued,
+                "duplicates": self.duplicates,
+                "processed": self.processed,
+                "retried": self.retried,
+                "failed_here": self.failed,
+                "batches": self.batches,
+            }
+
+
+# Shared instance; workers start from the app startup event when the queue is enabled
+submission_queue = SubmissionQueue()
+
+def is_enabled() -> bool:
+    return SUBMISSION_QUEUE_ENABLED
+
+def enqueue_submission(exam_id: int, student_id: int, answers: Dict[int, int]) -> Tuple[Dict[str, Any], bool]:
+    return submission_queue.enqueue(exam_id, student_id, answers)
+
+def get_submission_status(exam_id: int, student_id: int) -> Optional[Dict[str, Any]]:
+    return submission_queue.get_status(exam_id, student_id)
+
+def has_pending_submission(exam_id: int, student_id: int) -> bool:
+    return SUBMISSION_QUEUE_ENABLED and submission_queue.has_pending(exam_id, student_id)
+
+def get_metrics() -> Dict[str, Any]:
+    if not SUBMISSION_QUEUE_ENABLED and not os.path.exists(submission_queue.path):
+        return {"enabled": False}
+    return submission_queue.metrics()
+
+def start():
+    if SUBMISSION_QUEUE_ENABLED:
+        submission_queue.start()
+
+def shutdown():
+    submission_queue.shutdown()
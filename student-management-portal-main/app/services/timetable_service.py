@@ -0,0 +1,584 @@
+# app/services/timetable_service.py
+"""
+Automatic weekly timetable generation.
+
+The meetings to place are the current schedules (each keeps its course and instructor; day,
+time and classroom are free) plus, optionally, meetings for courses that have none yet.
+Hard constraints: no classroom or instructor double booking, instructors only inside their
+availability windows, classrooms with enough seats for the course's enrollment. Soft costs:
+shared students of two courses meeting at the same time, two meetings of a course on one
+day, unused seats, and moving a meeting away from its current slot.
+
+The search places the most constrained meetings first; a meeting with no free slot takes
+the one with the fewest clashes and the displaced meetings go back in the queue. Once every
+meeting is placed, single moves that lower the soft cost are applied until none is found.
+Independent randomised starts run in parallel worker processes within a wall-clock budget,
+and the best timetable is returned as a diff against the current schedules (written only
+on request). The search runs from the CLI, never inside a request: dry runs store their
+report, which the admin preview page only reads.
+"""
+
+import json
+import logging
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, distinct, func
+from sqlalchemy.orm import Session, aliased
+
+from app import models
+from app.services import schedule_service
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+TIMETABLE_DAYS = os.getenv("TIMETABLE_DAYS", "Mon,Tue,Wed,Thu,Fri")
+TIMETABLE_DAY_START = os.getenv("TIMETABLE_DAY_START", "08:00")
+TIMETABLE_DAY_END = os.getenv("TIMETABLE_DAY_END", "18:00")
+TIMETABLE_SLOT_MINUTES = int(os.getenv("TIMETABLE_SLOT_MINUTES", 30))
+TIMETABLE_MEETING_MINUTES = int(os.getenv("TIMETABLE_MEETING_MINUTES", 60)) # New meetings of unscheduled courses
+TIMETABLE_TIME_BUDGET_SECONDS = float(os.getenv("TIMETABLE_TIME_BUDGET_SECONDS", 30))
+TIMETABLE_WORKERS = int(os.getenv("TIMETABLE_WORKERS", os.cpu_count() or 1))
+TIMETABLE_PREVIEW_PATH = os.getenv("TIMETABLE_PREVIEW_PATH", "timetable_preview.json") # Last dry run, shown by the admin page
+
+# Soft cost weights
+STUDENT_CLASH_WEIGHT = 10.0 # Per shared student, per overlapping slot
+SAME_DAY_WEIGHT = 20.0 # Per other meeting of the course on the same day
+MOVE_WEIGHT = 2.0 # Meeting not left where it currently is
+ROOM_WASTE_WEIGHT = 1.0 # Times the share of empty seats
+# When a meeting has no free slot: windows and rooms sampled to pick the occupants to displace
+EJECTION_WINDOW_SAMPLES = 30
+EJECTION_ROOM_SAMPLES = 4
+MAX_EJECTIONS_PER_MEETING = 50
+
+
+@dataclass
+class Meeting:
+    """One weekly meeting to place. `rooms` are indexes into TimetableProblem.rooms, best fit first ([-1] = no classrooms)."""
+    index: int
+    schedule_id: Optional[int]
+    course_id: int
+    instructor_id: int # Negative for schedules without an instructor (unconstrained)
+    duration: int # Minutes
+    length: int # Grid slots
+    enrollment: int
+    rooms: List[int]
+    current: Optional[Tuple[int, int, int]] = None # (day index, start slot, room index) if on the grid
+
+@dataclass
+class TimetableProblem:
+    days: List[int] # Weekday numbers, 0 = Monday
+    day_start: int # Minutes since midnight
+    slot_minutes: int
+    n_slots: int
+    rooms: List[Tuple[int, Optional[int], str]] # (classroom id, capacity, location), smallest first
+    meetings: List[Meeting]
+    availability: Dict[int, List[int]] # instructor_id -> per-day bitmask of slots; missing = whole grid
+    shared_students: Dict[int, Dict[int, int]] # course_id -> {other course_id: students in both}
+    unplaceable: List[Dict[str, Any]] = field(default_factory=list)
+    course_names: Dict[int, str] = field(default_factory=dict)
+    instructor_names: Dict[int, str] = field(default_factory=dict)
+
+
+def _runs(mask: int, length: int) -> int:
+    """Bit s set iff slots s .. s+length-1 are all set in mask."""
+    runs = mask
+    for shift in range(1, length):
+        runs &= mask >> shift
+    return runs
+
+def _bits(mask: int):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+# --- Search (pure Python on a TimetableProblem; runs inside pool workers) ---
+class _Search:
+    def __init__(self, problem: TimetableProblem, seed: int):
+        self.p = problem
+        self.rng = random.Random(seed)
+        n_days = len(problem.days)
+        self.full_day = (1 << problem.n_slots) - 1
+        self.room_busy = [[0] * n_days for _ in problem.rooms]
+        self.instructor_busy: Dict[int, List[int]] = {}
+        self.room_owner: Dict[Tuple[int, int, int], int] = {} # (room, day, slot) -> meeting
+        self.instructor_owner: Dict[Tuple[int, int, int], int] = {} # (instructor, day, slot) -> meeting
+        self.course_slots = [[{} for _ in range(problem.n_slots)] for _ in range(n_days)] # course -> meetings in slot
+        self.course_days: Dict[int, List[int]] = {}
+        self.assign: List[Optional[Tuple[int, int, int]]] = [None] * len(problem.meetings)
+        self.evictions = [0] * len(problem.meetings)
+        self.ejections = 0
+
+    def _available(self, meeting: Meeting, day: int) -> int:
+        windows = self.p.availability.get(meeting.instructor_id)
+        return windows[day] if windows is not None else self.full_day
+
+    def _busy(self, instructor_id: int) -> List[int]:
+        busy = self.instructor_busy.get(instructor_id)
+        if busy is None:
+            busy = self.instructor_busy[instructor_id] = [0] * len(self.p.days)
+        return busy
+
+    def place(self, meeting: Meeting, option: Tuple[int, int, int]):
+        day, start, room = option
+        block = ((1 << meeting.length) - 1) << start
+        self._busy(meeting.instructor_id)[day] |= block
+        if room >= 0:
+            self.room_busy[room][day] |= block
+        for slot in range(start, start + meeting.length):
+            self.instructor_owner[(meeting.instructor_id, day, slot)] = meeting.index
+            if room >= 0:
+                self.room_owner[(room, day, slot)] = meeting.index
+            courses = self.course_slots[day][slot]
+            courses[meeting.course_id] = courses.get(meeting.course_id, 0) + 1
+        self.course_days.setdefault(meeting.course_id, [0] * len(self.p.days))[day] += 1
+        self.assign[meeting.index] = option
+
+    def remove(self, meeting: Meeting):
+        day, start, room = self.assign[meeting.index]
+        block = ((1 << meeting.length) - 1) << start
+        self._busy(meeting.instructor_id)[day] &= ~block
+        if room >= 0:
+            self.room_busy[room][day] &= ~block
+        for slot in range(start, start + meeting.length):
+            del self.instructor_owner[(meeting.instructor_id, day, slot)]
+            if room >= 0:
+                del self.room_owner[(room, day, slot)]
+            courses = self.course_slots[day][slot]
+            courses[meeting.course_id] -= 1
+            if not courses[meeting.course_id]:
+                del courses[meeting.course_id]
+        self.course_days[meeting.course_id][day] -= 1
+        self.assign[meeting.index] = None
+
+    def _time_cost(self, meeting: Meeting, day: int, start: int) -> float:
+        cost = 0.0
+        shared = self.p.shared_students.get(meeting.course_id)
+        if shared:
+            for slot in range(start, start + meeting.length):
+                for course_id, count in self.course_slots[day][slot].items():
+                    students = shared.get(course_id)
+                    if students:
+                        cost += STUDENT_CLASH_WEIGHT * students * count
+        days = self.course_days.get(meeting.course_id)
+        if days:
+            cost += SAME_DAY_WEIGHT * days[day]
+        return cost
+
+    def _room_cost(self, meeting: Meeting, room: int) -> float:
+        capacity = self.p.rooms[room][1] if room >= 0 else None
+        return ROOM_WASTE_WEIGHT * (capacity - meeting.enrollment) / capacity if capacity else 0.0
+
+    def cost(self, meeting: Meeting, option: Tuple[int, int, int]) -> float:
+        """Soft cost of the (unplaced) meeting at option."""
+        day, start, room = option
+        cost = self._time_cost(meeting, day, start) + self._room_cost(meeting, room)
+        return cost + (MOVE_WEIGHT if meeting.current is not None and option != meeting.current else 0.0)
+
+    def best_option(self, meeting: Meeting) -> Optional[Tuple[float, Tuple[int, int, int]]]:
+        """Cheapest clash-free (cost, option) for the unplaced meeting, or None."""
+        best = None
+        busy = self._busy(meeting.instructor_id)
+        current_room = meeting.current[2] if meeting.current else None
+        for day in range(len(self.p.days)):
+            starts = _runs(self._available(meeting, day) & ~busy[day], meeting.length)
+            for start in _bits(starts):
+                block = ((1 << meeting.length) - 1) << start
+                # Smallest free room that fits, and the current room if it's free
+                rooms = [room for room in meeting.rooms if room < 0 or not self.room_busy[room][day] & block][:1]
+                if current_room is not None and current_room in meeting.rooms and current_room not in rooms \
+                        and not self.room_busy[current_room][day] & block:
+                    rooms.append(current_room)
+                if not rooms:
+                    continue
+                time_cost = self._time_cost(meeting, day, start)
+                for room in rooms:
+                    option = (day, start, room)
+                    cost = time_cost + self._room_cost(meeting, room)
+                    if meeting.current is not None and option != meeting.current:
+                        cost += MOVE_WEIGHT
+                    cost += self.rng.random() * 1e-3 # Random tie-break: differs per start
+                    if best is None or cost < best[0]:
+                        best = (cost, option)
+        return best
+
+    def ejection_option(self, meeting: Meeting) -> Optional[Tuple[Tuple[int, int, int], set]]:
+        """A slot inside the instructor's availability whose occupants are cheap to displace (sampled)."""
+        windows = [(day, start) for day in range(len(self.p.days))
+                   for start in _bits(_runs(self._available(meeting, day), meeting.length))]
+        if len(windows) > EJECTION_WINDOW_SAMPLES:
+            windows = self.rng.sample(windows, EJECTION_WINDOW_SAMPLES)
+        rooms = meeting.rooms
+        if len(rooms) > EJECTION_ROOM_SAMPLES:
+            rooms = self.rng.sample(rooms, EJECTION_ROOM_SAMPLES)
+        best = None
+        for day, start in windows:
+            slots = range(start, start + meeting.length)
+            teaching = {self.instructor_owner[key] for key in ((meeting.instructor_id, day, s) for s in slots)
+                        if key in self.instructor_owner}
+            for room in rooms:
+                victims = set(teaching)
+                if room >= 0:
+                    victims.update(self.room_owner[key] for key in ((room, day, s) for s in slots) if key in self.room_owner)
+                # Prefer displacing few meetings that haven't been displaced often
+                score = sum(1 + self.evictions[v] for v in victims) + self.rng.random()
+                if best is None or score < best[0]:
+                    best = (score, (day, start, room), victims)
+        return (best[1], best[2]) if best else None
+
+    def construct(self, deadline: float):
+        meetings = self.p.meetings
+        # Most constrained first: few fitting rooms, narrow availability, long, large
+        def difficulty(meeting: Meeting):
+            windows = sum(bin(_runs(self._available(meeting, d), meeting.length)).count("1") for d in range(len(self.p.days)))
+            return (len(meeting.rooms) if meeting.rooms[0] >= 0 else 10 ** 6, windows, -meeting.length, -meeting.enrollment, self.rng.random())
+        queue = deque(sorted(meetings, key=difficulty))
+        max_ejections = MAX_EJECTIONS_PER_MEETING * max(1, len(meetings))
+        while queue and time.monotonic() < deadline and self.ejections < max_ejections:
+            meeting = queue.popleft()
+            best = self.best_option(meeting)
+            if best is not None:
+                self.place(meeting, best[1])
+                continue
+            ejection = self.ejection_option(meeting)
+            if ejection is None:
+                continue # No window at all (excluded when the problem is built)
+            option, victims = ejection
+            for victim in victims:
+                self.remove(meetings[victim])
+                self.evictions[victim] += 1
+                queue.append(meetings[victim])
+            self.ejections += 1
+            self.place(meeting, option)
+
+    def improve(self, deadline: float):
+        placed = [m for m in self.p.meetings if self.assign[m.index] is not None]
+        stale, limit = 0, 2 * len(placed)
+        while placed and stale < limit and time.monotonic() < deadline:
+            meeting = self.rng.choice(placed)
+            old = self.assign[meeting.index]
+            self.remove(meeting)
+            old_cost = self.cost(meeting, old)
+            best = self.best_option(meeting)
+            if best is not None and best[0] < old_cost - 1e-2:
+                self.place(meeting, best[1])
+                stale = 0
+            else:
+                self.place(meeting, old)
+                stale += 1
+
+    def total_cost(self) -> float:
+        shared = unary = 0.0
+        for meeting in self.p.meetings:
+            option = self.assign[meeting.index]
+            if option is not None:
+                self.remove(meeting)
+                time_cost = self._time_cost(meeting, option[0], option[1])
+                shared += time_cost
+                unary += self.cost(meeting, option) - time_cost
+                self.place(meeting, option)
+        return round(shared / 2 + unary, 2) # Clash and same-day costs are seen from both meetings
+
+def _run_search(problem: TimetableProblem, seed: int, time_budget: float) -> Dict[str, Any]:
+    """One randomised start (module level so the process pool can pickle it)."""
+    started = time.monotonic()
+    search = _Search(problem, seed)
+    search.construct(started + time_budget)
+    search.improve(started + time_budget)
+    return {
+        "seed": seed,
+        "assign": search.assign,
+        "unplaced": sum(1 for option in search.assign if option is None),
+        "cost": search.total_cost(),
+        "ejections": search.ejections,
+        "seconds": round(time.monotonic() - started, 2),
+    }
+
+def solve(problem: TimetableProblem, workers: int = TIMETABLE_WORKERS, time_budget: float = TIMETABLE_TIME_BUDGET_SECONDS,
+          seed: Optional[int] = None) -> Dict[str, Any]:
+    """Runs `workers` independent starts in parallel; the one placing most meetings at the lowest cost wins."""
+    workers = max(1, workers)
+    base_seed = seed if seed is not None else random.randrange(1 << 30)
+    seeds = [base_seed + i for i in range(workers)]
+    if workers == 1 or not problem.meetings:
+        runs = [_run_search(problem, seeds[0], time_budget)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            runs = list(pool.map(_run_search, [problem] * workers, seeds, [time_budget] * workers))
+    best = min(runs, key=lambda run: (run["unplaced"], run["cost"]))
+    best["starts"] = [{key: run[key] for key in ("seed", "unplaced", "cost", "ejections", "seconds")} for run in runs]
+    return best
+
+
+# --- Problem from the database ---
+def _grid() -> Tuple[List[int], int, int]:
+    days = sorted({schedule_service.parse_weekday(day) for day in TIMETABLE_DAYS.split(",") if day.strip()})
+    day_start = schedule_service.parse_time_minutes(TIMETABLE_DAY_START)
+    day_end = schedule_service.parse_time_minutes(TIMETABLE_DAY_END)
+    if not days or day_end <= day_start or TIMETABLE_SLOT_MINUTES <= 0:
+        raise ValueError("Invalid TIMETABLE_DAYS / TIMETABLE_DAY_START / TIMETABLE_DAY_END / TIMETABLE_SLOT_MINUTES.")
+    return days, day_start, day_end
+
+def build_problem(db: Session, include_unscheduled: bool = False) -> TimetableProblem:
+    """Collects meetings, classrooms, enrollment counts, shared students and availability."""
+    days, day_start, day_end = _grid()
+    slot_minutes = TIMETABLE_SLOT_MINUTES
+    n_slots = (day_end - day_start) // slot_minutes
+    full_day = (1 << n_slots) - 1
+
+    classrooms = db.query(models.Classroom.id, models.Classroom.capacity, models.Classroom.location).all()
+    rooms = sorted(classrooms, key=lambda r: (r.capacity is None, r.capacity or 0, r.id))
+    room_index = {room.id: i for i, room in enumerate(rooms)}
+    enrollment = dict(db.query(models.Enrollment.course_id, func.count(distinct(models.Enrollment.student_id))).group_by(
+        models.Enrollment.course_id
+    ).all())
+    first, second = aliased(models.Enrollment), aliased(models.Enrollment)
+    shared: Dict[int, Dict[int, int]] = {}
+    for course_a, course_b, students in db.query(first.course_id, second.course_id, func.count(distinct(first.student_id))).join(
+        second, and_(first.student_id == second.student_id, first.course_id < second.course_id)
+    ).group_by(first.course_id, second.course_id).all():
+        shared.setdefault(course_a, {})[course_b] = students
+        shared.setdefault(course_b, {})[course_a] = students
+
+    availability: Dict[int, List[int]] = {}
+    for window in db.query(models.InstructorAvailability).all():
+        masks = availability.setdefault(window.instructor_id, [0] * len(days))
+        if window.weekday not in days:
+            continue
+        first_slot = max(0, -(-(window.start_minute - day_start) // slot_minutes)) # Slots fully inside the window
+        last_slot = min(n_slots, (window.end_minute - day_start) // slot_minutes)
+        for slot in range(first_slot, last_slot):
+            masks[days.index(window.weekday)] |= 1 << slot
+
+    problem = TimetableProblem(
+        days=days, day_start=day_start, slot_minutes=slot_minutes, n_slots=n_slots,
+        rooms=[(room.id, room.capacity, room.location) for room in rooms], meetings=[],
+        availability=availability, shared_students=shared,
+        course_names=dict(db.query(models.Course.id, models.Course.name).all()),
+        instructor_names=dict(db.query(models.Instructor.id, models.Instructor.name).all()),
+    )
+
+    def add_meeting(schedule_id, course_id, instructor_id, duration, current_slot, current_room):
+        seats = enrollment.get(course_id, 0)
+        fitting = [i for i, room in enumerate(rooms) if room.capacity is None or room.capacity >= seats] if rooms else [-1]
+        meeting = Meeting(
+            index=len(problem.meetings), schedule_id=schedule_id, course_id=course_id,
+            instructor_id=instructor_id if instructor_id is not None else -(len(problem.meetings) + 1),
+            duration=duration, length=-(-duration // slot_minutes), enrollment=seats, rooms=fitting,
+        )
+        reason = None
+        if not fitting:
+            reason = f"No classroom seats {seats} students."
+        elif meeting.length > n_slots:
+            reason = f"Longer than the teaching day ({duration} minutes)."
+        elif not any(_runs(masks, meeting.length) for masks in availability.get(meeting.instructor_id, [full_day])):
+            reason = "Instructor availability has no window long enough."
+        if reason:
+            problem.unplaceable.append({"schedule_id": schedule_id, "course_id": course_id, "instructor_id": instructor_id, "reason": reason})
+            return
+        if current_slot is not None:
+            weekday, start, end = current_slot
+            offset = start - day_start
+            if weekday in days and offset >= 0 and offset % slot_minutes == 0 and offset // slot_minutes + meeting.length <= n_slots:
+                meeting.current = (days.index(weekday), offset // slot_minutes, room_index.get(current_room, -1))
+        problem.meetings.append(meeting)
+
+    schedules = db.query(models.Schedule).order_by(models.Schedule.id).all()
+    teaching_minutes: Dict[int, int] = {}
+    for schedule in schedules:
+        slot = schedule_service.schedule_slot(schedule)
+        duration = slot[2] - slot[1] if slot else TIMETABLE_MEETING_MINUTES
+        add_meeting(schedule.id, schedule.course_id, schedule.instructor_id, duration, slot, schedule.classroom_id)
+        if schedule.instructor_id is not None:
+            teaching_minutes[schedule.instructor_id] = teaching_minutes.get(schedule.instructor_id, 0) + duration
+
+    if include_unscheduled:
+        scheduled = {schedule.course_id for schedule in schedules}
+        instructors_by_department: Dict[int, List[int]] = {}
+        for instructor_id, department_id in db.query(models.Instructor.id, models.Instructor.department_id).all():
+            instructors_by_department.setdefault(department_id, []).append(instructor_id)
+        courses = db.query(models.Course).order_by(models.Course.id)
+        if scheduled:
+            courses = courses.filter(models.Course.id.notin_(scheduled))
+        for course in courses.all():
+            candidates = instructors_by_department.get(course.department_id)
+            if not candidates:
+                problem.unplaceable.append({"schedule_id": None, "course_id": course.id, "instructor_id": None,
+                                            "reason": "No instructor in the course's department."})
+                continue
+            # Least loaded instructor of the department teaches it; one meeting per credit
+            instructor_id = min(candidates, key=lambda i: (teaching_minutes.get(i, 0), i))
+            for _ in range(max(1, course.credits or 1)):
+                add_meeting(None, course.id, instructor_id, TIMETABLE_MEETING_MINUTES, None, None)
+                teaching_minutes[instructor_id] = teaching_minutes.get(instructor_id, 0) + TIMETABLE_MEETING_MINUTES
+    return problem
+
+
+# --- Diff / apply ---
+def _slot_of(problem: TimetableProblem, meeting: Meeting, option: Tuple[int, int, int]) -> Tuple[int, int, int]:
+    day, start, _ = option
+    start_minute = problem.day_start + start * problem.slot_minutes
+    return problem.days[day], start_minute, start_minute + meeting.duration
+
+def _describe(problem: TimetableProblem, meeting: Meeting, option: Tuple[int, int, int]) -> Dict[str, Any]:
+    weekday, start, end = _slot_of(problem, meeting, option)
+    room = problem.rooms[option[2]] if option[2] >= 0 else None
+    return {
+        "day_of_week": schedule_service.WEEKDAYS[weekday],
+        "start_time": schedule_service.format_minutes(start), "end_time": schedule_service.format_minutes(end),
+        "classroom_id": room[0] if room else None, "classroom": room[2] if room else None,
+    }
+
+def generate_timetable(
+    db: Session, include_unscheduled: bool = False, apply: bool = False, time_budget: Optional[float] = None,
+    workers: Optional[int] = None, seed: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Builds a conflict-free timetable and returns its diff against the current schedules.
+    With apply=True the diff is written (moved schedules are updated in place, so attendance
+    stays linked); refused if any meeting could not be placed or schedules changed meanwhile.
+    """
+    started = time.monotonic()
+    fingerprint = schedule_service.ScheduleIndex.fingerprint(db)
+    problem = build_problem(db, include_unscheduled)
+    db.rollback() # Don't hold the read transaction open during the search
+    solution = solve(problem, workers or TIMETABLE_WORKERS, time_budget or TIMETABLE_TIME_BUDGET_SECONDS, seed)
+
+    changes, unplaced = [], list(problem.unplaceable)
+    summary = {"unchanged": 0, "moved": 0, "new": 0}
+    for meeting in problem.meetings:
+        option = solution["assign"][meeting.index]
+        label = {
+            "schedule_id": meeting.schedule_id, "course_id": meeting.course_id,
+            "course": problem.course_names.get(meeting.course_id),
+            "instructor_id": meeting.instructor_id if meeting.instructor_id >= 0 else None,
+            "instructor": problem.instructor_names.get(meeting.instructor_id),
+        }
+        if option is None:
+            unplaced.append({**label, "reason": "No clash-free slot found within the time budget."})
+        elif meeting.schedule_id is None:
+            summary["new"] += 1
+            changes.append({**label, "status": "new", "to": _describe(problem, meeting, option)})
+        elif option == meeting.current:
+            summary["unchanged"] += 1
+        else:
+            summary["moved"] += 1
+            changes.append({**label, "status": "moved", "to": _describe(problem, meeting, option)})
+
+    # "from" of moved meetings: the schedule as stored
+    current = {s.id: s for s in db.query(models.Schedule).filter(
+        models.Schedule.id.in_([c["schedule_id"] for c in changes if c["schedule_id"] is not None])
+    ).all()} if summary["moved"] else {}
+    for change in changes:
+        schedule = current.get(change["schedule_id"])
+        if schedule is not None:
+            change["from"] = {
+                "day_of_week": schedule.day_of_week, "start_time": schedule.start_time, "end_time": schedule.end_time,
+                "classroom_id": schedule.classroom_id,
+            }
+
+    report = {
+        "dry_run": not apply,
+        "meetings": len(problem.meetings) + len(problem.unplaceable),
+        "placed": len(problem.meetings) - solution["unplaced"],
+        "summary": summary,
+        "cost": solution["cost"],
+        "seed": solution["seed"],
+        "starts": solution["starts"],
+        "seconds": round(time.monotonic() - started, 2),
+        "schedules_fingerprint": _fingerprint_key(fingerprint),
+        "changes": changes,
+        "unplaced": unplaced,
+    }
+    if not apply:
+        db.rollback()
+        return report
+
+    if unplaced:
+        raise ValueError(f"Timetable not applied: {len(unplaced)} meetings could not be placed.")
+    if schedule_service.ScheduleIndex.fingerprint(db) != fingerprint:
+        raise ValueError("Timetable not applied: schedules were changed while it was being generated.")
+    try:
+        for meeting in problem.meetings:
+            option = solution["assign"][meeting.index]
+            if option == meeting.current:
+                continue
+            schedule = current.get(meeting.schedule_id) if meeting.schedule_id is not None else None
+            if schedule is None:
+                schedule = models.Schedule(course_id=meeting.course_id, instructor_id=meeting.instructor_id)
+                db.add(schedule)
+            schedule.classroom_id = problem.rooms[option[2]][0] if option[2] >= 0 else None
+            schedule_service.apply_slot(schedule, _slot_of(problem, meeting, option))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error applying generated timetable: {e}", exc_info=True)
+        raise ValueError("Database error applying the generated timetable.")
+    schedule_service.invalidate_schedule_caches()
+    logger.info(f"Generated timetable applied: {summary}, cost {solution['cost']}.")
+    return report
+
+
+# --- Stored preview (written by the CLI, read by the admin page) ---
+def _fingerprint_key(fingerprint: tuple) -> List[str]:
+    return [str(value) for value in fingerprint] # JSON-safe (max updated_at is a datetime)
+
+def save_preview(report: Dict[str, Any], path: Optional[str] = None) -> None:
+    """Stores a dry-run report for the admin preview page (replaced atomically)."""
+    path = path or TIMETABLE_PREVIEW_PATH
+    stored = {**report, "generated_at": datetime.now().isoformat(timespec="seconds")}
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(stored, f)
+    os.replace(tmp_path, path)
+
+def load_preview(db: Session, path: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    The last stored dry run, or None if there is none. `stale` is set when schedules changed
+    since it was generated (its diff no longer applies as shown). Reads a file: call it off
+    the event loop.
+    """
+    try:
+        with open(path or TIMETABLE_PREVIEW_PATH) as f:
+            report = json.load(f)
+    except FileNotFoundError:
+        return None
+    current = _fingerprint_key(schedule_service.ScheduleIndex.fingerprint(db))
+    db.rollback()
+    report["stale"] = report.get("schedules_fingerprint") != current
+    return report
+
+
+# --- Instructor availability ---
+def set_instructor_availability(db: Session, instructor_id: int, windows: List[str]) -> int:
+    """
+    Replaces an instructor's availability with windows like 'Mon 09:00-13:00'. An empty list
+    clears it (available any time). Returns the number of windows stored.
+    """
+    if not db.query(models.Instructor.id).filter(models.Instructor.id == instructor_id).first():
+        raise ValueError(f"Instructor with ID {instructor_id} not found.")
+    rows = []
+    for window in windows:
+        day, _, times = window.strip().partition(" ")
+        start, _, end = times.strip().partition("-")
+        weekday, start_minute, end_minute = schedule_service.parse_slot(day, start, end)
+        rows.append(models.InstructorAvailability(
+            instructor_id=instructor_id, weekday=weekday, start_minute=start_minute, end_minute=end_minute
+        ))
+    try:
+        db.query(models.InstructorAvailability).filter(models.InstructorAvailability.instructor_id == instructor_id).delete()
+        db.add_all(rows)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error saving availability of instructor {instructor_id}: {e}", exc_info=True)
+        raise ValueError("Database error saving instructor availability.")
+    return len(rows)
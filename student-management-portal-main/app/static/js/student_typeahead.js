@@ -0,0 +1,82 @@
+// app/static/js/student_typeahead.js
+// Turns <select data-student-typeahead> into a server-side student picker: a search box is
+// inserted above the select and each (debounced) keystroke asks /api/students/search for the
+// top matches, which replace the select's options. The select keeps its name/value, so forms
+// and page scripts that read `select.value` work unchanged.
+//   data-exclude="alumni|hostel"  skip students that already have that record
+//   The first <option> is kept as the placeholder (e.g. "-- Select Student --" / "All Students");
+//   any other pre-rendered <option selected> (the current filter) stays until a search replaces it.
+(function () {
+    const SEARCH_URL = '/api/students/search';
+    const DEBOUNCE_MS = 200;
+
+    function attach(select) {
+        if (select.dataset.typeaheadReady) return;
+        select.dataset.typeaheadReady = '1';
+
+        const input = document.createElement('input');
+        input.type = 'search';
+        input.autocomplete = 'off';
+        input.placeholder = select.dataset.placeholder || 'Type a name or ID to search students...';
+        input.className = select.className;
+        input.style.marginBottom = '0.25rem';
+        select.parentNode.insertBefore(input, select);
+
+        const placeholder = select.options.length ? select.options[0].cloneNode(true) : new Option('-- Select Student --', '');
+        const initialOptions = Array.from(select.options).slice(1).map(o => o.cloneNode(true));
+        let timer = null;
+        let requestSeq = 0;
+
+        function render(students) {
+            const previous = select.value;
+            select.innerHTML = '';
+            select.appendChild(placeholder.cloneNode(true));
+            students.forEach(s => select.appendChild(new Option(`${s.name} (ID: ${s.id})`, s.id)));
+            if (students.length === 1) {
+                select.value = String(students[0].id);
+            } else if (Array.from(select.options).some(o => o.value === previous)) {
+                select.value = previous;
+            }
+        }
+
+        function restore() {
+            select.innerHTML = '';
+            select.appendChild(placeholder.cloneNode(true));
+            initialOptions.forEach(o => select.appendChild(o.cloneNode(true)));
+        }
+
+        input.addEventListener('input', () => {
+            clearTimeout(timer);
+            const q = input.value.trim();
+            if (!q) { restore(); return; }
+            timer = setTimeout(() => {
+                const seq = ++requestSeq;
+                const params = new URLSearchParams({ q });
+                if (select.dataset.exclude) params.set('exclude', select.dataset.exclude);
+                fetch(`${SEARCH_URL}?${params}`, { credentials: 'same-origin', headers: { 'Accept': 'application/json' } })
+                    .then(r => r.ok ? r.json() : [])
+                    .then(students => { if (seq === requestSeq) render(Array.isArray(students) ? students : []); })
+                    .catch(err => console.error('Student search failed', err));
+            }, DEBOUNCE_MS);
+        });
+
+        // Enter in the search box picks the first match instead of submitting the form
+        input.addEventListener('keydown', e => {
+            if (e.key !== 'Enter') return;
+            e.preventDefault();
+            if (select.options.length > 1) {
+                select.value = select.options[1].value;
+                select.dispatchEvent(new Event('change', { bubbles: true }));
+            }
+        });
+
+        if (select.form) {
+            select.form.addEventListener('reset', () => { input.value = ''; restore(); });
+        }
+    }
+
+    window.StudentTypeahead = { attach };
+    document.addEventListener('DOMContentLoaded', () => {
+        document.querySelectorAll('select[data-student-typeahead]').forEach(attach);
+    });
+})();
@@ -0,0 +1,183 @@
+# benchmarks/enrollment_load.py
+"""
+Registration-opening load test.
+
+Seeds a scratch database with one course of --capacity seats and --students students, then
+fires every student's enroll click (--clicks per student, to include double submits) at
+enrollment_service from --concurrency threads, each with its own session. Full courses put
+the student on the waitlist, as the enroll route does. Afterwards a share of the enrolled
+students drop the course concurrently, which must promote waitlisted students in order.
+
+Exits non-zero if a seat was oversold, a student got two enrollments, the seat counter
+drifted from the enrollment count or the waitlist was not served first come first served.
+
+    DATABASE_URL=mysql+mysqlconnector://root:pw@localhost/sms_load \\
+    DATABASE_POOL_SIZE=64 DATABASE_POOL_MAX_OVERFLOW=0 \\
+        python -m benchmarks.enrollment_load --students 5000 --capacity 300 --concurrency 64
+
+SQLite serialises all writers, so it checks correctness but not throughput.
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import func
+
+from app import models
+from app.database import SessionLocal, engine
+from app.services import enrollment_service
+
+
+def seed(students: int, capacity: int) -> int:
+    """Creates the students and the course; returns the course id."""
+    db = SessionLocal()
+    try:
+        if db.query(models.Student.id).first():
+            raise SystemExit("Database already has students; refusing to seed (use a scratch database).")
+        department = models.Department(name="Load Test")
+        db.add(department)
+        db.flush()
+        course = models.Course(name="Registration Load Test", credits=3, department_id=department.id, capacity=capacity)
+        db.add(course)
+        db.execute(models.User.__table__.insert(), [
+            {"id": u, "username": f"load{u}", "email": f"load{u}@example.com", "hashed_password": "x",
+             "role": models.UserRole.STUDENT, "is_active": True}
+            for u in range(1, students + 1)
+        ])
+        db.execute(models.Student.__table__.insert(), [
+            {"id": s, "user_id": s, "name": f"Load Student {s:06d}", "department_id": department.id}
+            for s in range(1, students + 1)
+        ])
+        db.commit()
+        return course.id
+    finally:
+        db.close()
+
+
+def _click(student_id: int, course_id: int) -> tuple:
+    """One enroll click, as handled by the enroll route. Returns (outcome, seconds)."""
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        enrollment_service.create_enrollment(db, student_id, course_id)
+        outcome = "enrolled"
+    except enrollment_service.CourseFullError:
+        try:
+            outcome = "enrolled" if enrollment_service.join_waitlist(db, student_id, course_id) == 0 else "waitlisted"
+        except ValueError:
+            outcome = "rejected"
+    except ValueError:
+        outcome = "rejected" # Duplicate click of an enrolled student
+    except Exception as e:
+        outcome = f"error: {type(e).__name__}"
+    finally:
+        db.close()
+    return outcome, time.perf_counter() - started
+
+
+def _drop(student_id: int, course_id: int) -> str:
+    db = SessionLocal()
+    try:
+        enrollment = db.query(models.Enrollment).filter_by(student_id=student_id, course_id=course_id).first()
+        if enrollment is None:
+            return "missing"
+        enrollment_service.delete_enrollment(db, enrollment.id, student_id)
+        return "dropped"
+    except Exception as e:
+        return f"error: {type(e).__name__}"
+    finally:
+        db.close()
+
+
+def check(course_id: int, capacity: int, students: int) -> list:
+    """Invariant violations (empty list = consistent)."""
+    db = SessionLocal()
+    try:
+        problems = []
+        enrolled = db.query(func.count(models.Enrollment.id)).filter(models.Enrollment.course_id == course_id).scalar()
+        distinct = db.query(func.count(models.Enrollment.student_id.distinct())).filter(models.Enrollment.course_id == course_id).scalar()
+        waiting = db.query(func.count(models.EnrollmentWaitlist.id)).filter(models.EnrollmentWaitlist.course_id == course_id).scalar()
+        seats_taken = db.query(models.Course.seats_taken).filter(models.Course.id == course_id).scalar()
+        both = db.query(func.count(models.EnrollmentWaitlist.id)).join(
+            models.Enrollment, (models.Enrollment.student_id == models.EnrollmentWaitlist.student_id)
+            & (models.Enrollment.course_id == models.EnrollmentWaitlist.course_id)
+        ).filter(models.EnrollmentWaitlist.course_id == course_id).scalar()
+        if enrolled > capacity:
+            problems.append(f"oversold: {enrolled} enrollments for {capacity} seats")
+        if distinct != enrolled:
+            problems.append(f"double enrollments: {enrolled - distinct}")
+        if seats_taken != enrolled:
+            problems.append(f"seat counter {seats_taken} != {enrolled} enrollments")
+        if both:
+            problems.append(f"{both} students both enrolled and waitlisted")
+        if enrolled < min(capacity, students) and waiting:
+            problems.append(f"{capacity - enrolled} free seats while {waiting} students wait")
+        print(f"  enrolled={enrolled} seats_taken={seats_taken} waitlisted={waiting}")
+        return problems
+    finally:
+        db.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--capacity", type=int, default=150)
+    parser.add_argument("--clicks", type=int, default=2, help="Enroll clicks per student (double submits)")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--drop-share", type=float, default=0.2, help="Share of enrolled students who then drop the course")
+    args = parser.parse_args(argv)
+
+    models.Base.metadata.create_all(bind=engine)
+    course_id = seed(args.students, args.capacity)
+    clicks = [s for s in range(1, args.students + 1) for _ in range(args.clicks)]
+    random.Random(7).shuffle(clicks)
+
+    print(f"Registration: {len(clicks)} clicks from {args.students} students for {args.capacity} seats, {args.concurrency} threads")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda student_id: _click(student_id, course_id), clicks))
+    elapsed = time.perf_counter() - started
+    outcomes = Counter(outcome for outcome, _ in results)
+    latencies = sorted(seconds for _, seconds in results)
+    print(f"  {len(clicks) / elapsed:.0f} clicks/s over {elapsed:.1f}s; outcomes {dict(outcomes)}")
+    print(f"  latency p50 {statistics.median(latencies) * 1000:.0f} ms, p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.0f} ms")
+    problems = check(course_id, args.capacity, args.students)
+
+    # Waitlist order as the database saw it, to check promotions are first come first served
+    db = SessionLocal()
+    try:
+        queue = [row[0] for row in db.query(models.EnrollmentWaitlist.student_id).filter(
+            models.EnrollmentWaitlist.course_id == course_id).order_by(models.EnrollmentWaitlist.id).all()]
+        enrolled = [row[0] for row in db.query(models.Enrollment.student_id).filter(models.Enrollment.course_id == course_id).all()]
+    finally:
+        db.close()
+    droppers = random.Random(11).sample(enrolled, int(len(enrolled) * args.drop_share))
+    print(f"Drops: {len(droppers)} enrolled students drop concurrently ({len(queue)} waiting)")
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        drops = Counter(pool.map(lambda s: _drop(s, course_id), droppers))
+    print(f"  outcomes {dict(drops)}")
+    problems += check(course_id, args.capacity, args.students)
+
+    db = SessionLocal()
+    try:
+        now_enrolled = {row[0] for row in db.query(models.Enrollment.student_id).filter(models.Enrollment.course_id == course_id).all()}
+    finally:
+        db.close()
+    promoted = [s for s in queue if s in now_enrolled]
+    if promoted != queue[:len(promoted)]:
+        problems.append("waitlist not promoted in arrival order")
+
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    if not problems:
+        print("OK: no oversold seats, no double enrollments, counters consistent, waitlist served in order.")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+# benchmarks/login_throughput.py
+"""
+Login throughput benchmark.
+
+Hashing mode (default) replays N concurrent password verifications through a
+PasswordHasher per worker count, showing how throughput scales with cores:
+
+    python -m benchmarks.login_throughput --logins 200 --workers 1,2,4,8
+    python -m benchmarks.login_throughput --executor process
+
+HTTP mode fires concurrent logins at a running server's /auth/token endpoint:
+
+    python -m benchmarks.login_throughput --url http://localhost:8000 \
+        --username admin --password admin123 --logins 500 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import os
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.password_service import PasswordHasher, pwd_context
+
+
+async def _run_hashing(hasher: PasswordHasher, hashed: str, logins: int) -> float:
+    started = time.perf_counter()
+    results = await asyncio.gather(*(hasher.verify_async("benchmark-password", hashed) for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    assert all(results), "verification failed"
+    return elapsed
+
+
+def benchmark_hashing(logins: int, worker_counts, executor: str):
+    hashed = pwd_context.hash("benchmark-password")
+    print(f"{logins} verifications per run, executor={executor}, cpu_count={os.cpu_count()}")
+    print(f"{'workers':>8} {'seconds':>9} {'logins/s':>10} {'speedup':>8} {'max queue':>10}")
+    baseline = None
+    for workers in worker_counts:
+        hasher = PasswordHasher(max_workers=workers, executor=executor)
+        hasher.verify("benchmark-password", hashed) # Warm up the pool outside the timing
+        elapsed = asyncio.run(_run_hashing(hasher, hashed, logins))
+        metrics = hasher.metrics()
+        hasher.shutdown()
+        rate = logins / elapsed
+        baseline = baseline or rate
+        print(f"{workers:>8} {elapsed:>9.2f} {rate:>10.1f} {rate / baseline:>7.2f}x {metrics['max_queue_depth']:>10}")
+
+
+def _login_once(url: str, body: bytes) -> bool:
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/x-www-form-urlencoded"})
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            return response.status == 200
+    except urllib.error.URLError:
+        return False
+
+
+def benchmark_http(base_url: str, username: str, password: str, logins: int, concurrency: int):
+    url = base_url.rstrip("/") + "/auth/token"
+    body = urllib.parse.urlencode({"username": username, "password": password}).encode()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: _login_once(url, body), range(logins)))
+    elapsed = time.perf_counter() - started
+    ok = sum(results)
+    print(f"{logins} logins, concurrency={concurrency}: {elapsed:.2f}s, {ok / elapsed:.1f} successful logins/s, {logins - ok} failed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--workers", default=None, help="Comma separated worker counts (default: 1,2,4,... up to cpu_count)")
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread")
+    parser.add_argument("--url", help="Benchmark a running server instead of the hashing pool")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    if args.url:
+        benchmark_http(args.url, args.username, args.password, args.logins, args.concurrency)
+        return
+
+    if args.workers:
+        worker_counts = [int(w) for w in args.workers.split(",")]
+    else:
+        cpus = os.cpu_count() or 1
+        worker_counts = [1]
+        while worker_counts[-1] * 2 <= cpus:
+            worker_counts.append(worker_counts[-1] * 2)
+        if worker_counts[-1] != cpus:
+            worker_counts.append(cpus)
+    benchmark_hashing(args.logins, worker_counts, args.executor)
+
+
+if __name__ == "__main__":
+    main()
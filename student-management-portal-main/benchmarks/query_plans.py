@@ -0,0 +1,276 @@
+# benchmarks/query_plans.py
+"""
+Query plan check.
+
+Runs the services' hot read paths against a seeded database, captures every SELECT they
+issue, EXPLAINs each one and exits non-zero if any plan reads a whole table that is
+expected to grow (MySQL access type ALL, SQLite "SCAN <table>" without an index).
+
+Point DATABASE_URL at a scratch database; --seed fills it with synthetic rows first:
+
+    DATABASE_URL=mysql+mysqlconnector://root:pw@localhost/sms_plans \
+        python -m benchmarks.query_plans --seed --students 5000
+    DATABASE_URL=sqlite:///./plans.sqlite3 python -m benchmarks.query_plans --seed
+
+Small reference tables (departments, courses, ...) may be scanned; see --allow-scan.
+"""
+
+import argparse
+import random
+import re
+import sys
+from datetime import date, timedelta
+
+from sqlalchemy import event, func, text
+from sqlalchemy.orm import Session
+
+from app import models
+from app.database import SessionLocal, engine
+from app.pagination import PageRequest
+from app.services import (
+    attendance_service, complaint_service, dashboard_service, enrollment_service, exam_service,
+    fee_service, hostel_service, library_service, result_service, schedule_service, student_service,
+)
+
+# Reference tables that stay small; a full scan of them is fine
+DEFAULT_ALLOWED_SCANS = ["departments", "courses", "classrooms", "scholarships", "clubs"]
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+
+
+# --- Seeding ---
+def _insert(db: Session, model, rows, chunk: int = 2000):
+    for start in range(0, len(rows), chunk):
+        db.execute(model.__table__.insert(), rows[start:start + chunk])
+
+def seed(db: Session, students: int, courses: int, days: int):
+    """Fills an empty database with synthetic rows sized like a busy term."""
+    if db.query(models.Student.id).first():
+        raise SystemExit("Database already has students; refusing to seed (use a scratch database).")
+    rng = random.Random(42)
+    instructors = max(courses // 3, 1)
+    print(f"Seeding {students} students, {courses} courses, {instructors} instructors, {days} days of attendance...")
+
+    _insert(db, models.Department, [{"id": d, "name": f"Department {d}"} for d in range(1, 11)])
+    users = [
+        {"id": u, "username": f"user{u}", "email": f"user{u}@example.com", "hashed_password": "x",
+         "role": models.UserRole.STUDENT if u <= students else models.UserRole.INSTRUCTOR, "is_active": True}
+        for u in range(1, students + instructors + 1)
+    ]
+    _insert(db, models.User, users)
+    _insert(db, models.Student, [
+        {"id": s, "user_id": s, "name": f"Student {s:06d}", "department_id": rng.randint(1, 10)}
+        for s in range(1, students + 1)
+    ])
+    _insert(db, models.Instructor, [
+        {"id": i, "user_id": students + i, "name": f"Instructor {i}", "department_id": rng.randint(1, 10)}
+        for i in range(1, instructors + 1)
+    ])
+    _insert(db, models.Course, [
+        {"id": c, "name": f"Course {c:03d}", "credits": rng.choice([2, 3, 4]), "department_id": rng.randint(1, 10)}
+        for c in range(1, courses + 1)
+    ])
+    schedules = [
+        {"id": c, "course_id": c, "instructor_id": (c - 1) % instructors + 1,
+         "day_of_week": DAYS[c % len(DAYS)], "start_time": "09:00", "end_time": "10:00",
+         "weekday": schedule_service.WEEKDAYS.index(DAYS[c % len(DAYS)]), "start_minute": 540, "end_minute": 600}
+        for c in range(1, courses + 1)
+    ]
+    _insert(db, models.Schedule, schedules)
+
+    enrollments, grades = [], []
+    course_students = {c: [] for c in range(1, courses + 1)}
+    for s in range(1, students + 1):
+        for c in rng.sample(range(1, courses + 1), min(5, courses)):
+            enrollments.append({"student_id": s, "course_id": c})
+            grades.append({"student_id": s, "course_id": c, "grade": rng.choice("ABCDF")})
+            course_students[c].append(s)
+    _insert(db, models.Enrollment, enrollments)
+    for c, enrolled in course_students.items():
+        db.execute(models.Course.__table__.update().where(models.Course.__table__.c.id == c).values(seats_taken=len(enrolled)))
+    _insert(db, models.Grade, grades)
+
+    statuses = list(models.AttendanceStatus)
+    start = date.today() - timedelta(days=days)
+    attendance = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        for schedule in schedules:
+            if schedule["day_of_week"] != DAYS[day.weekday() % len(DAYS)] or day.weekday() > 4:
+                continue
+            for s in course_students[schedule["course_id"]]:
+                attendance.append({"student_id": s, "schedule_id": schedule["id"], "date": day,
+                                   "status": rng.choice(statuses)})
+    _insert(db, models.Attendance, attendance)
+
+    exams = [
+        {"id": e, "course_id": (e - 1) % courses + 1, "name": f"Exam {e}", "type": models.ExamType.QUIZ,
+         "date": date.today() + timedelta(days=rng.randint(-30, 30)), "is_published": e % 3 != 0, "total_marks": 10.0}
+        for e in range(1, courses * 3 + 1)
+    ]
+    _insert(db, models.Exam, exams)
+    questions = [
+        {"id": e["id"] * 5 + q, "exam_id": e["id"], "question_text": f"Question {q}", "marks": 1.0}
+        for e in exams for q in range(5)
+    ]
+    _insert(db, models.MCQQuestion, questions)
+    _insert(db, models.MCQOption, [
+        {"question_id": question["id"], "position": p, "text": text, "is_correct": p == 0}
+        for question in questions for p, text in enumerate("ABCD")
+    ])
+    results = []
+    for e in exams:
+        for s in course_students[e["course_id"]][:50]:
+            results.append({"student_id": s, "exam_id": e["id"], "score": rng.randint(0, 10), "is_graded": True})
+    _insert(db, models.Result, results)
+
+    _insert(db, models.FeePayment, [
+        {"student_id": s, "amount": 1000.0, "amount_paid": 0.0, "description": "Tuition",
+         "date": date.today() + timedelta(days=rng.randint(-90, 90)), "status": rng.choice(list(models.PaymentStatus))}
+        for s in range(1, students + 1) for _ in range(3)
+    ])
+    _insert(db, models.Complaint, [
+        {"student_id": rng.randint(1, students), "description": "Seeded complaint",
+         "status": rng.choice(list(models.ComplaintStatus)), "date": date.today() - timedelta(days=rng.randint(0, 365))}
+        for _ in range(students // 2)
+    ])
+    _insert(db, models.Hostel, [
+        {"student_id": s, "hostel_name": f"Block {s % 8}", "room_number": str(s % 300)}
+        for s in range(1, students + 1, 2)
+    ])
+    _insert(db, models.Library, [
+        {"student_id": s, "books_borrowed": 1, "borrowed_date": date.today() - timedelta(days=s % 60)}
+        for s in range(1, students + 1, 3)
+    ])
+    db.commit()
+    attendance_service.rebuild_attendance_summary(db)
+    if engine.dialect.name == "mysql":
+        for table in models.Base.metadata.sorted_tables:
+            db.execute(text(f"ANALYZE TABLE `{table.name}`"))
+    elif engine.dialect.name == "sqlite":
+        db.execute(text("ANALYZE"))
+    db.commit()
+
+
+# --- Scenarios ---
+def scenarios(db: Session):
+    """(label, callable) pairs exercising the services' read paths with ids from the seeded data."""
+    student_id = db.query(func.min(models.Enrollment.student_id)).scalar()
+    course_id = db.query(models.Enrollment.course_id).filter(models.Enrollment.student_id == student_id).limit(1).scalar()
+    schedule = db.query(models.Schedule).filter(models.Schedule.course_id == course_id).first()
+    attendance_day = db.query(func.max(models.Attendance.date)).filter(models.Attendance.schedule_id == schedule.id).scalar()
+    exam_ids = [e for (e,) in db.query(models.Exam.id).filter(models.Exam.course_id == course_id).all()]
+    hostel_name = db.query(models.Hostel.hostel_name).limit(1).scalar()
+    page = PageRequest()
+
+    return [
+        ("student page", lambda: student_service.get_students_page(db, page)),
+        ("student search (name)", lambda: student_service.search_students(db, "Student 0001")),
+        ("student search (id)", lambda: student_service.search_students(db, str(student_id))),
+        ("enrollments for student", lambda: enrollment_service.get_enrollments_for_student(db, student_id)),
+        ("attendance sheet", lambda: attendance_service.get_attendance_records(db, schedule.id, attendance_day)),
+        ("attendance history", lambda: attendance_service.get_attendance_for_student(db, student_id)),
+        ("attendance summary", lambda: attendance_service.get_attendance_summary_for_student(db, student_id)),
+        ("dashboard summary", lambda: dashboard_service.compute_dashboard_summary(db, student_id)),
+        ("fee page", lambda: fee_service.get_fee_payments_page(db, page)),
+        ("fee page (student)", lambda: fee_service.get_fee_payments_page(db, page, student_id=student_id)),
+        ("fee page (status)", lambda: fee_service.get_fee_payments_page(db, page, status="OVERDUE")),
+        ("published exams", lambda: exam_service.get_published_exams_for_student_courses(db, student_id)),
+        ("exams for course", lambda: exam_service.get_exams_for_course(db, course_id)),
+        ("exam questions", lambda: exam_service.get_exam_questions_for_student(db, exam_ids[0])),
+        ("attempt exists", lambda: exam_service.check_exam_attempt_exists(db, exam_ids[0], student_id)),
+        ("result lookup", lambda: result_service.get_result_by_exam_and_student(db, exam_ids[0], student_id)),
+        ("results for exams", lambda: result_service.get_results_for_student_exams(db, student_id, exam_ids)),
+        ("instructor day", lambda: schedule_service.get_instructor_schedules_on_day(
+            db, schedule.instructor_id, course_id, schedule.day_of_week)),
+        ("courses taught", lambda: schedule_service.get_courses_taught_by_instructor(db, schedule.instructor_id)),
+        ("schedules for courses", lambda: schedule_service.get_schedules_for_courses(db, [course_id])),
+        ("complaints page", lambda: complaint_service.admin_get_complaints_page(db, page, status="OPEN")),
+        ("hostel page", lambda: hostel_service.get_hostel_assignments_page(db, page, hostel_name=hostel_name)),
+        ("library page (student)", lambda: library_service.get_library_records_page(db, page, student_id=student_id)),
+    ]
+
+
+# --- Plan inspection ---
+class StatementCollector:
+    """Records the SELECTs sent to the database, tagged with the scenario that issued them."""
+
+    def __init__(self):
+        self.label = None
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if self.label and statement.lstrip().upper().startswith("SELECT"):
+            self.statements.append((self.label, statement, parameters))
+
+def full_scans(conn, statement: str, parameters, allowed) -> list:
+    """Tables the plan reads in full, excluding the allowed ones."""
+    dialect = conn.dialect.name
+    if dialect == "mysql":
+        rows = conn.exec_driver_sql("EXPLAIN " + statement, parameters).mappings().all()
+        return [
+            row["table"] for row in rows
+            if row["type"] == "ALL" and row["table"] and not row["table"].startswith("<") and row["table"] not in allowed
+        ]
+    if dialect == "sqlite":
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+        scans = []
+        for row in rows:
+            match = re.match(r"SCAN (?:TABLE )?(\w+)(?: AS (\w+))?", row[-1])
+            if match and "INDEX" not in row[-1] and match.group(1) not in allowed:
+                scans.append(match.group(1))
+        return scans
+    raise SystemExit(f"EXPLAIN checks are not implemented for the {dialect} dialect.")
+
+def check(allowed) -> int:
+    collector = StatementCollector()
+    event.listen(engine, "before_cursor_execute", collector)
+    db = SessionLocal()
+    try:
+        for label, run in scenarios(db):
+            collector.label = label
+            run()
+            collector.label = None
+            db.rollback() # Fresh identity map per scenario, like separate requests
+    finally:
+        event.remove(engine, "before_cursor_execute", collector)
+        db.close()
+
+    failures, seen = 0, set()
+    with engine.connect() as conn:
+        for label, statement, parameters in collector.statements:
+            key = (statement, repr(parameters))
+            if key in seen:
+                continue
+            seen.add(key)
+            scans = full_scans(conn, statement, parameters, allowed)
+            if scans:
+                failures += 1
+                print(f"FULL SCAN [{label}] on {', '.join(sorted(set(scans)))}:\n    {' '.join(statement.split())[:400]}\n")
+    print(f"{len(seen)} distinct statements checked, {failures} with full scans.")
+    return 1 if failures else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", action="store_true", help="Create the schema and fill an empty database first")
+    parser.add_argument("--students", type=int, default=3000)
+    parser.add_argument("--courses", type=int, default=60)
+    parser.add_argument("--days", type=int, default=60, help="Days of attendance history to seed")
+    parser.add_argument("--allow-scan", default=",".join(DEFAULT_ALLOWED_SCANS),
+                        help="Comma separated tables that may be scanned in full")
+    args = parser.parse_args()
+
+    if args.seed:
+        models.Base.metadata.create_all(bind=engine)
+        db = SessionLocal()
+        try:
+            seed(db, args.students, args.courses, args.days)
+        finally:
+            db.close()
+    allowed = {table for table in args.allow_scan.split(",") if table}
+    sys.exit(check(allowed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+-- 001: one attendance row per (student, schedule, date).
+-- Required by the bulk upsert in attendance_service.save_attendance_records.
+-- Tables created by create_all after this change already have the constraint.
+
+-- Keep the most recent row of any duplicates
+DELETE a FROM attendance a
+JOIN attendance newer
+  ON newer.student_id = a.student_id
+ AND newer.schedule_id = a.schedule_id
+ AND newer.date = a.date
+ AND newer.id > a.id;
+
+ALTER TABLE attendance
+  ADD CONSTRAINT _attendance_student_schedule_date_uc UNIQUE (student_id, schedule_id, date);
+
+-- If duplicates were removed, refresh the rollup afterwards:
+--   python -m app.cli rebuild-attendance-summary
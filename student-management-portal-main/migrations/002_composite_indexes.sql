@@ -0,0 +1,33 @@
+-- 002: indexes matching how the services filter and order (see __table_args__ in app/models.py).
+-- create_all adds these to new databases; apply this file to existing ones.
+-- Check afterwards with: python -m benchmarks.query_plans
+
+-- Student typeahead (name prefix search)
+CREATE INDEX ix_students_name ON students (name);
+
+CREATE INDEX ix_enrollments_student_course ON enrollments (student_id, course_id);
+CREATE INDEX ix_enrollments_course_student ON enrollments (course_id, student_id);
+
+CREATE INDEX ix_schedules_instructor_course_day ON schedules (instructor_id, course_id, day_of_week);
+CREATE INDEX ix_schedules_course ON schedules (course_id);
+
+CREATE INDEX ix_grades_student_course ON grades (student_id, course_id);
+
+CREATE INDEX ix_attendance_schedule_date ON attendance (schedule_id, date);
+CREATE INDEX ix_attendance_student_date ON attendance (student_id, date);
+
+CREATE INDEX ix_exams_course_published_date ON exams (course_id, is_published, date);
+CREATE INDEX ix_mcq_questions_exam ON mcq_questions (exam_id);
+
+CREATE INDEX ix_results_exam_student ON results (exam_id, student_id);
+CREATE INDEX ix_results_student_exam ON results (student_id, exam_id);
+CREATE INDEX ix_mcq_answers_result_question ON mcq_answers (result_id, mcq_question_id);
+
+CREATE INDEX ix_fee_payments_student_status ON fee_payments (student_id, status);
+CREATE INDEX ix_fee_payments_status_date ON fee_payments (status, date);
+CREATE INDEX ix_fee_payments_date ON fee_payments (date);
+
+CREATE INDEX ix_complaints_status_date ON complaints (status, date);
+CREATE INDEX ix_complaints_date ON complaints (date);
+
+CREATE INDEX ix_hostels_hostel_name ON hostels (hostel_name);
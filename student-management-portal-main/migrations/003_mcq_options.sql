@@ -0,0 +1,14 @@
+-- 003: MCQ options move from the mcq_questions.options JSON blob to mcq_options rows,
+-- and answers reference the chosen option by id.
+-- Apply after the app (or any `python -m app.cli` command) has run once on the new code,
+-- so create_all has created the mcq_options table the foreign key points at.
+
+ALTER TABLE mcq_questions MODIFY options TEXT NULL;
+
+ALTER TABLE mcq_answers
+  ADD COLUMN selected_option_id INT NULL AFTER mcq_question_id,
+  ADD CONSTRAINT fk_mcq_answers_selected_option
+    FOREIGN KEY (selected_option_id) REFERENCES mcq_options (id) ON DELETE SET NULL;
+
+-- Then convert existing exams (parses the JSON, links answers by option text):
+--   python -m app.cli migrate-mcq-options
@@ -0,0 +1,4 @@
+-- 004: version counter for compiled exam answer keys (exam_service.AnswerKeyCache).
+-- Bumped by save_mcq_questions_for_exam / update_exam_details; cached keys of an older version are ignored.
+
+ALTER TABLE exams ADD COLUMN answer_key_version INT NOT NULL DEFAULT 1 AFTER is_published;
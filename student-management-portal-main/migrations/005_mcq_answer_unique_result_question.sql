@@ -0,0 +1,16 @@
+-- 005: one mcq_answers row per (result, question).
+-- Required by the autosave upsert in attempt_service.flush_autosaves; replaces ix_mcq_answers_result_question.
+-- Tables created by create_all after this change already have the constraint.
+
+-- Keep the most recent row of any duplicates
+DELETE a FROM mcq_answers a
+JOIN mcq_answers newer
+  ON newer.result_id = a.result_id
+ AND newer.mcq_question_id = a.mcq_question_id
+ AND newer.id > a.id;
+
+-- Add the unique key first: it takes over the result_id foreign key's index
+ALTER TABLE mcq_answers
+  ADD CONSTRAINT _mcq_answer_result_question_uc UNIQUE (result_id, mcq_question_id);
+
+DROP INDEX ix_mcq_answers_result_question ON mcq_answers;
@@ -0,0 +1,13 @@
+-- 006: typed weekday / time columns on schedules, used by schedule_service conflict detection.
+-- Tables created by create_all after this change already have them.
+
+ALTER TABLE schedules
+  ADD COLUMN weekday SMALLINT NULL AFTER end_time,
+  ADD COLUMN start_minute SMALLINT NULL AFTER weekday,
+  ADD COLUMN end_minute SMALLINT NULL AFTER start_minute;
+
+CREATE INDEX ix_schedules_classroom_weekday ON schedules (classroom_id, weekday, start_minute);
+
+-- Then fill the new columns from the existing strings (accepts 'Mon'/'Monday', '9:00 AM'/'09:00'):
+--   python -m app.cli backfill-schedule-times
+-- and review existing double bookings at GET /admin/schedules/conflicts
@@ -0,0 +1,15 @@
+-- 007: weekly teaching windows of instructors, read by the timetable generator (timetable_service).
+-- Instructors without rows are treated as available any time. Created by create_all on fresh databases.
+
+CREATE TABLE IF NOT EXISTS instructor_availability (
+  id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+  instructor_id INT NOT NULL,
+  weekday SMALLINT NOT NULL,
+  start_minute SMALLINT NOT NULL,
+  end_minute SMALLINT NOT NULL,
+  created_at DATETIME NULL,
+  CONSTRAINT fk_instructor_availability_instructor FOREIGN KEY (instructor_id) REFERENCES instructors (id)
+);
+
+CREATE INDEX ix_instructor_availability_instructor ON instructor_availability (instructor_id, weekday);
+-- Windows are set with: python -m app.cli set-instructor-availability INSTRUCTOR_ID "Mon 09:00-13:00" ...
@@ -0,0 +1,36 @@
+-- 008: course seat limits, one enrollment per (student, course) and the enrollment waitlist.
+-- Used by enrollment_service seat reservation; replaces ix_enrollments_student_course.
+-- Tables created by create_all after this change already have all of it.
+
+-- Keep the oldest row of any duplicate enrollments
+DELETE e FROM enrollments e
+JOIN enrollments older
+  ON older.student_id = e.student_id
+ AND older.course_id = e.course_id
+ AND older.id < e.id;
+
+-- Add the unique key first: it takes over the student_id foreign key's index
+ALTER TABLE enrollments
+  ADD CONSTRAINT _enrollment_student_course_uc UNIQUE (student_id, course_id);
+
+DROP INDEX ix_enrollments_student_course ON enrollments;
+
+ALTER TABLE courses
+  ADD COLUMN capacity INT NULL AFTER department_id,
+  ADD COLUMN seats_taken INT NOT NULL DEFAULT 0 AFTER capacity;
+
+UPDATE courses c
+   SET seats_taken = (SELECT COUNT(*) FROM enrollments e WHERE e.course_id = c.id);
+
+CREATE TABLE IF NOT EXISTS enrollment_waitlist (
+  id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+  student_id INT NOT NULL,
+  course_id INT NOT NULL,
+  created_at DATETIME NULL,
+  CONSTRAINT _waitlist_student_course_uc UNIQUE (student_id, course_id),
+  CONSTRAINT fk_enrollment_waitlist_student FOREIGN KEY (student_id) REFERENCES students (id),
+  CONSTRAINT fk_enrollment_waitlist_course FOREIGN KEY (course_id) REFERENCES courses (id)
+);
+
+CREATE INDEX ix_enrollment_waitlist_course ON enrollment_waitlist (course_id, id);
+-- Seat counters can be re-derived at any time with: python -m app.cli recount-course-seats
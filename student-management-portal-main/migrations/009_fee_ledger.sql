@@ -0,0 +1,38 @@
+-- 009: immutable fee ledger and the per-student balance summary kept by fee_ledger_service.
+-- Tables created by create_all after this change already have all of it.
+
+CREATE TABLE IF NOT EXISTS fee_ledger_entries (
+  id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+  student_id INT NOT NULL,
+  fee_payment_id INT NULL,
+  entry_type ENUM('CHARGE', 'ADJUSTMENT', 'PAYMENT', 'REFUND') NOT NULL,
+  amount FLOAT NOT NULL,
+  description VARCHAR(255) NULL,
+  posted_at DATETIME NOT NULL,
+  CONSTRAINT fk_fee_ledger_entries_student FOREIGN KEY (student_id) REFERENCES students (id)
+);
+
+CREATE INDEX ix_fee_ledger_entries_id ON fee_ledger_entries (id);
+CREATE INDEX ix_fee_ledger_entries_student_id ON fee_ledger_entries (student_id, id);
+CREATE INDEX ix_fee_ledger_entries_fee_payment ON fee_ledger_entries (fee_payment_id);
+
+CREATE TABLE IF NOT EXISTS student_fee_balances (
+  student_id INT NOT NULL PRIMARY KEY,
+  balance FLOAT NOT NULL DEFAULT 0,
+  charged_total FLOAT NOT NULL DEFAULT 0,
+  paid_total FLOAT NOT NULL DEFAULT 0,
+  not_due FLOAT NOT NULL DEFAULT 0,
+  overdue_1_30 FLOAT NOT NULL DEFAULT 0,
+  overdue_31_60 FLOAT NOT NULL DEFAULT 0,
+  overdue_61_90 FLOAT NOT NULL DEFAULT 0,
+  overdue_over_90 FLOAT NOT NULL DEFAULT 0,
+  oldest_due_date DATE NULL,
+  aged_on DATE NULL,
+  updated_at DATETIME NULL,
+  CONSTRAINT fk_student_fee_balances_student FOREIGN KEY (student_id) REFERENCES students (id)
+);
+
+CREATE INDEX ix_student_fee_balances_balance ON student_fee_balances (balance);
+CREATE INDEX ix_student_fee_balances_aged_on ON student_fee_balances (aged_on);
+-- Then post opening entries for existing fee records and fill the balances:
+--   python -m app.cli rebuild-fee-ledger
@@ -0,0 +1,28 @@
+-- 010: term fee plans generated per cohort by fee_plan_service, and the link from fee records
+-- to the plan that charged them (one charge per plan and student).
+-- Tables created by create_all after this change already have all of it.
+
+CREATE TABLE IF NOT EXISTS fee_plans (
+  id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+  name VARCHAR(100) NOT NULL,
+  term VARCHAR(20) NOT NULL,
+  academic_year VARCHAR(20) NULL,
+  department_id INT NULL,
+  tuition_amount FLOAT NOT NULL,
+  include_hostel BOOL NOT NULL DEFAULT 1,
+  apply_scholarships BOOL NOT NULL DEFAULT 1,
+  scholarship_share FLOAT NOT NULL DEFAULT 1,
+  due_date DATE NOT NULL,
+  generated_at DATETIME NULL,
+  generated_count INT NOT NULL DEFAULT 0,
+  created_at DATETIME NULL,
+  CONSTRAINT _fee_plan_term_name_uc UNIQUE (term, name),
+  CONSTRAINT fk_fee_plans_department FOREIGN KEY (department_id) REFERENCES departments (id)
+);
+
+CREATE INDEX ix_fee_plans_id ON fee_plans (id);
+
+ALTER TABLE fee_payments
+  ADD COLUMN fee_plan_id INT NULL AFTER payment_method,
+  ADD CONSTRAINT _fee_payment_plan_student_uc UNIQUE (fee_plan_id, student_id),
+  ADD CONSTRAINT fk_fee_payments_fee_plan FOREIGN KEY (fee_plan_id) REFERENCES fee_plans (id);
@@ -0,0 +1,25 @@
+-- 011: one results row (attempt) per (exam, student).
+-- start_attempt and record_exam_submission insert the row when missing and rely on this key to
+-- turn a concurrent second insert into an IntegrityError; replaces ix_results_exam_student.
+-- Tables created by create_all after this change already have the constraint.
+
+-- Duplicates to drop: a submitted attempt beats an open one, otherwise the oldest row stays
+CREATE TEMPORARY TABLE _duplicate_results AS
+SELECT DISTINCT r.id
+FROM results r
+JOIN results keep
+  ON keep.exam_id = r.exam_id
+ AND keep.student_id = r.student_id
+ AND keep.id <> r.id
+ AND ((keep.submitted_at IS NOT NULL AND r.submitted_at IS NULL)
+   OR ((keep.submitted_at IS NULL) = (r.submitted_at IS NULL) AND keep.id < r.id));
+
+DELETE FROM mcq_answers WHERE result_id IN (SELECT id FROM _duplicate_results);
+DELETE FROM results WHERE id IN (SELECT id FROM _duplicate_results);
+DROP TEMPORARY TABLE _duplicate_results;
+
+-- Add the unique key first: it takes over the exam_id foreign key's index
+ALTER TABLE results
+  ADD CONSTRAINT _result_exam_student_uc UNIQUE (exam_id, student_id);
+
+DROP INDEX ix_results_exam_student ON results;
@@ -0,0 +1,165 @@
+# tests/conftest.py
+"""
+Test setup: the app runs against a throwaway SQLite file in async session mode
+(DATABASE_ASYNC=true, aiosqlite), so route tests exercise the AsyncSession path while
+service tests use the sync SessionLocal on the same file. Run from the project root:
+
+    python -m pytest -q
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+_DB_FILE = Path(tempfile.mkdtemp(prefix="sms-tests-")) / "test.sqlite3"
+
+# Set (not setdefault) before the app is imported: a developer's .env must never point the tests at a real database
+os.environ["DATABASE_URL"] = f"sqlite:///{_DB_FILE}"
+os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{_DB_FILE}"
+os.environ["DATABASE_ASYNC"] = "true"
+os.environ["FEE_OVERDUE_SWEEP_INTERVAL_SECONDS"] = "0" # No background sweeps during tests
+os.environ["SUBMISSION_QUEUE_ENABLED"] = "false"
+os.environ["DEFAULT_ADMIN_USERNAME"] = "admin"
+os.environ["DEFAULT_ADMIN_PASSWORD"] = "admin123"
+
+os.chdir(ROOT) # Templates and static files are resolved relative to the project root
+sys.path.insert(0, str(ROOT))
+
+import pytest
+
+from app import models
+from app.database import SessionLocal, engine
+from app.services import auth_service, dashboard_service
+
+
+@pytest.fixture
+def db():
+    """A session on a freshly created schema; caches that outlive a request are emptied too."""
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    auth_service.principal_cache.clear()
+    dashboard_service.invalidate_all_dashboards()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client(db):
+    """TestClient for the app (startup creates the default admin). Server errors come back as 500s."""
+    from fastapi.testclient import TestClient
+    from app.main import app
+    with TestClient(app, raise_server_exceptions=False) as test_client:
+        yield test_client
+
+
+def auth_headers(username: str) -> dict:
+    token = auth_service.create_access_token(data={"sub": username})
+    return {"Authorization": f"Bearer {token}"}
+
+
+# --- Factories (plain rows; passwords are not hashed, tests authenticate with minted tokens) ---
+def make_department(db, name="Computer Science") -> models.Department:
+    department = models.Department(name=name)
+    db.add(department); db.commit()
+    return department
+
+def make_student(db, username="student1", name="Student One", department=None) -> models.Student:
+    user = models.User(
+        username=username, email=f"{username}@example.com", hashed_password="-",
+        role=models.UserRole.STUDENT, is_active=True
+    )
+    db.add(user); db.flush()
+    student = models.Student(name=name, user_id=user.id, department_id=department.id if department else None)
+    db.add(student); db.commit()
+    return student
+
+def make_instructor(db, username="instructor1", name="Instructor One", department=None) -> models.Instructor:
+    user = models.User(
+        username=username, email=f"{username}@example.com", hashed_password="-",
+        role=models.UserRole.INSTRUCTOR, is_active=True
+    )
+    db.add(user); db.flush()
+    instructor = models.Instructor(name=name, user_id=user.id, department_id=department.id if department else None)
+    db.add(instructor); db.commit()
+    return instructor
+
+def make_course(db, department, name="Databases", capacity=None) -> models.Course:
+    course = models.Course(name=name, credits=3, department_id=department.id, capacity=capacity)
+    db.add(course); db.commit()
+    return course
+
+def make_schedule(db, course, instructor=None, day="Monday", start="09:00", end="10:00") -> models.Schedule:
+    from app.services import schedule_service
+    schedule = models.Schedule(
+        course_id=course.id, instructor_id=instructor.id if instructor else None, start_time=start, end_time=end
+    )
+    schedule_service.apply_slot(schedule, schedule_service.parse_slot(day, start, end))
+    db.add(schedule); db.commit()
+    return schedule
+
+def make_mcq_exam(db, course, questions=2, published=True, name="Quiz") -> models.Exam:
+    """A published MCQ exam; each question is worth 1 mark and its first option (position 0) is correct."""
+    from datetime import date, timedelta
+    exam = models.Exam(course_id=course.id, name=name, date=date.today() + timedelta(days=1),
+                       type=models.ExamType.QUIZ, total_marks=questions, is_published=published)
+    db.add(exam); db.flush()
+    for number in range(questions):
+        question = models.MCQQuestion(exam_id=exam.id, question_text=f"Question {number + 1}", marks=1)
+        db.add(question); db.flush()
+        db.add_all([
+            models.MCQOption(question_id=question.id, position=0, text="right", is_correct=True),
+            models.MCQOption(question_id=question.id, position=1, text="wrong", is_correct=False),
+        ])
+    db.commit()
+    return exam
+
+def mcq_options(db, exam) -> dict:
+    """{question_id: (correct option id, wrong option id)} of an exam made by make_mcq_exam."""
+    options = {}
+    for question in db.query(models.MCQQuestion).filter(models.MCQQuestion.exam_id == exam.id).order_by(models.MCQQuestion.id):
+        by_position = {o.position: o.id for o in db.query(models.MCQOption).filter(models.MCQOption.question_id == question.id)}
+        options[question.id] = (by_position[0], by_position[1])
+    return options
+
+def run_concurrently_in_async_mode(fn, *args, count=2, timeout=10.0) -> list:
+    """
+    Runs `count` calls of the sync service fn(db, *args) at once, each through its own
+    AsyncSession.run_sync, the way run_db does in async mode (on the event loop thread).
+    The loop runs in a separate thread so a deadlocked loop fails the test instead of hanging it.
+    """
+    import asyncio
+    import threading
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from sqlalchemy.pool import NullPool
+    from app import database
+
+    outcome = {}
+
+    async def main():
+        async_engine = create_async_engine(database.ASYNC_DATABASE_URL, poolclass=NullPool)
+        async def call():
+            async with AsyncSession(async_engine, expire_on_commit=False) as session:
+                return await session.run_sync(fn, *args)
+        try:
+            return await asyncio.gather(*[call() for _ in range(count)])
+        finally:
+            await async_engine.dispose()
+
+    def run():
+        try:
+            outcome["results"] = asyncio.run(main())
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), f"event loop still blocked after {timeout}s (deadlock)"
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["results"]
@@ -0,0 +1,121 @@
+# tests/test_async_smoke.py
+"""
+Crawls every page in async session mode with realistic data. A lazy load outside
+run_db/run_sync fails there with MissingGreenlet (a 500), so any status >= 500 is a bug.
+"""
+
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app import models
+from tests.conftest import (
+    auth_headers, make_course, make_department, make_instructor, make_schedule, make_student,
+)
+
+
+@pytest.fixture
+def campus(db):
+    """One of everything, linked the way the pages expect."""
+    department = make_department(db)
+    instructor = make_instructor(db, department=department)
+    student = make_student(db, department=department)
+    course = make_course(db, department, capacity=30)
+    db.add(models.Classroom(location="Room 101", capacity=40))
+    schedule = make_schedule(db, course, instructor)
+    db.add(models.Enrollment(student_id=student.id, course_id=course.id, enrollment_date=date.today()))
+    course.seats_taken = 1
+    db.add(models.Attendance(student_id=student.id, schedule_id=schedule.id, date=date.today(), status=models.AttendanceStatus.PRESENT))
+
+    exam = models.Exam(course_id=course.id, name="Midterm", date=date.today() + timedelta(days=7),
+                       type=models.ExamType.MIDTERM, total_marks=10, is_published=True)
+    db.add(exam); db.flush()
+    question = models.MCQQuestion(exam_id=exam.id, question_text="2 + 2?", marks=10)
+    db.add(question); db.flush()
+    db.add_all([
+        models.MCQOption(question_id=question.id, position=0, text="4", is_correct=True),
+        models.MCQOption(question_id=question.id, position=1, text="5", is_correct=False),
+    ])
+    result = models.Result(student_id=student.id, exam_id=exam.id, score=10, grade="A", is_graded=True, submitted_at=datetime.now())
+    db.add(result)
+
+    db.add(models.FeePayment(student_id=student.id, description="Tuition", amount=500, amount_paid=0,
+                             date=date.today() - timedelta(days=3), status=models.PaymentStatus.PENDING))
+    scholarship = models.Scholarship(name="Merit", amount=100)
+    db.add(scholarship); db.flush()
+    db.add(models.StudentScholarship(student_id=student.id, scholarship_id=scholarship.id, academic_year="2026-2027"))
+    db.add(models.Hostel(student_id=student.id, hostel_name="Block A", room_number="12", fees=200))
+    db.add(models.Library(student_id=student.id, books_borrowed="SQL Basics", borrowed_date=date.today()))
+    club = models.Club(name="Chess", type="Sports")
+    db.add(club); db.flush()
+    db.add(models.StudentClub(student_id=student.id, club_id=club.id, join_date=date.today()))
+    db.add(models.Complaint(student_id=student.id, description="Noisy hall", status=models.ComplaintStatus.OPEN, date=date.today()))
+    db.add(models.Alumni(student_id=student.id, graduation_year=2025, current_job="Engineer"))
+    db.add(models.DisciplineRecord(student_id=student.id, incident_description="Late", incident_date=date.today()))
+    plan = models.FeePlan(name="Tuition", term="2026-Fall", department_id=department.id, tuition_amount=1000,
+                          include_hostel=True, apply_scholarships=True, scholarship_share=0.5, due_date=date.today())
+    db.add(plan)
+    db.commit()
+    return {"student": student, "instructor": instructor, "exam": exam, "result": result, "plan": plan}
+
+
+ADMIN_PAGES = [
+    "/admin/dashboard", "/admin/students/", "/admin/students/add", "/admin/students/import",
+    "/admin/students/{student_id}/edit", "/admin/instructors/", "/admin/instructors/add",
+    "/admin/instructors/{instructor_id}/edit", "/admin/instructors/dashboard",
+    "/admin/metrics/db-pool", "/admin/metrics/password-hashing", "/admin/metrics/submission-queue",
+    "/admin/metrics/exam-autosave", "/admin/metrics/fee-overdue-sweep",
+    "/admin/exports/students", "/admin/exports/fees", "/admin/exports/fee_balances",
+    "/admin/courses/", "/admin/classrooms/", "/admin/schedules/", "/admin/schedules/conflicts",
+    "/admin/schedules/timetable-preview",
+    "/admin/fees/", "/admin/fees/outstanding", "/admin/fees/plans", "/admin/fees/plans/{plan_id}/preview",
+    "/admin/scholarships/definitions", "/admin/scholarships/assignments",
+    "/admin/library/records", "/admin/hostels/", "/admin/clubs/", "/admin/complaints/", "/admin/alumni/",
+    "/admin/departments/", "/api/students/search?q=Stu", "/auth/change-password",
+]
+STUDENT_PAGES = [
+    "/student/dashboard", "/student/enrollments", "/student/my-schedule", "/student/my-attendance",
+    "/student/exams/{exam_id}/attempt", "/student/exams/{exam_id}/submission-status", "/student/my-exams",
+    "/student/results/{result_id}", "/student/my-fees", "/student/my-library", "/student/profile",
+    "/student/my-clubs", "/student/my-complaints", "/auth/change-password",
+]
+INSTRUCTOR_PAGES = [
+    "/instructor/dashboard", "/instructor/attendance", "/instructor/exams",
+    "/instructor/exams/{exam_id}/edit-mcqs", "/instructor/exams/{exam_id}/analytics",
+    "/instructor/exams/{exam_id}/analytics.json", "/instructor/discipline/", "/auth/change-password",
+]
+
+
+def _crawl(client, username, pages, campus):
+    ids = {
+        "student_id": campus["student"].id, "instructor_id": campus["instructor"].id,
+        "exam_id": campus["exam"].id, "result_id": campus["result"].id, "plan_id": campus["plan"].id,
+    }
+    failures = {}
+    for page in pages:
+        url = page.format(**ids)
+        for attempt in ("cold", "cached"): # The second request goes through the principal cache
+            response = client.get(url, headers=auth_headers(username), follow_redirects=False)
+            if response.status_code >= 500:
+                failures[f"{url} ({attempt})"] = response.status_code
+    return failures
+
+def test_admin_pages_render_in_async_mode(client, campus):
+    assert _crawl(client, "admin", ADMIN_PAGES, campus) == {}
+
+def test_student_pages_render_in_async_mode(client, campus):
+    assert _crawl(client, "student1", STUDENT_PAGES, campus) == {}
+
+def test_instructor_pages_render_in_async_mode(client, campus):
+    assert _crawl(client, "instructor1", INSTRUCTOR_PAGES, campus) == {}
+
+def test_admin_creates_student_and_instructor_in_async_mode(client, campus):
+    headers = auth_headers("admin")
+    response = client.post("/admin/students/add", headers=headers, follow_redirects=False, data={
+        "name": "New Student", "email": "new.student@example.com", "username": "newstudent",
+    })
+    assert response.status_code == 303
+    response = client.post("/admin/instructors/add", headers=headers, follow_redirects=False, data={
+        "name": "New Instructor", "email": "new.instructor@example.com", "username": "newinstructor",
+    })
+    assert response.status_code == 303
@@ -0,0 +1,67 @@
+# tests/test_attempt_service.py
+"""One attempt (results row) per student and exam, also when two requests race to create it."""
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+
+from app import models
+from app.database import SessionLocal
+from app.services import attempt_service, result_service
+from tests.conftest import make_course, make_department, make_mcq_exam, make_student, mcq_options
+
+
+@pytest.fixture
+def exam(db):
+    department = make_department(db)
+    make_student(db, department=department)
+    return make_mcq_exam(db, make_course(db, department))
+
+@pytest.fixture
+def student(db, exam):
+    return db.query(models.Student).one()
+
+def _insert_before_next_flush(db, exam_id, student_id, submitted=False):
+    """Lets another session create the attempt between the lookup and this session's insert."""
+    @event.listens_for(db, "before_flush", once=True)
+    def competing_insert(session, flush_context, instances):
+        with SessionLocal() as other:
+            other.add(models.Result(exam_id=exam_id, student_id=student_id,
+                                    submitted_at=models.func.now() if submitted else None))
+            other.commit()
+
+def _attempts(db, exam, student):
+    db.expire_all()
+    return db.query(models.Result).filter_by(exam_id=exam.id, student_id=student.id).all()
+
+
+def test_results_are_unique_per_exam_and_student(db, exam, student):
+    db.add_all([models.Result(exam_id=exam.id, student_id=student.id) for _ in range(2)])
+    with pytest.raises(IntegrityError):
+        db.commit()
+    db.rollback()
+
+def test_start_attempt_resumes_the_row_a_concurrent_start_created(db, exam, student):
+    _insert_before_next_flush(db, exam.id, student.id)
+    result, saved = attempt_service.start_attempt(db, exam.id, student.id)
+    assert [attempt.id for attempt in _attempts(db, exam, student)] == [result.id]
+    assert saved == {}
+
+def test_start_attempt_after_a_concurrent_submission_is_refused(db, exam, student):
+    _insert_before_next_flush(db, exam.id, student.id, submitted=True)
+    with pytest.raises(ValueError, match="already been submitted"):
+        attempt_service.start_attempt(db, exam.id, student.id)
+
+def test_submission_grades_the_row_a_concurrent_start_created(db, exam, student):
+    answers = {question_id: correct for question_id, (correct, _) in mcq_options(db, exam).items()}
+    _insert_before_next_flush(db, exam.id, student.id)
+    result = result_service.record_exam_submission(db, exam.id, student.id, answers)
+    attempts = _attempts(db, exam, student)
+    assert [attempt.id for attempt in attempts] == [result.id]
+    assert attempts[0].score == 2 and attempts[0].submitted_at is not None
+
+def test_submission_racing_another_submission_is_rejected_as_duplicate(db, exam, student):
+    _insert_before_next_flush(db, exam.id, student.id, submitted=True)
+    with pytest.raises(result_service.ExamAlreadySubmittedError):
+        result_service.record_exam_submission(db, exam.id, student.id, {})
+    assert len(_attempts(db, exam, student)) == 1
@@ -0,0 +1,64 @@
+# tests/test_attendance_service.py
+"""The monthly attendance rollup is maintained by deltas and must match a full rebuild."""
+
+from datetime import date
+
+import pytest
+
+from app import models
+from app.services import attendance_service
+from tests.conftest import make_course, make_department, make_schedule, make_student
+
+
+@pytest.fixture
+def schedule_and_students(db):
+    department = make_department(db)
+    course = make_course(db, department)
+    schedule = make_schedule(db, course)
+    students = [make_student(db, f"student{i}", department=department) for i in range(3)]
+    return schedule, students
+
+def _rollup(db):
+    db.expire_all()
+    columns = list(attendance_service.SUMMARY_COUNT_COLUMNS.values())
+    return {
+        (row.student_id, row.month): tuple(getattr(row, column) for column in columns)
+        for row in db.query(models.AttendanceMonthlySummary).all()
+    }
+
+
+def test_first_save_counts_each_student_once(db, schedule_and_students):
+    schedule, (a, b, c) = schedule_and_students
+    day = date(2026, 3, 10)
+    created, updated = attendance_service.save_attendance_records(
+        db, schedule.id, day, {a.id: "PRESENT", b.id: "ABSENT", c.id: "bogus"}
+    )
+    assert (created, updated) == (2, 0)
+    month = date(2026, 3, 1)
+    assert _rollup(db) == {(a.id, month): (1, 0, 0, 0), (b.id, month): (0, 1, 0, 0)}
+
+def test_changed_status_moves_the_count(db, schedule_and_students):
+    schedule, (a, b, _) = schedule_and_students
+    day = date(2026, 3, 10)
+    attendance_service.save_attendance_records(db, schedule.id, day, {a.id: "PRESENT", b.id: "ABSENT"})
+    assert attendance_service.save_attendance_records(db, schedule.id, day, {a.id: "LATE", b.id: "ABSENT"}) == (0, 1)
+    assert attendance_service.save_attendance_records(db, schedule.id, day, {a.id: "LATE", b.id: "ABSENT"}) == (0, 0)
+    month = date(2026, 3, 1)
+    assert _rollup(db) == {(a.id, month): (0, 0, 1, 0), (b.id, month): (0, 1, 0, 0)}
+
+def test_deltas_match_a_full_rebuild(db, schedule_and_students):
+    schedule, (a, b, c) = schedule_and_students
+    for day, statuses in [
+        (date(2026, 3, 10), {a.id: "PRESENT", b.id: "PRESENT", c.id: "ABSENT"}),
+        (date(2026, 3, 17), {a.id: "EXCUSED", b.id: "PRESENT"}),
+        (date(2026, 3, 17), {a.id: "PRESENT", c.id: "LATE"}),
+        (date(2026, 4, 7), {a.id: "ABSENT", b.id: "LATE", c.id: "PRESENT"}),
+    ]:
+        attendance_service.save_attendance_records(db, schedule.id, day, statuses)
+    maintained = _rollup(db)
+    attendance_service.rebuild_attendance_summary(db)
+    assert maintained == _rollup(db)
+
+def test_unknown_schedule_is_rejected(db):
+    with pytest.raises(ValueError):
+        attendance_service.save_attendance_records(db, 999, date(2026, 3, 10), {1: "PRESENT"})
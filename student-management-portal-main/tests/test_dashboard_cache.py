@@ -0,0 +1,23 @@
+# tests/test_dashboard_cache.py
+"""Invalidation of one student's dashboard must not stop the others from being cached."""
+
+from app.services.dashboard_service import DashboardCache
+
+
+def test_invalidating_one_student_keeps_caching_the_others():
+    cache = DashboardCache(ttl_seconds=60, max_entries=10)
+    token_1, token_2 = cache.generation(1), cache.generation(2)
+    cache.invalidate(1) # A write for student 1 lands while both summaries are being computed
+    cache.put(1, {"v": 1}, token_1)
+    cache.put(2, {"v": 2}, token_2)
+    assert cache.get(1) is None
+    assert cache.get(2) == {"v": 2}
+
+def test_clear_rejects_every_summary_in_flight():
+    cache = DashboardCache(ttl_seconds=60, max_entries=10)
+    token = cache.generation(1)
+    cache.clear()
+    cache.put(1, {"v": 1}, token)
+    assert cache.get(1) is None
+    cache.put(1, {"v": 1}, cache.generation(1))
+    assert cache.get(1) == {"v": 1}
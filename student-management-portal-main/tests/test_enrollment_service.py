@@ -0,0 +1,82 @@
+# tests/test_enrollment_service.py
+"""Seat reservation, the waitlist and promotion when a seat is given back."""
+
+import urllib.parse
+
+import pytest
+
+from app import models
+from app.services import enrollment_service
+from tests.conftest import auth_headers, make_course, make_department, make_schedule, make_student
+
+
+@pytest.fixture
+def full_course(db):
+    """A one-seat course taken by `first`; `second` and `third` want in."""
+    department = make_department(db)
+    course = make_course(db, department, capacity=1)
+    make_schedule(db, course)
+    first = make_student(db, "first", department=department)
+    second = make_student(db, "second", department=department)
+    third = make_student(db, "third", department=department)
+    enrollment_service.create_enrollment(db, first.id, course.id)
+    return course, first, second, third
+
+def _seats_taken(db, course):
+    db.expire_all()
+    return db.get(models.Course, course.id).seats_taken
+
+
+def test_reserve_seat_respects_capacity(db):
+    course = make_course(db, make_department(db), capacity=2)
+    assert enrollment_service._reserve_seat(db, course.id)
+    assert enrollment_service._reserve_seat(db, course.id)
+    assert not enrollment_service._reserve_seat(db, course.id) # Full: the conditional UPDATE matches nothing
+    db.commit()
+    assert _seats_taken(db, course) == 2
+
+def test_reserve_seat_without_capacity_is_unlimited(db):
+    course = make_course(db, make_department(db), capacity=None)
+    assert all(enrollment_service._reserve_seat(db, course.id) for _ in range(5))
+
+def test_full_course_raises_and_leaves_session_usable(db, full_course):
+    course, first, second, _ = full_course
+    with pytest.raises(enrollment_service.CourseFullError):
+        enrollment_service.create_enrollment(db, second.id, course.id)
+    # Objects loaded before the error are still readable without a refresh
+    assert second.name == "Student One"
+    assert enrollment_service.join_waitlist(db, second.id, course.id) == 1
+    assert _seats_taken(db, course) == 1
+
+def test_dropped_seat_goes_to_first_waiting_student(db, full_course):
+    course, first, second, third = full_course
+    assert enrollment_service.join_waitlist(db, second.id, course.id) == 1
+    assert enrollment_service.join_waitlist(db, third.id, course.id) == 2
+
+    enrollment = db.query(models.Enrollment).filter_by(student_id=first.id, course_id=course.id).one()
+    assert enrollment_service.delete_enrollment(db, enrollment.id, first.id)
+
+    enrolled = {e.student_id for e in db.query(models.Enrollment).filter_by(course_id=course.id).all()}
+    waiting = [w.student_id for w in db.query(models.EnrollmentWaitlist).filter_by(course_id=course.id).all()]
+    assert enrolled == {second.id}
+    assert waiting == [third.id]
+    assert _seats_taken(db, course) == 1
+    assert enrollment_service.get_waitlist_for_student(db, third.id)[0]["position"] == 1
+
+def test_raised_capacity_promotes_in_arrival_order(db, full_course):
+    course, first, second, third = full_course
+    enrollment_service.join_waitlist(db, third.id, course.id)
+    enrollment_service.join_waitlist(db, second.id, course.id)
+    db.get(models.Course, course.id).capacity = 2
+    db.commit()
+    assert enrollment_service.promote_waitlist(db, course.id) == [third.id]
+    assert _seats_taken(db, course) == 2
+
+def test_enroll_route_offers_waitlist_when_full_in_async_mode(client, db, full_course):
+    course, _, second, _ = full_course
+    response = client.post(
+        "/student/enroll", data={"course_id": course.id}, headers=auth_headers("second"), follow_redirects=False
+    )
+    assert response.status_code == 303
+    assert "#1 on the waitlist" in urllib.parse.unquote(response.headers["location"])
+    assert db.query(models.EnrollmentWaitlist).filter_by(student_id=second.id, course_id=course.id).count() == 1
@@ -0,0 +1,59 @@
+# tests/test_exam_analytics_service.py
+"""Exam analytics: score summary, item statistics, the fingerprinted cache and instructor access."""
+
+import pytest
+
+from app.services import exam_analytics_service, result_service
+from tests.conftest import (
+    auth_headers, make_course, make_department, make_instructor, make_mcq_exam, make_schedule, make_student, mcq_options,
+)
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = exam_analytics_service.AnalyticsCache(max_entries=10)
+    monkeypatch.setattr(exam_analytics_service, "analytics_cache", cache)
+    return cache
+
+@pytest.fixture
+def exam(db):
+    """Four submissions of a two-question quiz scoring 2, 1, 1 and 0."""
+    department = make_department(db)
+    course = make_course(db, department)
+    make_schedule(db, course, make_instructor(db, department=department))
+    exam = make_mcq_exam(db, course)
+    (q1, (right1, wrong1)), (q2, (right2, wrong2)) = mcq_options(db, exam).items()
+    for username, answers in (
+        ("top", {q1: right1, q2: right2}), ("mid1", {q1: right1, q2: wrong2}),
+        ("mid2", {q1: right1, q2: wrong2}), ("bottom", {q1: wrong1}),
+    ):
+        student = make_student(db, username, department=department)
+        result_service.record_exam_submission(db, exam.id, student.id, answers)
+    return exam
+
+
+def test_summary_and_item_statistics(db, exam, cache):
+    analytics = exam_analytics_service.get_exam_analytics(db, exam.id)
+    assert (analytics["attempts"], analytics["total_marks"], analytics["mean"], analytics["median"]) == (4, 2, 1.0, 1.0)
+    assert sum(bucket["count"] for bucket in analytics["histogram"]) == 4
+
+    q1, q2 = analytics["questions"]
+    assert (q1["difficulty"], q2["difficulty"]) == (0.75, 0.25)
+    assert (q1["discrimination"], q2["discrimination"]) == (1.0, 1.0) # Top scorer right, bottom scorer wrong
+    assert (q2["answered"], q2["unanswered"]) == (3, 1)
+    assert [(option["is_correct"], option["count"]) for option in q1["options"]] == [(True, 3), (False, 1)]
+
+def test_cached_until_a_new_submission_arrives(db, exam, cache):
+    first = exam_analytics_service.get_exam_analytics(db, exam.id)
+    assert exam_analytics_service.get_exam_analytics(db, exam.id) is first
+    late = make_student(db, "late", department=exam.course.department)
+    result_service.record_exam_submission(db, exam.id, late.id, {})
+    assert exam_analytics_service.get_exam_analytics(db, exam.id)["attempts"] == 5
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 2}
+
+def test_json_endpoint_is_limited_to_instructors_of_the_course(client, db, exam, cache):
+    make_instructor(db, "outsider")
+    response = client.get(f"/instructor/exams/{exam.id}/analytics.json", headers=auth_headers("instructor1"))
+    assert response.status_code == 200 and response.json()["attempts"] == 4
+    response = client.get(f"/instructor/exams/{exam.id}/analytics.json", headers=auth_headers("outsider"))
+    assert response.status_code == 403
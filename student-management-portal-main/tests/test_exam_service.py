@@ -0,0 +1,92 @@
+# tests/test_exam_service.py
+"""MCQ option rows, compiled answer keys, the per-process key cache and cold-cache submissions in async mode."""
+
+import json
+
+import pytest
+
+from app import models
+from app.services import attempt_service, exam_service, result_service
+from tests.conftest import (
+    make_course, make_department, make_mcq_exam, make_student, mcq_options, run_concurrently_in_async_mode,
+)
+
+
+@pytest.fixture
+def exam(db):
+    return make_mcq_exam(db, make_course(db, make_department(db)), questions=3)
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = exam_service.AnswerKeyCache(max_entries=10)
+    monkeypatch.setattr(exam_service, "answer_key_cache", cache)
+    return cache
+
+
+def test_answer_key_grades_by_option_id(db, exam):
+    options = mcq_options(db, exam)
+    (q1, (right1, _)), (q2, (_, wrong2)), (q3, _) = options.items()
+    key = exam_service.compile_answer_key(db, exam.id, 0)
+    score, graded = key.grade({q1: right1, q2: wrong2, q3: right1}) # q3 gets an option of another question
+    assert key.total_marks == 3
+    assert score == 1
+    assert [(question_id, is_correct) for question_id, _, _, is_correct in graded] == [(q1, True), (q2, False), (q3, False)]
+    assert graded[2][1] is None # Recorded as unanswered
+
+def test_cache_reuses_a_key_until_the_version_changes(db, exam, cache):
+    first = cache.get(db, exam.id, 1)
+    assert cache.get(db, exam.id, 1) is first
+    assert cache.get(db, exam.id, 2) is not first # An edit through another worker bumped the version
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 2}
+
+def test_cache_does_not_replace_a_newer_key(db, exam, cache):
+    newer = cache.get(db, exam.id, 2)
+    cache.get(db, exam.id, 1) # A request that read the exam row before the edit
+    assert cache.get(db, exam.id, 2) is newer
+
+def test_concurrent_cold_cache_submissions_do_not_block_the_event_loop(db, exam, cache):
+    department = db.get(models.Course, exam.course_id).department
+    student_ids = [make_student(db, f"student{number}", department=department).id for number in range(3)]
+    for student_id in student_ids: # Open attempts, so the submissions reach the key before any write
+        attempt_service.start_attempt(db, exam.id, student_id)
+    students = iter(student_ids)
+    answers = {question_id: correct for question_id, (correct, _) in mcq_options(db, exam).items()}
+
+    def submit(session):
+        return result_service.record_exam_submission(session, exam.id, next(students), answers).score
+
+    assert run_concurrently_in_async_mode(submit, count=3) == [3, 3, 3]
+    assert cache.stats()["entries"] == 1
+
+def test_editing_questions_keeps_option_ids_and_bumps_the_key_version(db, exam):
+    before = mcq_options(db, exam)
+    version = exam.answer_key_version or 0
+    form = [{
+        "id": str(question_id), "question_text": f"Edited {question_id}", "marks": "2",
+        "options": [{"text": "now wrong", "is_correct": False}, {"text": "now right", "is_correct": True}],
+    } for question_id in list(before)[:2]] # The third question is dropped
+    assert exam_service.save_mcq_questions_for_exam(db, exam.id, form) == (2, 4.0)
+
+    db.expire_all()
+    after = {question.id: sorted(question.mcq_options, key=lambda option: option.position)
+             for question in db.get(models.Exam, exam.id).mcq_questions}
+    assert {question_id: (options[0].id, options[1].id) for question_id, options in after.items()} == \
+        {question_id: before[question_id] for question_id in list(before)[:2]} # Answers keep pointing at the same rows
+    assert all(options[1].is_correct and not options[0].is_correct for options in after.values())
+    assert db.get(models.Exam, exam.id).answer_key_version == version + 1
+
+def test_legacy_json_options_are_converted_and_answers_linked_once(db, exam):
+    question = models.MCQQuestion(exam_id=exam.id, question_text="Legacy", marks=1, options=json.dumps([
+        {"text": "A", "is_correct": False}, {"text": "B", "is_correct": True},
+    ]))
+    db.add(question); db.flush()
+    result = models.Result(exam_id=exam.id, student_id=make_student(db).id)
+    db.add(result); db.flush()
+    db.add(models.MCQAnswer(result_id=result.id, mcq_question_id=question.id, selected_option_text="B"))
+    db.commit()
+
+    assert exam_service.migrate_legacy_mcq_options(db, batch_size=1) == (1, 1)
+    db.expire_all()
+    chosen = db.query(models.MCQAnswer).filter_by(mcq_question_id=question.id).one().selected_option_id
+    assert db.get(models.MCQOption, chosen).is_correct
+    assert exam_service.migrate_legacy_mcq_options(db) == (0, 0) # Re-running changes nothing
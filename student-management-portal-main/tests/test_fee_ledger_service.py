@@ -0,0 +1,80 @@
+# tests/test_fee_ledger_service.py
+"""Fee changes post ledger entries and keep the student's balance row and aging buckets current."""
+
+from datetime import date, timedelta
+
+import pytest
+
+from app import models
+from app.services import fee_ledger_service, fee_service
+from tests.conftest import make_department, make_student
+
+
+@pytest.fixture
+def student(db):
+    return make_student(db, department=make_department(db))
+
+def _balance(db, student_id):
+    db.expire_all()
+    return fee_ledger_service.get_student_balance(db, student_id)
+
+def _ledger_sum(db, student_id):
+    return round(sum(entry.amount for entry in db.query(models.FeeLedgerEntry).filter_by(student_id=student_id)), 2)
+
+
+def test_charges_payments_and_cancellations_keep_the_balance(db, student):
+    today = date.today()
+    tuition = fee_service.create_fee_record(db, student.id, 1000.0, today + timedelta(days=10))
+    lab = fee_service.create_fee_record(db, student.id, 200.0, today - timedelta(days=5))
+    books = fee_service.create_fee_record(db, student.id, 50.0, today - timedelta(days=40))
+    assert _balance(db, student.id).balance == 1250.0
+
+    fee_service.update_fee_payment(db, tuition.id, {"amount_paid": 400.0}) # Partial payment
+    fee_service.record_student_payment(db, lab.id, student.id) # Paid in full
+    fee_service.update_fee_record_details(db, books.id, {"status": "CANCELLED"})
+
+    balance = _balance(db, student.id)
+    assert (balance.charged_total, balance.paid_total, balance.balance) == (1200.0, 600.0, 600.0)
+    assert balance.balance == _ledger_sum(db, student.id)
+    entry_types = [entry.entry_type for entry in fee_ledger_service.get_student_statement(db, student.id)]
+    assert entry_types.count(models.LedgerEntryType.CHARGE) == 3
+    assert models.LedgerEntryType.ADJUSTMENT in entry_types # The cancellation reverses the charge
+
+    fee_service.delete_fee_record(db, tuition.id)
+    assert _balance(db, student.id).balance == 0.0 == _ledger_sum(db, student.id)
+
+def test_outstanding_money_is_bucketed_by_days_past_due(db, student):
+    today = date.today()
+    for days_past_due, amount in [(-3, 10.0), (5, 20.0), (45, 40.0), (75, 80.0), (200, 160.0)]:
+        fee_service.create_fee_record(db, student.id, amount, today - timedelta(days=days_past_due))
+    balance = _balance(db, student.id)
+    assert (balance.not_due, balance.overdue_1_30, balance.overdue_31_60, balance.overdue_61_90, balance.overdue_over_90) == (
+        10.0, 20.0, 40.0, 80.0, 160.0
+    )
+    assert balance.oldest_due_date == today - timedelta(days=200)
+    assert balance.aged_on == today
+
+def test_refresh_moves_money_into_older_buckets(db, student):
+    today = date.today()
+    fee_service.create_fee_record(db, student.id, 100.0, today - timedelta(days=25))
+    assert fee_ledger_service.refresh_fee_aging(db, as_of=today + timedelta(days=10)) == 1
+    balance = _balance(db, student.id)
+    assert (balance.overdue_1_30, balance.overdue_31_60) == (0.0, 100.0)
+    assert fee_ledger_service.refresh_fee_aging(db, as_of=today + timedelta(days=10)) == 0 # Already current
+
+def test_outstanding_report_and_rebuild_agree_with_maintained_balances(db, student):
+    other = make_student(db, "student2", department=None)
+    fee_service.create_fee_record(db, student.id, 300.0, date.today() - timedelta(days=2))
+    fee = fee_service.create_fee_record(db, other.id, 500.0, date.today())
+    fee_service.update_fee_payment(db, fee.id, {"amount_paid": 100.0})
+
+    report = fee_ledger_service.get_outstanding_report(db)
+    assert [row["student_id"] for row in report["students"]] == [other.id, student.id] # Largest balance first
+    assert report["total_outstanding"] == 700.0
+    assert report["aging_totals"]["not_due"] == 400.0 and report["aging_totals"]["overdue_1_30"] == 300.0
+
+    maintained = {row["student_id"]: row["balance"] for row in report["students"]}
+    fee_ledger_service.rebuild_fee_ledger(db)
+    db.expire_all()
+    rebuilt = {row["student_id"]: row["balance"] for row in fee_ledger_service.get_outstanding_report(db)["students"]}
+    assert rebuilt == maintained
@@ -0,0 +1,88 @@
+# tests/test_fee_overdue_service.py
+"""Overdue sweep: batched PENDING -> OVERDUE flips, the status re-check, deadlock retries and balance re-aging."""
+
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app import models
+from app.database import SessionLocal
+from app.services import fee_ledger_service, fee_overdue_service, fee_service
+from tests.conftest import make_department, make_student
+
+
+@pytest.fixture
+def student(db):
+    return make_student(db, department=make_department(db))
+
+def _fee(db, student, days_past_due, amount=100.0):
+    return fee_service.create_fee_record(db, student.id, amount, date.today() - timedelta(days=days_past_due))
+
+def _statuses(db, fees):
+    db.expire_all()
+    return [db.get(models.FeePayment, fee.id).status for fee in fees]
+
+def _deadlock():
+    return OperationalError("UPDATE fee_payments ...", {}, Exception("Deadlock found when trying to get lock"))
+
+
+def test_past_due_pending_fees_are_flipped_in_batches(db, student):
+    past_due = [_fee(db, student, days) for days in (1, 2, 3, 4, 5)]
+    upcoming = _fee(db, student, -10)
+    paid = _fee(db, student, 7)
+    fee_service.record_student_payment(db, paid.id, student.id)
+
+    report = fee_overdue_service.sweep_overdue_fees(batch_size=2)
+    assert (report["rows"], report["batches"]) == (5, 3)
+    assert set(_statuses(db, past_due)) == {models.PaymentStatus.OVERDUE}
+    assert _statuses(db, [upcoming, paid]) == [models.PaymentStatus.PENDING, models.PaymentStatus.PAID]
+    assert fee_overdue_service.sweep_overdue_fees(batch_size=2)["rows"] == 0 # Idempotent
+
+def test_fee_paid_after_the_batch_was_picked_is_left_alone(db, student, monkeypatch):
+    first, second = _fee(db, student, 3), _fee(db, student, 2)
+    pick = fee_overdue_service._overdue_batch
+
+    def pick_then_pay(session, as_of, batch_size):
+        batch = pick(session, as_of, batch_size)
+        with SessionLocal() as other: # A payment commits between the SELECT and the UPDATE
+            other.get(models.FeePayment, first.id).status = models.PaymentStatus.PAID
+            other.commit()
+        return batch
+    monkeypatch.setattr(fee_overdue_service, "_overdue_batch", pick_then_pay)
+
+    assert fee_overdue_service.sweep_overdue_fees()["rows"] == 1
+    assert _statuses(db, [first, second]) == [models.PaymentStatus.PAID, models.PaymentStatus.OVERDUE]
+
+@pytest.mark.parametrize("failures", [fee_overdue_service.MAX_BATCH_RETRIES, fee_overdue_service.MAX_BATCH_RETRIES + 1])
+def test_deadlocked_batches_are_retried_up_to_the_limit(db, student, monkeypatch, failures):
+    fee = _fee(db, student, 3)
+    pick = fee_overdue_service._overdue_batch
+    calls = []
+
+    def deadlocking(session, as_of, batch_size):
+        calls.append(1)
+        if len(calls) <= failures:
+            raise _deadlock()
+        return pick(session, as_of, batch_size)
+    monkeypatch.setattr(fee_overdue_service, "_overdue_batch", deadlocking)
+
+    if failures > fee_overdue_service.MAX_BATCH_RETRIES:
+        with pytest.raises(OperationalError):
+            fee_overdue_service.sweep_overdue_fees()
+        assert _statuses(db, [fee]) == [models.PaymentStatus.PENDING]
+    else:
+        assert fee_overdue_service.sweep_overdue_fees()["rows"] == 1
+        assert _statuses(db, [fee]) == [models.PaymentStatus.OVERDUE]
+
+def test_sweep_re_ages_balances_into_later_buckets(db, student):
+    _fee(db, student, -5, amount=120.0) # Due in five days
+    db.expire_all()
+    assert fee_ledger_service.get_student_balance(db, student.id).not_due == 120.0
+
+    report = fee_overdue_service.sweep_overdue_fees(as_of=date.today() + timedelta(days=40))
+    assert (report["rows"], report["balances_aged"]) == (1, 1)
+    db.expire_all()
+    balance = fee_ledger_service.get_student_balance(db, student.id)
+    assert (balance.not_due, balance.overdue_31_60, balance.balance) == (0.0, 120.0, 120.0)
+    assert fee_overdue_service.get_metrics()["last_rows"] == 1
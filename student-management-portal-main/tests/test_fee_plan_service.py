@@ -0,0 +1,81 @@
+# tests/test_fee_plan_service.py
+"""Term fee plans: preview amounts, generation into fees/ledger/balances and one plan charge per student and term."""
+
+from datetime import date, timedelta
+
+import pytest
+
+from app import models
+from app.services import fee_ledger_service, fee_plan_service
+from tests.conftest import make_department, make_student
+
+
+@pytest.fixture
+def cohort(db):
+    """CS: `plain`, `boarder` (hostel 300) and `scholar` (award 1500, more than tuition); `physicist` elsewhere."""
+    cs, physics = make_department(db, "Computer Science"), make_department(db, "Physics")
+    plain = make_student(db, "plain", department=cs)
+    boarder = make_student(db, "boarder", department=cs)
+    scholar = make_student(db, "scholar", department=cs)
+    physicist = make_student(db, "physicist", department=physics)
+    award = models.Scholarship(name="Merit", amount=1500.0)
+    db.add_all([models.Hostel(student_id=boarder.id, hostel_name="Block A", fees=300.0), award]); db.flush()
+    db.add(models.StudentScholarship(student_id=scholar.id, scholarship_id=award.id, academic_year="2026-2027"))
+    db.commit()
+    return cs, plain, boarder, scholar, physicist
+
+def _plan(db, department=None, name="Tuition", term="2026-Fall"):
+    return fee_plan_service.create_fee_plan(
+        db, name, term, 1000.0, date.today() + timedelta(days=30),
+        department_id=department.id if department else None, academic_year="2026-2027"
+    )
+
+def _charges(db):
+    db.expire_all()
+    return {(fee.student.user.username, fee.fee_plan_id): fee.amount
+            for fee in db.query(models.FeePayment).filter(models.FeePayment.fee_plan_id.isnot(None))}
+
+
+def test_preview_computes_amounts_without_writing(db, cohort):
+    cs, plain, boarder, scholar, _ = cohort
+    preview = fee_plan_service.preview_fee_plan(db, _plan(db, cs).id)
+    assert {row["student_id"]: row["amount"] for row in preview["sample"]} == {plain.id: 1000.0, boarder.id: 1300.0, scholar.id: 0.0}
+    assert (preview["students"], preview["to_charge"], preview["fully_covered"]) == (3, 2, 1)
+    assert (preview["total_amount"], preview["total_hostel"], preview["total_scholarship"]) == (2300.0, 300.0, 1500.0)
+    assert _charges(db) == {}
+
+def test_generation_posts_fees_ledger_and_balances_and_reruns_charge_only_newcomers(db, cohort):
+    cs, plain, boarder, _, _ = cohort
+    plan = _plan(db, cs)
+    report = fee_plan_service.generate_fee_plan(db, plan.id)
+    assert (report["generated"], report["total_amount"], report["already_charged"]) == (2, 2300.0, 0)
+    assert _charges(db) == {("plain", plan.id): 1000.0, ("boarder", plan.id): 1300.0}
+    assert fee_ledger_service.get_student_balance(db, boarder.id).balance == 1300.0
+    assert db.query(models.FeeLedgerEntry).filter_by(student_id=boarder.id).count() == 1
+
+    assert fee_plan_service.generate_fee_plan(db, plan.id)["generated"] == 0 # Rerun: nothing new
+    make_student(db, "newcomer", department=cs)
+    report = fee_plan_service.generate_fee_plan(db, plan.id)
+    assert (report["generated"], report["already_charged"]) == (1, 2)
+    assert fee_ledger_service.get_student_balance(db, plain.id).balance == 1000.0 # Not charged twice
+
+def test_second_plan_of_the_term_skips_students_already_charged(db, cohort):
+    cs, *_ = cohort
+    department_plan = _plan(db, cs)
+    fee_plan_service.generate_fee_plan(db, department_plan.id)
+    everyone = _plan(db, name="Tuition (all)")
+
+    preview = fee_plan_service.preview_fee_plan(db, everyone.id)
+    assert (preview["to_charge"], preview["charged_by_other_plans"], preview["already_charged"]) == (1, 2, 0)
+    fee_plan_service.generate_fee_plan(db, everyone.id)
+    assert sorted(_charges(db).items()) == sorted({
+        ("plain", department_plan.id): 1000.0, ("boarder", department_plan.id): 1300.0, ("physicist", everyone.id): 1000.0,
+    }.items())
+
+    next_term = _plan(db, cs, term="2027-Spring") # A new term charges everyone again
+    assert fee_plan_service.generate_fee_plan(db, next_term.id)["generated"] == 2
+
+def test_plan_names_are_unique_per_term(db, cohort):
+    _plan(db)
+    with pytest.raises(ValueError, match="already exists"):
+        _plan(db)
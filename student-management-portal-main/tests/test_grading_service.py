@@ -0,0 +1,63 @@
+# tests/test_grading_service.py
+"""Batch regrading: the vectorised grader and regrade_exam after an answer key correction."""
+
+import numpy as np
+import pytest
+
+from app import models
+from app.services import exam_service, grading_service, result_service
+from tests.conftest import make_course, make_department, make_mcq_exam, make_student, mcq_options
+
+
+@pytest.fixture
+def graded_exam(db):
+    """Two submissions: `right` chose every keyed option, `wrong` every other one."""
+    department = make_department(db)
+    exam = make_mcq_exam(db, make_course(db, department), questions=3)
+    options = mcq_options(db, exam)
+    for username, pick in (("right", 0), ("wrong", 1)):
+        student = make_student(db, username, department=department)
+        result_service.record_exam_submission(db, exam.id, student.id, {q: pair[pick] for q, pair in options.items()})
+    return exam, options
+
+def _fix_answer_key(db, exam, options):
+    """The key was wrong: every question's second option is the correct one."""
+    for correct, wrong in options.values():
+        db.get(models.MCQOption, correct).is_correct = False
+        db.get(models.MCQOption, wrong).is_correct = True
+    db.get(models.Exam, exam.id).answer_key_version = models.Exam.answer_key_version + 1
+    db.commit()
+
+def _scores(db, exam):
+    db.expire_all()
+    return {result.student.user.username: result.score for result in db.query(models.Result).filter_by(exam_id=exam.id)}
+
+
+def test_grade_answers_matches_the_answer_key(db, graded_exam):
+    exam, options = graded_exam
+    key = exam_service.compile_answer_key(db, exam.id, 0)
+    (q1, (right1, wrong1)), (q2, (right2, _)), (q3, _) = options.items()
+    question_ids = np.array([q1, q1, q2, q3, q3], dtype=np.int64)
+    option_ids = np.array([right1, wrong1, right2, right1, -1], dtype=np.int64) # Foreign option, unanswered
+    is_correct, awarded = grading_service.grade_answers(key, question_ids, option_ids)
+    assert is_correct.tolist() == [True, False, True, False, False]
+    assert awarded.sum() == key.grade({q1: right1, q2: right2})[0] == 2
+
+def test_regrade_after_key_fix_rewrites_only_changed_rows(db, graded_exam):
+    exam, options = graded_exam
+    assert _scores(db, exam) == {"right": 3, "wrong": 0}
+    _fix_answer_key(db, exam, options)
+
+    preview = grading_service.regrade_exam(db, exam.id, dry_run=True)
+    assert (preview["results_changed"], preview["answers_changed"]) == (2, 6)
+    assert _scores(db, exam) == {"right": 3, "wrong": 0} # Dry run writes nothing
+
+    grading_service.regrade_exam(db, exam.id)
+    assert _scores(db, exam) == {"right": 0, "wrong": 3}
+    assert db.query(models.MCQAnswer).filter_by(is_correct=True).count() == 3
+    rerun = grading_service.regrade_exam(db, exam.id)
+    assert (rerun["results"], rerun["results_changed"], rerun["answers_changed"]) == (2, 0, 0)
+
+def test_regrade_of_unknown_exam_is_rejected(db):
+    with pytest.raises(ValueError, match="not found"):
+        grading_service.regrade_exam(db, 999)
@@ -0,0 +1,66 @@
+# tests/test_pagination.py
+"""Keyset pagination: pages walked in either direction cover every row once, ties included."""
+
+import re
+
+import pytest
+
+from app.pagination import PageRequest
+from app.services import student_service
+from tests.conftest import auth_headers, make_department, make_student
+
+
+NAMES = ["Ann", "Cy", "Ann", "Bob", "Ann", "Cy", "Bob"] # Ties on the sort key, broken by id
+
+
+@pytest.fixture
+def students(db):
+    department = make_department(db)
+    return [make_student(db, f"user{i}", name=name, department=department) for i, name in enumerate(NAMES)]
+
+def _walk_forward(db, order, limit=2):
+    pages, cursor = [], None
+    while True:
+        page = student_service.get_students_page(db, PageRequest.from_query(limit=limit, after=cursor, sort="name", order=order))
+        pages.append(page)
+        if not page.next_cursor:
+            return pages
+        cursor = page.next_cursor
+
+@pytest.mark.parametrize("order", ["asc", "desc"])
+def test_forward_walk_covers_every_row_in_order(db, students, order):
+    expected = [s.id for s in sorted(students, key=lambda s: (s.name, s.id), reverse=order == "desc")]
+    pages = _walk_forward(db, order)
+    assert [s.id for page in pages for s in page] == expected
+    assert [len(page) for page in pages] == [2, 2, 2, 1]
+    assert all(page.total == len(students) for page in pages)
+    assert pages[0].prev_cursor is None
+
+@pytest.mark.parametrize("order", ["asc", "desc"])
+def test_backward_walk_returns_the_same_pages(db, students, order):
+    forward = _walk_forward(db, order)
+    backward, cursor = [], forward[-1].prev_cursor
+    while cursor:
+        page = student_service.get_students_page(db, PageRequest.from_query(limit=2, before=cursor, sort="name", order=order))
+        backward.append([s.id for s in page])
+        cursor = page.prev_cursor
+    assert backward == [[s.id for s in page] for page in reversed(forward[:-1])]
+
+def test_tampered_cursor_restarts_from_the_first_page(db, students):
+    page = student_service.get_students_page(db, PageRequest.from_query(limit=2, after="not-a-cursor", sort="name"))
+    assert [s.name for s in page] == ["Ann", "Ann"]
+    assert page.prev_cursor is None
+
+def test_student_list_filters_by_department_and_keeps_it_in_links(client, db, students):
+    other = make_department(db, "Physics")
+    make_student(db, "physicist", name="Ann", department=other)
+    headers = auth_headers("admin")
+
+    response = client.get(f"/admin/students/?department_id={other.id}", headers=headers)
+    assert response.status_code == 200
+    assert "physicist" in response.text and "user0" not in response.text
+
+    response = client.get(f"/admin/students/?department_id={students[0].department_id}&limit=2", headers=headers)
+    assert "physicist" not in response.text
+    next_link = re.search(r'href="([^"]*after=[^"]*)"', response.text).group(1)
+    assert f"department_id={students[0].department_id}" in next_link
@@ -0,0 +1,35 @@
+# tests/test_principal_cache.py
+"""A password change must drop the cached principal, so the next request sees the new hash."""
+
+from app.services import auth_service
+from tests.conftest import auth_headers, make_department, make_student
+
+
+def _change_password(client, current, new):
+    return client.post("/auth/change-password", headers=auth_headers("student1"), follow_redirects=False, data={
+        "current_password": current, "new_password": new, "confirm_password": new,
+    })
+
+def test_password_change_invalidates_cached_principal(client, db):
+    student = make_student(db, department=make_department(db))
+    student.user.hashed_password = auth_service.get_password_hash("first-password")
+    db.commit()
+
+    assert client.get("/student/dashboard", headers=auth_headers("student1")).status_code == 200
+    assert auth_service.principal_cache.get("student1") is not None # Cached by the first request
+
+    assert _change_password(client, "first-password", "second-password").status_code == 303
+    assert auth_service.principal_cache.get("student1") is None
+
+    # Served from a fresh lookup: the old password no longer verifies, the new one does
+    assert _change_password(client, "first-password", "third-password").status_code == 400
+    assert _change_password(client, "second-password", "third-password").status_code == 303
+
+def test_invalidate_drops_every_subject_of_the_user(db):
+    cache = auth_service.PrincipalCache(ttl_seconds=60, max_entries=10)
+    student = make_student(db)
+    user = auth_service.get_user(db, "student1")
+    cache.put("student1", user)
+    cache.put("student1@example.com", user) # Tokens may carry the username or the email
+    cache.invalidate_user(student.user_id)
+    assert cache.get("student1") is None and cache.get("student1@example.com") is None
@@ -0,0 +1,72 @@
+# tests/test_schedule_service.py
+"""Schedule caches: course/student bitmaps and the conflict index, including async-mode concurrency."""
+
+from datetime import timedelta
+
+import pytest
+
+from app.services import schedule_service
+from tests.conftest import (
+    make_course, make_department, make_instructor, make_schedule, run_concurrently_in_async_mode,
+)
+
+
+@pytest.fixture
+def courses(db):
+    department = make_department(db)
+    algebra = make_course(db, department, name="Algebra")
+    biology = make_course(db, department, name="Biology")
+    make_schedule(db, algebra, day="Monday", start="09:00", end="10:00")
+    make_schedule(db, biology, day="Monday", start="09:30", end="11:00")
+    return algebra, biology
+
+
+def test_student_bitmap_detects_clash_and_follows_schedule_changes(db, courses):
+    algebra, biology = courses
+    bitmaps = schedule_service.CourseBitmaps(max_students=10)
+    timetable = bitmaps.student_bitmap(db, 1, (algebra.id,))
+    assert bitmaps.course_bitmaps(db)[biology.id] & timetable # Overlap on Monday 09:30-10:00
+    assert bitmaps.student_bitmap(db, 1, (algebra.id,)) == timetable # Served from the per-student cache
+
+    make_schedule(db, algebra, day="Friday", start="14:00", end="15:00") # Seen through the fingerprint
+    assert bitmaps.student_bitmap(db, 1, (algebra.id,)) != timetable
+
+def test_concurrent_cold_bitmap_reads_do_not_block_the_event_loop(db, courses):
+    algebra, _ = courses
+    bitmaps = schedule_service.CourseBitmaps(max_students=10)
+    results = run_concurrently_in_async_mode(bitmaps.course_bitmaps, count=4)
+    assert all(result[algebra.id] for result in results)
+    bitmaps.invalidate()
+    assert len(set(run_concurrently_in_async_mode(bitmaps.student_bitmap, 1, (algebra.id,), count=4))) == 1
+
+def test_conflict_index_reports_instructor_clash_and_follows_updates(db, courses):
+    algebra, biology = courses
+    instructor = make_instructor(db)
+    booked = make_schedule(db, algebra, instructor, day="Tuesday", start="10:00", end="11:00")
+    index = schedule_service.ScheduleIndex()
+    slot = schedule_service.parse_slot("Tuesday", "10:30", "11:30")
+
+    resource, resource_id, (start, end, schedule_id), course_name = index.find_conflict(db, slot, instructor.id, None)
+    assert (resource, resource_id, schedule_id, course_name) == ("instructor", instructor.id, booked.id, "Algebra")
+    assert index.find_conflict(db, slot, instructor.id, None, exclude_id=booked.id) is None # Editing the booking itself
+
+    schedule_service.apply_slot(booked, schedule_service.parse_slot("Wednesday", "10:00", "11:00"))
+    booked.updated_at = booked.updated_at + timedelta(seconds=1) # A later second (same-second rewrites are the documented blind spot)
+    db.commit() # Another worker's write: no invalidate(), seen through the fingerprint
+    assert index.find_conflict(db, slot, instructor.id, None) is None
+
+def test_check_schedule_conflicts_names_the_clashing_course(db, courses):
+    algebra, _ = courses
+    instructor = make_instructor(db)
+    make_schedule(db, algebra, instructor, day="Thursday", start="13:00", end="14:00")
+    with pytest.raises(ValueError, match="Instructor .* already booked on Thursday 13:00-14:00 .*Algebra"):
+        schedule_service.check_schedule_conflicts(db, schedule_service.parse_slot("Thursday", "13:30", "14:30"), instructor.id, None)
+
+def test_concurrent_cold_conflict_checks_do_not_block_the_event_loop(db, courses):
+    algebra, _ = courses
+    instructor = make_instructor(db)
+    booked = make_schedule(db, algebra, instructor, day="Friday", start="08:00", end="09:00")
+    index = schedule_service.ScheduleIndex()
+    slot = schedule_service.parse_slot("Friday", "08:30", "09:30")
+    results = run_concurrently_in_async_mode(index.find_conflict, slot, instructor.id, None, count=4)
+    assert {result[2][2] for result in results} == {booked.id}
@@ -0,0 +1,94 @@
+# tests/test_student_import_service.py
+"""Bulk student import: row validation, duplicates, the concurrent-insert retry and the shared hashing pool."""
+
+import io
+
+import pytest
+
+from app import models
+from app.database import SessionLocal
+from app.services import password_service, student_import_service
+from tests.conftest import make_department, make_student
+
+
+def _csv(*lines) -> io.BytesIO:
+    return io.BytesIO(("\n".join(("name,email,username,password,dob,department",) + lines) + "\n").encode("utf-8"))
+
+def _errors(report):
+    return [(error["row"], error["message"]) for error in report["errors"]]
+
+@pytest.fixture
+def fast_hashes(monkeypatch):
+    """Skips bcrypt for tests that are not about hashing."""
+    monkeypatch.setattr(password_service, "hash_passwords_on", lambda pool, passwords: [f"hashed:{p}" for p in passwords])
+
+@pytest.fixture
+def hash_pool(monkeypatch):
+    monkeypatch.setattr(student_import_service, "_hash_pool", None)
+    yield
+    student_import_service.shutdown()
+
+
+def test_invalid_rows_are_reported_and_the_rest_imported(db, fast_hashes):
+    make_department(db, "Physics")
+    report = student_import_service.import_students(db, _csv(
+        "Ada,ada@example.com,ada,,1990-01-31,physics",
+        ",nobody@example.com,nobody,,,",
+        "Bad Mail,not-an-email,badmail,,,",
+        "Bad Date,date@example.com,baddate,,31/01/1990,",
+        "Lost,lost@example.com,lost,,,Chemistry",
+    ), "intake.csv")
+    assert (report["rows"], report["imported"], report["failed"]) == (5, 1, 4)
+    assert _errors(report) == [
+        (3, "name is required."),
+        (4, "'not-an-email' is not a valid email address."),
+        (5, "dob '31/01/1990' is not a YYYY-MM-DD date."),
+        (6, "Unknown department 'Chemistry'."),
+    ]
+    student = db.query(models.Student).one()
+    assert (student.name, student.department.name, student.user.hashed_password) == ("Ada", "Physics", "hashed:12345")
+
+def test_duplicates_in_the_file_and_in_the_database(db, fast_hashes):
+    make_student(db, "taken")
+    report = student_import_service.import_students(db, _csv(
+        "One,one@example.com,one,,,",
+        "Again,other@example.com,ONE,,,",
+        "Same Mail,One@Example.com,two,,,",
+        "Taken,new@example.com,taken,,,",
+    ), "intake.csv", chunk_size=2)
+    assert report["imported"] == 1
+    assert _errors(report) == [
+        (3, "Username 'ONE' appears earlier in the file."),
+        (4, "Email 'One@Example.com' appears earlier in the file."),
+        (5, "Username 'taken' already exists."),
+    ]
+
+def test_dry_run_writes_nothing(db, fast_hashes):
+    report = student_import_service.import_students(db, _csv("Ada,ada@example.com,ada,,,"), "intake.csv", dry_run=True)
+    assert (report["imported"], report["failed"]) == (1, 0)
+    assert db.query(models.User).filter_by(username="ada").count() == 0
+
+def test_account_created_concurrently_is_dropped_and_the_chunk_retried(db, monkeypatch):
+    def hash_while_someone_registers(pool, passwords):
+        with SessionLocal() as other: # Between the existence check and the INSERT
+            other.add(models.User(username="bob", email="bob@example.com", hashed_password="-",
+                                  role=models.UserRole.STUDENT, is_active=True))
+            other.commit()
+        return [f"hashed:{p}" for p in passwords]
+    monkeypatch.setattr(password_service, "hash_passwords_on", hash_while_someone_registers)
+
+    report = student_import_service.import_students(db, _csv(
+        "Ada,ada@example.com,ada,,,", "Bob,bob@example.com,bob,,,",
+    ), "intake.csv")
+    assert report["imported"] == 1
+    assert _errors(report) == [(3, "Username 'bob' already exists.")]
+    assert db.query(models.Student).join(models.User).filter(models.User.username == "ada").count() == 1
+
+def test_imports_share_one_spawned_hashing_pool(db, hash_pool):
+    student_import_service.import_students(db, _csv("Ada,ada@example.com,ada,secret,,"), "first.csv", hash_workers=1)
+    pool = student_import_service._hash_pool
+    assert pool is not None and pool._mp_context.get_start_method() == "spawn"
+    student_import_service.import_students(db, _csv("Bob,bob@example.com,bob,,,"), "second.csv", hash_workers=1)
+    assert student_import_service._hash_pool is pool # Not a fresh pool per upload
+    hashed = db.query(models.User.hashed_password).filter_by(username="ada").scalar()
+    assert password_service.pwd_context.verify("secret", hashed)
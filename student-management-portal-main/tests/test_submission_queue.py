@@ -0,0 +1,122 @@
+# tests/test_submission_queue.py
+"""Queued exam submissions: idempotent enqueue and drain, the pending page state and crash replay."""
+
+from datetime import date
+
+import pytest
+
+from app import models
+from app.services import result_service, submission_queue_service
+from tests.conftest import auth_headers, make_course, make_department, make_mcq_exam, make_student, mcq_options
+
+
+@pytest.fixture
+def queue(client, tmp_path, monkeypatch):
+    """The queue switched on, backed by a temp file; no worker threads (tests drain it by hand)."""
+    test_queue = submission_queue_service.SubmissionQueue(path=str(tmp_path / "queue.sqlite3"), poll_seconds=0.01)
+    monkeypatch.setattr(submission_queue_service, "SUBMISSION_QUEUE_ENABLED", True)
+    monkeypatch.setattr(submission_queue_service, "submission_queue", test_queue)
+    return test_queue
+
+@pytest.fixture
+def exam(db):
+    department = make_department(db)
+    course = make_course(db, department)
+    student = make_student(db, department=department)
+    db.add(models.Enrollment(student_id=student.id, course_id=course.id, enrollment_date=date.today()))
+    db.commit()
+    return make_mcq_exam(db, course)
+
+def _my_exams(client):
+    response = client.get("/student/my-exams", headers=auth_headers("student1"))
+    assert response.status_code == 200
+    return response.text
+
+
+def test_unstarted_exam_can_be_started_with_queue_enabled(client, queue, exam):
+    page = _my_exams(client)
+    assert "Start Exam" in page
+    assert "Grading..." not in page
+
+def _answers(db, exam):
+    return {question_id: correct for question_id, (correct, _) in mcq_options(db, exam).items()}
+
+def _results(db, exam):
+    db.expire_all()
+    return db.query(models.Result).filter_by(exam_id=exam.id).all()
+
+
+def test_enqueue_is_idempotent_until_rejected(queue, exam):
+    entry, created = queue.enqueue(exam.id, 1, {})
+    assert created and entry["status"] == submission_queue_service.QUEUED
+    assert queue.enqueue(exam.id, 1, {1: 2}) == (entry, False) # Double click: the first answers stay
+    assert queue.metrics()["duplicates"] == 1
+
+    queue._finish([(entry["id"], submission_queue_service.FAILED, {"error": "unpublished"}, 1)])
+    entry, created = queue.enqueue(exam.id, 1, {}) # A rejected submission may be sent again
+    assert created and entry["status"] == submission_queue_service.QUEUED and entry["error"] is None
+
+def test_drain_writes_each_submission_once(db, queue, exam):
+    student = db.query(models.Student).one()
+    queue.enqueue(exam.id, student.id, _answers(db, exam))
+    assert queue.process_batch() == 1
+    entry = queue.get_status(exam.id, student.id)
+    assert entry["status"] == submission_queue_service.DONE and entry["score"] == 2
+    assert [result.id for result in _results(db, exam)] == [entry["result_id"]]
+
+    assert queue.enqueue(exam.id, student.id, {})[1] is False # Resubmitting a graded exam
+    assert queue.process_batch() == 0
+    assert len(_results(db, exam)) == 1
+
+def test_queued_submission_shows_grading_until_drained(client, db, queue, exam):
+    form = {f"q_answer_{question_id}": option_id for question_id, option_id in _answers(db, exam).items()}
+    response = client.post(f"/student/exams/{exam.id}/submit", data=form, headers=auth_headers("student1"), follow_redirects=False)
+    assert response.status_code == 303 and "toast_success" in response.headers["location"]
+    assert _results(db, exam) == [] # Acknowledged from the queue file only
+
+    page = _my_exams(client)
+    assert "Grading..." in page and "Start Exam" not in page
+    status = client.get(f"/student/exams/{exam.id}/submission-status", headers=auth_headers("student1")).json()
+    assert status["status"] == submission_queue_service.QUEUED
+
+    queue.process_batch()
+    page = _my_exams(client)
+    assert "View Results" in page and "Grading..." not in page
+    status = client.get(f"/student/exams/{exam.id}/submission-status", headers=auth_headers("student1")).json()
+    assert (status["status"], status["score"]) == ("done", 2)
+
+def test_claim_of_a_crashed_worker_is_replayed_after_the_lease(db, queue, exam):
+    student = db.query(models.Student).one()
+    queue.enqueue(exam.id, student.id, _answers(db, exam))
+    assert len(queue.claim_batch()) == 1 # The worker dies before recording anything
+    assert queue.process_batch() == 0 # Still leased
+
+    restarted = submission_queue_service.SubmissionQueue(path=queue.path, poll_seconds=0.01, lease_seconds=0)
+    assert restarted.process_batch() == 1
+    entry = restarted.get_status(exam.id, student.id)
+    assert (entry["status"], entry["attempts"]) == (submission_queue_service.DONE, 2)
+    assert len(_results(db, exam)) == 1
+
+def test_replay_after_a_lost_acknowledgement_is_done_without_a_second_write(db, queue, exam):
+    student = db.query(models.Student).one()
+    written = result_service.record_exam_submission(db, exam.id, student.id, _answers(db, exam)) # Then the worker crashed
+    queue.enqueue(exam.id, student.id, _answers(db, exam))
+    queue.process_batch()
+    entry = queue.get_status(exam.id, student.id)
+    assert (entry["status"], entry["result_id"]) == (submission_queue_service.DONE, written.id)
+    assert len(_results(db, exam)) == 1
+
+def test_transient_failures_are_retried_until_max_attempts(tmp_path):
+    def unavailable(exam_id, student_id, answers):
+        raise result_service.SubmissionStorageError("Database error saving exam submission.")
+
+    flaky = submission_queue_service.SubmissionQueue(
+        path=str(tmp_path / "flaky.sqlite3"), poll_seconds=0, max_attempts=2, processor=unavailable
+    )
+    flaky.enqueue(1, 1, {})
+    flaky.process_batch()
+    assert flaky.get_status(1, 1)["status"] == submission_queue_service.QUEUED # Backoff of 0s with poll_seconds=0
+    flaky.process_batch()
+    entry = flaky.get_status(1, 1)
+    assert (entry["status"], entry["attempts"]) == (submission_queue_service.FAILED, 2)
+    assert "Database error" in entry["error"]
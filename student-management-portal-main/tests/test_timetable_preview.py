@@ -0,0 +1,35 @@
+# tests/test_timetable_preview.py
+"""The admin preview only reads the report stored by a CLI dry run; it never runs the search."""
+
+import pytest
+
+from app.services import timetable_service
+from tests.conftest import auth_headers, make_course, make_department, make_schedule
+
+
+@pytest.fixture
+def preview_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "timetable_preview.json")
+    monkeypatch.setattr(timetable_service, "TIMETABLE_PREVIEW_PATH", path)
+    return path
+
+def test_preview_page_reads_stored_dry_run(client, db, preview_path, monkeypatch):
+    monkeypatch.setattr(timetable_service, "solve", lambda *args, **kwargs: pytest.fail("searched in a request"))
+    response = client.get("/admin/schedules/timetable-preview", headers=auth_headers("admin"))
+    assert response.status_code == 404
+
+    timetable_service.save_preview({"summary": {"moved": 0}, "schedules_fingerprint": ["stored"]})
+    response = client.get("/admin/schedules/timetable-preview", headers=auth_headers("admin"))
+    assert response.status_code == 200
+    assert response.json()["summary"] == {"moved": 0}
+    assert "generated_at" in response.json()
+
+def test_preview_goes_stale_when_schedules_change(db, preview_path):
+    course = make_course(db, make_department(db))
+    make_schedule(db, course)
+    report = timetable_service.generate_timetable(db, time_budget=0.5, workers=1, seed=1)
+    timetable_service.save_preview(report)
+    assert timetable_service.load_preview(db)["stale"] is False
+
+    make_schedule(db, course, day="Tuesday")
+    assert timetable_service.load_preview(db)["stale"] is True